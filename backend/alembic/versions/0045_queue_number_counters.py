@@ -0,0 +1,30 @@
+"""Counter-backed queue number allocation.
+
+Revision ID: 0045_queue_number_counters
+Revises: 0044_audit_logs
+Create Date: 2026-10-17
+
+Adds daily_queues.last_number (per-queue counter, seeded lazily from
+MAX(queue_entries.number) on first allocation) and queue_number_counters
+for cross-queue numbering.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0045_queue_number_counters"
+down_revision = "0044_audit_logs"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.add_column("daily_queues", sa.Column("last_number", sa.Integer(), nullable=True))
+    op.create_table(
+        "queue_number_counters",
+        sa.Column("key", sa.String(64), primary_key=True),
+        sa.Column("last_number", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+
+def downgrade() -> None:
+    op.drop_table("queue_number_counters")
+    op.drop_column("daily_queues", "last_number")
@@ -0,0 +1,91 @@
+"""Daily analytics rollup tables.
+
+Revision ID: 0046_analytics_rollups
+Revises: 0045_queue_number_counters
+Create Date: 2026-10-17
+
+Pre-aggregated per-day facts for analytics and admin dashboards (visits,
+revenue, services, queues) plus analytics_rollup_days marking the days that
+have been rolled up. Filled by the refresh_analytics_rollups arq job and
+app.scripts.backfill_analytics_rollups.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0046_analytics_rollups"
+down_revision = "0045_queue_number_counters"
+branch_labels = None
+depends_on = None
+
+def upgrade() -> None:
+    op.create_table(
+        "analytics_rollup_days",
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("rolled_up_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_table(
+        "analytics_visit_daily",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("department", sa.String(64), nullable=True),
+        sa.Column("doctor_id", sa.Integer(), nullable=True),
+        sa.Column("status", sa.String(32), nullable=True),
+        sa.Column("hour", sa.Integer(), nullable=False),
+        sa.Column("visit_count", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_analytics_visit_daily_day", "analytics_visit_daily", ["day"])
+    op.create_index(
+        "ix_analytics_visit_daily_day_department", "analytics_visit_daily", ["day", "department"]
+    )
+    op.create_table(
+        "analytics_revenue_daily",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("source", sa.String(16), nullable=False),
+        sa.Column("status", sa.String(32), nullable=True),
+        sa.Column("provider", sa.String(50), nullable=True),
+        sa.Column("method", sa.String(32), nullable=True),
+        sa.Column("department", sa.String(64), nullable=True),
+        sa.Column("amount", sa.Numeric(14, 2), nullable=False),
+        sa.Column("transactions", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_analytics_revenue_daily_day", "analytics_revenue_daily", ["day"])
+    op.create_index(
+        "ix_analytics_revenue_daily_day_source", "analytics_revenue_daily", ["day", "source"]
+    )
+    op.create_table(
+        "analytics_service_daily",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("service_id", sa.Integer(), nullable=False),
+        sa.Column("visit_count", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_analytics_service_daily_day", "analytics_service_daily", ["day"])
+    op.create_table(
+        "analytics_queue_daily",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("specialty", sa.String(100), nullable=True),
+        sa.Column("queue_tag", sa.String(32), nullable=True),
+        sa.Column("queue_count", sa.Integer(), nullable=False),
+        sa.Column("total_entries", sa.Integer(), nullable=False),
+        sa.Column("served", sa.Integer(), nullable=False),
+        sa.Column("waiting", sa.Integer(), nullable=False),
+        sa.Column("wait_sum_minutes", sa.Float(), nullable=False),
+        sa.Column("wait_samples", sa.Integer(), nullable=False),
+        sa.Column("wait_histogram", sa.JSON(), nullable=True),
+    )
+    op.create_index("ix_analytics_queue_daily_day", "analytics_queue_daily", ["day"])
+
+def downgrade() -> None:
+    op.drop_index("ix_analytics_queue_daily_day", table_name="analytics_queue_daily")
+    op.drop_table("analytics_queue_daily")
+    op.drop_index("ix_analytics_service_daily_day", table_name="analytics_service_daily")
+    op.drop_table("analytics_service_daily")
+    op.drop_index("ix_analytics_revenue_daily_day_source", table_name="analytics_revenue_daily")
+    op.drop_index("ix_analytics_revenue_daily_day", table_name="analytics_revenue_daily")
+    op.drop_table("analytics_revenue_daily")
+    op.drop_index("ix_analytics_visit_daily_day_department", table_name="analytics_visit_daily")
+    op.drop_index("ix_analytics_visit_daily_day", table_name="analytics_visit_daily")
+    op.drop_table("analytics_visit_daily")
+    op.drop_table("analytics_rollup_days")
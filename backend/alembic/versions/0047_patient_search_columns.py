@@ -0,0 +1,101 @@
+"""Normalized patient search columns with trigram indexes.
+
+Revision ID: 0047_patient_search_columns
+Revises: 0046_analytics_rollups
+Create Date: 2026-10-17
+
+Adds patients.search_name (case-folded, transliterated full name) and
+patients.search_phone (digits only), backfills them with
+app.utils.text_search and indexes them. On PostgreSQL the indexes are
+pg_trgm GIN indexes built CONCURRENTLY so substring search (LIKE '%q%')
+no longer scans the table; other dialects get plain btree indexes.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from app.utils.text_search import normalize_phone_digits, patient_search_name
+
+revision = "0047_patient_search_columns"
+down_revision = "0046_analytics_rollups"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 5000
+
+def _backfill(bind) -> None:
+    patients = sa.table(
+        "patients",
+        sa.column("id", sa.Integer),
+        sa.column("last_name", sa.String),
+        sa.column("first_name", sa.String),
+        sa.column("middle_name", sa.String),
+        sa.column("phone", sa.String),
+        sa.column("search_name", sa.String),
+        sa.column("search_phone", sa.String),
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(
+                patients.c.id,
+                patients.c.last_name,
+                patients.c.first_name,
+                patients.c.middle_name,
+                patients.c.phone,
+            )
+            .where(patients.c.id > last_id)
+            .order_by(patients.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        bind.execute(
+            patients.update()
+            .where(patients.c.id == sa.bindparam("row_id"))
+            .values(
+                search_name=sa.bindparam("name"),
+                search_phone=sa.bindparam("digits"),
+            ),
+            [
+                {
+                    "row_id": row.id,
+                    "name": patient_search_name(row.last_name, row.first_name, row.middle_name),
+                    "digits": normalize_phone_digits(row.phone) or None,
+                }
+                for row in rows
+            ],
+        )
+        last_id = rows[-1].id
+
+def upgrade() -> None:
+    op.add_column("patients", sa.Column("search_name", sa.String(512), nullable=True))
+    op.add_column("patients", sa.Column("search_phone", sa.String(32), nullable=True))
+
+    bind = op.get_bind()
+    _backfill(bind)
+
+    if bind.dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        with op.get_context().autocommit_block():
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_patients_search_name_trgm "
+                "ON patients USING gin (search_name gin_trgm_ops)"
+            )
+            op.execute(
+                "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_patients_search_phone_trgm "
+                "ON patients USING gin (search_phone gin_trgm_ops)"
+            )
+    else:
+        op.create_index("ix_patients_search_name", "patients", ["search_name"])
+        op.create_index("ix_patients_search_phone", "patients", ["search_phone"])
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute("DROP INDEX IF EXISTS ix_patients_search_phone_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_patients_search_name_trgm")
+    else:
+        op.drop_index("ix_patients_search_phone", table_name="patients")
+        op.drop_index("ix_patients_search_name", table_name="patients")
+    op.drop_column("patients", "search_phone")
+    op.drop_column("patients", "search_name")
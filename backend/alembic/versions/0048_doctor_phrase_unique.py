@@ -0,0 +1,78 @@
+"""Unique (doctor_id, field, phrase) for doctor_phrase_history.
+
+Revision ID: 0048_doctor_phrase_unique
+Revises: 0047_patient_search_columns
+Create Date: 2026-10-17
+
+Bulk phrase indexing (EMRPhraseIndexer.index_all_doctors) upserts with
+INSERT ... ON CONFLICT, which needs a unique index. Duplicates left by
+concurrent row-by-row upserts are merged first: the lowest id keeps the
+summed usage/telemetry counters and the latest last_used.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0048_doctor_phrase_unique"
+down_revision = "0047_patient_search_columns"
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = "uq_doctor_phrase_history_phrase"
+
+def _merge_duplicates(bind) -> None:
+    phrases = sa.table(
+        "doctor_phrase_history",
+        sa.column("id", sa.Integer),
+        sa.column("doctor_id", sa.Integer),
+        sa.column("field", sa.String),
+        sa.column("phrase", sa.Text),
+        sa.column("usage_count", sa.Integer),
+        sa.column("last_used", sa.DateTime),
+        sa.column("suggestions_shown", sa.Integer),
+        sa.column("suggestions_accepted", sa.Integer),
+    )
+    groups = bind.execute(
+        sa.select(
+            phrases.c.doctor_id,
+            phrases.c.field,
+            phrases.c.phrase,
+            sa.func.min(phrases.c.id).label("keep_id"),
+            sa.func.sum(phrases.c.usage_count).label("usage_count"),
+            sa.func.max(phrases.c.last_used).label("last_used"),
+            sa.func.sum(phrases.c.suggestions_shown).label("shown"),
+            sa.func.sum(phrases.c.suggestions_accepted).label("accepted"),
+        )
+        .group_by(phrases.c.doctor_id, phrases.c.field, phrases.c.phrase)
+        .having(sa.func.count() > 1)
+    ).all()
+    for group in groups:
+        bind.execute(
+            phrases.update()
+            .where(phrases.c.id == group.keep_id)
+            .values(
+                usage_count=group.usage_count,
+                last_used=group.last_used,
+                suggestions_shown=group.shown,
+                suggestions_accepted=group.accepted,
+            )
+        )
+        bind.execute(
+            phrases.delete().where(
+                phrases.c.doctor_id == group.doctor_id,
+                phrases.c.field == group.field,
+                phrases.c.phrase == group.phrase,
+                phrases.c.id != group.keep_id,
+            )
+        )
+
+def upgrade() -> None:
+    _merge_duplicates(op.get_bind())
+    op.create_index(
+        INDEX_NAME,
+        "doctor_phrase_history",
+        ["doctor_id", "field", "phrase"],
+        unique=True,
+    )
+
+def downgrade() -> None:
+    op.drop_index(INDEX_NAME, table_name="doctor_phrase_history")
@@ -0,0 +1,178 @@
+"""Content-addressed file blobs with reference counts.
+
+Revision ID: 0049_file_blobs
+Revises: 0048_doctor_phrase_unique
+Create Date: 2026-10-17
+
+Adds file_blobs (one row per SHA-256 of stored content) and backfills it
+from files and file_versions: every live file and every version of a
+live file holds one reference to the blob of its file_hash. Existing
+content stays where it is - storage_path points at the current on-disk
+path - and new uploads go to the sharded blobs/ layout. Files without a
+hash and content referenced only by already deleted files are left
+unmanaged, exactly as before.
+
+When the same content was stored several times, the blob keeps one
+existing copy: live files and versions are repointed to it and the other
+copies are removed from disk once no row refers to them any more.
+"""
+import logging
+import os
+from collections import defaultdict
+
+import sqlalchemy as sa
+
+from alembic import op
+
+logger = logging.getLogger("alembic.runtime.migration")
+
+revision = "0049_file_blobs"
+down_revision = "0048_doctor_phrase_unique"
+branch_labels = None
+depends_on = None
+
+
+def _files_tables():
+    files = sa.table(
+        "files",
+        sa.column("id", sa.Integer),
+        sa.column("file_path", sa.String),
+        sa.column("file_size", sa.Integer),
+        sa.column("file_hash", sa.String),
+        sa.column("status", sa.String),
+    )
+    versions = sa.table(
+        "file_versions",
+        sa.column("file_id", sa.Integer),
+        sa.column("file_path", sa.String),
+        sa.column("file_size", sa.Integer),
+        sa.column("file_hash", sa.String),
+    )
+    blobs = sa.table(
+        "file_blobs",
+        sa.column("sha256", sa.String),
+        sa.column("storage_path", sa.String),
+        sa.column("size", sa.BigInteger),
+        sa.column("ref_count", sa.Integer),
+    )
+    return files, versions, blobs
+
+
+def _live_references(files, versions):
+    live = sa.and_(files.c.status != "DELETED", sa.func.coalesce(files.c.file_hash, "") != "")
+    live_versions = sa.and_(
+        files.c.status != "DELETED", sa.func.coalesce(versions.c.file_hash, "") != ""
+    )
+    return sa.union_all(
+        sa.select(
+            files.c.file_hash.label("sha256"),
+            files.c.file_path.label("storage_path"),
+            files.c.file_size.label("size"),
+        ).where(live),
+        sa.select(
+            versions.c.file_hash,
+            versions.c.file_path,
+            versions.c.file_size,
+        )
+        .select_from(versions.join(files, files.c.id == versions.c.file_id))
+        .where(live_versions),
+    ).subquery()
+
+
+def _backfill(bind) -> None:
+    files, versions, blobs = _files_tables()
+    references = _live_references(files, versions)
+
+    bind.execute(
+        blobs.insert().from_select(
+            ["sha256", "storage_path", "size", "ref_count"],
+            sa.select(
+                references.c.sha256,
+                sa.func.max(references.c.storage_path),
+                sa.func.max(references.c.size),
+                sa.func.count(),
+            ).group_by(references.c.sha256),
+        )
+    )
+
+
+def _dedupe_copies(bind) -> None:
+    """Keep one on-disk copy per blob and remove the others.
+
+    Blob GC only deletes file_blobs.storage_path, so extra copies of the
+    same content would otherwise stay on disk forever.
+    """
+    files, versions, blobs = _files_tables()
+    references = _live_references(files, versions)
+
+    paths_by_hash: dict[str, set[str]] = defaultdict(set)
+    for sha256, storage_path in bind.execute(
+        sa.select(references.c.sha256, references.c.storage_path).distinct()
+    ):
+        paths_by_hash[sha256].add(storage_path)
+
+    for sha256, paths in paths_by_hash.items():
+        if len(paths) < 2:
+            continue
+        existing = sorted(path for path in paths if os.path.exists(path))
+        if not existing:
+            continue
+        keep = existing[-1]
+
+        bind.execute(blobs.update().where(blobs.c.sha256 == sha256).values(storage_path=keep))
+        bind.execute(
+            files.update()
+            .where(files.c.file_hash == sha256, files.c.status != "DELETED")
+            .values(file_path=keep)
+        )
+        live_file_ids = sa.select(files.c.id).where(files.c.status != "DELETED")
+        bind.execute(
+            versions.update()
+            .where(versions.c.file_hash == sha256, versions.c.file_id.in_(live_file_ids))
+            .values(file_path=keep)
+        )
+
+        for path in paths - {keep}:
+            # Deleted files may still point at a copy - leave those alone
+            still_referenced = bind.execute(
+                sa.select(
+                    sa.exists().where(files.c.file_path == path)
+                    | sa.exists().where(versions.c.file_path == path)
+                )
+            ).scalar()
+            if still_referenced:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            except OSError as exc:
+                logger.warning("file_blobs: could not remove duplicate %s: %s", path, exc)
+                continue
+            logger.info("file_blobs: removed duplicate copy %s of %s", path, sha256)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "file_blobs",
+        sa.Column("sha256", sa.String(64), primary_key=True),
+        sa.Column("storage_path", sa.String(500), nullable=False),
+        sa.Column("size", sa.BigInteger(), nullable=False),
+        sa.Column("ref_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.func.now(),
+            nullable=False,
+        ),
+        sa.Column("unreferenced_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_index("ix_file_blobs_unreferenced_at", "file_blobs", ["unreferenced_at"])
+
+    _backfill(op.get_bind())
+    _dedupe_copies(op.get_bind())
+
+
+def downgrade() -> None:
+    op.drop_index("ix_file_blobs_unreferenced_at", table_name="file_blobs")
+    op.drop_table("file_blobs")
@@ -0,0 +1,32 @@
+"""Scheduler leases for leader-elected periodic jobs.
+
+Revision ID: 0050_scheduler_leases
+Revises: 0049_file_blobs
+Create Date: 2026-10-17
+
+One row per periodic job of app.tasks.periodic: the last claimed schedule
+slot (each slot runs in exactly one process) and the running lock with
+its expiry, so API workers without Redis still agree on who runs a job.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0050_scheduler_leases"
+down_revision = "0049_file_blobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "scheduler_leases",
+        sa.Column("job_name", sa.String(100), primary_key=True),
+        sa.Column("owner", sa.String(200), nullable=True),
+        sa.Column("last_slot", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("locked_until", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("last_success_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("scheduler_leases")
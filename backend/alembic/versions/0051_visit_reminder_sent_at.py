@@ -0,0 +1,28 @@
+"""Add visits.reminder_sent_at.
+
+Revision ID: 0051_visit_reminder_sent_at
+Revises: 0050_scheduler_leases
+Create Date: 2026-10-17
+
+The arq reminder jobs mark a visit once its reminder is sent, so retries
+and repeated batch runs do not remind the patient twice. The batch query
+filters on the already indexed visit_date first.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0051_visit_reminder_sent_at"
+down_revision = "0050_scheduler_leases"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "visits",
+        sa.Column("reminder_sent_at", sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("visits", "reminder_sent_at")
@@ -8,6 +8,7 @@ from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db
+from app.core.cache import CacheKeys, CacheTags, cached
 from app.core.roles import DOCTOR_ROLES
 from app.core.security import require_roles
 from app.crud import clinic as crud_clinic
@@ -22,6 +23,7 @@ from app.schemas.clinic import (
     WeeklyScheduleUpdate,
 )
 from app.services.admin_doctors_stats_service import AdminDoctorsStatsService
+from app.services.catalogue_cache import CATALOGUE_CACHE_TTL_SECONDS
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -348,6 +350,15 @@ def create_schedule(
         raise _admin_doctors_http_error(exc, "create_schedule") from exc
 
 
+@cached(
+    ttl=CATALOGUE_CACHE_TTL_SECONDS,
+    key_builder=lambda db: CacheKeys.SPECIALTIES,
+    tags=(CacheTags.DOCTOR,),
+)
+def _specialties_payload(db: Session) -> list[dict]:
+    return AdminDoctorsStatsService(db).get_specialties()
+
+
 @router.get("/specialties", response_model=dict[str, Any])
 def get_specialties(
     db: Session = Depends(get_db),
@@ -355,7 +366,7 @@ def get_specialties(
 ):
     """Получить список специальностей."""
     try:
-        return AdminDoctorsStatsService(db).get_specialties()
+        return _specialties_payload(db)
     except Exception as exc:
         raise _admin_doctors_http_error(exc, "get_specialties") from exc
 
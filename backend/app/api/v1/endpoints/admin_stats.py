@@ -5,7 +5,7 @@ from datetime import UTC, date, datetime, time, timedelta
 from typing import Any, NoReturn
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import and_, desc, func
+from sqlalchemy import and_, desc
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db, require_roles
@@ -14,6 +14,7 @@ from app.models.patient import Patient
 from app.models.payment_webhook import PaymentWebhook
 from app.models.user import User
 from app.models.visit import Visit
+from app.services.analytics_rollup import revenue_facts
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -51,14 +52,12 @@ def get_admin_stats(
         # Пациенты
         total_patients = db.query(Patient).count()
 
-        # Доход (успешные платежи; amount хранится в тийинах)
-        total_revenue_cents = (
-            db.query(func.coalesce(func.sum(PaymentWebhook.amount), 0))
-            .filter(PaymentWebhook.status == "processed")
-            .scalar()
-            or 0
+        # Доход (успешные онлайн-платежи) - закрытые дни из дневных агрегатов
+        total_revenue = sum(
+            float(fact.amount)
+            for fact in revenue_facts(db, None, datetime.now(UTC), by_day=False)
+            if fact.source == "webhook" and fact.status == "processed"
         )
-        total_revenue = float(total_revenue_cents) / 100.0
 
         # Записи и визиты за сегодня
         appointments_today = (
@@ -523,14 +522,6 @@ def get_analytics_overview(
             )
         )
 
-        payments_query = db.query(PaymentWebhook).filter(
-            and_(
-                PaymentWebhook.status == "processed",
-                PaymentWebhook.created_at >= start_datetime,
-                PaymentWebhook.created_at <= end_datetime,
-            )
-        )
-
         patients_query = db.query(Patient).filter(
             and_(
                 Patient.created_at >= start_datetime, Patient.created_at <= end_datetime
@@ -552,11 +543,16 @@ def get_analytics_overview(
         total_appointments = appointments_query.count()
 
         # Доходы
-        payments = payments_query.all()
-        total_revenue = sum(float(p.amount) / 100.0 for p in payments)
+        revenue = [
+            fact
+            for fact in revenue_facts(db, start_datetime, end_datetime, by_day=False)
+            if fact.source == "webhook" and fact.status == "processed"
+        ]
+        total_revenue = sum(float(fact.amount) for fact in revenue)
+        transactions = sum(fact.transactions for fact in revenue)
 
         # Средний чек
-        avg_check = total_revenue / len(payments) if len(payments) > 0 else 0
+        avg_check = total_revenue / transactions if transactions > 0 else 0
 
         # Пациенты
         total_patients = patients_query.count()
@@ -576,15 +572,8 @@ def get_analytics_overview(
         for apt in appointments_all:
             if apt.doctor_id:
                 doctor_stats[apt.doctor_id]["appointments"] += 1
-                # Доход от этого appointment (если есть payment)
-                apt_payments = [
-                    p for p in payments if getattr(p, 'appointment_id', None) == apt.id
-                ]
-                if apt_payments:
-                    doctor_stats[apt.doctor_id]["revenue"] += sum(
-                        float(p.amount) / 100.0 for p in apt_payments
-                    )
-                elif apt.payment_amount:
+                # Онлайн-платежи не привязаны к записи - берём сумму из записи
+                if apt.payment_amount:
                     doctor_stats[apt.doctor_id]["revenue"] += float(apt.payment_amount)
 
         # Получаем имена врачей
@@ -673,6 +662,18 @@ def get_analytics_charts(
         start_date = today - timedelta(days=days - 1)
         end_date = today
 
+        # Доходы по дням - одним запросом (закрытые дни из дневных агрегатов)
+        revenue_by_day: dict[date, float] = {}
+        for fact in revenue_facts(
+            db,
+            datetime.combine(start_date, time.min),
+            datetime.combine(end_date, time.max),
+        ):
+            if fact.source == "webhook" and fact.status == "processed":
+                revenue_by_day[fact.day] = revenue_by_day.get(fact.day, 0.0) + float(
+                    fact.amount
+                )
+
         chart_data = []
         labels = []
 
@@ -694,19 +695,7 @@ def get_analytics_charts(
                 )
             appointments_count = appointments_query.count()
 
-            # Доходы за день
-            payments = (
-                db.query(PaymentWebhook)
-                .filter(
-                    and_(
-                        PaymentWebhook.status == "processed",
-                        PaymentWebhook.created_at >= day_start,
-                        PaymentWebhook.created_at <= day_end,
-                    )
-                )
-                .all()
-            )
-            revenue = sum(float(p.amount) / 100.0 for p in payments)
+            revenue = revenue_by_day.get(current_date, 0.0)
 
             labels.append(current_date.strftime("%d.%m"))
             chart_data.append(
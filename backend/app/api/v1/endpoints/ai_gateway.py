@@ -382,7 +382,7 @@ async def get_rate_limit_status(
     from app.services.ai import get_rate_limiter
 
     limiter = get_rate_limiter()
-    return limiter.get_user_usage(current_user.id)
+    return await limiter.get_user_usage(current_user.id)
 
 
 @router.post("/admin/reset-circuit-breaker", response_model=dict[str, Any])
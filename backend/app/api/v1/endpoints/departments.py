@@ -6,10 +6,13 @@ Provides department/tab management for registrar panel
 from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_current_active_user, get_db
+from app.core.cache import CacheKeys, CacheTags, cached
 from app.models.user import User
+from app.services.catalogue_cache import CATALOGUE_CACHE_TTL_SECONDS, catalogue_key
 from app.services.departments_api_service import (
     DepartmentsApiDomainError,
     DepartmentsApiService,
@@ -18,6 +21,19 @@ from app.services.departments_api_service import (
 router = APIRouter()
 
 
+@cached(
+    ttl=CATALOGUE_CACHE_TTL_SECONDS,
+    key_builder=lambda db, *, active_only: catalogue_key(
+        CacheKeys.DEPARTMENTS, active_only=active_only
+    ),
+    tags=(CacheTags.DEPARTMENT,),
+)
+async def _departments_payload(db: Session, *, active_only: bool) -> dict:
+    return await run_in_threadpool(
+        DepartmentsApiService(db).get_departments, active_only=active_only
+    )
+
+
 @router.get("/active", response_model=dict[str, Any])
 @router.get("", response_model=dict[str, Any])
 async def get_departments(
@@ -30,7 +46,7 @@ async def get_departments(
 
     Fetches departments from database with optional filtering by active status.
     """
-    return DepartmentsApiService(db).get_departments(active_only=active_only)
+    return await _departments_payload(db, active_only=active_only)
 
 
 @router.get("/{department_id}", response_model=dict[str, Any])
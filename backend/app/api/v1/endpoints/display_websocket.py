@@ -113,6 +113,11 @@ async def websocket_display_board(
                 elif message.get("type") == "request_update":
                     # Запрос обновления состояния
                     await manager._send_current_state(websocket, board_id)
+                elif message.get("type") == "queue_resync":
+                    # Табло пропустило дифф (разрыв версий) - шлём снимок
+                    queue_id = message.get("queue_id")
+                    if isinstance(queue_id, int):
+                        await manager.send_queue_snapshot(websocket, queue_id)
 
         except WebSocketDisconnect:
             pass
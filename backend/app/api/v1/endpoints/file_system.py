@@ -2,17 +2,12 @@
 API endpoints для файловой системы
 """
 
-import io
 import logging
-import os
-import shutil
-import tempfile
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Any, NoReturn
 
 from fastapi import (
     APIRouter,
-    BackgroundTasks,
     Depends,
     File,
     Form,
@@ -22,7 +17,8 @@ from fastapi import (
     UploadFile,
     status,
 )
-from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db, require_roles
@@ -31,7 +27,6 @@ from app.core.i18n import t  # noqa: F401
 from app.models.user import User
 from app.schemas.file_system import (
     FileExportRequest,
-    FileExportResponse,
     FileImportRequest,
     FileImportResponse,
     FileList,
@@ -45,6 +40,7 @@ from app.schemas.file_system import (
 )
 from app.services.file_system_api_service import FileSystemApiService
 from app.services.file_system_service import get_file_system_service
+from app.services.image_compression_service import ImageQueueFullError
 from app.utils.file_validator import validate_upload_file
 
 router = APIRouter()
@@ -52,6 +48,12 @@ logger = logging.getLogger(__name__)
 
 IMPORT_ARCHIVE_READ_CHUNK_BYTES = 1024 * 1024
 
+# Растровые изображения в предпросмотре отдаются веб-версией (JPEG);
+# SVG, GIF и прочее - как есть
+PREVIEW_WEB_VERSION_MIME_TYPES = frozenset(
+    {"image/jpeg", "image/png", "image/webp", "image/bmp", "image/tiff"}
+)
+
 
 def raise_file_system_internal_error(action: str, exc: Exception) -> NoReturn:
     logger.error(
@@ -238,14 +240,15 @@ async def download_file(
     """Скачать файл"""
     try:
         service = get_file_system_service()
-        file_content, filename, mime_type = service.download_file(
+        file_path, filename, mime_type = service.download_file(
             db, file_id, current_user.id
         )
 
-        return StreamingResponse(
-            io.BytesIO(file_content),
+        # Отдаётся с диска кусками; Range-запросы (докачка, перемотка) - 206
+        return FileResponse(
+            file_path,
             media_type=mime_type,
-            headers={"Content-Disposition": f"attachment; filename={filename}"},
+            filename=filename,
         )
 
     except HTTPException:
@@ -280,15 +283,36 @@ async def preview_file(
                 detail="Предварительный просмотр не поддерживается для этого типа файла",
             )
 
-        file_content, filename, mime_type = service.download_file(
+        file_path, filename, mime_type = service.download_file(
             db, file_id, current_user.id
         )
 
-        return StreamingResponse(
-            io.BytesIO(file_content),
+        if mime_type in PREVIEW_WEB_VERSION_MIME_TYPES:
+            try:
+                preview, preview_type = await service.render_image_preview(
+                    file_path, file_obj.file_hash
+                )
+            except ImageQueueFullError:
+                logger.warning("preview_file: image queue is full, serving original")
+            except (OSError, ValueError) as e:
+                # Не удалось декодировать - отдаём исходный файл
+                logger.warning("preview_file: web version failed (%s)", type(e).__name__)
+            else:
+                return Response(
+                    content=preview,
+                    media_type=preview_type,
+                    headers={
+                        "Content-Disposition": "inline",
+                        "X-Content-Type-Options": "nosniff",
+                    },
+                )
+
+        return FileResponse(
+            file_path,
             media_type=mime_type,
+            filename=filename,
+            content_disposition_type="inline",
             headers={
-                "Content-Disposition": f"inline; filename={filename}",
                 # FILES-AUDIT-28 P0-3: prevent content-type sniffing (SVG XSS)
                 "X-Content-Type-Options": "nosniff",
             },
@@ -609,34 +633,37 @@ async def get_file_shares(
         raise_file_system_internal_error("get_file_shares", e)
 
 
-@router.post("/export", response_model=FileExportResponse)
+@router.post(
+    "/export",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "description": "ZIP-архив выбранных файлов",
+            "content": {"application/zip": {"schema": {"type": "string", "format": "binary"}}},
+        },
+    },
+)
 async def export_files(
     export_request: FileExportRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_user: User = Depends(
         require_roles("Admin", "Doctor", "Nurse", "Receptionist")
     ),
 ):
-    """Экспортировать файлы в архив"""
+    """Экспортировать файлы в архив (ZIP отдаётся потоком по мере сжатия)"""
     try:
         service = get_file_system_service()
-        archive_path = service.export_files(db, export_request, current_user.id)
-
-        # Создаем временный файл для ответа
-        temp_file = tempfile.NamedTemporaryFile(
-            delete=False, suffix=f".{export_request.format}"
+        # Выбор файлов и проверка прав - в пуле потоков, сам архив StreamingResponse
+        # тоже читает из синхронного итератора в пуле, не блокируя event loop
+        archive_chunks = await run_in_threadpool(
+            service.export_files, db, export_request, current_user.id
         )
-        shutil.copy2(archive_path, temp_file.name)
-        temp_file.close()
 
-        # Удаляем исходный файл
-        os.unlink(archive_path)
-
-        return FileExportResponse(
-            export_id=f"export_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-            download_url=f"/api/v1/files/download-export/{os.path.basename(temp_file.name)}",
-            expires_at=datetime.now() + timedelta(hours=24),
+        archive_name = f"export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        return StreamingResponse(
+            archive_chunks,
+            media_type="application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{archive_name}"'},
         )
 
     except HTTPException:
@@ -8,6 +8,7 @@ from datetime import date, datetime
 from typing import Any
 
 from fastapi import APIRouter, Depends, Query
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, ConfigDict
 from sqlalchemy.orm import Session
 
@@ -97,7 +98,8 @@ async def global_search(
     """
     query = q.strip()
     search_service = GlobalSearchApiService(db)
-    patients, visits, lab_results = search_service.search_all(
+    patients, visits, lab_results = await run_in_threadpool(
+        search_service.search_all,
         query=query,
         limit=limit,
     )
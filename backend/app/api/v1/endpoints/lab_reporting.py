@@ -4,6 +4,7 @@ from datetime import UTC, datetime
 from typing import Any
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db, require_roles
@@ -33,11 +34,15 @@ from app.schemas.lab_reporting import (
     LabTemplateResolutionIn,
     LabTemplateResolutionOut,
 )
-from app.services.lab_report_pdf_service import lab_report_pdf_service
 from app.services.lab_reporting_service import (
     LabReportingDomainError,
     LabReportingService,
 )
+from app.services.pdf_render_pool import (
+    PDFQueueFullError,
+    PDFRenderTimeoutError,
+    get_pdf_render_pool,
+)
 
 router = APIRouter(prefix="/lab", tags=["lab-reporting"])
 
@@ -695,45 +700,56 @@ def mark_lab_report_printed(
         _handle_domain_error(exc)
 
 
+def _lab_report_pdf_context(db: Session, instance_id: int, user) -> dict[str, Any]:
+    service = LabReportingService(db)
+    instance = service.get_instance(instance_id)
+    _ensure_doctor_can_read_lab_instance(db, instance, user)
+    if instance.status not in {"FINALIZED", "PRINTED"}:
+        raise LabReportingDomainError(409, "Only finalized reports can be exported to PDF")
+    materialized_sections = service.materialize_instance(instance)
+    critical_findings = service.summarize_critical_findings(materialized_sections)
+    return {
+        "template_name": instance.template.name,
+        "layout_preset": instance.template_version.layout_preset,
+        "page_settings": instance.template_version.page_settings or {},
+        "branding": instance.branding_snapshot or {},
+        "patient": instance.patient_snapshot or {},
+        "signers": instance.signer_snapshot or {},
+        "sections": materialized_sections,
+        "critical_findings": critical_findings,
+        "footer_notes": instance.template_version.footer_notes,
+        "report_date": (
+            instance.finalized_at or instance.created_at or datetime.now(UTC)
+        ).strftime("%d.%m.%Y"),
+    }
+
+
 @router.get("/report-instances/{instance_id}/pdf", response_model=dict[str, Any])
-def download_lab_report_pdf(
+async def download_lab_report_pdf(
     instance_id: int,
     db: Session = Depends(get_db),
     user=Depends(require_roles("Admin", "Lab", "Doctor")),
 ):
-    service = LabReportingService(db)
     try:
-        instance = service.get_instance(instance_id)
-        _ensure_doctor_can_read_lab_instance(db, instance, user)
-        if instance.status not in {"FINALIZED", "PRINTED"}:
-            raise LabReportingDomainError(409, "Only finalized reports can be exported to PDF")
-        materialized_sections = service.materialize_instance(instance)
-        critical_findings = service.summarize_critical_findings(materialized_sections)
-        pdf_bytes = lab_report_pdf_service.render_report(
-            {
-                "template_name": instance.template.name,
-                "layout_preset": instance.template_version.layout_preset,
-                "page_settings": instance.template_version.page_settings or {},
-                "branding": instance.branding_snapshot or {},
-                "patient": instance.patient_snapshot or {},
-                "signers": instance.signer_snapshot or {},
-                "sections": materialized_sections,
-                "critical_findings": critical_findings,
-                "footer_notes": instance.template_version.footer_notes,
-                "report_date": (
-                    instance.finalized_at or instance.created_at or datetime.now(UTC)
-                ).strftime("%d.%m.%Y"),
-            }
-        )
-        filename = f"lab-report-{instance.id}.pdf"
-        return Response(
-            content=pdf_bytes,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f'inline; filename="{filename}"'},
-        )
+        context = await run_in_threadpool(_lab_report_pdf_context, db, instance_id, user)
     except LabReportingDomainError as exc:
         _handle_domain_error(exc)
 
+    # WeasyPrint рендерит в пуле процессов - event loop не блокируется
+    try:
+        pdf_bytes = await get_pdf_render_pool().render_lab_report(context)
+    except PDFQueueFullError as exc:
+        raise HTTPException(status_code=503, detail="PDF rendering queue is full") from exc
+    except PDFRenderTimeoutError as exc:
+        raise HTTPException(status_code=504, detail="PDF rendering timed out") from exc
+
+    filename = f"lab-report-{instance_id}.pdf"
+    return Response(
+        content=pdf_bytes,
+        media_type="application/pdf",
+        headers={"Content-Disposition": f'inline; filename="{filename}"'},
+    )
+
 
 # =============================================================================
 # P1 fix: Doctor-initiated lab orders — allows doctors to order lab tests
@@ -387,6 +387,7 @@ class BatchIndexResponse(BaseModel):
     doctorsNowReady: int
     durationMs: int
     errors: list[str]
+    emrsPerSecond: float = 0.0
 
 
 @router.post("/batch-index", response_model=BatchIndexResponse)
@@ -418,7 +419,8 @@ async def batch_index_emrs(
             totalPhrases=result.total_phrases,
             doctorsNowReady=result.doctors_now_ready,
             durationMs=result.duration_ms,
-            errors=result.errors
+            errors=result.errors,
+            emrsPerSecond=result.emrs_per_second
         )
     except Exception:
         raise HTTPException(
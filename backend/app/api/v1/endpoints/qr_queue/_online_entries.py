@@ -1368,16 +1368,11 @@ def _full_update_create_single_independent_entry(
     """
     import json
 
-    from sqlalchemy import text
-
     from app.models.online_queue import OnlineQueueEntry
 
     target_queue_id = _full_update_resolve_target_queue_id(db, entry, service)
 
-    next_number = db.execute(
-        text("SELECT COALESCE(MAX(number), 0) + 1 FROM queue_entries WHERE queue_id = :qid"),
-        {"qid": target_queue_id},
-    ).scalar()
+    next_number = queue_service.get_next_queue_number(db, queue_id=target_queue_id)
 
     quantity = service_item_data.get("quantity", 1) if service_item_data else 1
     item_price = service.price * quantity
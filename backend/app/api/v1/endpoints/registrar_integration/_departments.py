@@ -3,6 +3,61 @@ from __future__ import annotations
 from typing import Any
 
 from app.api.v1.endpoints.registrar_integration._helpers import *  # noqa
+from app.core.cache import CacheKeys, CacheTags, cached
+from app.services.catalogue_cache import CATALOGUE_CACHE_TTL_SECONDS, catalogue_key
+
+
+@cached(
+    ttl=CATALOGUE_CACHE_TTL_SECONDS,
+    key_builder=lambda db, *, active_only: catalogue_key(
+        f"{CacheKeys.DEPARTMENTS}:registrar", active_only=active_only
+    ),
+    tags=(CacheTags.DEPARTMENT,),
+)
+def _registrar_departments_payload(db: Session, *, active_only: bool) -> dict:
+    query = db.query(Department)
+
+    if active_only:
+        query = query.filter(Department.active == True)
+
+    # Сортируем по display_order
+    query = query.order_by(Department.display_order)
+
+    departments = query.all()
+
+    # Формируем ответ
+    result = []
+    for dept in departments:
+        # Получаем queue_prefix из настроек очереди
+        from app.models.department import DepartmentQueueSettings
+
+        queue_settings = (
+            db.query(DepartmentQueueSettings)
+            .filter(DepartmentQueueSettings.department_id == dept.id)
+            .first()
+        )
+
+        result.append(
+            {
+                "id": dept.id,
+                "key": dept.key,
+                "name_ru": dept.name_ru,
+                "name_uz": dept.name_uz,
+                "icon": dept.icon,
+                "color": dept.color,
+                "gradient": dept.gradient,
+                "display_order": dept.display_order,
+                "active": dept.active,
+                "description": dept.description,
+                "queue_prefix": (
+                    queue_settings.queue_prefix
+                    if queue_settings
+                    else dept.key.upper()[0]
+                ),
+            }
+        )
+
+    return {"success": True, "data": result, "count": len(result)}
 
 
 @router.get("/registrar/departments", response_model=dict[str, Any])
@@ -18,50 +73,7 @@ def get_registrar_departments(
     Доступен для регистраторов, в отличие от admin endpoint
     """
     try:
-        query = db.query(Department)
-
-        if active_only:
-            query = query.filter(Department.active == True)
-
-        # Сортируем по display_order
-        query = query.order_by(Department.display_order)
-
-        departments = query.all()
-
-        # Формируем ответ
-        result = []
-        for dept in departments:
-            # Получаем queue_prefix из настроек очереди
-            from app.models.department import DepartmentQueueSettings
-
-            queue_settings = (
-                db.query(DepartmentQueueSettings)
-                .filter(DepartmentQueueSettings.department_id == dept.id)
-                .first()
-            )
-
-            result.append(
-                {
-                    "id": dept.id,
-                    "key": dept.key,
-                    "name_ru": dept.name_ru,
-                    "name_uz": dept.name_uz,
-                    "icon": dept.icon,
-                    "color": dept.color,
-                    "gradient": dept.gradient,
-                    "display_order": dept.display_order,
-                    "active": dept.active,
-                    "description": dept.description,
-                    "queue_prefix": (
-                        queue_settings.queue_prefix
-                        if queue_settings
-                        else dept.key.upper()[0]
-                    ),
-                }
-            )
-
-        return {"success": True, "data": result, "count": len(result)}
-
+        return _registrar_departments_payload(db, active_only=active_only)
     except Exception:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -8,6 +8,7 @@ import logging
 from datetime import date, datetime
 from typing import Any, NoReturn
 
+import anyio.from_thread
 from fastapi import HTTPException, Request, Response, status
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, ConfigDict, Field
@@ -1421,7 +1422,10 @@ def _build_mini_app_patient_report_download_response(
     try:
         from app.api.v1.endpoints import telegram_webhook
 
-        filename, pdf_bytes, _caption = telegram_webhook._build_lab_report_pdf(db, report)
+        # Обработчик синхронный (пул потоков): рендер уходит в пул PDF через event loop
+        filename, pdf_bytes, _caption = anyio.from_thread.run(
+            telegram_webhook._build_lab_report_pdf, db, report
+        )
     except Exception as exc:
         # M4-P0-1: Log generation error
         log_patient_access(
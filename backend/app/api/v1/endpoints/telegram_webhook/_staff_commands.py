@@ -9,6 +9,7 @@ from datetime import UTC, date, datetime
 from decimal import Decimal
 from typing import Any
 
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from app.api.v1.endpoints.admin_telegram import (
@@ -22,6 +23,7 @@ from app.models.patient import Patient
 from app.models.payment import Payment, PaymentVisit
 from app.models.telegram_config import TelegramMessage, TelegramUser
 from app.models.visit import Visit
+from app.services.pdf_render_pool import get_pdf_render_pool
 
 logger = logging.getLogger(__name__)
 from app.api.v1.endpoints.telegram_webhook._helpers import *  # noqa: F401, F403
@@ -864,29 +866,40 @@ def _lab_report_document_caption(
     return caption
 
 
-def _build_lab_report_pdf(db: Session, instance: LabReportInstance) -> tuple[str, bytes, str]:
+def _lab_report_pdf_payload(
+    db: Session, instance: LabReportInstance
+) -> tuple[str, dict[str, Any], str]:
     service = LabReportingService(db)
     materialized_sections = service.materialize_instance(instance)
     critical_findings = service.summarize_critical_findings(materialized_sections)
     report_date = instance.finalized_at or instance.created_at or datetime.now(UTC)
-    pdf_bytes = lab_report_pdf_service.render_report(
-        {
-            "template_name": instance.template.name,
-            "layout_preset": instance.template_version.layout_preset,
-            "page_settings": instance.template_version.page_settings or {},
-            "branding": instance.branding_snapshot or {},
-            "patient": instance.patient_snapshot or {},
-            "signers": instance.signer_snapshot or {},
-            "sections": materialized_sections,
-            "critical_findings": critical_findings,
-            "footer_notes": instance.template_version.footer_notes,
-            "report_date": report_date.strftime("%d.%m.%Y"),
-        }
-    )
+    context = {
+        "template_name": instance.template.name,
+        "layout_preset": instance.template_version.layout_preset,
+        "page_settings": instance.template_version.page_settings or {},
+        "branding": instance.branding_snapshot or {},
+        "patient": instance.patient_snapshot or {},
+        "signers": instance.signer_snapshot or {},
+        "sections": materialized_sections,
+        "critical_findings": critical_findings,
+        "footer_notes": instance.template_version.footer_notes,
+        "report_date": report_date.strftime("%d.%m.%Y"),
+    }
     filename = f"kosmed-lab-report-{instance.id}.pdf"
     caption = _lab_report_document_caption(
         instance, report_date, TELEGRAM_LANGUAGE_RU
     )
+    return filename, context, caption
+
+
+async def _build_lab_report_pdf(
+    db: Session, instance: LabReportInstance
+) -> tuple[str, bytes, str]:
+    filename, context, caption = await run_in_threadpool(
+        _lab_report_pdf_payload, db, instance
+    )
+    # Как в lab_reporting: PDF рендерится в пуле процессов, а не в event loop
+    pdf_bytes = await get_pdf_render_pool().render_lab_report(context)
     return filename, pdf_bytes, caption
 
 
@@ -970,7 +983,7 @@ async def _send_clinic_lab_results(db: Session, bot_service, chat_id: int) -> No
     sent_count = 0
     for instance in instances:
         try:
-            filename, pdf_bytes, caption = _telegram_webhook_pkg._build_lab_report_pdf(
+            filename, pdf_bytes, caption = await _telegram_webhook_pkg._build_lab_report_pdf(
                 db, instance
             )
             if language == TELEGRAM_LANGUAGE_UZ:
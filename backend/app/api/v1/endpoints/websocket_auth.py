@@ -100,7 +100,7 @@ async def ws_queue_authenticated(
 
     try:
         # ✅ SECURITY: Rate limiting check
-        allowed, reason = websocket_rate_limiter.check_rate_limit(ip_address)
+        allowed, reason = await websocket_rate_limiter.check_rate_limit(ip_address)
         if not allowed:
             logger.warning(f"WebSocket rate limit exceeded for IP {ip_address}: {reason}")
             await websocket.close(
@@ -126,7 +126,7 @@ async def ws_queue_authenticated(
             return
 
         # ✅ SECURITY: Record connection after successful auth
-        websocket_rate_limiter.record_connection(ip_address)
+        await websocket_rate_limiter.record_connection(ip_address)
 
         await websocket.accept()
 
@@ -1,7 +1,8 @@
 """
 Caching Strategy for Clinic Management System
 
-This module provides in-memory caching with optional Redis support.
+This module provides in-memory caching with optional Redis support, either
+as the only backend or as L2 behind a per-process L1 (CACHE_BACKEND=tiered).
 Caches frequently accessed data:
 - Department lists
 - Doctor lists
@@ -11,8 +12,8 @@ Caches frequently accessed data:
 Usage:
     from app.core.cache import cache_manager, cached
 
-    # Decorator usage
-    @cached(ttl=300, key_prefix="departments")
+    # Decorator usage (sync or async; concurrent misses share one call)
+    @cached(ttl=300, key_prefix="departments", tags=(CacheTags.DEPARTMENT,))
     def get_departments():
         return db.query(Department).all()
 
@@ -21,12 +22,19 @@ Usage:
     value = cache_manager.get("key")
 """
 
+import asyncio
 import hashlib
+import heapq
+import inspect
 import json
 import logging
 import os
+import sys
+import threading
 import time
-from collections.abc import Callable
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from functools import wraps
 from typing import Any, TypeVar
@@ -35,6 +43,62 @@ logger = logging.getLogger(__name__)
 
 T = TypeVar("T")
 
+# Defaults for the per-process cache; overridable via CACHE_MAX_ENTRIES /
+# CACHE_MAX_BYTES / CACHE_EXPIRY_INTERVAL_SECONDS.
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_EXPIRY_INTERVAL_SECONDS = 30.0
+
+# Expired entries purged opportunistically on each write (amortised expiry).
+_EXPIRY_BATCH_ON_WRITE = 8
+
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        return max(0, int(raw))
+    except ValueError:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name)
+    if raw is None or raw.strip() == "":
+        return default
+    try:
+        return max(0.0, float(raw))
+    except ValueError:
+        return default
+
+
+def estimate_size(value: Any, _seen: set[int] | None = None) -> int:
+    """Approximate deep size of a cached value in bytes.
+
+    Computed once per ``set`` so that ``get_stats`` never has to walk
+    the cache. Shared sub-objects are counted once.
+    """
+    if _seen is None:
+        _seen = set()
+    obj_id = id(value)
+    if obj_id in _seen:
+        return 0
+    _seen.add(obj_id)
+
+    size = sys.getsizeof(value, 64)
+    if isinstance(value, (str, bytes, bytearray, int, float, bool)) or value is None:
+        return size
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += estimate_size(k, _seen) + estimate_size(v, _seen)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += estimate_size(item, _seen)
+    elif hasattr(value, "__dict__"):
+        size += estimate_size(vars(value), _seen)
+    return size
+
 
 @dataclass
 class CacheEntry:
@@ -43,38 +107,63 @@ class CacheEntry:
     expires_at: float
     created_at: float = field(default_factory=time.time)
     hits: int = 0
+    size: int = 0
 
 
 class InMemoryCache:
     """
-    Thread-safe in-memory cache with TTL support.
+    Thread-safe in-memory LRU cache with per-entry TTL and a byte budget.
+
+    All operations are O(1) amortised: recency is tracked by an
+    ``OrderedDict`` and expirations by a min-heap that is drained lazily
+    on writes and by an optional background janitor thread.
 
     For production with multiple instances, use Redis instead.
     """
 
-    def __init__(self, max_size: int = 1000):
-        self._cache: dict[str, CacheEntry] = {}
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        expiry_interval: float = DEFAULT_EXPIRY_INTERVAL_SECONDS,
+    ):
+        self._cache: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._expiry_heap: list[tuple[float, str]] = []
+        self._lock = threading.RLock()
         self._max_size = max_size
+        self._max_bytes = max_bytes
+        self._bytes = 0
         self._hits = 0
         self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        # Only tags that were bumped at least once are stored (default 0).
+        # Never evicted: losing a version would resurrect stale entries.
+        self._tag_versions: dict[str, int] = {}
+        self._expiry_interval = expiry_interval
+        self._janitor: threading.Thread | None = None
+        self._janitor_stop = threading.Event()
 
     def get(self, key: str) -> Any | None:
         """Get value from cache"""
-        entry = self._cache.get(key)
+        with self._lock:
+            entry = self._cache.get(key)
 
-        if entry is None:
-            self._misses += 1
-            return None
+            if entry is None:
+                self._misses += 1
+                return None
 
-        # Check expiration
-        if time.time() > entry.expires_at:
-            del self._cache[key]
-            self._misses += 1
-            return None
+            # Check expiration
+            if time.time() > entry.expires_at:
+                self._remove(key)
+                self._expirations += 1
+                self._misses += 1
+                return None
 
-        entry.hits += 1
-        self._hits += 1
-        return entry.value
+            self._cache.move_to_end(key)
+            entry.hits += 1
+            self._hits += 1
+            return entry.value
 
     def set(self, key: str, value: Any, ttl: int = 300) -> None:
         """
@@ -85,90 +174,183 @@ class InMemoryCache:
             value: Value to cache
             ttl: Time to live in seconds (default 5 minutes)
         """
-        # Evict oldest entries if at capacity
-        if len(self._cache) >= self._max_size:
-            self._evict_oldest()
-
-        self._cache[key] = CacheEntry(
-            value=value,
-            expires_at=time.time() + ttl
-        )
+        size = estimate_size(value) + sys.getsizeof(key)
+        now = time.time()
+        expires_at = now + ttl
+
+        with self._lock:
+            self._ensure_janitor()
+            if key in self._cache:
+                self._remove(key)
+
+            if self._max_bytes and size > self._max_bytes:
+                # Never let a single oversized value flush the whole cache.
+                logger.debug("Cache value for %s exceeds byte budget, skipped", key)
+                return
+
+            self._purge_expired(now, limit=_EXPIRY_BATCH_ON_WRITE)
+
+            while self._cache and (
+                (self._max_size and len(self._cache) >= self._max_size)
+                or (self._max_bytes and self._bytes + size > self._max_bytes)
+            ):
+                self._evict_oldest()
+
+            self._cache[key] = CacheEntry(
+                value=value,
+                expires_at=expires_at,
+                created_at=now,
+                size=size,
+            )
+            self._bytes += size
+            heapq.heappush(self._expiry_heap, (expires_at, key))
+            self._compact_heap()
 
     def delete(self, key: str) -> bool:
         """Delete a key from cache"""
-        if key in self._cache:
-            del self._cache[key]
-            return True
-        return False
+        with self._lock:
+            return self._remove(key)
 
     def delete_pattern(self, pattern: str) -> int:
         """Delete all keys matching pattern (prefix match)"""
-        keys_to_delete = [k for k in self._cache.keys() if k.startswith(pattern)]
-        for key in keys_to_delete:
-            del self._cache[key]
-        return len(keys_to_delete)
+        with self._lock:
+            keys_to_delete = [k for k in self._cache if k.startswith(pattern)]
+            for key in keys_to_delete:
+                self._remove(key)
+            return len(keys_to_delete)
 
     def clear(self) -> None:
         """Clear entire cache"""
-        self._cache.clear()
+        with self._lock:
+            self._cache.clear()
+            self._expiry_heap.clear()
+            self._bytes = 0
+
+    def get_tag_versions(self, tags: list[str]) -> list[int]:
+        """Current version of each tag (0 if never invalidated)"""
+        with self._lock:
+            return [self._tag_versions.get(tag, 0) for tag in tags]
+
+    def bump_tags(self, tags: list[str]) -> None:
+        """Invalidate every entry cached under any of ``tags`` in O(1)"""
+        with self._lock:
+            for tag in tags:
+                self._tag_versions[tag] = self._tag_versions.get(tag, 0) + 1
+
+    def _remove(self, key: str) -> bool:
+        entry = self._cache.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= entry.size
+        return True
 
     def _evict_oldest(self) -> None:
-        """Evict oldest 10% of entries"""
+        """Evict the least recently used entry"""
         if not self._cache:
             return
-
-        # Sort by creation time and remove oldest 10%
-        sorted_keys = sorted(
-            self._cache.keys(),
-            key=lambda k: self._cache[k].created_at
-        )
-
-        evict_count = max(1, len(sorted_keys) // 10)
-        for key in sorted_keys[:evict_count]:
-            del self._cache[key]
+        _, entry = self._cache.popitem(last=False)
+        self._bytes -= entry.size
+        self._evictions += 1
+
+    def _purge_expired(self, now: float, limit: int | None = None) -> int:
+        """Pop expired keys off the heap; stale heap items are skipped."""
+        removed = 0
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now and (limit is None or removed < limit):
+            expires_at, key = heapq.heappop(heap)
+            entry = self._cache.get(key)
+            if entry is not None and entry.expires_at == expires_at:
+                self._remove(key)
+                self._expirations += 1
+                removed += 1
+        return removed
+
+    def _compact_heap(self) -> None:
+        """Rebuild the heap when overwritten/deleted keys dominate it."""
+        if len(self._expiry_heap) > 2 * len(self._cache) + 64:
+            self._expiry_heap = [
+                (entry.expires_at, key) for key, entry in self._cache.items()
+            ]
+            heapq.heapify(self._expiry_heap)
 
     def cleanup_expired(self) -> int:
         """Remove all expired entries"""
-        now = time.time()
-        expired = [k for k, v in self._cache.items() if v.expires_at < now]
-        for key in expired:
-            del self._cache[key]
-        return len(expired)
+        with self._lock:
+            return self._purge_expired(time.time())
+
+    def _ensure_janitor(self) -> None:
+        if self._expiry_interval <= 0 or self._janitor is not None:
+            return
+        self._janitor = threading.Thread(
+            target=self._janitor_loop, name="cache-expiry", daemon=True
+        )
+        self._janitor.start()
+
+    def _janitor_loop(self) -> None:
+        while not self._janitor_stop.wait(self._expiry_interval):
+            try:
+                self.cleanup_expired()
+            except Exception as e:  # pragma: no cover - defensive
+                logger.error(f"Cache expiry error: {e}")
+
+    def stop(self) -> None:
+        """Stop the background expiry thread (if started)."""
+        self._janitor_stop.set()
+        if self._janitor is not None:
+            self._janitor.join(timeout=1)
+            self._janitor = None
+        self._janitor_stop = threading.Event()
 
     def get_stats(self) -> dict[str, Any]:
         """Get cache statistics"""
-        total_requests = self._hits + self._misses
-        hit_rate = self._hits / total_requests * 100 if total_requests > 0 else 0
-
-        return {
-            "size": len(self._cache),
-            "max_size": self._max_size,
-            "hits": self._hits,
-            "misses": self._misses,
-            "hit_rate": f"{hit_rate:.1f}%",
-            "memory_estimate_kb": self._estimate_memory() // 1024
-        }
+        with self._lock:
+            total_requests = self._hits + self._misses
+            hit_rate = self._hits / total_requests * 100 if total_requests > 0 else 0
 
-    def _estimate_memory(self) -> int:
-        """Rough estimate of cache memory usage in bytes"""
-        try:
-            return len(json.dumps({k: str(v.value) for k, v in self._cache.items()}))
-        except Exception:
-            return len(self._cache) * 1000  # Rough estimate
+            return {
+                "size": len(self._cache),
+                "max_size": self._max_size,
+                "bytes": self._bytes,
+                "max_bytes": self._max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "hit_rate": f"{hit_rate:.1f}%",
+                "memory_estimate_kb": self._bytes // 1024,
+            }
 
 
 class RedisCache:
     """
     Redis-based cache for production multi-instance deployments.
 
+    All keys live under ``key_prefix`` so that ``clear()`` and pattern
+    deletes never touch rate-limiter or pub/sub data sharing the database.
+    Tag versions are plain counters (``INCR``), which makes tag
+    invalidation O(1) regardless of keyspace size.
+
     Requires: pip install redis
     """
 
-    def __init__(self, redis_url: str | None = None):
+    KEY_PREFIX = "cache:"
+    TAG_PREFIX = "cache-tag:"
+    _SCAN_BATCH = 500
+
+    def __init__(
+        self,
+        redis_url: str | None = None,
+        client: Any | None = None,
+        key_prefix: str = KEY_PREFIX,
+    ):
         self._redis_url = redis_url or os.getenv("REDIS_URL", "redis://localhost:6379/0")
-        self._client = None
+        self._client = client
+        self._key_prefix = key_prefix
         self._available = False
-        self._connect()
+        if client is not None:
+            self._available = True
+        else:
+            self._connect()
 
     def _connect(self) -> None:
         """Attempt to connect to Redis"""
@@ -187,11 +369,14 @@ class RedisCache:
     def is_available(self) -> bool:
         return self._available
 
+    def _key(self, key: str) -> str:
+        return f"{self._key_prefix}{key}"
+
     def get(self, key: str) -> Any | None:
         if not self._available:
             return None
         try:
-            value = self._client.get(key)
+            value = self._client.get(self._key(key))
             if value:
                 return json.loads(value)
         except Exception as e:
@@ -202,7 +387,7 @@ class RedisCache:
         if not self._available:
             return
         try:
-            self._client.setex(key, ttl, json.dumps(value, default=str))
+            self._client.setex(self._key(key), ttl, json.dumps(value, default=str))
         except Exception as e:
             logger.error(f"Redis set error: {e}")
 
@@ -210,18 +395,30 @@ class RedisCache:
         if not self._available:
             return False
         try:
-            return self._client.delete(key) > 0
+            return self._client.delete(self._key(key)) > 0
         except Exception as e:
             logger.error(f"Redis delete error: {e}")
             return False
 
+    def _unlink_matching(self, match: str) -> int:
+        """Incrementally delete keys via SCAN (never blocks like KEYS)."""
+        deleted = 0
+        batch: list[Any] = []
+        for key in self._client.scan_iter(match=match, count=self._SCAN_BATCH):
+            batch.append(key)
+            if len(batch) >= self._SCAN_BATCH:
+                deleted += self._client.unlink(*batch)
+                batch.clear()
+        if batch:
+            deleted += self._client.unlink(*batch)
+        return deleted
+
     def delete_pattern(self, pattern: str) -> int:
+        """Prefix delete; prefer tags (``bump_tags``) on hot paths."""
         if not self._available:
             return 0
         try:
-            keys = self._client.keys(f"{pattern}*")
-            if keys:
-                return self._client.delete(*keys)
+            return self._unlink_matching(f"{self._key(pattern)}*")
         except Exception as e:
             logger.error(f"Redis delete pattern error: {e}")
         return 0
@@ -230,29 +427,245 @@ class RedisCache:
         if not self._available:
             return
         try:
-            self._client.flushdb()
+            self._unlink_matching(f"{self._key_prefix}*")
         except Exception as e:
             logger.error(f"Redis clear error: {e}")
 
+    def get_tag_versions(self, tags: list[str]) -> list[int]:
+        if not self._available or not tags:
+            return [0] * len(tags)
+        try:
+            values = self._client.mget([f"{self.TAG_PREFIX}{tag}" for tag in tags])
+            return [int(v) if v is not None else 0 for v in values]
+        except Exception as e:
+            logger.error(f"Redis tag version error: {e}")
+            return [0] * len(tags)
+
+    def bump_tags(self, tags: list[str]) -> None:
+        if not self._available or not tags:
+            return
+        try:
+            pipe = self._client.pipeline(transaction=False)
+            for tag in tags:
+                pipe.incr(f"{self.TAG_PREFIX}{tag}")
+            pipe.execute()
+        except Exception as e:
+            logger.error(f"Redis tag bump error: {e}")
+
+    def publish(self, channel: str, message: str) -> bool:
+        if not self._available:
+            return False
+        try:
+            self._client.publish(channel, message)
+            return True
+        except Exception as e:
+            logger.error(f"Redis publish error: {e}")
+            return False
+
+
+class TieredCache:
+    """
+    Two-tier cache: a small per-process L1 in front of shared Redis (L2).
+
+    Reads are served from L1 when possible; L1 entries live at most
+    ``l1_ttl`` seconds so a missed invalidation is bounded. Every write or
+    invalidation is broadcast over Redis pub/sub (``RedisPubSubBridge``
+    wire format) so the other workers drop their L1 copies. Without Redis
+    the tier degrades to the L1 cache alone.
+    """
+
+    INVALIDATION_CHANNEL = "invalidate"
+
+    def __init__(
+        self,
+        l1: InMemoryCache,
+        l2: RedisCache | None,
+        pubsub: Any | None = None,
+        l1_ttl: int = 30,
+    ):
+        self._l1 = l1
+        self._l2 = l2 if l2 is not None and l2.is_available else None
+        self._pubsub = pubsub
+        self._l1_ttl = l1_ttl
+        self._l2_hits = 0
+        self._l2_misses = 0
+        self._invalidations_received = 0
+
+    @property
+    def l1(self) -> InMemoryCache:
+        return self._l1
+
+    @property
+    def l2_available(self) -> bool:
+        return self._l2 is not None
+
+    def get(self, key: str) -> Any | None:
+        value = self._l1.get(key)
+        if value is not None or self._l2 is None:
+            return value
+
+        value = self._l2.get(key)
+        if value is None:
+            self._l2_misses += 1
+            return None
+        self._l2_hits += 1
+        self._l1.set(key, value, self._l1_ttl)
+        return value
+
+    def set(self, key: str, value: Any, ttl: int = 300) -> None:
+        self._l1.set(key, value, min(ttl, self._l1_ttl))
+        if self._l2 is not None:
+            self._l2.set(key, value, ttl)
+            self._broadcast({"op": "delete", "key": key})
+
+    def delete(self, key: str) -> bool:
+        deleted = self._l1.delete(key)
+        if self._l2 is not None:
+            deleted = self._l2.delete(key) or deleted
+            self._broadcast({"op": "delete", "key": key})
+        return deleted
+
+    def delete_pattern(self, pattern: str) -> int:
+        deleted = self._l1.delete_pattern(pattern)
+        if self._l2 is not None:
+            deleted = max(deleted, self._l2.delete_pattern(pattern))
+            self._broadcast({"op": "delete_pattern", "pattern": pattern})
+        return deleted
+
+    def clear(self) -> None:
+        self._l1.clear()
+        if self._l2 is not None:
+            self._l2.clear()
+            self._broadcast({"op": "clear"})
+
+    @staticmethod
+    def _tag_memo_key(tag: str) -> str:
+        return f"\x00tag:{tag}"
+
+    def get_tag_versions(self, tags: list[str]) -> list[int]:
+        if self._l2 is None:
+            return self._l1.get_tag_versions(tags)
+
+        versions: list[int | None] = [self._l1.get(self._tag_memo_key(t)) for t in tags]
+        missing = [i for i, v in enumerate(versions) if v is None]
+        if missing:
+            fetched = self._l2.get_tag_versions([tags[i] for i in missing])
+            for i, version in zip(missing, fetched, strict=True):
+                versions[i] = version
+                self._l1.set(self._tag_memo_key(tags[i]), version, self._l1_ttl)
+        return [int(v or 0) for v in versions]
+
+    def bump_tags(self, tags: list[str]) -> None:
+        if self._l2 is None:
+            self._l1.bump_tags(tags)
+            return
+        self._l2.bump_tags(tags)
+        for tag in tags:
+            memo_key = self._tag_memo_key(tag)
+            self._l1.delete(memo_key)
+            self._broadcast({"op": "delete", "key": memo_key})
+
+    def _broadcast(self, payload: dict[str, Any]) -> None:
+        if self._pubsub is None or self._l2 is None:
+            return
+        channel, message = self._pubsub.encode(self.INVALIDATION_CHANNEL, payload)
+        self._l2.publish(channel, message)
+
+    async def handle_invalidation(self, payload: dict[str, Any]) -> None:
+        """Apply an invalidation broadcast by another worker to L1 only."""
+        op = payload.get("op")
+        if op == "delete" and payload.get("key"):
+            self._l1.delete(str(payload["key"]))
+        elif op == "delete_pattern" and payload.get("pattern"):
+            self._l1.delete_pattern(str(payload["pattern"]))
+        elif op == "clear":
+            self._l1.clear()
+        else:
+            return
+        self._invalidations_received += 1
+
+    async def start(self) -> None:
+        """Subscribe to cross-worker invalidations (no-op without Redis)."""
+        if self._pubsub is None or self._l2 is None:
+            return
+        await self._pubsub.subscribe(
+            self.INVALIDATION_CHANNEL, self.handle_invalidation
+        )
+
+    def get_stats(self) -> dict[str, Any]:
+        return {
+            "l1": self._l1.get_stats(),
+            "l2_available": self.l2_available,
+            "l2_hits": self._l2_hits,
+            "l2_misses": self._l2_misses,
+            "invalidations_received": self._invalidations_received,
+        }
+
 
 class CacheManager:
     """
     Cache manager with automatic fallback from Redis to in-memory.
+
+    ``tiered=True`` puts a small per-process L1 in front of Redis and keeps
+    workers coherent through pub/sub invalidations (see ``TieredCache``).
     """
 
-    def __init__(self, use_redis: bool = False, redis_url: str | None = None):
-        self._memory_cache = InMemoryCache()
+    def __init__(
+        self,
+        use_redis: bool = False,
+        redis_url: str | None = None,
+        tiered: bool = False,
+        redis_client: Any | None = None,
+        pubsub: Any | None = None,
+    ):
+        expiry_interval = _env_float(
+            "CACHE_EXPIRY_INTERVAL_SECONDS", DEFAULT_EXPIRY_INTERVAL_SECONDS
+        )
+        self._memory_cache = InMemoryCache(
+            max_size=_env_int("CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES),
+            max_bytes=_env_int("CACHE_MAX_BYTES", DEFAULT_MAX_BYTES),
+            expiry_interval=expiry_interval,
+        )
         self._redis_cache = None
+        self._tiered_cache: TieredCache | None = None
 
-        if use_redis:
-            self._redis_cache = RedisCache(redis_url)
+        if use_redis or tiered:
+            self._redis_cache = RedisCache(redis_url, client=redis_client)
             if not self._redis_cache.is_available:
                 self._redis_cache = None
                 logger.info("Falling back to in-memory cache")
 
+        if tiered:
+            if pubsub is None and self._redis_cache is not None:
+                from app.services.ws_redis_pubsub import RedisPubSubBridge
+
+                pubsub = RedisPubSubBridge(
+                    channel_prefix="cache", redis_url=redis_url
+                )
+            self._tiered_cache = TieredCache(
+                l1=InMemoryCache(
+                    max_size=_env_int("CACHE_L1_MAX_ENTRIES", 256),
+                    max_bytes=_env_int("CACHE_L1_MAX_BYTES", 8 * 1024 * 1024),
+                    expiry_interval=expiry_interval,
+                ),
+                l2=self._redis_cache,
+                pubsub=pubsub,
+                l1_ttl=_env_int("CACHE_L1_TTL_SECONDS", 30),
+            )
+
     @property
-    def _cache(self) -> InMemoryCache | RedisCache:
-        return self._redis_cache or self._memory_cache
+    def is_shared(self) -> bool:
+        """True when writes and invalidations are visible to every worker (Redis L2)."""
+        return self._redis_cache is not None
+
+    @property
+    def _cache(self) -> InMemoryCache | RedisCache | TieredCache:
+        return self._tiered_cache or self._redis_cache or self._memory_cache
+
+    async def start(self) -> None:
+        """Start background subscriptions required by the active backend."""
+        if self._tiered_cache is not None:
+            await self._tiered_cache.start()
 
     def get(self, key: str) -> Any | None:
         return self._cache.get(key)
@@ -269,7 +682,20 @@ class CacheManager:
     def clear(self) -> None:
         self._cache.clear()
 
+    def get_tag_versions(self, tags: list[str]) -> list[int]:
+        return self._cache.get_tag_versions(tags)
+
+    def invalidate_tags(self, *tags: str) -> None:
+        """Invalidate everything cached under ``tags`` (O(1) per tag)."""
+        if tags:
+            self._cache.bump_tags(list(tags))
+
     def get_stats(self) -> dict[str, Any]:
+        if isinstance(self._cache, TieredCache):
+            return {
+                "backend": "tiered",
+                **self._cache.get_stats()
+            }
         if isinstance(self._cache, InMemoryCache):
             return {
                 "backend": "memory",
@@ -281,74 +707,265 @@ class CacheManager:
         }
 
 
-# Global cache manager instance
+# Global cache manager instance (CACHE_BACKEND: memory | redis | tiered)
 cache_manager = CacheManager(
-    use_redis=os.getenv("CACHE_BACKEND") == "redis"
+    use_redis=os.getenv("CACHE_BACKEND") == "redis",
+    tiered=os.getenv("CACHE_BACKEND") == "tiered",
 )
 
 
+async def start_cache_invalidation_listener() -> None:
+    """Subscribe this worker to cross-worker cache invalidations."""
+    await cache_manager.start()
+
+
 # === Caching Decorator ===
 
+TagSpec = tuple[str, ...] | Callable[..., Iterable[str]]
+
+
+def _resolve_tags(tags: TagSpec | None, args: tuple, kwargs: dict) -> list[str]:
+    if tags is None:
+        return []
+    if callable(tags):
+        return list(tags(*args, **kwargs))
+    return list(tags)
+
+
+def _versioned_key(base_key: str, tags: list[str]) -> str:
+    """Append current tag versions so a tag bump orphans old entries."""
+    if not tags:
+        return base_key
+    versions = cache_manager.get_tag_versions(tags)
+    suffix = ",".join(f"{tag}={version}" for tag, version in zip(tags, versions, strict=True))
+    return f"{base_key}|{suffix}"
+
+
+_SCALAR_TYPES = (str, int, float, bool, type(None))
+_SWR_FRESH_UNTIL = "__fresh_until__"
+
+
+def _default_key(key_prefix: str, func: Callable, args: tuple, kwargs: dict) -> str:
+    """prefix:function_name:args - readable for scalars, hashed otherwise"""
+    if all(isinstance(a, _SCALAR_TYPES) for a in args) and all(
+        isinstance(v, _SCALAR_TYPES) for v in kwargs.values()
+    ):
+        parts = [repr(a) for a in args]
+        parts.extend(f"{k}={v!r}" for k, v in sorted(kwargs.items()))
+        return f"{key_prefix}:{func.__name__}:{','.join(parts)}"
+
+    args_hash = hashlib.md5(
+        json.dumps((args, kwargs), default=str, sort_keys=True).encode(),
+        usedforsecurity=False,
+    ).hexdigest()[:8]
+    return f"{key_prefix}:{func.__name__}:{args_hash}"
+
+
+class _SyncFlights:
+    """Coalesces concurrent sync computations of the same key."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[str, Future] = {}
+
+    def in_flight(self, key: str) -> bool:
+        with self._lock:
+            return key in self._calls
+
+    def run(self, key: str, load: Callable[[], T]) -> T:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+        if not leader:
+            return future.result()
+
+        try:
+            result = load()
+            future.set_result(result)
+            return result
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+class _AsyncFlights:
+    """Coalesces concurrent coroutine computations of the same key."""
+
+    def __init__(self) -> None:
+        self._calls: dict[tuple[int, str], asyncio.Future] = {}
+
+    def in_flight(self, key: str) -> bool:
+        return (id(asyncio.get_running_loop()), key) in self._calls
+
+    async def run(self, key: str, load: Callable[[], Awaitable[T]]) -> T:
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        future = self._calls.get(flight_key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = loop.create_future()
+        # Followers may not exist; never warn about an unretrieved exception.
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._calls[flight_key] = future
+        try:
+            result = await load()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            self._calls.pop(flight_key, None)
+
+
+_refresh_executor: ThreadPoolExecutor | None = None
+_refresh_tasks: set[asyncio.Task] = set()
+
+
+def _get_refresh_executor() -> ThreadPoolExecutor:
+    global _refresh_executor
+    if _refresh_executor is None:
+        _refresh_executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="cache-refresh"
+        )
+    return _refresh_executor
+
+
 def cached(
     ttl: int = 300,
     key_prefix: str = "",
-    key_builder: Callable[..., str] | None = None
+    key_builder: Callable[..., str] | None = None,
+    tags: TagSpec | None = None,
+    single_flight: bool = True,
+    stale_ttl: int = 0,
 ):
     """
-    Decorator to cache function results.
+    Decorator to cache function results (sync functions and coroutines).
 
     Args:
         ttl: Time to live in seconds (default 5 minutes)
         key_prefix: Prefix for cache keys
-        key_builder: Custom function to build cache key from args
+        key_builder: Custom function to build cache key from args; use it
+            whenever args include objects such as a DB session
+        tags: Invalidation tags, either a tuple or a function of the call
+            arguments. ``cache_manager.invalidate_tags(tag)`` drops every
+            result cached under ``tag`` without scanning keys.
+        single_flight: Concurrent misses for the same key wait for one
+            computation instead of all hitting the database.
+        stale_ttl: Seconds a value may be served after ``ttl`` while one
+            background refresh runs (stale-while-revalidate). The refresh
+            re-invokes the function with the original arguments after the
+            caller has returned, so only enable it for functions that do
+            not depend on request-scoped objects (e.g. the request session).
 
     Example:
-        @cached(ttl=600, key_prefix="departments")
+        @cached(ttl=600, key_prefix="departments", tags=(CacheTags.DEPARTMENT,))
         def get_departments():
             return db.query(Department).all()
 
-        @cached(ttl=60, key_builder=lambda patient_id: f"patient:{patient_id}")
-        def get_patient(patient_id: int):
-            return db.query(Patient).get(patient_id)
+        @cached(
+            ttl=60,
+            key_builder=lambda patient_id: f"patient:{patient_id}",
+            tags=lambda patient_id: (CacheTags.patient(patient_id),),
+        )
+        async def get_patient(patient_id: int):
+            return await load_patient(patient_id)
     """
     def decorator(func: Callable[..., T]) -> Callable[..., T]:
-        @wraps(func)
-        def wrapper(*args, **kwargs) -> T:
-            # Build cache key
+        is_async = inspect.iscoroutinefunction(func)
+        sync_flights = _SyncFlights()
+        async_flights = _AsyncFlights()
+        store_ttl = ttl + max(stale_ttl, 0)
+
+        def build_key(args: tuple, kwargs: dict) -> str:
             if key_builder:
-                cache_key = key_builder(*args, **kwargs)
+                base_key = key_builder(*args, **kwargs)
+            else:
+                base_key = _default_key(key_prefix, func, args, kwargs)
+            return _versioned_key(base_key, _resolve_tags(tags, args, kwargs))
+
+        def store(cache_key: str, result: Any) -> None:
+            if result is None:
+                return
+            if stale_ttl > 0:
+                cache_manager.set(
+                    cache_key,
+                    {_SWR_FRESH_UNTIL: time.time() + ttl, "value": result},
+                    store_ttl,
+                )
             else:
-                # Default key: prefix:function_name:hash(args)
-                args_hash = hashlib.md5(
-                    json.dumps((args, kwargs), default=str, sort_keys=True).encode(),
-                    usedforsecurity=False,
-                ).hexdigest()[:8]
-                cache_key = f"{key_prefix}:{func.__name__}:{args_hash}"
-
-            # Try to get from cache
-            cached_value = cache_manager.get(cache_key)
-            if cached_value is not None:
-                logger.debug(f"Cache hit: {cache_key}")
-                return cached_value
-
-            # Execute function and cache result
-            result = func(*args, **kwargs)
-            cache_manager.set(cache_key, result, ttl)
+                cache_manager.set(cache_key, result, store_ttl)
             logger.debug(f"Cache set: {cache_key}")
 
-            return result
+        def lookup(cache_key: str) -> tuple[Any | None, bool]:
+            """Return (value, is_fresh); value is None on a miss."""
+            raw = cache_manager.get(cache_key)
+            if raw is None:
+                return None, False
+            if stale_ttl > 0 and isinstance(raw, dict) and _SWR_FRESH_UNTIL in raw:
+                return raw.get("value"), time.time() < raw[_SWR_FRESH_UNTIL]
+            return raw, True
+
+        if is_async:
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs) -> T:
+                cache_key = build_key(args, kwargs)
+
+                async def load() -> T:
+                    result = await func(*args, **kwargs)
+                    store(cache_key, result)
+                    return result
+
+                value, fresh = lookup(cache_key)
+                if value is not None:
+                    logger.debug(f"Cache hit: {cache_key}")
+                    if not fresh and not async_flights.in_flight(cache_key):
+                        task = asyncio.create_task(async_flights.run(cache_key, load))
+                        _refresh_tasks.add(task)
+                        task.add_done_callback(_refresh_tasks.discard)
+                    return value
+
+                if single_flight:
+                    return await async_flights.run(cache_key, load)
+                return await load()
+
+            wrapper = async_wrapper
+        else:
+            @wraps(func)
+            def sync_wrapper(*args, **kwargs) -> T:
+                cache_key = build_key(args, kwargs)
+
+                def load() -> T:
+                    result = func(*args, **kwargs)
+                    store(cache_key, result)
+                    return result
+
+                value, fresh = lookup(cache_key)
+                if value is not None:
+                    logger.debug(f"Cache hit: {cache_key}")
+                    if not fresh and not sync_flights.in_flight(cache_key):
+                        _get_refresh_executor().submit(sync_flights.run, cache_key, load)
+                    return value
+
+                if single_flight:
+                    return sync_flights.run(cache_key, load)
+                return load()
+
+            wrapper = sync_wrapper
 
         # Add cache invalidation method
         def invalidate(*args, **kwargs):
-            if key_builder:
-                cache_key = key_builder(*args, **kwargs)
-            else:
-                args_hash = hashlib.md5(
-                    json.dumps((args, kwargs), default=str, sort_keys=True).encode(),
-                    usedforsecurity=False,
-                ).hexdigest()[:8]
-                cache_key = f"{key_prefix}:{func.__name__}:{args_hash}"
-            cache_manager.delete(cache_key)
+            cache_manager.delete(build_key(args, kwargs))
 
         wrapper.invalidate = invalidate
         wrapper.invalidate_all = lambda: cache_manager.delete_pattern(f"{key_prefix}:")
@@ -379,29 +996,48 @@ class CacheKeys:
         return f"department:{department_id}"
 
 
+class CacheTags:
+    """
+    Invalidation tags for ``cached(tags=...)``.
+
+    Patient-scoped results should carry both ``PATIENT`` and
+    ``patient(id)`` so they can be dropped individually or all at once.
+    """
+    DEPARTMENT = "department"
+    DOCTOR = "doctor"
+    SERVICE = "service"
+    PATIENT = "patient"
+
+    @staticmethod
+    def patient(patient_id: int) -> str:
+        return f"patient:{patient_id}"
+
+
 # === Cache Invalidation Helpers ===
+# Tag bumps are O(1); the fixed catalogue keys are removed with a single DEL.
 
 def invalidate_department_cache():
     """Call when departments are modified"""
-    cache_manager.delete_pattern("clinic:departments")
-    cache_manager.delete_pattern("department:")
+    cache_manager.invalidate_tags(CacheTags.DEPARTMENT)
+    cache_manager.delete(CacheKeys.DEPARTMENTS)
 
 
 def invalidate_doctor_cache():
     """Call when doctors are modified"""
-    cache_manager.delete_pattern("clinic:doctors")
-    cache_manager.delete_pattern("doctor:")
+    cache_manager.invalidate_tags(CacheTags.DOCTOR)
+    cache_manager.delete(CacheKeys.DOCTORS)
 
 
 def invalidate_service_cache():
     """Call when services are modified"""
-    cache_manager.delete_pattern("clinic:services")
-    cache_manager.delete_pattern("service:")
+    cache_manager.invalidate_tags(CacheTags.SERVICE)
+    cache_manager.delete(CacheKeys.SERVICES)
 
 
 def invalidate_patient_cache(patient_id: int | None = None):
     """Call when patient data is modified"""
     if patient_id:
+        cache_manager.invalidate_tags(CacheTags.patient(patient_id))
         cache_manager.delete(CacheKeys.patient(patient_id))
     else:
-        cache_manager.delete_pattern("patient:")
+        cache_manager.invalidate_tags(CacheTags.PATIENT)
@@ -21,6 +21,18 @@ Custom metrics exposed:
     - clinic_ai_requests_total{provider, task_type} — AI API call counter
     - clinic_ai_request_duration_seconds{provider} — AI API call latency
     - clinic_active_websocket_connections — current WS connections
+    - clinic_image_processing_queue_depth — images queued/processing off the event loop
+    - clinic_image_processing_duration_seconds{operation} — per-image processing time
+    - clinic_image_derivative_cache_total{result} — derivative cache hits/misses
+    - clinic_pdf_render_queue_depth — PDFs queued/rendering in the PDF worker pool
+    - clinic_pdf_render_duration_seconds{kind} — per-document PDF render time
+    - clinic_pdf_render_failures_total{kind, reason} — rejected, timed out or failed renders
+    - clinic_scheduler_job_duration_seconds{job} — periodic job run time (leader only)
+    - clinic_scheduler_job_runs_total{job, outcome} — periodic job runs: success/failure/skipped
+    - clinic_scheduler_job_last_success_timestamp_seconds{job} — last successful run (unix time)
+    - clinic_worker_job_duration_seconds{job} — arq worker job run time
+    - clinic_worker_job_runs_total{job, outcome} — arq worker job runs: success/failure
+    - clinic_worker_job_retries_total{job} — arq job runs that are retries (job_try > 1)
     - clinic_db_pool_connections — DB pool size (if available)
 
 Standard metrics from prometheus_client:
@@ -56,6 +68,7 @@ if os.getenv("ENABLE_PROMETHEUS", "1").lower() in ("1", "true", "yes", "on"):
             Info,
                 generate_latest,  # noqa: F401,
             make_asgi_app,
+            start_http_server,
         )
 
         # HTTP request metrics
@@ -105,6 +118,85 @@ if os.getenv("ENABLE_PROMETHEUS", "1").lower() in ("1", "true", "yes", "on"):
             "Current active WebSocket connections",
         )
 
+        # Image processing metrics
+        image_processing_queue_depth = Gauge(
+            "clinic_image_processing_queue_depth",
+            "Images queued or being processed in the image worker pool",
+        )
+
+        image_processing_duration = Histogram(
+            "clinic_image_processing_duration_seconds",
+            "Per-image processing time in the image worker pool",
+            ["operation"],
+            buckets=(0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+        )
+
+        image_derivative_cache_total = Counter(
+            "clinic_image_derivative_cache_total",
+            "Image derivative cache lookups",
+            ["result"],
+        )
+
+        # PDF rendering metrics
+        pdf_render_queue_depth = Gauge(
+            "clinic_pdf_render_queue_depth",
+            "PDFs queued or being rendered in the PDF worker pool",
+        )
+
+        pdf_render_duration = Histogram(
+            "clinic_pdf_render_duration_seconds",
+            "Per-document render time in the PDF worker pool",
+            ["kind"],
+            buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+        )
+
+        pdf_render_failures_total = Counter(
+            "clinic_pdf_render_failures_total",
+            "PDF renders rejected, timed out or failed in the PDF worker pool",
+            ["kind", "reason"],
+        )
+
+        # Periodic job scheduler metrics
+        scheduler_job_duration = Histogram(
+            "clinic_scheduler_job_duration_seconds",
+            "Run time of periodic scheduler jobs",
+            ["job"],
+            buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0),
+        )
+
+        scheduler_job_runs_total = Counter(
+            "clinic_scheduler_job_runs_total",
+            "Periodic scheduler job runs by outcome",
+            ["job", "outcome"],
+        )
+
+        scheduler_job_last_success = Gauge(
+            "clinic_scheduler_job_last_success_timestamp_seconds",
+            "Unix time of the last successful periodic job run",
+            ["job"],
+        )
+
+        # arq worker job metrics (exported by the worker process, see
+        # start_worker_metrics_server)
+        worker_job_duration = Histogram(
+            "clinic_worker_job_duration_seconds",
+            "Run time of arq worker jobs",
+            ["job"],
+            buckets=(0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0),
+        )
+
+        worker_job_runs_total = Counter(
+            "clinic_worker_job_runs_total",
+            "arq worker job runs by outcome",
+            ["job", "outcome"],
+        )
+
+        worker_job_retries_total = Counter(
+            "clinic_worker_job_retries_total",
+            "arq worker job runs that are retries of a failed attempt",
+            ["job"],
+        )
+
         # App info
         app_info = Info(
             "clinic",
@@ -154,36 +246,41 @@ def init_prometheus(app: Any) -> None:
     })
 
     # Add middleware to track HTTP requests
-    from starlette.middleware.base import BaseHTTPMiddleware
-    from starlette.requests import Request
-
-    class PrometheusMetricsMiddleware(BaseHTTPMiddleware):
+    class PrometheusMetricsMiddleware:
         """Middleware that records HTTP request count + duration."""
 
-        async def dispatch(self, request: Request, call_next):
+        def __init__(self, app: Any) -> None:
+            self.app = app
+
+        async def __call__(self, scope, receive, send):
             # Skip /metrics endpoint itself (avoid recursive counting)
-            if request.url.path == "/metrics":
-                return await call_next(request)
+            if scope["type"] != "http" or scope["path"] == "/metrics":
+                await self.app(scope, receive, send)
+                return
 
             start_time = time.time()
-            method = request.method
+            method = scope["method"]
             # Normalize path to avoid cardinality explosion
             # /api/v1/patients/123 → /api/v1/patients/:id
-            path = _normalize_path(request.url.path)
+            path = _normalize_path(scope["path"])
+            status = "500"
+            duration = None
+
+            async def send_with_status(message):
+                nonlocal status, duration
+                if message["type"] == "http.response.start":
+                    status = str(message["status"])
+                    duration = time.time() - start_time
+                await send(message)
 
             try:
-                response = await call_next(request)
-                status = str(response.status_code)
-            except Exception:
-                status = "500"
-                raise
+                await self.app(scope, receive, send_with_status)
             finally:
-                duration = time.time() - start_time
+                if duration is None:
+                    duration = time.time() - start_time
                 http_requests_total.labels(method=method, path=path, status=status).inc()
                 http_request_duration.labels(method=method, path=path).observe(duration)
 
-            return response
-
     app.add_middleware(PrometheusMetricsMiddleware)
 
     _prometheus_initialized = True
@@ -237,3 +334,72 @@ def decrement_websocket_connections() -> None:
     """Call when a WebSocket disconnects."""
     if _PROMETHEUS_AVAILABLE:
         active_websocket_connections.dec()
+
+
+def set_image_queue_depth(depth: int) -> None:
+    """Update the number of images queued/processing in the worker pool."""
+    if _PROMETHEUS_AVAILABLE:
+        image_processing_queue_depth.set(depth)
+
+
+def record_image_processing(operation: str, duration_seconds: float) -> None:
+    """Record processing time of one image."""
+    if _PROMETHEUS_AVAILABLE:
+        image_processing_duration.labels(operation=operation).observe(duration_seconds)
+
+
+def record_image_derivative_cache(hit: bool) -> None:
+    """Record an image derivative cache lookup."""
+    if _PROMETHEUS_AVAILABLE:
+        image_derivative_cache_total.labels(result="hit" if hit else "miss").inc()
+
+
+def set_pdf_render_queue_depth(depth: int) -> None:
+    """Update the number of PDFs queued/rendering in the worker pool."""
+    if _PROMETHEUS_AVAILABLE:
+        pdf_render_queue_depth.set(depth)
+
+
+def record_pdf_render(kind: str, duration_seconds: float) -> None:
+    """Record render time of one PDF document."""
+    if _PROMETHEUS_AVAILABLE:
+        pdf_render_duration.labels(kind=kind).observe(duration_seconds)
+
+
+def record_pdf_render_failure(kind: str, reason: str) -> None:
+    """Record a PDF render that was rejected, timed out or failed."""
+    if _PROMETHEUS_AVAILABLE:
+        pdf_render_failures_total.labels(kind=kind, reason=reason).inc()
+
+
+def record_scheduler_job_run(job: str, outcome: str, duration_seconds: float | None = None) -> None:
+    """Record a periodic job run (outcome: success, failure or skipped)."""
+    if _PROMETHEUS_AVAILABLE:
+        scheduler_job_runs_total.labels(job=job, outcome=outcome).inc()
+        if duration_seconds is not None:
+            scheduler_job_duration.labels(job=job).observe(duration_seconds)
+        if outcome == "success":
+            scheduler_job_last_success.labels(job=job).set_to_current_time()
+
+
+def record_worker_job_run(
+    job: str, outcome: str, duration_seconds: float, attempt: int = 1
+) -> None:
+    """Record an arq worker job run (outcome: success or failure)."""
+    if _PROMETHEUS_AVAILABLE:
+        worker_job_runs_total.labels(job=job, outcome=outcome).inc()
+        worker_job_duration.labels(job=job).observe(duration_seconds)
+        if attempt > 1:
+            worker_job_retries_total.labels(job=job).inc()
+
+
+def start_worker_metrics_server(port: int) -> bool:
+    """Expose /metrics over HTTP from a non-ASGI process (the arq worker).
+
+    Returns False if prometheus-client is not available.
+    """
+    if not _PROMETHEUS_AVAILABLE:
+        return False
+    start_http_server(port)
+    logger.info("[prometheus] worker metrics exposed on :%d", port)
+    return True
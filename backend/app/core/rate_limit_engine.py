@@ -0,0 +1,315 @@
+"""
+Shared sliding-window rate limit engine.
+
+Used by SecurityMiddleware, WebSocketRateLimiter and AIRateLimiter.
+
+Algorithm: sliding window counter. Each key keeps only two integers -
+hits in the current fixed window and hits in the previous one - and the
+request estimate is
+
+    previous * (1 - elapsed_in_current / window) + current
+
+so a check is O(1) in time and memory regardless of the limit size
+(unlike a per-key list of timestamps, which grows with the window).
+
+Backends:
+- MemoryRateLimitBackend - per-process, LRU-capped dict.
+- RedisRateLimitBackend - one hash per key, updated by an atomic Lua
+  script, so limits are shared across uvicorn workers.
+
+Redis is used when RATE_LIMIT_REDIS_URL (or REDIS_URL) is configured and
+not under TESTING. If Redis is unreachable the limiter falls back to the
+in-memory backend and retries Redis after a cooldown.
+"""
+from __future__ import annotations
+
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+logger = logging.getLogger(__name__)
+
+_TESTING = os.getenv("TESTING", "").lower() in ("1", "true", "yes")
+
+# Max keys tracked by one in-memory backend (least recently used are evicted)
+RATE_LIMIT_MEMORY_MAX_KEYS = int(os.getenv("RATE_LIMIT_MEMORY_MAX_KEYS", "10000"))
+
+# Seconds before retrying Redis after a connection/command failure
+_REDIS_RETRY_SECONDS = 30.0
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimitResult:
+    allowed: bool
+    limit: int
+    remaining: int
+    # Seconds until the request would be allowed (0 when allowed)
+    retry_after: float
+    # Estimated hits in the sliding window, including this one if allowed
+    count: float
+
+
+def evaluate_window(
+    previous: int,
+    current: int,
+    elapsed: float,
+    limit: int,
+    window: float,
+    cost: int,
+) -> RateLimitResult:
+    """Decide on a hit given the two window counters (before the hit)."""
+    weight = 1.0 - elapsed / window
+    estimate = previous * weight + current
+    allowed = estimate + cost <= limit
+    if allowed:
+        estimate += cost
+        retry_after = 0.0
+    else:
+        retry_after = _retry_after(previous, current, elapsed, limit, window, cost)
+    return RateLimitResult(
+        allowed=allowed,
+        limit=limit,
+        remaining=max(0, math.floor(limit - estimate)),
+        retry_after=retry_after,
+        count=estimate,
+    )
+
+
+def _retry_after(
+    previous: int, current: int, elapsed: float, limit: int, window: float, cost: int
+) -> float:
+    # Still in the current window: wait for the previous window to decay
+    room = limit - current - cost
+    if room >= 0 and previous > 0:
+        needed = window * (1.0 - room / previous)
+        if needed < window:
+            return max(0.0, needed - elapsed)
+    # Next window: the current counter becomes the decaying one
+    until_next = window - elapsed
+    if current <= 0:
+        return until_next
+    needed = window * (1.0 - (limit - cost) / current)
+    return until_next + max(0.0, min(window, needed))
+
+
+class RateLimitBackend(Protocol):
+    async def hit(
+        self, key: str, limit: int, window: float, now: float, cost: int
+    ) -> RateLimitResult: ...
+
+    async def reset(self, key: str) -> None: ...
+
+
+class MemoryRateLimitBackend:
+    """Per-process backend: key -> [window_index, previous, current, window]."""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MEMORY_MAX_KEYS) -> None:
+        self.max_keys = max_keys
+        self._entries: OrderedDict[str, list[int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    async def hit(
+        self, key: str, limit: int, window: float, now: float, cost: int
+    ) -> RateLimitResult:
+        return self.hit_sync(key, limit, window, now, cost)
+
+    def hit_sync(
+        self, key: str, limit: int, window: float, now: float, cost: int
+    ) -> RateLimitResult:
+        index = int(now // window)
+        elapsed = now - index * window
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[3] != window:
+                entry = [index, 0, 0, window]
+            elif entry[0] != index:
+                # Rolled into a new window; anything older than one window is gone
+                previous = entry[2] if entry[0] == index - 1 else 0
+                entry = [index, previous, 0, window]
+            result = evaluate_window(entry[1], entry[2], elapsed, limit, window, cost)
+            if cost and result.allowed:
+                entry[2] += cost
+            if cost or key in self._entries:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_keys:
+                    self._entries.popitem(last=False)
+        return result
+
+    async def reset(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def purge(self, now: float) -> int:
+        """Drop keys whose counters have fully expired. Returns the number dropped."""
+        dropped = 0
+        with self._lock:
+            for key, (index, _, _, window) in list(self._entries.items()):
+                if index < int(now // window) - 1:
+                    del self._entries[key]
+                    dropped += 1
+        return dropped
+
+
+# KEYS[1] - hash key; ARGV: limit, window, now, cost.
+# Returns {allowed, previous, current} with counters as seen before the hit.
+_SLIDING_WINDOW_LUA = """
+local limit = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local index = math.floor(now / window)
+
+local state = redis.call('HMGET', KEYS[1], 'i', 'p', 'c')
+local stored = tonumber(state[1])
+local previous = 0
+local current = 0
+if stored == index then
+    previous = tonumber(state[2]) or 0
+    current = tonumber(state[3]) or 0
+elseif stored == index - 1 then
+    previous = tonumber(state[3]) or 0
+end
+
+local elapsed = now - index * window
+local estimate = previous * (1 - elapsed / window) + current
+local allowed = 0
+if estimate + cost <= limit then
+    allowed = 1
+end
+if cost > 0 then
+    local stored_current = current
+    if allowed == 1 then
+        stored_current = current + cost
+    end
+    redis.call('HSET', KEYS[1], 'i', index, 'p', previous, 'c', stored_current)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(window * 2000))
+end
+return {allowed, previous, current}
+"""
+
+
+class RedisRateLimitBackend:
+    """Backend shared across workers: one Redis hash per key, atomic Lua update."""
+
+    KEY_PREFIX = "ratelimit:"
+
+    def __init__(self, client: Any, key_prefix: str = KEY_PREFIX) -> None:
+        self._client = client
+        self._key_prefix = key_prefix
+        self._script = client.register_script(_SLIDING_WINDOW_LUA)
+
+    async def hit(
+        self, key: str, limit: int, window: float, now: float, cost: int
+    ) -> RateLimitResult:
+        _, previous, current = await self._script(
+            keys=[f"{self._key_prefix}{key}"], args=[limit, window, now, cost]
+        )
+        index = int(now // window)
+        return evaluate_window(
+            int(previous), int(current), now - index * window, limit, window, cost
+        )
+
+    async def reset(self, key: str) -> None:
+        await self._client.delete(f"{self._key_prefix}{key}")
+
+
+_redis_backend: RedisRateLimitBackend | None = None
+_redis_backend_lock = threading.Lock()
+
+
+def _get_redis_url() -> str | None:
+    if _TESTING:
+        return None
+    redis_url = (os.getenv("RATE_LIMIT_REDIS_URL") or os.getenv("REDIS_URL") or "").strip()
+    return redis_url or None
+
+
+def get_redis_rate_limit_backend() -> RedisRateLimitBackend | None:
+    """Process-wide Redis backend, or None when Redis is not configured."""
+    global _redis_backend
+    redis_url = _get_redis_url()
+    if redis_url is None:
+        return None
+    with _redis_backend_lock:
+        if _redis_backend is None:
+            try:
+                import redis.asyncio as redis_asyncio
+            except ImportError:
+                logger.warning("redis package not installed - using in-memory rate limits")
+                return None
+            _redis_backend = RedisRateLimitBackend(redis_asyncio.from_url(redis_url))
+    return _redis_backend
+
+
+class RateLimiter:
+    """Rate limiter over a namespace of keys.
+
+    With a shared backend (Redis) limits are counted across workers; on
+    backend errors the local in-memory backend takes over until Redis is
+    retried.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        backend: RateLimitBackend | None = None,
+        *,
+        clock: Callable[[], float] = time.time,
+        max_keys: int = RATE_LIMIT_MEMORY_MAX_KEYS,
+    ) -> None:
+        self.namespace = namespace
+        self.local = MemoryRateLimitBackend(max_keys=max_keys)
+        self.backend: RateLimitBackend = backend or self.local
+        self._clock = clock
+        self._backend_down_until = 0.0
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    async def _call(self, key: str, limit: int, window: float, cost: int) -> RateLimitResult:
+        now = self._clock()
+        if self.backend is not self.local and now >= self._backend_down_until:
+            try:
+                return await self.backend.hit(self._key(key), limit, window, now, cost)
+            except Exception as exc:
+                self._backend_down_until = now + _REDIS_RETRY_SECONDS
+                logger.warning(
+                    "Rate limit backend error (%s) - using in-memory limits for %ss",
+                    exc,
+                    int(_REDIS_RETRY_SECONDS),
+                )
+        return self.local.hit_sync(self._key(key), limit, window, now, cost)
+
+    async def hit(self, key: str, limit: int, window: float, cost: int = 1) -> RateLimitResult:
+        """Count a hit if it fits into the limit."""
+        return await self._call(key, limit, window, cost)
+
+    async def peek(self, key: str, limit: int, window: float) -> RateLimitResult:
+        """Current state of the key without counting a hit."""
+        return await self._call(key, limit, window, 0)
+
+    async def reset(self, key: str) -> None:
+        await self.local.reset(self._key(key))
+        if self.backend is not self.local:
+            try:
+                await self.backend.reset(self._key(key))
+            except Exception as exc:
+                logger.warning("Rate limit backend reset failed: %s", exc)
+
+
+def create_rate_limiter(namespace: str, **kwargs: Any) -> RateLimiter:
+    """Rate limiter on the shared Redis backend if configured, else in-memory."""
+    return RateLimiter(namespace, get_redis_rate_limit_backend(), **kwargs)
@@ -25,7 +25,7 @@ from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from slowapi import Limiter
 from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware
+from slowapi.middleware import SlowAPIASGIMiddleware
 
 logger = logging.getLogger(__name__)
 
@@ -183,7 +183,7 @@ def setup_rate_limiting(app: FastAPI) -> None:
     limiter._enabled = True
     app.state.limiter = limiter
     app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-    app.add_middleware(SlowAPIMiddleware)
+    app.add_middleware(SlowAPIASGIMiddleware)
     if _STORAGE_URI:
         # PR-34: don't log the full Redis URI — it may contain a password.
         logger.info("Rate limiter using Redis storage (REDIS_URL configured)")
@@ -4,15 +4,17 @@ CRUD операции для файловой системы
 
 import json
 import os
+from collections import Counter
 from datetime import UTC, datetime
 from typing import Any
 
-from sqlalchemy import desc, func, or_
+from sqlalchemy import case, desc, func, insert, or_, select, update
 from sqlalchemy.orm import Session
 
 from app.models.file_system import (
     File,
     FileAccessLog,
+    FileBlob,
     FileFolder,
     FileQuota,
     FileShare,
@@ -59,6 +61,12 @@ class CRUDFile:
         """Получить файл по ID"""
         return db.query(File).filter(File.id == id).first()
 
+    def get_by_ids(self, db: Session, *, ids: list[int]) -> list[File]:
+        """Получить файлы по списку ID одним запросом"""
+        if not ids:
+            return []
+        return db.query(File).filter(File.id.in_(ids)).all()
+
     def get_by_hash(self, db: Session, *, file_hash: str) -> File | None:
         """Получить файл по хешу"""
         return db.query(File).filter(File.file_hash == file_hash).first()
@@ -224,7 +232,9 @@ class CRUDFile:
         """Удалить файл"""
         obj = db.query(File).filter(File.id == id).first()
         if obj:
-            # Мягкое удаление - меняем статус
+            # Мягкое удаление - меняем статус и отпускаем ссылки на blob
+            if obj.status != FileStatus.DELETED:
+                file_blob.release(db, hashes=_blob_refs(obj))
             obj.status = FileStatus.DELETED
             db.add(obj)
             db.commit()
@@ -235,8 +245,12 @@ class CRUDFile:
         """Жесткое удаление файла"""
         obj = db.query(File).filter(File.id == id).first()
         if obj:
-            # Удаляем физический файл
-            if obj.file_path and os.path.exists(obj.file_path):
+            if obj.file_hash and file_blob.get(db, sha256=obj.file_hash):
+                # Содержимое может быть общим - его удалит сборщик мусора
+                if obj.status != FileStatus.DELETED:
+                    file_blob.release(db, hashes=_blob_refs(obj))
+            elif obj.file_path and os.path.exists(obj.file_path):
+                # Файл вне blob-хранилища - удаляем физический файл
                 try:
                     os.remove(obj.file_path)
                 except OSError:
@@ -284,14 +298,9 @@ class CRUDFile:
         count = 0
 
         for file_obj in expired_files:
-            # Удаляем физический файл
-            if file_obj.file_path and os.path.exists(file_obj.file_path):
-                try:
-                    os.remove(file_obj.file_path)
-                except OSError:
-                    pass
-
-            # Мягкое удаление
+            # Мягкое удаление; содержимое (возможно, общее с другими файлами)
+            # удалит сборщик мусора, когда на blob не останется ссылок
+            file_blob.release(db, hashes=_blob_refs(file_obj))
             file_obj.status = FileStatus.DELETED
             db.add(file_obj)
             count += 1
@@ -300,6 +309,12 @@ class CRUDFile:
         return count
 
 
+def _blob_refs(file_obj: File) -> list[str]:
+    """Ссылки файла на blob-хранилище: текущее содержимое и все версии"""
+    hashes = [file_obj.file_hash] + [version.file_hash for version in file_obj.versions]
+    return [file_hash for file_hash in hashes if file_hash]
+
+
 # ===================== ВЕРСИИ ФАЙЛОВ =====================
 
 
@@ -385,6 +400,18 @@ class CRUDFileShare:
             .all()
         )
 
+    def get_shares_for_files(
+        self, db: Session, *, file_ids: list[int]
+    ) -> list[FileShare]:
+        """Получить активные совместные использования нескольких файлов"""
+        if not file_ids:
+            return []
+        return (
+            db.query(FileShare)
+            .filter(FileShare.file_id.in_(file_ids), FileShare.is_active == True)
+            .all()
+        )
+
     def get_user_shares(self, db: Session, *, user_id: int) -> list[FileShare]:
         """Получить файлы, доступные пользователю"""
         return (
@@ -647,6 +674,16 @@ class CRUDFileAccessLog:
         db.refresh(db_obj)
         return db_obj
 
+    def create_many(
+        self, db: Session, *, file_ids: list[int], user_id: int | None, action: str
+    ) -> None:
+        """Создать логи доступа к нескольким файлам одним commit"""
+        db.add_all(
+            FileAccessLog(file_id=file_id, user_id=user_id, action=action)
+            for file_id in file_ids
+        )
+        db.commit()
+
     def get_file_logs(
         self, db: Session, *, file_id: int, skip: int = 0, limit: int = 100
     ) -> list[FileAccessLog]:
@@ -674,6 +711,134 @@ class CRUDFileAccessLog:
         )
 
 
+# ===================== BLOB-ХРАНИЛИЩЕ =====================
+
+
+class CRUDFileBlob:
+    """Содержимое файлов по SHA-256 со счётчиком ссылок.
+
+    Изменения счётчика не коммитятся - они входят в транзакцию вызывающего
+    кода вместе с записью File/FileVersion, на которую ссылаются.
+    """
+
+    def get(self, db: Session, *, sha256: str) -> FileBlob | None:
+        return db.get(FileBlob, sha256)
+
+    def acquire(
+        self, db: Session, *, sha256: str, size: int, storage_path: str
+    ) -> FileBlob:
+        """Добавить ссылку на blob (создать его, если такого содержимого ещё нет)"""
+        table = FileBlob.__table__
+        values = {
+            "sha256": sha256,
+            "storage_path": storage_path,
+            "size": size,
+            "ref_count": 1,
+        }
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            updated = db.execute(
+                update(table)
+                .where(table.c.sha256 == sha256)
+                .values(ref_count=table.c.ref_count + 1, unreferenced_at=None)
+            ).rowcount
+            if not updated:
+                db.execute(insert(table).values(**values))
+            return db.get(FileBlob, sha256, populate_existing=True)
+
+        # Атомарно относительно сборщика мусора: строка либо уже удалена им
+        # (тогда blob создаётся заново), либо получает ссылку и не удаляется
+        stmt = dialect_insert(table).values(**values)
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[table.c.sha256],
+                set_={"ref_count": table.c.ref_count + 1, "unreferenced_at": None},
+            )
+        )
+        return db.get(FileBlob, sha256, populate_existing=True)
+
+    def release(self, db: Session, *, hashes: list[str]) -> None:
+        """Снять ссылки на blob (хеш может повторяться - снимается по разу)"""
+        now = datetime.now(UTC)
+        for sha256, count in Counter(hashes).items():
+            drained = FileBlob.ref_count <= count
+            db.execute(
+                update(FileBlob)
+                .where(FileBlob.sha256 == sha256)
+                .values(
+                    ref_count=case((drained, 0), else_=FileBlob.ref_count - count),
+                    unreferenced_at=case(
+                        (drained, func.coalesce(FileBlob.unreferenced_at, now)),
+                        else_=None,
+                    ),
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+    def get_unreferenced(
+        self, db: Session, *, older_than: datetime, limit: int
+    ) -> list[FileBlob]:
+        """Blob без ссылок дольше grace-периода, самые старые первыми"""
+        return (
+            db.query(FileBlob)
+            .filter(FileBlob.ref_count == 0, FileBlob.unreferenced_at < older_than)
+            .order_by(FileBlob.unreferenced_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+
+    def delete_unreferenced(self, db: Session, *, sha256: str) -> bool:
+        """Удалить строку blob, если на него по-прежнему нет ссылок"""
+        deleted = db.execute(
+            FileBlob.__table__.delete().where(
+                FileBlob.sha256 == sha256, FileBlob.ref_count == 0
+            )
+        ).rowcount
+        return deleted == 1
+
+    def get_storage_stats(self, db: Session, *, owner_id: int) -> dict[str, int]:
+        """Логический и физический объём файлов пользователя.
+
+        logical_bytes - сумма размеров файлов, physical_bytes - сумма
+        размеров уникальных blob, на которые они ссылаются (дубликаты
+        хранятся один раз), плюс файлы без хеша, лежащие вне blob-хранилища.
+        """
+        owner_files = (File.owner_id == owner_id, File.status != FileStatus.DELETED)
+        logical_bytes, unmanaged_bytes = (
+            db.query(
+                func.coalesce(func.sum(File.file_size), 0),
+                func.coalesce(
+                    func.sum(case((File.file_hash.is_(None), File.file_size), else_=0)),
+                    0,
+                ),
+            )
+            .filter(*owner_files)
+            .one()
+        )
+        owner_hashes = (
+            select(File.file_hash)
+            .where(*owner_files, File.file_hash.is_not(None))
+            .distinct()
+        )
+        blob_bytes, blob_count = (
+            db.query(func.coalesce(func.sum(FileBlob.size), 0), func.count(FileBlob.sha256))
+            .filter(FileBlob.sha256.in_(owner_hashes))
+            .one()
+        )
+        physical_bytes = int(blob_bytes) + int(unmanaged_bytes)
+        return {
+            "logical_bytes": int(logical_bytes),
+            "physical_bytes": physical_bytes,
+            "deduplicated_bytes": max(int(logical_bytes) - physical_bytes, 0),
+            "unique_blobs": int(blob_count),
+        }
+
+
 # Создаем экземпляры CRUD классов
 file = CRUDFile()
 file_version = CRUDFileVersion()
@@ -682,3 +847,4 @@ file_folder = CRUDFileFolder()
 file_quota = CRUDFileQuota()
 file_storage = CRUDFileStorage()
 file_access_log = CRUDFileAccessLog()
+file_blob = CRUDFileBlob()
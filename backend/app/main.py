@@ -130,7 +130,16 @@ async def lifespan(app: FastAPI):
     yield  # Application is running
 
     # === SHUTDOWN ===
-    # Add any cleanup code here if needed
+    scheduler = getattr(app.state, "periodic_scheduler", None)
+    if scheduler is not None:
+        await scheduler.stop()
+
+    # Worker-процессы пулов изображений и PDF не должны пережить приложение
+    from app.services.image_compression_service import get_image_processing_pool
+    from app.services.pdf_render_pool import get_pdf_render_pool
+
+    get_image_processing_pool().shutdown()
+    get_pdf_render_pool().shutdown()
     log.info("Application shutdown complete")
 
 
@@ -218,29 +227,46 @@ app.add_api_websocket_route("/ws/chat", chat_websocket_handler)  # User-to-user
 # -----------------------------------------------------------------------------
 
 # Security headers middleware
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+
+_SECURITY_HEADERS = {
+    "X-Content-Type-Options": "nosniff",
+    "X-Frame-Options": "DENY",
+    "X-XSS-Protection": "1; mode=block",
+    "Referrer-Policy": "strict-origin-when-cross-origin",
+    "Permissions-Policy": "geolocation=(), microphone=(), camera=()",
+    # CSP: allow inline styles (Tailwind), scripts from self, images from data: and https:
+    "Content-Security-Policy": (
+        "default-src 'self'; "
+        "script-src 'self' 'unsafe-inline'; "
+        "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com; "
+        "font-src 'self' https://fonts.gstatic.com data:; "
+        "img-src 'self' data: https: blob:; "
+        "connect-src 'self' wss: ws:; "
+        "frame-ancestors 'none';"
+    ),
+}
+
+
+class SecurityHeadersMiddleware:
+    """FRONTEND-SECURITY: Add security headers to all responses."""
 
+    def __init__(self, app):
+        self.app = app
 
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    """FRONTEND-SECURITY: Add security headers to all responses."""
-    async def dispatch(self, request, call_next):
-        response = await call_next(request)
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        response.headers["Permissions-Policy"] = "geolocation=(), microphone=(), camera=()"
-        # CSP: allow inline styles (Tailwind), scripts from self, images from data: and https:
-        response.headers["Content-Security-Policy"] = (
-            "default-src 'self'; "
-            "script-src 'self' 'unsafe-inline'; "
-            "style-src 'self' 'unsafe-inline' https://fonts.googleapis.com; "
-            "font-src 'self' https://fonts.gstatic.com data:; "
-            "img-src 'self' data: https: blob:; "
-            "connect-src 'self' wss: ws:; "
-            "frame-ancestors 'none';"
-        )
-        return response
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for name, value in _SECURITY_HEADERS.items():
+                    headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
 
 
 app.add_middleware(SecurityHeadersMiddleware)
@@ -508,83 +534,29 @@ async def _startup_tasks() -> None:
             raise  # Fail fast in production
         log.warning("Continuing in development mode despite security warning")
 
-    # ✅ SECURITY: Start scheduled backups if enabled
-    backup_enabled = settings.AUTO_BACKUP_ENABLED
-    if backup_enabled:
-        try:
-            from app.db.session import SessionLocal
-            from app.services.scheduled_backup import ScheduledBackupService
-
-            backup_db = SessionLocal()
-            backup_service = ScheduledBackupService(backup_db)
-
-            # Get backup time from env (default: 2 AM)
-            backup_hour = int(os.getenv("BACKUP_HOUR", "2"))
-            backup_minute = int(os.getenv("BACKUP_MINUTE", "0"))
-            from datetime import time
-            backup_time = time(backup_hour, backup_minute)
-
-            await backup_service.start_daily_backups(backup_time)
-            log.info(f"✅ Scheduled backups enabled (daily at {backup_time})")
-        except Exception as e:
-            log.error(f"Failed to start backup scheduler: {e}")
-
-    # #8 fix: Start lab notification scheduler as a safety net.
-    # The primary notification path is inline in lab_reporting_service.finalize(),
-    # but this scheduler catches any missed events (e.g. if the inline call
-    # failed due to a transient error). Runs every 5 minutes.
+    # Cross-worker L1 cache invalidation (CACHE_BACKEND=tiered; no-op otherwise)
     try:
-        import asyncio
+        from app.core.cache import start_cache_invalidation_listener
 
-        from app.db.session import SessionLocal
-        from app.services.lab_notification_service import LabNotificationService
-
-        async def _run_lab_notifications_periodically():
-            while True:
-                try:
-                    lab_db = SessionLocal()
-                    LabNotificationService(lab_db).run_all_notifications()
-                    lab_db.close()
-                except Exception as exc:
-                    log.warning("Lab notification scheduler error: %s", exc)
-                await asyncio.sleep(300)  # 5 minutes
-
-        asyncio.create_task(_run_lab_notifications_periodically())
-        log.info("✅ Lab notification scheduler started (every 5 minutes)")
-    except ImportError:
-        log.debug("Lab notification service not available — scheduler skipped")
+        await start_cache_invalidation_listener()
     except Exception as e:
-        log.warning(f"Failed to start lab notification scheduler: {e}")
+        log.warning(f"Failed to start cache invalidation listener: {e}")
 
-# -----------------------------------------------------------------------------
-# F-017: Retention cleanup scheduler — daily at 03:00
-# -----------------------------------------------------------------------------
-try:
-    import asyncio
-
-    async def _retention_cleanup_loop():
-        """F-017: daily cleanup of old/soft-deleted messages."""
-        while True:
-            try:
-                from app.db.session import SessionLocal
-                from app.services.data_retention import DataRetentionService
-                db = SessionLocal()
-                try:
-                    service = DataRetentionService(db)
-                    result = service.cleanup_deleted_messages(batch_size=500)
-                    log.info("F-017 retention cleanup: %s", result)
-                finally:
-                    db.close()
-            except Exception as exc:
-                log.error("F-017 retention cleanup error: %s", exc)
-            # Run every 24 hours
-            await asyncio.sleep(86400)
-
-    asyncio.create_task(_retention_cleanup_loop())
-    log.info("✅ F-017: Retention cleanup scheduler started (daily)")
-except Exception as e:
-    log.warning(f"Failed to start retention scheduler: {e}")
+    # Periodic jobs (backups, opt-in lab notification sweep; retention runs as an arq cron):
+    # one leader-elected scheduler instead of a loop per job in every worker.
+    try:
+        from app.tasks.periodic import (
+            SCHEDULER_ENABLED,
+            PeriodicScheduler,
+            build_default_jobs,
+        )
 
+        if SCHEDULER_ENABLED and not TESTING:
+            scheduler = PeriodicScheduler(build_default_jobs(settings))
+            scheduler.start()
+            app.state.periodic_scheduler = scheduler
+    except Exception as e:
+        log.error(f"Failed to start periodic scheduler: {e}")
 
     # Print routes
     try:
@@ -7,12 +7,12 @@ trail for HIPAA compliance without leaking patient phone numbers, emails,
 or other PII that may appear in query parameters.
 """
 import logging
-from collections.abc import Callable
 from contextvars import ContextVar
 from uuid import uuid4
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi import Request
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.core.pii_masker import mask_pii  # PR-31: PII scrubber for query strings
 
@@ -31,7 +31,7 @@ def get_current_request() -> Request | None:
     return _request_context.get()
 
 
-class AuditMiddleware(BaseHTTPMiddleware):
+class AuditMiddleware:
     """
     Middleware для установки request_id в каждом запросе и аудит-логирования
     mutating-запросов (POST/PUT/PATCH/DELETE).
@@ -48,9 +48,15 @@ class AuditMiddleware(BaseHTTPMiddleware):
     - WebSocket-соединения
     """
 
-    async def dispatch(  # type: ignore[override]
-        self, request: Request, call_next: Callable[[Request], Response]
-    ) -> Response:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope, receive)
         # Генерируем уникальный request_id для каждого запроса
         request_id = str(uuid4())
         request.state.request_id = request_id
@@ -67,10 +73,12 @@ class AuditMiddleware(BaseHTTPMiddleware):
                 self._audit_log_request(request, request_id, method)
 
             # Добавляем request_id в заголовки ответа для отладки
-            response = await call_next(request)
-            response.headers["X-Request-ID"] = request_id
+            async def send_with_request_id(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    MutableHeaders(scope=message)["X-Request-ID"] = request_id
+                await send(message)
 
-            return response
+            await self.app(scope, receive, send_with_request_id)
         finally:
             # Восстанавливаем предыдущее значение contextvar
             _request_context.reset(token)
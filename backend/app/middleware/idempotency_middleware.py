@@ -8,23 +8,44 @@ of re-executing the handler.
 Audit (PR-6) found this was missing — mobile clients that retry on
 timeout could create duplicate appointments / payments / patients.
 
-Implementation: in-memory LRU cache keyed by (user_id, idempotency_key).
-For production with multiple workers, this should be backed by Redis;
-for now in-memory is sufficient to satisfy the contract and tests.
+Implementation: responses are stored keyed by (scope, idempotency_key),
+where the scope is the caller (verified bearer token subject), method and
+path, as plain status/headers/body records:
+- IdempotencyResponseCache — in-memory LRU, per worker (dev, tests);
+- RedisIdempotencyStore — shared across workers, used when
+  IDEMPOTENCY_REDIS_URL (or REDIS_URL) is configured.
+
+While the first request with a key is running, an in-flight marker is
+held; a concurrent duplicate (double tap, retry landing on another
+worker) waits for the stored result instead of running the handler
+a second time.
 """
 from __future__ import annotations
 
+import asyncio
+import base64
+import hashlib
+import json
 import logging
+import os
+import threading
 import time
 from collections import OrderedDict
+from dataclasses import dataclass
 from typing import Any
+from uuid import uuid4
 
-from starlette.middleware.base import BaseHTTPMiddleware
+import jwt
 from starlette.requests import Request
-from starlette.responses import Response
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
 
 logger = logging.getLogger(__name__)
 
+_TESTING = os.getenv("TESTING", "").lower() in ("1", "true", "yes")
+
 # Methods that are idempotent-by-key (GET/DELETE/HEAD are naturally idempotent)
 _IDEMPOTENT_METHODS = {"POST", "PUT", "PATCH"}
 
@@ -34,16 +55,58 @@ _CACHE_TTL_SECONDS = 24 * 60 * 60
 # Max entries to prevent unbounded memory growth
 _MAX_CACHE_ENTRIES = 10_000
 
+# Larger responses are passed through but not stored (exports, files)
+IDEMPOTENCY_MAX_BODY_BYTES = int(os.getenv("IDEMPOTENCY_MAX_BODY_BYTES", str(1024 * 1024)))
+
+# In-flight marker lifetime: covers a crashed worker that never releases it
+IDEMPOTENCY_LOCK_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_TTL_SECONDS", "60"))
+
+# How long a concurrent duplicate waits for the first request's result
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+
+_WAIT_POLL_SECONDS = 0.05
+
+
+@dataclass(frozen=True, slots=True)
+class StoredResponse:
+    """Response snapshot that can be serialized and replayed."""
+
+    status_code: int
+    headers: list[tuple[bytes, bytes]]
+    body: bytes
+
+    def to_response(self) -> Response:
+        response = Response(content=self.body, status_code=self.status_code)
+        response.raw_headers = list(self.headers)
+        return response
+
+    def dumps(self) -> str:
+        return json.dumps({
+            "status": self.status_code,
+            "headers": [[name.decode("latin-1"), value.decode("latin-1")] for name, value in self.headers],
+            "body": base64.b64encode(self.body).decode("ascii"),
+        })
+
+    @classmethod
+    def loads(cls, raw: str | bytes) -> StoredResponse:
+        data = json.loads(raw)
+        return cls(
+            status_code=data["status"],
+            headers=[(name.encode("latin-1"), value.encode("latin-1")) for name, value in data["headers"]],
+            body=base64.b64decode(data["body"]),
+        )
+
 
 class IdempotencyResponseCache:
-    """In-memory LRU cache for idempotent responses."""
+    """In-memory LRU cache for idempotent responses (per worker)."""
 
     def __init__(self, max_entries: int = _MAX_CACHE_ENTRIES) -> None:
-        self._cache: OrderedDict[tuple[int, str], tuple[float, Response]] = OrderedDict()
+        self._cache: OrderedDict[tuple[str, str], tuple[float, StoredResponse]] = OrderedDict()
+        self._in_flight: dict[tuple[str, str], tuple[str, float]] = {}
         self._max_entries = max_entries
 
-    def get(self, user_id: int, key: str) -> Response | None:
-        cache_key = (user_id, key)
+    async def get(self, scope: str, key: str) -> StoredResponse | None:
+        cache_key = (scope, key)
         entry = self._cache.get(cache_key)
         if entry is None:
             return None
@@ -56,8 +119,10 @@ class IdempotencyResponseCache:
         self._cache.move_to_end(cache_key)
         return response
 
-    def set(self, user_id: int, key: str, response: Response, ttl: int = _CACHE_TTL_SECONDS) -> None:
-        cache_key = (user_id, key)
+    async def set(
+        self, scope: str, key: str, response: StoredResponse, ttl: int = _CACHE_TTL_SECONDS
+    ) -> None:
+        cache_key = (scope, key)
         expires_at = time.time() + ttl
         self._cache[cache_key] = (expires_at, response)
         self._cache.move_to_end(cache_key)
@@ -65,100 +130,294 @@ class IdempotencyResponseCache:
         while len(self._cache) > self._max_entries:
             self._cache.popitem(last=False)
 
+    async def acquire(
+        self, scope: str, key: str, token: str, ttl: int = IDEMPOTENCY_LOCK_TTL_SECONDS
+    ) -> bool:
+        """Take the in-flight marker; False if another request holds it."""
+        cache_key = (scope, key)
+        holder = self._in_flight.get(cache_key)
+        if holder is not None and time.time() < holder[1]:
+            return False
+        self._in_flight[cache_key] = (token, time.time() + ttl)
+        return True
+
+    async def release(self, scope: str, key: str, token: str) -> None:
+        cache_key = (scope, key)
+        holder = self._in_flight.get(cache_key)
+        if holder is not None and holder[0] == token:
+            del self._in_flight[cache_key]
+
     def clear(self) -> None:
         self._cache.clear()
+        self._in_flight.clear()
 
 
-# Global singleton cache
-_idempotency_cache = IdempotencyResponseCache()
+# Deletes the in-flight marker only if it still belongs to this request
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
 
+class RedisIdempotencyStore:
+    """Redis-backed store shared by all workers.
+
+    Falls back to the in-memory cache when Redis is unavailable, so a
+    Redis outage degrades to per-worker idempotency instead of failing
+    the request.
+    """
 
-def get_idempotency_cache() -> IdempotencyResponseCache:
+    KEY_PREFIX = "idempotency:"
+    LOCK_PREFIX = "idempotency-lock:"
+
+    def __init__(self, client: Any, fallback: IdempotencyResponseCache | None = None) -> None:
+        self._client = client
+        self._fallback = fallback or IdempotencyResponseCache()
+        self._release_script = client.register_script(_RELEASE_LUA)
+
+    def _key(self, scope: str, key: str) -> str:
+        return f"{self.KEY_PREFIX}{scope}:{key}"
+
+    def _lock_key(self, scope: str, key: str) -> str:
+        return f"{self.LOCK_PREFIX}{scope}:{key}"
+
+    async def get(self, scope: str, key: str) -> StoredResponse | None:
+        try:
+            raw = await self._client.get(self._key(scope, key))
+        except Exception as exc:
+            logger.warning("Idempotency Redis get failed: %s — using in-memory cache", exc)
+            return await self._fallback.get(scope, key)
+        return StoredResponse.loads(raw) if raw else None
+
+    async def set(
+        self, scope: str, key: str, response: StoredResponse, ttl: int = _CACHE_TTL_SECONDS
+    ) -> None:
+        try:
+            await self._client.set(self._key(scope, key), response.dumps(), ex=ttl)
+        except Exception as exc:
+            logger.warning("Idempotency Redis set failed: %s — using in-memory cache", exc)
+            await self._fallback.set(scope, key, response, ttl)
+
+    async def acquire(
+        self, scope: str, key: str, token: str, ttl: int = IDEMPOTENCY_LOCK_TTL_SECONDS
+    ) -> bool:
+        try:
+            return bool(await self._client.set(self._lock_key(scope, key), token, nx=True, ex=ttl))
+        except Exception as exc:
+            logger.warning("Idempotency Redis lock failed: %s — using in-memory lock", exc)
+            return await self._fallback.acquire(scope, key, token, ttl)
+
+    async def release(self, scope: str, key: str, token: str) -> None:
+        await self._fallback.release(scope, key, token)
+        try:
+            await self._release_script(keys=[self._lock_key(scope, key)], args=[token])
+        except Exception as exc:
+            logger.warning("Idempotency Redis unlock failed: %s", exc)
+
+    def clear(self) -> None:
+        # Redis keys expire on their own; only the local fallback is dropped
+        self._fallback.clear()
+
+
+def _create_idempotency_cache() -> IdempotencyResponseCache | RedisIdempotencyStore:
+    redis_url = "" if _TESTING else (
+        os.getenv("IDEMPOTENCY_REDIS_URL") or os.getenv("REDIS_URL") or ""
+    ).strip()
+    if not redis_url:
+        return IdempotencyResponseCache()
+    try:
+        import redis.asyncio as redis_asyncio
+    except ImportError:
+        logger.warning("redis package not installed — idempotency cache is per-worker")
+        return IdempotencyResponseCache()
+    return RedisIdempotencyStore(redis_asyncio.from_url(redis_url))
+
+
+# Global singleton cache (created lazily: the Redis client binds to the running loop)
+_idempotency_cache: IdempotencyResponseCache | RedisIdempotencyStore | None = None
+_idempotency_cache_lock = threading.Lock()
+
+
+def get_idempotency_cache() -> IdempotencyResponseCache | RedisIdempotencyStore:
+    global _idempotency_cache
+    if _idempotency_cache is None:
+        with _idempotency_cache_lock:
+            if _idempotency_cache is None:
+                _idempotency_cache = _create_idempotency_cache()
     return _idempotency_cache
 
 
-class IdempotencyMiddleware(BaseHTTPMiddleware):
+class IdempotencyMiddleware:
     """Idempotency-Key middleware (PR-6).
 
     Caches responses for POST/PUT/PATCH requests that carry an
     `Idempotency-Key` header. Subsequent requests with the same key
-    (and same authenticated user) receive the cached response.
-
-    The cache is in-memory per-worker. For multi-worker production
-    deployments, replace with a Redis-backed cache (TODO PR-8).
+    (same caller, method and path) receive the cached response; a
+    duplicate that arrives while the first one is still running waits
+    for its result (409 if it does not appear within
+    IDEMPOTENCY_WAIT_SECONDS).
     """
 
-    async def dispatch(self, request: Request, call_next: Any) -> Response:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         # Only intercept methods that benefit from idempotency
-        if request.method.upper() not in _IDEMPOTENT_METHODS:
-            return await call_next(request)
+        if scope["type"] != "http" or scope["method"].upper() not in _IDEMPOTENT_METHODS:
+            await self.app(scope, receive, send)
+            return
 
-        idempotency_key = request.headers.get("Idempotency-Key") or request.headers.get("idempotency-key")
+        request = Request(scope, receive)
+        idempotency_key = request.headers.get("Idempotency-Key")
         if not idempotency_key:
             # No key — pass through (idempotency is opt-in)
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
 
-        # Resolve user_id from auth state (set by upstream middleware)
-        # Default to 0 if unauthenticated (rare for POST, but defensive)
-        user_id = self._resolve_user_id(request)
+        # Key scope: caller identity (see _resolve_identity; "anonymous" without
+        # a bearer token), method and path - so a key from another caller or
+        # route never replays this response
+        key_scope = self._resolve_key_scope(request)
+        cache = get_idempotency_cache()
 
         # Check cache
-        cached = _idempotency_cache.get(user_id, idempotency_key)
-        if cached is not None:
-            logger.info(
-                "Idempotency hit: user=%s key=%s method=%s path=%s — returning cached response",
-                user_id, idempotency_key, request.method, request.url.path,
-            )
-            return cached
-
-        # Execute handler
-        response = await call_next(request)
-
-        # Cache only successful responses (2xx) — don't cache errors,
-        # client should be able to retry with the same key after fixing
-        # the issue.
-        if 200 <= response.status_code < 300:
-            # Materialize the body so we can replay it on cache hit.
-            # Starlette StreamingResponse consumes the body on first read,
-            # so we need to capture it and build a new Response.
-            body_bytes = b""
-            async for chunk in response.body_iterator:
-                body_bytes += chunk
-            # Rebuild response with materialized body
-            cached_response = Response(
-                content=body_bytes,
-                status_code=response.status_code,
-                headers=dict(response.headers),
-                media_type=response.media_type,
-            )
-            _idempotency_cache.set(user_id, idempotency_key, cached_response)
+        if await self._replay_cached(cache, key_scope, idempotency_key, request, scope, receive, send):
+            return
+
+        # Take the in-flight marker; a concurrent duplicate waits for the
+        # first request to store its result (or to fail and release it)
+        token = uuid4().hex
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        while not await cache.acquire(key_scope, idempotency_key, token):
+            if time.monotonic() >= deadline:
+                logger.warning(
+                    "Idempotency wait timed out: scope=%s key=%s method=%s path=%s",
+                    key_scope, idempotency_key, request.method, request.url.path,
+                )
+                response = JSONResponse(
+                    status_code=409,
+                    content={"detail": "A request with this Idempotency-Key is still being processed"},
+                )
+                await response(scope, receive, send)
+                return
+            await asyncio.sleep(_WAIT_POLL_SECONDS)
+            if await self._replay_cached(cache, key_scope, idempotency_key, request, scope, receive, send):
+                return
+
+        try:
+            # The first request may have finished between get() and acquire()
+            if await self._replay_cached(cache, key_scope, idempotency_key, request, scope, receive, send):
+                return
+            await self._run_and_store(cache, key_scope, idempotency_key, request, scope, receive, send)
+        finally:
+            await cache.release(key_scope, idempotency_key, token)
+
+    async def _replay_cached(
+        self,
+        cache: IdempotencyResponseCache | RedisIdempotencyStore,
+        key_scope: str,
+        idempotency_key: str,
+        request: Request,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+    ) -> bool:
+        cached = await cache.get(key_scope, idempotency_key)
+        if cached is None:
+            return False
+        logger.info(
+            "Idempotency hit: scope=%s key=%s method=%s path=%s — returning cached response",
+            key_scope, idempotency_key, request.method, request.url.path,
+        )
+        await cached.to_response()(scope, receive, send)
+        return True
+
+    async def _run_and_store(
+        self,
+        cache: IdempotencyResponseCache | RedisIdempotencyStore,
+        key_scope: str,
+        idempotency_key: str,
+        request: Request,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+    ) -> None:
+        # Execute handler. Messages go to the client as they come; the body
+        # of a successful (2xx) response is collected on the side so it can
+        # be replayed on cache hit. Errors are not cached — client should be
+        # able to retry with the same key after fixing the issue.
+        status_code = 0
+        raw_headers: list[tuple[bytes, bytes]] = []
+        body_chunks: list[bytes] = []
+        body_size = 0
+        to_store: StoredResponse | None = None
+
+        async def send_and_capture(message: Message) -> None:
+            nonlocal status_code, raw_headers, body_size, to_store
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                raw_headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body" and 200 <= status_code < 300:
+                chunk = message.get("body", b"")
+                body_size += len(chunk)
+                if body_size <= IDEMPOTENCY_MAX_BODY_BYTES:
+                    body_chunks.append(chunk)
+                elif body_chunks:
+                    body_chunks.clear()
+                if not message.get("more_body", False):
+                    if body_size <= IDEMPOTENCY_MAX_BODY_BYTES:
+                        to_store = StoredResponse(status_code, raw_headers, b"".join(body_chunks))
+                    else:
+                        logger.info(
+                            "Idempotency skip: scope=%s key=%s path=%s — body %s bytes over cap",
+                            key_scope, idempotency_key, request.url.path, body_size,
+                        )
+            await send(message)
+
+        await self.app(scope, receive, send_and_capture)
+
+        if to_store is not None:
+            await cache.set(key_scope, idempotency_key, to_store)
             logger.info(
-                "Idempotency cached: user=%s key=%s method=%s path=%s status=%s",
-                user_id, idempotency_key, request.method, request.url.path, response.status_code,
-            )
-            # Return a fresh Response with the same body (so client can read it)
-            return Response(
-                content=body_bytes,
-                status_code=response.status_code,
-                headers=dict(response.headers),
-                media_type=response.media_type,
+                "Idempotency cached: scope=%s key=%s method=%s path=%s status=%s",
+                key_scope, idempotency_key, request.method, request.url.path, status_code,
             )
 
-        return response
+    def _resolve_key_scope(self, request: Request) -> str:
+        """Namespace for the key: caller identity, method and path."""
+        return f"{self._resolve_identity(request)}:{request.method.upper()}:{request.url.path}"
 
-    def _resolve_user_id(self, request: Request) -> int:
-        """Best-effort user_id resolution from request state.
+    def _resolve_identity(self, request: Request) -> str:
+        """Caller identity for the key scope.
 
-        Look for user_id in request.state (set by auth middleware) or
-        in the Authorization header (decode JWT). Returns 0 if not found.
+        Nothing upstream authenticates the request (that happens in route
+        dependencies), so the identity is the verified ``sub`` of the bearer
+        token. A token that does not verify is scoped by its own digest:
+        such a request is rejected by the route and its response is not
+        stored anyway.
         """
-        # Fast path: auth middleware already set state.user_id
+        # Set by upstream middleware, when there is one
         user_id = getattr(request.state, "user_id", None)
+        if user_id is None:
+            user_id = getattr(getattr(request.state, "user", None), "id", None)
         if user_id is not None:
-            return int(user_id)
-        user = getattr(request.state, "user", None)
-        if user is not None:
-            uid = getattr(user, "id", None)
-            if uid is not None:
-                return int(uid)
-        return 0
+            return f"user:{user_id}"
+
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        token = token.strip()
+        if scheme.lower() != "bearer" or not token:
+            return "anonymous"
+        try:
+            payload = jwt.decode(
+                token,
+                settings.SECRET_KEY,
+                algorithms=[getattr(settings, "ALGORITHM", "HS256")],
+            )
+        except jwt.PyJWTError:
+            payload = {}
+        subject = payload.get("sub") or payload.get("username")
+        if subject is not None:
+            return f"user:{subject}"
+        return "token:" + hashlib.sha256(token.encode()).hexdigest()[:32]
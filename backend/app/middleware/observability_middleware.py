@@ -5,12 +5,11 @@ from __future__ import annotations
 import logging
 import re
 import time
-from collections.abc import Callable
 from uuid import uuid4
 
 from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from app.core.observability import observability_state
 
@@ -20,9 +19,12 @@ _TRACEPARENT_RE = re.compile(
 )
 
 
-class ObservabilityMiddleware(BaseHTTPMiddleware):
+class ObservabilityMiddleware:
     """Collect request SLI metrics and emit structured request logs."""
 
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
     @staticmethod
     def _extract_trace_id(request: Request) -> str:
         traceparent = request.headers.get("traceparent")
@@ -44,10 +46,13 @@ class ObservabilityMiddleware(BaseHTTPMiddleware):
             return request.client.host
         return "unknown"
 
-    async def dispatch(  # type: ignore[override]
-        self, request: Request, call_next: Callable[[Request], Response]
-    ) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
         started_at = time.perf_counter()
+        request = Request(scope, receive)
         trace_id = self._extract_trace_id(request)
         request.state.trace_id = trace_id
         request_id = getattr(request.state, "request_id", None)
@@ -56,16 +61,28 @@ class ObservabilityMiddleware(BaseHTTPMiddleware):
             request.state.request_id = request_id
 
         path = request.url.path
-        route = request.scope.get("route")
+        route = scope.get("route")
         route_path = getattr(route, "path", path)
         status_code = 500
+        duration_ms: float | None = None
         client_ip = self._extract_client_ip(request)
 
+        async def send_with_trace(message: Message) -> None:
+            nonlocal status_code, duration_ms
+            if message["type"] == "http.response.start":
+                # Время до заголовков ответа - как и при call_next
+                duration_ms = (time.perf_counter() - started_at) * 1000.0
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers["X-Trace-ID"] = trace_id
+                headers["X-Request-ID"] = str(request_id)
+            await send(message)
+
         try:
-            response = await call_next(request)
-            status_code = response.status_code
+            await self.app(scope, receive, send_with_trace)
         except Exception:
-            duration_ms = (time.perf_counter() - started_at) * 1000.0
+            if duration_ms is None:
+                duration_ms = (time.perf_counter() - started_at) * 1000.0
             observability_state.record_request(
                 method=request.method,
                 path=route_path,
@@ -87,7 +104,8 @@ class ObservabilityMiddleware(BaseHTTPMiddleware):
             )
             raise
 
-        duration_ms = (time.perf_counter() - started_at) * 1000.0
+        if duration_ms is None:
+            duration_ms = (time.perf_counter() - started_at) * 1000.0
         observability_state.record_request(
             method=request.method,
             path=route_path,
@@ -96,9 +114,6 @@ class ObservabilityMiddleware(BaseHTTPMiddleware):
         )
         observability_state.evaluate_sla_alerts()
 
-        response.headers["X-Trace-ID"] = trace_id
-        response.headers["X-Request-ID"] = str(request_id)
-
         log_level = logging.ERROR if status_code >= 500 else logging.INFO
         logger.log(
             log_level,
@@ -113,4 +128,3 @@ class ObservabilityMiddleware(BaseHTTPMiddleware):
                 "client_ip": client_ip,
             },
         )
-        return response
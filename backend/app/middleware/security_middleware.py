@@ -4,21 +4,19 @@ Security Middleware для rate limiting, brute force protection и IP logging
 
 import logging
 import os
-import time
-from collections import defaultdict
-from collections.abc import Callable
 from datetime import UTC, datetime, timedelta
-from typing import Any
 
 from fastapi import Request, status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.rate_limit_engine import RateLimitResult, create_rate_limiter
 
 logger = logging.getLogger(__name__)
 
 
-class SecurityMiddleware(BaseHTTPMiddleware):
+class SecurityMiddleware:
     """
     Middleware для защиты от:
     - Rate limiting (ограничение частоты запросов)
@@ -26,8 +24,8 @@ class SecurityMiddleware(BaseHTTPMiddleware):
     - IP logging (логирование IP адресов для аудита)
     """
 
-    def __init__(self, app):
-        super().__init__(app)
+    def __init__(self, app: ASGIApp):
+        self.app = app
 
         # Rate limiting конфигурация
         self.rate_limits: dict[str, dict[str, int]] = {
@@ -56,11 +54,9 @@ class SecurityMiddleware(BaseHTTPMiddleware):
             "tracking_window": 3600,  # Окно отслеживания: 1 час
         }
 
-        # In-memory хранилище (в продакшене использовать Redis)
-        self.request_counts: dict[str, list] = defaultdict(list)  # IP -> [timestamps]
-        self.failed_attempts: dict[str, dict[str, list]] = defaultdict(
-            lambda: defaultdict(list)
-        )  # IP -> endpoint -> [timestamps]
+        # Счётчики запросов и неудачных попыток - общий движок rate limit
+        # (Redis при REDIS_URL, иначе память процесса)
+        self.rate_limiter = create_rate_limiter("security")
         self.locked_ips: dict[str, datetime] = {}  # IP -> lock_until
 
         # Очистка старых записей каждые 5 минут
@@ -115,101 +111,41 @@ class SecurityMiddleware(BaseHTTPMiddleware):
             return "api"
 
     def _cleanup_old_records(self):
-        """Очистить старые записи из памяти"""
+        """Очистить старые записи из памяти (не чаще cleanup_interval)"""
         now = datetime.now(UTC)
-        # Use epoch seconds from the system clock to avoid naive datetime timezone shifts.
-        current_timestamp = time.time()
-        default_window = min(cfg["window"] for cfg in self.rate_limits.values())
-
-        # Очистка request_counts
-        for key in list(self.request_counts.keys()):
-            endpoint_type = key.split(":", 1)[0]
-            window = self.rate_limits.get(endpoint_type, {}).get(
-                "window", default_window
-            )
-            self.request_counts[key] = [
-                ts
-                for ts in self.request_counts[key]
-                if current_timestamp - ts < window
-            ]
-            if not self.request_counts[key]:
-                del self.request_counts[key]
-
-        # Очистка failed_attempts
-        for ip in list(self.failed_attempts.keys()):
-            for endpoint in list(self.failed_attempts[ip].keys()):
-                window = self.brute_force_config["tracking_window"]
-                self.failed_attempts[ip][endpoint] = [
-                    ts
-                    for ts in self.failed_attempts[ip][endpoint]
-                    if current_timestamp - ts < window
-                ]
-                if not self.failed_attempts[ip][endpoint]:
-                    del self.failed_attempts[ip][endpoint]
-            if not self.failed_attempts[ip]:
-                del self.failed_attempts[ip]
+        if now - self.last_cleanup < self.cleanup_interval:
+            return
+
+        # Истекшие счётчики локального хранилища
+        self.rate_limiter.local.purge(now.timestamp())
 
         # Очистка истекших блокировок
         for ip in list(self.locked_ips.keys()):
             if now > self.locked_ips[ip]:
                 del self.locked_ips[ip]
 
-        # MW-AUDIT-28 P0-3: prevent unbounded dict growth.
-        # In multi-worker deployment without Redis, in-memory dicts can
-        # grow to millions of entries. Cap at 10000 unique IPs.
-        MAX_TRACKED_IPS = 10000
-        if len(self.request_counts) > MAX_TRACKED_IPS:
-            # Evict oldest 20% of entries
-            sorted_keys = sorted(self.request_counts.keys(),
-                                 key=lambda k: max(self.request_counts[k]) if self.request_counts[k] else 0)
-            for k in sorted_keys[:MAX_TRACKED_IPS // 5]:
-                del self.request_counts[k]
-        if len(self.failed_attempts) > MAX_TRACKED_IPS:
-            sorted_ips = sorted(self.failed_attempts.keys(),
-                               key=lambda ip: max(ts for ep in self.failed_attempts[ip].values() for ts in ep) if self.failed_attempts[ip] else 0)
-            for ip in sorted_ips[:MAX_TRACKED_IPS // 5]:
-                del self.failed_attempts[ip]
-
         self.last_cleanup = now
 
-    def _check_rate_limit(
+    async def _check_rate_limit(
         self, ip_address: str, endpoint_type: str
-    ) -> tuple[bool, str | None]:
+    ) -> RateLimitResult | None:
         """
-        Проверить rate limit
+        Проверить rate limit и учесть запрос
 
         Returns:
-            (is_limited, error_message)
+            результат проверки или None, если для эндпоинта нет лимита
         """
         if endpoint_type not in self.rate_limits:
-            return False, None
+            return None
 
         limit_config = self.rate_limits[endpoint_type]
-        window = limit_config["window"]
-        max_requests = limit_config["requests"]
-
-        key = f"{endpoint_type}:{ip_address}"
-        current_timestamp = time.time()
-
-        # Очищаем старые записи для этого ключа
-        if key in self.request_counts:
-            self.request_counts[key] = [
-                ts
-                for ts in self.request_counts[key]
-                if current_timestamp - ts < window
-            ]
-        else:
-            self.request_counts[key] = []
+        return await self.rate_limiter.hit(
+            f"{endpoint_type}:{ip_address}",
+            limit_config["requests"],
+            limit_config["window"],
+        )
 
-        # Проверяем лимит
-        if len(self.request_counts[key]) >= max_requests:
-            return True, f"Превышен лимит запросов: {max_requests} за {window} секунд"
-
-        # Добавляем текущий запрос
-        self.request_counts[key].append(current_timestamp)
-        return False, None
-
-    def _check_brute_force(self, ip_address: str, endpoint: str) -> tuple[bool, str | None]:
+    async def _check_brute_force(self, ip_address: str, endpoint: str) -> tuple[bool, str | None]:
         """
         Проверить brute force protection
 
@@ -227,33 +163,33 @@ class SecurityMiddleware(BaseHTTPMiddleware):
                 del self.locked_ips[ip_address]
 
         # Проверяем количество неудачных попыток
-        failed = self.failed_attempts[ip_address][endpoint]
-        current_timestamp = time.time()
-        window = self.brute_force_config["tracking_window"]
-
-        # Очищаем старые записи
-        failed[:] = [
-            ts for ts in failed if current_timestamp - ts < window
-        ]
-
         max_attempts = self.brute_force_config["max_failed_attempts"]
-        if len(failed) >= max_attempts:
+        failed = await self.rate_limiter.peek(
+            f"failed:{ip_address}:{endpoint}",
+            max_attempts,
+            self.brute_force_config["tracking_window"],
+        )
+
+        if failed.count >= max_attempts:
             # Блокируем IP
             lock_duration = self.brute_force_config["lockout_duration"]
             self.locked_ips[ip_address] = datetime.now(UTC) + timedelta(
                 seconds=lock_duration
             )
             logger.warning(
-                f"IP {ip_address} заблокирован из-за {len(failed)} неудачных попыток на {endpoint}"
+                f"IP {ip_address} заблокирован из-за {int(failed.count)} неудачных попыток на {endpoint}"
             )
             return True, "IP заблокирован из-за множественных неудачных попыток. Попробуйте позже."
 
         return False, None
 
-    def _record_failed_attempt(self, ip_address: str, endpoint: str):
+    async def _record_failed_attempt(self, ip_address: str, endpoint: str):
         """Записать неудачную попытку"""
-        current_timestamp = time.time()
-        self.failed_attempts[ip_address][endpoint].append(current_timestamp)
+        await self.rate_limiter.hit(
+            f"failed:{ip_address}:{endpoint}",
+            self.brute_force_config["max_failed_attempts"],
+            self.brute_force_config["tracking_window"],
+        )
 
     def _log_ip_access(
         self, request: Request, ip_address: str, endpoint_type: str, blocked: bool = False
@@ -266,10 +202,13 @@ class SecurityMiddleware(BaseHTTPMiddleware):
                 f"(type: {endpoint_type}, blocked: {blocked})"
             )
 
-    async def dispatch(  # type: ignore[override]
-        self, request: Request, call_next: Callable[[Request], Any]
-    ) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         """Основной метод middleware"""
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope, receive)
         # Пропускаем публичные эндпоинты
         public_paths = [
             "/docs",
@@ -286,14 +225,16 @@ class SecurityMiddleware(BaseHTTPMiddleware):
 
         path = request.url.path
         if path == "/" or any(path.startswith(prefix) for prefix in public_paths):
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
 
         if request.method.upper() == "OPTIONS":
             logger.debug(
                 "[FIX:RATE_LIMIT] Skipping rate-limit accounting for preflight request %s",
                 path,
             )
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
 
         # Получаем IP адрес
         ip_address = self._get_client_ip(request)
@@ -314,55 +255,69 @@ class SecurityMiddleware(BaseHTTPMiddleware):
 
         # Проверка brute force protection (только для auth endpoints)
         if endpoint_type in ["login", "2fa_verify", "password_reset", "password_change"]:
-            is_blocked, error_msg = self._check_brute_force(ip_address, request.url.path)
+            is_blocked, error_msg = await self._check_brute_force(ip_address, request.url.path)
             if is_blocked:
                 self._log_ip_access(request, ip_address, endpoint_type, blocked=True)
-                return JSONResponse(
+                response = JSONResponse(
                     status_code=status.HTTP_429_TOO_MANY_REQUESTS,
                     content={"detail": error_msg or "Превышен лимит неудачных попыток"},
                 )
+                await response(scope, receive, send)
+                return
 
         # Проверка rate limiting
-        is_limited, error_msg = self._check_rate_limit(ip_address, endpoint_type)
-        if is_limited:
+        rate_limit = await self._check_rate_limit(ip_address, endpoint_type)
+        if rate_limit is not None and not rate_limit.allowed:
             self._log_ip_access(request, ip_address, endpoint_type, blocked=True)
-            return JSONResponse(
+            limit_config = self.rate_limits[endpoint_type]
+            response = JSONResponse(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                content={"detail": error_msg or "Превышен лимит запросов"},
+                content={
+                    "detail": f"Превышен лимит запросов: {limit_config['requests']} за {limit_config['window']} секунд"
+                },
             )
+            await response(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_with_limits(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                status_code = message["status"]
+
+                # Если запрос неудачный (4xx/5xx) на auth endpoint, записываем как failed attempt
+                if (
+                    endpoint_type in ["login", "2fa_verify", "password_reset", "password_change"]
+                    and status_code >= 400
+                ):
+                    await self._record_failed_attempt(ip_address, request.url.path)
+                    self._log_ip_access(request, ip_address, endpoint_type, blocked=True)
+
+                # Добавляем заголовки с информацией о лимитах (только для успешных запросов)
+                if rate_limit is not None and status_code < 400:
+                    limit_config = self.rate_limits[endpoint_type]
+                    headers = MutableHeaders(scope=message)
+                    headers["X-RateLimit-Limit"] = str(limit_config["requests"])
+                    headers["X-RateLimit-Window"] = str(limit_config["window"])
+                    headers["X-RateLimit-Remaining"] = str(rate_limit.remaining)
+            await send(message)
 
         # Выполняем запрос
         try:
-            response = await call_next(request)
-
-            # Если запрос неудачный (4xx/5xx) на auth endpoint, записываем как failed attempt
-            if (
-                endpoint_type in ["login", "2fa_verify", "password_reset", "password_change"]
-                and response.status_code >= 400
-            ):
-                self._record_failed_attempt(ip_address, request.url.path)
-                self._log_ip_access(request, ip_address, endpoint_type, blocked=True)
-
-            # Добавляем заголовки с информацией о лимитах (только для успешных запросов)
-            if endpoint_type in self.rate_limits and response.status_code < 400:
-                limit_config = self.rate_limits[endpoint_type]
-                response.headers["X-RateLimit-Limit"] = str(limit_config["requests"])
-                response.headers["X-RateLimit-Window"] = str(limit_config["window"])
-
-                # Подсчитываем оставшиеся запросы
-                key = f"{endpoint_type}:{ip_address}"
-                if key in self.request_counts:
-                    remaining = limit_config["requests"] - len(self.request_counts[key])
-                    response.headers["X-RateLimit-Remaining"] = str(max(0, remaining))
-
-            return response
+            await self.app(scope, receive, send_with_limits)
 
         except Exception as e:
             # MW-AUDIT-28 P0-1: fail-closed on middleware error.
             # Раньше вызывал call_next повторно → fail-open.
             logger.error(f"Security middleware error: {e}", exc_info=True)
-            return JSONResponse(
+            if response_started:
+                # Заголовки уже отправлены - ответ не подменить
+                raise
+            response = JSONResponse(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 content={"detail": "Internal server error"},
             )
+            await response(scope, receive, send)
 
@@ -1,12 +1,10 @@
 from __future__ import annotations
 
 import logging
-from typing import Any
 
 from fastapi import Request, status
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from app.core.config import settings
 from app.core.tenant_scope import (
@@ -20,15 +18,15 @@ logger = logging.getLogger(__name__)
 WRITE_METHODS = frozenset({"POST", "PUT", "PATCH", "DELETE"})
 
 
-class TenantScopeMiddleware(BaseHTTPMiddleware):
+class TenantScopeMiddleware:
     """
     Enforce branch scope on high-risk write routes during multi-clinic rollout.
 
     Guard is feature-flagged with `TENANT_SCOPE_ENFORCE_WRITES` and is no-op by default.
     """
 
-    def __init__(self, app: Any) -> None:
-        super().__init__(app)
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
         self.enabled = settings.TENANT_SCOPE_ENFORCE_WRITES
         self.protected_prefixes = _parse_prefixes(settings.TENANT_SCOPE_WRITE_PREFIXES)
 
@@ -38,17 +36,20 @@ class TenantScopeMiddleware(BaseHTTPMiddleware):
             self.protected_prefixes,
         )
 
-    async def dispatch(self, request: Request, call_next) -> Response:  # type: ignore[override]
-        if not self.enabled:
-            return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.enabled:
+            await self.app(scope, receive, send)
+            return
 
+        request = Request(scope, receive)
         method = request.method.upper()
         path = request.url.path
         if method not in WRITE_METHODS or not _is_protected_path(
             path=path,
             prefixes=self.protected_prefixes,
         ):
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
 
         query_branch_id: int | None
         raw_query_branch_id = request.query_params.get("branch_id")
@@ -64,19 +65,21 @@ class TenantScopeMiddleware(BaseHTTPMiddleware):
                     method,
                     raw_query_branch_id,
                 )
-                return JSONResponse(
+                response = JSONResponse(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     content={"detail": "Query branch_id must be a positive integer"},
                 )
+                await response(scope, receive, send)
+                return
 
         user_branch_id = _extract_user_branch_id(request)
         try:
-            scope = resolve_tenant_scope(
+            tenant_scope = resolve_tenant_scope(
                 header_branch_id=request.headers.get(TENANT_BRANCH_HEADER),
                 query_branch_id=query_branch_id,
                 user_branch_id=user_branch_id,
             )
-            resolved_branch_id = require_branch_scope(scope)
+            resolved_branch_id = require_branch_scope(tenant_scope)
         except ValueError as error:
             logger.warning(
                 "tenant_scope_middleware.scope_rejected path=%s method=%s detail=%s",
@@ -84,21 +87,23 @@ class TenantScopeMiddleware(BaseHTTPMiddleware):
                 method,
                 str(error),
             )
-            return JSONResponse(
+            response = JSONResponse(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 content={"detail": str(error)},
             )
+            await response(scope, receive, send)
+            return
 
-        request.state.tenant_scope = scope
+        request.state.tenant_scope = tenant_scope
         request.state.branch_id = resolved_branch_id
         logger.info(
             "tenant_scope_middleware.scope_applied path=%s method=%s branch_id=%s source=%s",
             path,
             method,
             resolved_branch_id,
-            scope.source,
+            tenant_scope.source,
         )
-        return await call_next(request)
+        await self.app(scope, receive, send)
 
 
 def _parse_prefixes(raw_prefixes: str) -> tuple[str, ...]:
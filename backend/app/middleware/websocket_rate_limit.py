@@ -5,6 +5,8 @@ import logging
 from collections import defaultdict
 from datetime import UTC, datetime, timedelta
 
+from app.core.rate_limit_engine import create_rate_limiter
+
 logger = logging.getLogger(__name__)
 
 
@@ -12,10 +14,13 @@ class WebSocketRateLimiter:
     """Rate limiter for WebSocket connections"""
 
     def __init__(self):
-        # Track connections per IP
+        # Open connections per IP (this process)
         self.connections_per_ip: dict[str, int] = defaultdict(int)
         self.connection_timestamps: dict[str, list] = defaultdict(list)
 
+        # New connections per minute - shared rate limit engine
+        self.rate_limiter = create_rate_limiter("ws")
+
         # Rate limits
         self.max_connections_per_ip = 10  # Max 10 connections per IP
         self.max_connections_per_minute = 5  # Max 5 new connections per minute per IP
@@ -48,9 +53,10 @@ class WebSocketRateLimiter:
                 if ip in self.connections_per_ip:
                     del self.connections_per_ip[ip]
 
+        self.rate_limiter.local.purge(now.timestamp())
         self.last_cleanup = now
 
-    def check_rate_limit(self, ip_address: str) -> tuple[bool, str]:
+    async def check_rate_limit(self, ip_address: str) -> tuple[bool, str]:
         """
         Check if IP address is within rate limits
 
@@ -65,22 +71,16 @@ class WebSocketRateLimiter:
             return False, f"Too many connections from this IP (max {self.max_connections_per_ip})"
 
         # Check connections per minute
-        now = datetime.now(UTC)
-        minute_ago = now - timedelta(minutes=1)
-
-        recent_connections = [
-            ts for ts in self.connection_timestamps.get(ip_address, [])
-            if ts > minute_ago
-        ]
-
-        if len(recent_connections) >= self.max_connections_per_minute:
+        recent = await self.rate_limiter.peek(ip_address, self.max_connections_per_minute, 60)
+        if recent.count >= self.max_connections_per_minute:
             logger.warning(f"Rate limit exceeded: IP {ip_address} connected too frequently")
             return False, f"Too many connection attempts (max {self.max_connections_per_minute} per minute)"
 
         return True, ""
 
-    def record_connection(self, ip_address: str):
+    async def record_connection(self, ip_address: str):
         """Record a new connection"""
+        await self.rate_limiter.hit(ip_address, self.max_connections_per_minute, 60)
         now = datetime.now(UTC)
         self.connection_timestamps[ip_address].append(now)
         self.connections_per_ip[ip_address] = len(self.connection_timestamps[ip_address])
@@ -7,6 +7,13 @@ from .ai_config import (
     AIProvider,
     AIUsageLog,
 )
+from .analytics_rollup import (
+    AnalyticsRollupDay,
+    QueueDailyRollup,
+    RevenueDailyRollup,
+    ServiceDailyRollup,
+    VisitDailyRollup,
+)
 from .appointment import Appointment
 from .audit import AuditLog
 from .authentication import (
@@ -104,6 +111,7 @@ from .emergency_access_token import EmergencyAccessToken  # M4-P2-1: emergency r
 from .file_system import (
     File,
     FileAccessLog,
+    FileBlob,
     FileFolder,
     FilePermission,
     FileQuota,
@@ -139,7 +147,12 @@ from .notification import (
     NotificationTemplate,
 )
 from .online import OnlineDay
-from .online_queue import DailyQueue, OnlineQueueEntry, QueueToken
+from .online_queue import (
+    DailyQueue,
+    OnlineQueueEntry,
+    QueueNumberCounter,
+    QueueToken,
+)
 from .patient import Patient
 from .payment import Payment
 from .payment_invoice import PaymentInvoice, PaymentInvoiceVisit
@@ -163,6 +176,7 @@ from .role_permission import Permission, Role, UserGroup, UserPermissionOverride
 # from .payment_webhook import PaymentWebhook, PaymentProvider, PaymentTransaction
 # QueueTicket заменен на новые модели в queue.py
 from .schedule import ScheduleTemplate
+from .scheduler_lease import SchedulerLease
 from .service import Service, ServiceCatalog
 from .service_audit import ServiceAuditLog
 from .setting import Setting
@@ -296,6 +310,7 @@ __all__ = [
     "SystemInfo",
     "DailyQueue",
     "OnlineQueueEntry",
+    "QueueNumberCounter",
     "QueueToken",
     "QueueProfile",
     "INITIAL_QUEUE_PROFILES",
@@ -319,6 +334,7 @@ __all__ = [
     "DepartmentRegistrationSettings",
     "File",
     "FileAccessLog",
+    "FileBlob",
     "FileFolder",
     "FilePermission",
     "FileQuota",
@@ -349,4 +365,12 @@ __all__ = [
     "AIPromptTemplate",
     "AIProvider",
     "AIUsageLog",
+    # Analytics rollups
+    "AnalyticsRollupDay",
+    "VisitDailyRollup",
+    "RevenueDailyRollup",
+    "ServiceDailyRollup",
+    "QueueDailyRollup",
+    # Periodic scheduler
+    "SchedulerLease",
 ]
@@ -0,0 +1,94 @@
+"""
+Дневные агрегаты (rollup) для аналитики и админ-дашбордов.
+
+Каждая таблица - факты за закрытый день по фиксированному набору измерений.
+Строки дня пересчитываются целиком (см. app.services.analytics_rollup);
+``AnalyticsRollupDay`` отмечает дни, для которых агрегаты готовы.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+from decimal import Decimal
+
+from sqlalchemy import JSON, Date, DateTime, Float, Index, Integer, Numeric, String
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.sql import func
+
+from app.db.base_class import Base
+
+
+class AnalyticsRollupDay(Base):
+    """День, для которого посчитаны все дневные агрегаты."""
+
+    __tablename__ = "analytics_rollup_days"
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    rolled_up_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=True
+    )
+
+
+class VisitDailyRollup(Base):
+    """Визиты за день по отделению, врачу, статусу и часу приёма."""
+
+    __tablename__ = "analytics_visit_daily"
+    __table_args__ = (Index("ix_analytics_visit_daily_day_department", "day", "department"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    day: Mapped[date] = mapped_column(Date, nullable=False, index=True)
+    department: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    doctor_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    status: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    hour: Mapped[int] = mapped_column(Integer, nullable=False)
+    visit_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class RevenueDailyRollup(Base):
+    """Выручка за день: платежи кассы (payment) и онлайн-вебхуки (webhook)."""
+
+    __tablename__ = "analytics_revenue_daily"
+    __table_args__ = (Index("ix_analytics_revenue_daily_day_source", "day", "source"),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    day: Mapped[date] = mapped_column(Date, nullable=False, index=True)
+    source: Mapped[str] = mapped_column(String(16), nullable=False)  # payment|webhook
+    status: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    provider: Mapped[str | None] = mapped_column(String(50), nullable=True)
+    method: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    department: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    # В основной валюте (вебхуки хранят тийины - делим на 100 при агрегации)
+    amount: Mapped[Decimal] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    transactions: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class ServiceDailyRollup(Base):
+    """Количество оказанных услуг (строк visit_services) за день."""
+
+    __tablename__ = "analytics_service_daily"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    day: Mapped[date] = mapped_column(Date, nullable=False, index=True)
+    service_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    visit_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class QueueDailyRollup(Base):
+    """Очереди за день по специальности врача и тегу очереди."""
+
+    __tablename__ = "analytics_queue_daily"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    day: Mapped[date] = mapped_column(Date, nullable=False, index=True)
+    specialty: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    queue_tag: Mapped[str | None] = mapped_column(String(32), nullable=True)
+    queue_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    total_entries: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    served: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    waiting: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Сумма и число замеров ожидания - среднее складывается по дням точно
+    wait_sum_minutes: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    wait_samples: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    # Гистограмма ожидания {номер корзины: количество}, корзины по
+    # WAIT_BUCKET_MINUTES - из неё считаются перцентили за любой период
+    wait_histogram: Mapped[dict | None] = mapped_column(JSON, nullable=True)
@@ -33,6 +33,11 @@ class DoctorPhraseHistory(Base):
         Index('ix_doctor_phrase_lookup', 'doctor_id', 'field', 'specialty'),
         # Индекс для prefix search
         Index('ix_doctor_phrase_prefix', 'doctor_id', 'field', 'prefix_index'),
+        # Одна строка на фразу: bulk-индексация пишет через ON CONFLICT
+        Index(
+            'uq_doctor_phrase_history_phrase', 'doctor_id', 'field', 'phrase',
+            unique=True,
+        ),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
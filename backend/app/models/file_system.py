@@ -8,7 +8,16 @@ import enum
 from datetime import datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import Boolean, DateTime, Enum, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Integer,
+    String,
+    Text,
+)
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy.sql import func
 
@@ -315,6 +324,28 @@ class FileStorage(Base):
     )
 
 
+class FileBlob(Base):
+    """Содержимое файла в хранилище, адресуемое по SHA-256.
+
+    File и FileVersion с одинаковым содержимым ссылаются на один blob
+    (по file_hash); ref_count - число таких ссылок. Blob без ссылок
+    удаляет сборщик мусора, когда с unreferenced_at прошёл grace-период.
+    """
+
+    __tablename__ = "file_blobs"
+
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    storage_path: Mapped[str] = mapped_column(String(500), nullable=False)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    ref_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), nullable=False
+    )
+    unreferenced_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True, index=True
+    )  # Когда ref_count стал 0; NULL - пока есть ссылки
+
+
 class FileQuota(Base):
     """Квоты пользователей на файлы"""
 
@@ -81,6 +81,10 @@ class DailyQueue(Base):
         Integer, default=15, nullable=False
     )  # Максимум записей онлайн
 
+    # Последний выданный номер (счётчик очереди, см. queue_svc._numbering).
+    # NULL - счётчик ещё не инициализирован и засевается по MAX(number).
+    last_number: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
     created_at: Mapped[datetime | None] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
     )
@@ -332,3 +336,19 @@ class QueueStatistics(Base):
 
     # Relationships
     queue: Mapped[DailyQueue] = relationship("DailyQueue", foreign_keys=[queue_id])
+
+
+class QueueNumberCounter(Base):
+    """Именованный счётчик номеров, не привязанный к одной очереди.
+
+    Используется для сквозной нумерации (``scope="global"``); номера внутри
+    очереди хранятся в ``DailyQueue.last_number``.
+    """
+
+    __tablename__ = "queue_number_counters"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    last_number: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    updated_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
@@ -11,6 +11,7 @@ from sqlalchemy import (
     Integer,
     String,
     Text,
+    event,
     func,
     literal,
 )
@@ -18,6 +19,7 @@ from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base_class import Base
+from app.utils.text_search import normalize_phone_digits, patient_search_name
 
 if TYPE_CHECKING:
     from app.models.user import User
@@ -58,6 +60,11 @@ class Patient(Base):
         DateTime(timezone=True), nullable=False, default=lambda: datetime.now(UTC)
     )
 
+    # Нормализованные поля для поиска (app.utils.text_search), заполняются
+    # автоматически при сохранении; индексы pg_trgm - миграция 0047
+    search_name: Mapped[str | None] = mapped_column(String(512), nullable=True)
+    search_phone: Mapped[str | None] = mapped_column(String(32), nullable=True)
+
     # ✅ SOFT-DELETE: Безопасное удаление пациентов
     is_deleted: Mapped[bool] = mapped_column(Boolean, default=False, index=True)
     deleted_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
@@ -114,3 +121,12 @@ class Patient(Base):
             + literal(" ")
             + func.coalesce(cls.middle_name, "")
         )
+
+
+@event.listens_for(Patient, "before_insert", propagate=True)
+@event.listens_for(Patient, "before_update", propagate=True)
+def _refresh_search_fields(mapper, connection, target) -> None:
+    target.search_name = patient_search_name(
+        target.last_name, target.first_name, target.middle_name
+    )
+    target.search_phone = normalize_phone_digits(target.phone) or None
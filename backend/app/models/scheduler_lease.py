@@ -0,0 +1,31 @@
+"""
+Аренда периодических задач планировщика (app.tasks.periodic).
+
+Одна строка на задачу. last_slot - последний занятый слот расписания
+(каждый слот выполняет ровно один процесс), locked_until - задача сейчас
+выполняется у owner; продлевается heartbeat'ом и истекает сама, если
+процесс упал.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base_class import Base
+
+
+class SchedulerLease(Base):
+    """Аренда периодической задачи."""
+
+    __tablename__ = "scheduler_leases"
+
+    job_name: Mapped[str] = mapped_column(String(100), primary_key=True)
+    owner: Mapped[str | None] = mapped_column(String(200), nullable=True)
+    last_slot: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    locked_until: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+    last_success_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
@@ -82,6 +82,10 @@ class Visit(Base):
     confirmed_by: Mapped[str | None] = mapped_column(
         String(64), nullable=True
     )  # user_id, telegram_id, или phone
+    # Напоминание о визите отправлено (app.tasks.worker) - повторно не шлём
+    reminder_sent_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
 
     # ✅ SSOT: Источник визита (единственный источник истины)
     # 'online' = QR/Telegram регистрация
@@ -3,14 +3,21 @@
 from __future__ import annotations
 
 from datetime import date
+from typing import Any
 
-from sqlalchemy import or_
+from sqlalchemy import and_, case, func, or_
 from sqlalchemy.orm import Session
 
 from app.models.global_search_audit import GlobalSearchAudit
 from app.models.lab import LabOrder
 from app.models.patient import Patient
 from app.models.visit import Visit
+from app.utils.text_search import normalize_phone_digits, normalize_search_text
+
+# Короче трёх цифр поиск по телефону не использует триграммный индекс
+# и совпадает почти со всеми номерами
+PHONE_MIN_DIGITS = 3
+_PHONE_QUERY_CHARS = frozenset("0123456789+-() ")
 
 
 class GlobalSearchApiRepository:
@@ -22,25 +29,64 @@ class GlobalSearchApiRepository:
     def get_patient(self, patient_id: int) -> Patient | None:
         return self.db.query(Patient).filter(Patient.id == patient_id).first()
 
+    def _name_match(self, query: str) -> Any | None:
+        """Все слова запроса входят в нормализованное ФИО (в любом порядке)."""
+        tokens = normalize_search_text(query).split()
+        if not tokens:
+            return None
+        return and_(*(Patient.search_name.like(f"%{token}%") for token in tokens))
+
+    def _phone_digits(self, query: str) -> str | None:
+        digits = normalize_phone_digits(query)
+        if len(digits) < PHONE_MIN_DIGITS or not set(query) <= _PHONE_QUERY_CHARS:
+            return None
+        return digits
+
     def search_patients(self, *, query: str, limit: int) -> list[Patient]:
-        search_term = f"%{query}%"
+        """Поиск по ФИО (регистр, кириллица/латиница) и цифрам телефона.
+
+        Сначала совпадения с начала ФИО, затем с начала любого слова, затем
+        остальные; внутри группы - по триграммной близости (PostgreSQL) или
+        по длине ФИО.
+        """
+        name_match = self._name_match(query)
+        digits = self._phone_digits(query)
+        conditions = [name_match] if name_match is not None else []
+        if digits:
+            conditions.append(Patient.search_phone.like(f"%{digits}%"))
+        if not conditions:
+            return []
+
+        name = normalize_search_text(query)
+        first_token = name.split()[0] if name else None
+        rank_cases = []
+        if name:
+            rank_cases.append((Patient.search_name.like(f"{name}%"), 0))
+            rank_cases.append((Patient.search_name.like(f"% {first_token}%"), 1))
+        if digits:
+            rank_cases.append((Patient.search_phone.like(f"{digits}%"), 1))
+        order_by = [case(*rank_cases, else_=2)]
+        if name and self.db.get_bind().dialect.name == "postgresql":
+            order_by.append(func.similarity(Patient.search_name, name).desc())
+        else:
+            order_by.append(func.length(Patient.search_name))
+        order_by.append(Patient.id)
+
         return (
             self.db.query(Patient)
-            .filter(
-                or_(
-                    Patient.first_name.ilike(search_term),
-                    Patient.last_name.ilike(search_term),
-                    Patient.phone.ilike(search_term)
-                    if hasattr(Patient, "phone")
-                    else False,
-                )
-            )
+            .filter(or_(*conditions))
+            .order_by(*order_by)
             .limit(limit)
             .all()
         )
 
-    def get_visit(self, visit_id: int) -> Visit | None:
-        return self.db.query(Visit).filter(Visit.id == visit_id).first()
+    def get_visit_with_patient(self, visit_id: int) -> tuple[Visit, Patient | None] | None:
+        return (
+            self.db.query(Visit, Patient)
+            .outerjoin(Patient, Visit.patient_id == Patient.id)
+            .filter(Visit.id == visit_id)
+            .first()
+        )
 
     def search_recent_visits_by_patient_name(
         self,
@@ -48,29 +94,40 @@ class GlobalSearchApiRepository:
         query: str,
         since_date: date,
         limit: int,
-    ) -> list[Visit]:
-        search_term = f"%{query}%"
+    ) -> list[tuple[Visit, Patient]]:
+        """Визиты вместе с пациентом - одним запросом, без догрузки по строке."""
+        name_match = self._name_match(query)
+        if name_match is None:
+            return []
         return (
-            self.db.query(Visit)
+            self.db.query(Visit, Patient)
             .join(Patient, Visit.patient_id == Patient.id)
-            .filter(
-                or_(Patient.first_name.ilike(search_term), Patient.last_name.ilike(search_term)),
-                Visit.created_at >= since_date,
-            )
+            .filter(name_match, Visit.created_at >= since_date)
             .order_by(Visit.created_at.desc())
             .limit(limit)
             .all()
         )
 
-    def get_lab_order(self, order_id: int) -> LabOrder | None:
-        return self.db.query(LabOrder).filter(LabOrder.id == order_id).first()
+    def get_lab_order_with_patient(
+        self, order_id: int
+    ) -> tuple[LabOrder, Patient | None] | None:
+        return (
+            self.db.query(LabOrder, Patient)
+            .outerjoin(Patient, LabOrder.patient_id == Patient.id)
+            .filter(LabOrder.id == order_id)
+            .first()
+        )
 
-    def search_lab_orders_by_patient_name(self, *, query: str, limit: int) -> list[LabOrder]:
-        search_term = f"%{query}%"
+    def search_lab_orders_by_patient_name(
+        self, *, query: str, limit: int
+    ) -> list[tuple[LabOrder, Patient]]:
+        name_match = self._name_match(query)
+        if name_match is None:
+            return []
         return (
-            self.db.query(LabOrder)
+            self.db.query(LabOrder, Patient)
             .join(Patient, LabOrder.patient_id == Patient.id)
-            .filter(or_(Patient.first_name.ilike(search_term), Patient.last_name.ilike(search_term)))
+            .filter(name_match)
             .order_by(LabOrder.created_at.desc())
             .limit(limit)
             .all()
@@ -0,0 +1,81 @@
+"""
+Backfill daily analytics rollups (app.services.analytics_rollup).
+
+The arq cron job `refresh_analytics_rollups` keeps the last few closed days
+up to date. Use this script to fill the history after deploying the rollup
+tables, or to rebuild a range after bulk corrections of old visits/payments
+(days outside the job's refresh window are not recomputed automatically).
+
+Usage:
+    cd backend && python -m app.scripts.backfill_analytics_rollups \\
+        --from 2025-01-01 --to 2026-10-16
+
+    # Same as the cron job: missing closed days + the refresh window
+    cd backend && python -m app.scripts.backfill_analytics_rollups --refresh
+
+Safety:
+- Idempotent: each day is deleted and rebuilt in its own transaction.
+- Only closed days are rolled up; --to is clamped to yesterday (UTC).
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+from datetime import date
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s  %(levelname)-7s  %(message)s")
+log = logging.getLogger("backfill_analytics_rollups")
+
+
+def _parse_day(value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(f"invalid date {value!r}, expected YYYY-MM-DD") from exc
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Backfill daily analytics rollups")
+    parser.add_argument("--from", dest="first_day", type=_parse_day, help="first day (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="last_day", type=_parse_day, help="last day (YYYY-MM-DD)")
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="roll up missing closed days and the refresh window, like the cron job",
+    )
+    args = parser.parse_args(argv)
+
+    if not args.refresh and (args.first_day is None or args.last_day is None):
+        parser.error("either --refresh or both --from and --to are required")
+    if not args.refresh and args.first_day > args.last_day:
+        parser.error("--from must not be after --to")
+
+    from app.db.session import SessionLocal
+    from app.services.analytics_rollup import backfill_rollups, refresh_rollups
+
+    db = SessionLocal()
+    try:
+        if args.refresh:
+            results = refresh_rollups(db)
+        else:
+            results = backfill_rollups(db, args.first_day, args.last_day)
+    except Exception:
+        log.exception("Rollup backfill failed")
+        return 1
+    finally:
+        db.close()
+
+    for result in results:
+        log.info(
+            "%s: visits=%d revenue=%d services=%d queues=%d",
+            result["day"], result["visits"], result["revenue"],
+            result["services"], result["queues"],
+        )
+    log.info("Rolled up %d day(s)", len(results))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,15 +7,18 @@ AI Rate Limiter - Контроль частоты AI запросов.
 3. Исчерпание бюджета
 """
 
-import asyncio
 import logging
-from collections import defaultdict
-from datetime import UTC, datetime, timedelta
+import math
 
 from fastapi import HTTPException, status
 
+from app.core.rate_limit_engine import create_rate_limiter
+
 logger = logging.getLogger(__name__)
 
+_HOUR = 3600
+_MINUTE = 60
+
 
 class AIRateLimiter:
     """
@@ -24,6 +27,9 @@ class AIRateLimiter:
     Два уровня лимитов:
     1. Per-user: X запросов в час (защита от злоупотреблений)
     2. Per-provider: Y запросов в минуту (защита от лимитов API)
+
+    Счётчики - в общем движке rate limit (Redis при REDIS_URL, иначе
+    память процесса), так что лимиты общие для всех воркеров.
     """
 
     def __init__(
@@ -33,19 +39,7 @@ class AIRateLimiter:
     ):
         self.user_limit_per_hour = user_limit_per_hour
         self.provider_limit_per_minute = provider_limit_per_minute
-
-        # Storage: {user_id: [timestamps]}
-        self._user_requests: dict[int, list[datetime]] = defaultdict(list)
-
-        # Storage: {provider_name: [timestamps]}
-        self._provider_requests: dict[str, list[datetime]] = defaultdict(list)
-
-        # Async lock for thread safety
-        self._lock = asyncio.Lock()
-
-        # Cleanup interval
-        self._last_cleanup = datetime.now(UTC)
-        self._cleanup_interval = timedelta(minutes=5)
+        self.rate_limiter = create_rate_limiter("ai")
 
     async def check_user_limit(self, user_id: int) -> tuple[bool, int | None]:
         """
@@ -59,35 +53,16 @@ class AIRateLimiter:
             - (True, None) если запрос разрешен
             - (False, X) если нужно подождать X секунд
         """
-        async with self._lock:
-            await self._maybe_cleanup()
-
-            now = datetime.now(UTC)
-            cutoff = now - timedelta(hours=1)
-
-            # Очистка старых записей для этого пользователя
-            self._user_requests[user_id] = [
-                ts for ts in self._user_requests[user_id] if ts > cutoff
-            ]
-
-            current_count = len(self._user_requests[user_id])
-
-            if current_count >= self.user_limit_per_hour:
-                # Вычисляем когда освободится слот
-                oldest = min(self._user_requests[user_id])
-                retry_after = int((oldest + timedelta(hours=1) - now).total_seconds()) + 1
-
-                logger.warning(
-                    f"Rate limit exceeded for user {user_id}: "
-                    f"{current_count}/{self.user_limit_per_hour} requests/hour"
-                )
-
-                return False, max(1, retry_after)
-
-            # Записываем запрос
-            self._user_requests[user_id].append(now)
+        result = await self.rate_limiter.hit(f"user:{user_id}", self.user_limit_per_hour, _HOUR)
+        if result.allowed:
             return True, None
 
+        logger.warning(
+            f"Rate limit exceeded for user {user_id}: "
+            f"{int(result.count)}/{self.user_limit_per_hour} requests/hour"
+        )
+        return False, max(1, math.ceil(result.retry_after))
+
     async def check_provider_limit(self, provider: str) -> tuple[bool, int | None]:
         """
         Проверка лимита провайдера.
@@ -98,87 +73,40 @@ class AIRateLimiter:
         Returns:
             (allowed, retry_after_seconds)
         """
-        async with self._lock:
-            now = datetime.now(UTC)
-            cutoff = now - timedelta(minutes=1)
-
-            # Очистка старых записей
-            self._provider_requests[provider] = [
-                ts for ts in self._provider_requests[provider] if ts > cutoff
-            ]
-
-            current_count = len(self._provider_requests[provider])
-
-            if current_count >= self.provider_limit_per_minute:
-                oldest = min(self._provider_requests[provider])
-                retry_after = int((oldest + timedelta(minutes=1) - now).total_seconds()) + 1
-
-                logger.warning(
-                    f"Provider rate limit reached for {provider}: "
-                    f"{current_count}/{self.provider_limit_per_minute} requests/minute"
-                )
-
-                return False, max(1, retry_after)
-
-            self._provider_requests[provider].append(now)
+        result = await self.rate_limiter.hit(
+            f"provider:{provider}", self.provider_limit_per_minute, _MINUTE
+        )
+        if result.allowed:
             return True, None
 
-    async def _maybe_cleanup(self):
-        """Периодическая очистка старых записей"""
-        now = datetime.now(UTC)
-
-        if now - self._last_cleanup < self._cleanup_interval:
-            return
-
-        self._last_cleanup = now
-
-        # Очистка user requests старше 1 часа
-        user_cutoff = now - timedelta(hours=1)
-        empty_users = []
-
-        for user_id, timestamps in self._user_requests.items():
-            self._user_requests[user_id] = [ts for ts in timestamps if ts > user_cutoff]
-            if not self._user_requests[user_id]:
-                empty_users.append(user_id)
-
-        for user_id in empty_users:
-            del self._user_requests[user_id]
-
-        # Очистка provider requests старше 1 минуты
-        provider_cutoff = now - timedelta(minutes=1)
-        empty_providers = []
-
-        for provider, timestamps in self._provider_requests.items():
-            self._provider_requests[provider] = [ts for ts in timestamps if ts > provider_cutoff]
-            if not self._provider_requests[provider]:
-                empty_providers.append(provider)
-
-        for provider in empty_providers:
-            del self._provider_requests[provider]
-
-        logger.debug(
-            f"Rate limiter cleanup: {len(self._user_requests)} users, "
-            f"{len(self._provider_requests)} providers tracked"
+        logger.warning(
+            f"Provider rate limit reached for {provider}: "
+            f"{int(result.count)}/{self.provider_limit_per_minute} requests/minute"
         )
+        return False, max(1, math.ceil(result.retry_after))
 
-    def get_user_usage(self, user_id: int) -> dict[str, int]:
+    async def get_user_usage(self, user_id: int) -> dict[str, int]:
         """Получить статистику использования пользователем"""
-        count = len(self._user_requests.get(user_id, []))
+        result = await self.rate_limiter.peek(f"user:{user_id}", self.user_limit_per_hour, _HOUR)
+        count = math.ceil(result.count)
         return {
             "requests_used": count,
             "requests_limit": self.user_limit_per_hour,
             "remaining": max(0, self.user_limit_per_hour - count),
-            "reset_in_seconds": 3600,  # Приблизительно
+            "reset_in_seconds": _HOUR,  # Приблизительно
         }
 
-    def get_provider_usage(self, provider: str) -> dict[str, int]:
+    async def get_provider_usage(self, provider: str) -> dict[str, int]:
         """Получить статистику использования провайдера"""
-        count = len(self._provider_requests.get(provider, []))
+        result = await self.rate_limiter.peek(
+            f"provider:{provider}", self.provider_limit_per_minute, _MINUTE
+        )
+        count = math.ceil(result.count)
         return {
             "requests_used": count,
             "requests_limit": self.provider_limit_per_minute,
             "remaining": max(0, self.provider_limit_per_minute - count),
-            "reset_in_seconds": 60,
+            "reset_in_seconds": _MINUTE,
         }
 
 
@@ -1,6 +1,5 @@
 import calendar
-import statistics
-from datetime import UTC, datetime, timedelta
+from datetime import UTC, date, datetime, time, timedelta
 from typing import Any
 
 from sqlalchemy import and_, func
@@ -8,9 +7,16 @@ from sqlalchemy.orm import Session
 
 from app.models.appointment import Appointment
 from app.models.patient import Patient
-from app.models.payment_webhook import PaymentWebhook
 from app.models.service import Service
 from app.models.visit import Visit
+from app.services.analytics_rollup import (
+    parse_visit_hour,
+    queue_facts,
+    revenue_facts,
+    service_facts,
+    visit_facts,
+    wait_percentile,
+)
 from app.services.queue_service import queue_service
 
 
@@ -51,13 +57,9 @@ class AnalyticsService:
     @staticmethod
     def _visit_activity_hour(visit: Visit) -> int:
         """Resolve the most reliable visit hour for analytics."""
-        visit_time = getattr(visit, "visit_time", None)
-        if visit_time:
-            for fmt in ("%H:%M:%S", "%H:%M"):
-                try:
-                    return datetime.strptime(visit_time, fmt).hour
-                except ValueError:
-                    continue
+        hour = parse_visit_hour(getattr(visit, "visit_time", None))
+        if hour is not None:
+            return hour
         created_at = getattr(visit, "created_at", None)
         if created_at:
             return created_at.hour
@@ -71,33 +73,23 @@ class AnalyticsService:
         department: str | None = None,
     ) -> dict[str, Any]:
         """Получение статистики визитов"""
-        visit_date_expr = func.coalesce(Visit.visit_date, func.date(Visit.created_at))
-        query = db.query(Visit).filter(
-            and_(visit_date_expr >= start_date.date(), visit_date_expr <= end_date.date())
-        )
-
-        if department:
-            query = query.filter(Visit.department == department)
-
-        visits = query.all()
-
-        # Общая статистика
-        total_visits = len(visits)
-        completed_visits = len([v for v in visits if v.status == "completed"])
-        cancelled_visits = len([v for v in visits if v.status == "cancelled"])
-        no_show_visits = len([v for v in visits if v.status == "no_show"])
-
-        # Статистика по дням недели
-        day_stats = {}
-        for visit in visits:
-            day_name = calendar.day_name[AnalyticsService._visit_activity_date(visit).weekday()]
-            day_stats[day_name] = day_stats.get(day_name, 0) + 1
-
-        # Статистика по часам
-        hour_stats = {}
-        for visit in visits:
-            hour = AnalyticsService._visit_activity_hour(visit)
-            hour_stats[hour] = hour_stats.get(hour, 0) + 1
+        # Закрытые дни - из дневных агрегатов, остальные - GROUP BY по visits
+        facts = visit_facts(db, start_date.date(), end_date.date(), department)
+
+        total_visits = completed_visits = cancelled_visits = no_show_visits = 0
+        day_stats: dict[str, int] = {}
+        hour_stats: dict[int, int] = {}
+        for fact in facts:
+            total_visits += fact.count
+            if fact.status == "completed":
+                completed_visits += fact.count
+            elif fact.status == "cancelled":
+                cancelled_visits += fact.count
+            elif fact.status == "no_show":
+                no_show_visits += fact.count
+            day_name = calendar.day_name[fact.day.weekday()]
+            day_stats[day_name] = day_stats.get(day_name, 0) + fact.count
+            hour_stats[fact.hour] = hour_stats.get(fact.hour, 0) + fact.count
 
         return {
             "period": {
@@ -213,80 +205,39 @@ class AnalyticsService:
         Расчёт доходов (SSOT).
 
         Получение статистики доходов за период с расширенными метриками.
+        Учитываются платежи кассы (Payment, статус "paid"; при фильтре по
+        отделению - только привязанные к визиту отделения) и успешные
+        онлайн-платежи (PaymentWebhook, статус "success").
         """
-        from app.models.payment import Payment
-
-        # Базовые фильтры для платежей
-        filters = [
-            Payment.created_at >= start_date,
-            Payment.created_at <= end_date,
-            Payment.status == "paid",
-        ]
-
-        # Получаем успешные платежи за период (из PaymentWebhook для онлайн-платежей)
-        webhook_payments = (
-            db.query(PaymentWebhook)
-            .filter(
-                and_(
-                    PaymentWebhook.status == "success",
-                    PaymentWebhook.created_at >= start_date,
-                    PaymentWebhook.created_at <= end_date,
-                )
-            )
-            .all()
-        )
-
-        # Получаем платежи из таблицы Payment
-        payment_query = db.query(Payment).filter(and_(*filters))
-        if department:
-            # Если нужна фильтрация по отделению, нужно связать через Visit
-            from app.models.visit import Visit
-
-            payment_query = payment_query.join(Visit).filter(
-                Visit.department == department
-            )
-
-        payments = payment_query.all()
-
-        # Общий доход из PaymentWebhook (онлайн-платежи)
-        webhook_revenue = sum(float(p.amount) / 100 for p in webhook_payments)
-
-        # Общий доход из Payment (все платежи)
-        payment_revenue = sum(float(p.amount) for p in payments)
+        webhook_revenue = payment_revenue = 0.0
+        total_transactions = 0
+        daily_revenue: dict[str, float] = {}
+        provider_revenue: dict[str, float] = {}
+        method_revenue: dict[str, float] = {}
+
+        for fact in revenue_facts(db, start_date, end_date):
+            amount = float(fact.amount)
+            if fact.source == "webhook":
+                if fact.status != "success":
+                    continue
+                webhook_revenue += amount
+                provider = fact.provider or "unknown"
+                provider_revenue[provider] = provider_revenue.get(provider, 0) + amount
+            else:
+                if fact.status != "paid":
+                    continue
+                if department and fact.department != department:
+                    continue
+                payment_revenue += amount
+                method = fact.method or "cash"
+                method_revenue[method] = method_revenue.get(method, 0) + amount
+            total_transactions += fact.transactions
+            date_str = fact.day.isoformat()
+            daily_revenue[date_str] = daily_revenue.get(date_str, 0) + amount
 
         total_revenue = webhook_revenue + payment_revenue
 
-        # Доходы по дням
-        daily_revenue = {}
-        for payment in webhook_payments:
-            date_str = payment.created_at.strftime("%Y-%m-%d")
-            daily_revenue[date_str] = (
-                daily_revenue.get(date_str, 0) + float(payment.amount) / 100
-            )
-        for payment in payments:
-            date_str = payment.created_at.strftime("%Y-%m-%d")
-            daily_revenue[date_str] = daily_revenue.get(date_str, 0) + float(
-                payment.amount
-            )
-
-        # Доходы по провайдерам (из PaymentWebhook)
-        provider_revenue = {}
-        for payment in webhook_payments:
-            provider = payment.provider or "unknown"
-            provider_revenue[provider] = (
-                provider_revenue.get(provider, 0) + float(payment.amount) / 100
-            )
-
-        # Доходы по методам оплаты (из Payment)
-        method_revenue = {}
-        for payment in payments:
-            method = payment.method or "cash"
-            method_revenue[method] = method_revenue.get(method, 0) + float(
-                payment.amount
-            )
-
         # Средний чек
-        total_transactions = len(webhook_payments) + len(payments)
         avg_check = total_revenue / total_transactions if total_transactions > 0 else 0
 
         # Средний дневной доход
@@ -315,24 +266,14 @@ class AnalyticsService:
         # Получаем все услуги
         services = db.query(Service).all()
 
+        # Сколько раз каждая услуга оказана за период (строки visit_services)
+        usage: dict[int, int] = {}
+        for fact in service_facts(db, start_date.date(), end_date.date()):
+            usage[fact.service_id] = usage.get(fact.service_id, 0) + fact.count
+
         service_stats = {}
         for service in services:
-            # Подсчитываем количество визитов с этой услугой
-            visit_count = (
-                db.query(Visit)
-                .filter(
-                    and_(
-                        func.coalesce(Visit.visit_date, func.date(Visit.created_at))
-                        >= start_date.date(),
-                        func.coalesce(Visit.visit_date, func.date(Visit.created_at))
-                        <= end_date.date(),
-                    )
-                )
-                .join(Visit.services)
-                .filter(Service.id == service.id)
-                .count()
-            )
-
+            visit_count = usage.get(service.id, 0)
             service_stats[service.name] = {
                 "id": service.id,
                 "name": service.name,
@@ -366,70 +307,33 @@ class AnalyticsService:
         department: str | None = None,
     ) -> dict[str, Any]:
         """Получение статистики очередей"""
-        # Импортируем здесь, чтобы избежать циклических импортов
-        from app.models.clinic import Doctor
-        from app.models.online_queue import DailyQueue
-
-        # Получаем статистику очередей
-        queue_query = db.query(DailyQueue).filter(
-            and_(DailyQueue.day >= start_date.date(), DailyQueue.day <= end_date.date())
-        )
-
-        if department:
-            queue_query = queue_query.join(DailyQueue.specialist).filter(
-                Doctor.specialty == department
-            )
-
-        queues = queue_query.all()
-
-        total_queues = len(queues)
-        total_entries = sum(len(q.entries) for q in queues)
-        total_served = sum(
-            sum(1 for entry in q.entries if entry.status == "served") for q in queues
-        )
-        total_waiting = sum(
-            sum(
-                1
-                for entry in q.entries
-                if entry.status in {"waiting", "called", "in_service", "diagnostics"}
-            )
-            for q in queues
-        )
-
-        wait_times: list[float] = []
-        for queue in queues:
-            for entry in queue.entries:
-                reference_time = entry.called_at or entry.created_at
-                if entry.queue_time and reference_time:
-                    wait_times.append(
-                        (reference_time - entry.queue_time).total_seconds() / 60
-                    )
-
-        avg_wait_time_minutes = round(statistics.mean(wait_times), 2) if wait_times else 0.0
+        department_stats: dict[str, dict[str, int]] = {}
+        total_queues = total_entries = total_served = total_waiting = 0
+        wait_sum = 0.0
+        wait_samples = 0
+        wait_histogram: dict[int, int] = {}
+
+        for fact in queue_facts(db, start_date.date(), end_date.date(), department):
+            # Все отделения попадают в отчёт, даже если записей в их очередях нет
+            bucket = department_stats.setdefault(
+                fact.specialty or fact.queue_tag or "Общее",
+                {"total_entries": 0, "served": 0, "waiting": 0},
+            )
+            bucket["total_entries"] += fact.total_entries
+            bucket["served"] += fact.served
+            bucket["waiting"] += fact.waiting
+            total_queues += fact.queue_count
+            total_entries += fact.total_entries
+            total_served += fact.served
+            total_waiting += fact.waiting
+            wait_sum += fact.wait_sum_minutes
+            wait_samples += fact.wait_samples
+            for index, count in fact.wait_histogram.items():
+                wait_histogram[index] = wait_histogram.get(index, 0) + count
+
+        avg_wait_time_minutes = round(wait_sum / wait_samples, 2) if wait_samples else 0.0
         avg_wait_time = f"{avg_wait_time_minutes:.0f} минут" if avg_wait_time_minutes else "0 минут"
 
-        # Статистика по отделениям
-        department_stats = {}
-        for queue in queues:
-            dept = (
-                queue.specialist.specialty
-                if getattr(queue, "specialist", None)
-                and getattr(queue.specialist, "specialty", None)
-                else queue.queue_tag or "Общее"
-            )
-            if dept not in department_stats:
-                department_stats[dept] = {"total_entries": 0, "served": 0, "waiting": 0}
-
-            department_stats[dept]["total_entries"] += len(queue.entries)
-            department_stats[dept]["served"] += sum(
-                1 for entry in queue.entries if entry.status == "served"
-            )
-            department_stats[dept]["waiting"] += sum(
-                1
-                for entry in queue.entries
-                if entry.status in {"waiting", "called", "in_service", "diagnostics"}
-            )
-
         return {
             "period": {
                 "start_date": start_date.isoformat(),
@@ -444,6 +348,11 @@ class AnalyticsService:
             ),
             "average_wait_time_minutes": avg_wait_time_minutes,
             "average_wait_time": avg_wait_time,
+            # Оценка по гистограмме: верхняя граница корзины WAIT_BUCKET_MINUTES
+            "wait_time_percentiles_minutes": {
+                "p50": wait_percentile(wait_histogram, 0.5),
+                "p90": wait_percentile(wait_histogram, 0.9),
+            },
             "by_department": department_stats,
         }
 
@@ -488,50 +397,33 @@ class AnalyticsService:
         end_date = queue_service.get_local_timestamp(db)
         start_date = end_date - timedelta(days=days)
 
-        # Тренд визитов
-        visit_trend = []
-        for i in range(days):
-            date = start_date + timedelta(days=i)
-            next_date = date + timedelta(days=1)
+        first_day = start_date.date()
+        last_day = (start_date + timedelta(days=days - 1)).date()
 
-            visit_count = (
-                db.query(Visit)
-                .filter(
-                    and_(
-                        func.coalesce(Visit.visit_date, func.date(Visit.created_at))
-                        >= date.date(),
-                        func.coalesce(Visit.visit_date, func.date(Visit.created_at))
-                        < next_date.date(),
-                    )
-                )
-                .count()
-            )
+        visits_by_day: dict[date, int] = {}
+        for fact in visit_facts(db, first_day, last_day):
+            visits_by_day[fact.day] = visits_by_day.get(fact.day, 0) + fact.count
 
-            visit_trend.append(
-                {"date": date.strftime("%Y-%m-%d"), "visits": visit_count}
-            )
+        # Выручка - по календарным дням (как подписаны точки графика)
+        revenue_by_day: dict[date, float] = {}
+        for fact in revenue_facts(
+            db,
+            datetime.combine(first_day, time.min),
+            datetime.combine(last_day, time.max),
+        ):
+            if fact.source == "webhook" and fact.status == "success":
+                revenue_by_day[fact.day] = revenue_by_day.get(fact.day, 0) + float(fact.amount)
 
-        # Тренд доходов
+        visit_trend = []
         revenue_trend = []
         for i in range(days):
-            date = start_date + timedelta(days=i)
-            next_date = date + timedelta(days=1)
-
-            daily_revenue = (
-                db.query(PaymentWebhook)
-                .filter(
-                    and_(
-                        PaymentWebhook.status == "success",
-                        PaymentWebhook.created_at >= date,
-                        PaymentWebhook.created_at < next_date,
-                    )
-                )
-                .all()
+            day = first_day + timedelta(days=i)
+            visit_trend.append(
+                {"date": day.strftime("%Y-%m-%d"), "visits": visits_by_day.get(day, 0)}
+            )
+            revenue_trend.append(
+                {"date": day.strftime("%Y-%m-%d"), "revenue": revenue_by_day.get(day, 0)}
             )
-
-            total = sum(float(p.amount) / 100 for p in daily_revenue)
-
-            revenue_trend.append({"date": date.strftime("%Y-%m-%d"), "revenue": total})
 
         return {
             "period_days": days,
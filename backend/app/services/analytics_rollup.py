@@ -0,0 +1,652 @@
+"""
+Дневные агрегаты (rollup) для аналитики и админ-дашбордов.
+
+Одни и те же GROUP BY-агрегаторы (``aggregate_*``) используются и для
+построения дневных таблиц (``rollup_day``), и для чтения "живых" дней, ещё не
+попавших в агрегаты. Функции ``*_facts`` собирают факты за период: закрытые
+дни, для которых есть отметка ``AnalyticsRollupDay``, читаются из таблиц
+агрегатов, остальные (как правило, только сегодняшний день) - из исходных
+таблиц. Время ответа дашборда поэтому не зависит от длины истории.
+
+Агрегаты обновляются фоновой задачей (``refresh_rollups``, arq cron
+``refresh_analytics_rollups``) и заполняются за прошлые периоды через
+``python -m app.scripts.backfill_analytics_rollups``.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import UTC, date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, NamedTuple
+
+from sqlalchemy import Integer, cast, delete, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.models.analytics_rollup import (
+    AnalyticsRollupDay,
+    QueueDailyRollup,
+    RevenueDailyRollup,
+    ServiceDailyRollup,
+    VisitDailyRollup,
+)
+from app.models.clinic import Doctor
+from app.models.online_queue import DailyQueue, OnlineQueueEntry
+from app.models.payment import Payment
+from app.models.payment_webhook import PaymentWebhook
+from app.models.visit import Visit, VisitService
+
+logger = logging.getLogger(__name__)
+
+# Ширина корзины гистограммы ожидания; последняя корзина открыта сверху
+WAIT_BUCKET_MINUTES = 5
+WAIT_BUCKETS = 48
+# Сколько последних закрытых дней пересчитывать при каждом запуске задачи,
+# чтобы учесть поздние правки (смена статуса визита, возврат платежа)
+REFRESH_DAYS = int(os.getenv("ANALYTICS_ROLLUP_REFRESH_DAYS", "3"))
+
+WAITING_STATUSES = frozenset({"waiting", "called", "in_service", "diagnostics"})
+
+
+class VisitFact(NamedTuple):
+    day: date
+    department: str | None
+    doctor_id: int | None
+    status: str | None
+    hour: int
+    count: int
+
+
+class RevenueFact(NamedTuple):
+    day: date | None  # None - свёрнуто по всему периоду (by_day=False)
+    source: str  # payment|webhook
+    status: str | None
+    provider: str | None
+    method: str | None
+    department: str | None
+    amount: Decimal
+    transactions: int
+
+
+class ServiceFact(NamedTuple):
+    day: date
+    service_id: int
+    count: int
+
+
+class QueueFact(NamedTuple):
+    day: date
+    specialty: str | None
+    queue_tag: str | None
+    queue_count: int
+    total_entries: int
+    served: int
+    waiting: int
+    wait_sum_minutes: float
+    wait_samples: int
+    wait_histogram: dict[int, int]
+
+
+def _today() -> date:
+    return datetime.now(UTC).date()
+
+
+def as_date(value: Any) -> date:
+    """Aggregates over DATE()/COALESCE come back as strings on SQLite."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def minutes_between(db: Session, later: Any, earlier: Any) -> Any:
+    """SQL expression for ``later - earlier`` in minutes."""
+    if db.get_bind().dialect.name == "sqlite":
+        return (func.julianday(later) - func.julianday(earlier)) * 1440.0
+    return func.extract("epoch", later - earlier) / 60.0
+
+
+def _wait_bucket(db: Session, minutes: Any) -> Any:
+    # julianday() даёт 39.99999 вместо 40 - сдвигаем на ошибку округления
+    scaled = (minutes + 1e-6) / WAIT_BUCKET_MINUTES
+    if db.get_bind().dialect.name == "sqlite":
+        # CAST отбрасывает дробную часть (в PostgreSQL - округляет)
+        return cast(scaled, Integer)
+    return func.floor(scaled)
+
+
+def parse_visit_hour(visit_time: str | None) -> int | None:
+    if visit_time:
+        for fmt in ("%H:%M:%S", "%H:%M"):
+            try:
+                return datetime.strptime(visit_time, fmt).hour
+            except ValueError:
+                continue
+    return None
+
+
+def wait_percentile(histogram: dict[int, int], fraction: float) -> float:
+    """Перцентиль ожидания (верхняя граница корзины), 0.0 без данных."""
+    total = sum(histogram.values())
+    if not total:
+        return 0.0
+    threshold = total * fraction
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= threshold:
+            return float((bucket + 1) * WAIT_BUCKET_MINUTES)
+    return float(WAIT_BUCKETS * WAIT_BUCKET_MINUTES)
+
+
+# ---------------------------------------------------------------------------
+# Агрегаторы исходных таблиц
+# ---------------------------------------------------------------------------
+
+def _visit_date_expr() -> Any:
+    return func.coalesce(Visit.visit_date, func.date(Visit.created_at))
+
+
+def aggregate_visits(
+    db: Session,
+    first_day: date | None,
+    last_day: date,
+    department: str | None = None,
+) -> list[VisitFact]:
+    """Визиты по (день, отделение, врач, статус, час) из таблицы visits."""
+    visit_date = _visit_date_expr()
+    created_hour = func.extract("hour", Visit.created_at)
+    query = (
+        db.query(
+            visit_date,
+            Visit.department,
+            Visit.doctor_id,
+            Visit.status,
+            Visit.visit_time,
+            created_hour,
+            func.count(Visit.id),
+        )
+        .filter(visit_date <= last_day)
+        .group_by(
+            visit_date,
+            Visit.department,
+            Visit.doctor_id,
+            Visit.status,
+            Visit.visit_time,
+            created_hour,
+        )
+    )
+    if first_day is not None:
+        query = query.filter(visit_date >= first_day)
+    if department:
+        query = query.filter(Visit.department == department)
+
+    # visit_time - строка; час из неё (или из created_at) считаем так же,
+    # как AnalyticsService._visit_activity_hour
+    counts: dict[tuple, int] = defaultdict(int)
+    for day, dept, doctor_id, status, visit_time, hour_created, count in query.all():
+        hour = parse_visit_hour(visit_time)
+        if hour is None:
+            hour = int(hour_created) if hour_created is not None else 0
+        counts[(as_date(day), dept, doctor_id, status, hour)] += count
+    return [VisitFact(*key, count) for key, count in counts.items()]
+
+
+def aggregate_revenue(
+    db: Session,
+    start: datetime | None,
+    end: datetime,
+    *,
+    by_day: bool = True,
+) -> list[RevenueFact]:
+    """Выручка из payments и payment_webhooks за [start, end]."""
+    facts: list[RevenueFact] = []
+
+    payment_day = func.date(Payment.created_at)
+    payment_dims = [Payment.status, Payment.provider, Payment.method, Visit.department]
+    payment_query = (
+        db.query(
+            *([payment_day] if by_day else []),
+            *payment_dims,
+            func.coalesce(func.sum(Payment.amount), 0),
+            func.count(Payment.id),
+        )
+        .select_from(Payment)
+        .outerjoin(Visit, Payment.visit_id == Visit.id)
+        .filter(Payment.created_at <= end)
+        .group_by(*([payment_day] if by_day else []), *payment_dims)
+    )
+    if start is not None:
+        payment_query = payment_query.filter(Payment.created_at >= start)
+    for row in payment_query.all():
+        day = as_date(row[0]) if by_day else None
+        status, provider, method, department, amount, count = row[1:] if by_day else row
+        facts.append(
+            RevenueFact(
+                day, "payment", status, provider, method, department,
+                Decimal(str(amount)), count,
+            )
+        )
+
+    webhook_day = func.date(PaymentWebhook.created_at)
+    webhook_dims = [PaymentWebhook.status, PaymentWebhook.provider]
+    webhook_query = (
+        db.query(
+            *([webhook_day] if by_day else []),
+            *webhook_dims,
+            func.coalesce(func.sum(PaymentWebhook.amount), 0),
+            func.count(PaymentWebhook.id),
+        )
+        .filter(PaymentWebhook.created_at <= end)
+        .group_by(*([webhook_day] if by_day else []), *webhook_dims)
+    )
+    if start is not None:
+        webhook_query = webhook_query.filter(PaymentWebhook.created_at >= start)
+    for row in webhook_query.all():
+        day = as_date(row[0]) if by_day else None
+        status, provider, amount_tiyin, count = row[1:] if by_day else row
+        facts.append(
+            RevenueFact(
+                day, "webhook", status, provider, None, None,
+                Decimal(int(amount_tiyin)) / 100, count,
+            )
+        )
+    return facts
+
+
+def aggregate_services(
+    db: Session, first_day: date | None, last_day: date
+) -> list[ServiceFact]:
+    """Оказанные услуги (строки visit_services) по дню визита."""
+    visit_date = _visit_date_expr()
+    query = (
+        db.query(visit_date, VisitService.service_id, func.count(VisitService.id))
+        .join(Visit, VisitService.visit_id == Visit.id)
+        .filter(visit_date <= last_day)
+        .group_by(visit_date, VisitService.service_id)
+    )
+    if first_day is not None:
+        query = query.filter(visit_date >= first_day)
+    return [
+        ServiceFact(as_date(day), service_id, count)
+        for day, service_id, count in query.all()
+    ]
+
+
+def aggregate_queues(
+    db: Session,
+    first_day: date | None,
+    last_day: date,
+    department: str | None = None,
+) -> list[QueueFact]:
+    """Очереди по (день, специальность врача, тег очереди)."""
+    filters = [DailyQueue.day <= last_day]
+    if first_day is not None:
+        filters.append(DailyQueue.day >= first_day)
+    if department:
+        filters.append(Doctor.specialty == department)
+    group = [DailyQueue.day, Doctor.specialty, DailyQueue.queue_tag]
+
+    def _entries_query(*columns: Any) -> Any:
+        return (
+            db.query(*group, *columns)
+            .select_from(OnlineQueueEntry)
+            .join(DailyQueue, OnlineQueueEntry.queue_id == DailyQueue.id)
+            .outerjoin(Doctor, DailyQueue.specialist_id == Doctor.id)
+            .filter(*filters)
+        )
+
+    buckets: dict[tuple, dict[str, Any]] = {}
+
+    def _bucket(day: Any, specialty: str | None, queue_tag: str | None) -> dict[str, Any]:
+        return buckets.setdefault(
+            (as_date(day), specialty, queue_tag),
+            {
+                "queue_count": 0, "total_entries": 0, "served": 0, "waiting": 0,
+                "wait_sum_minutes": 0.0, "wait_samples": 0, "wait_histogram": {},
+            },
+        )
+
+    # Очереди без записей тоже попадают в отчёт
+    for day, specialty, queue_tag, queue_count in (
+        db.query(*group, func.count(DailyQueue.id))
+        .select_from(DailyQueue)
+        .outerjoin(Doctor, DailyQueue.specialist_id == Doctor.id)
+        .filter(*filters)
+        .group_by(*group)
+        .all()
+    ):
+        _bucket(day, specialty, queue_tag)["queue_count"] += queue_count
+
+    for day, specialty, queue_tag, status, count in (
+        _entries_query(OnlineQueueEntry.status, func.count(OnlineQueueEntry.id))
+        .group_by(*group, OnlineQueueEntry.status)
+        .all()
+    ):
+        bucket = _bucket(day, specialty, queue_tag)
+        bucket["total_entries"] += count
+        if status == "served":
+            bucket["served"] += count
+        elif status in WAITING_STATUSES:
+            bucket["waiting"] += count
+
+    reference_time = func.coalesce(OnlineQueueEntry.called_at, OnlineQueueEntry.created_at)
+    wait_minutes = minutes_between(db, reference_time, OnlineQueueEntry.queue_time)
+    wait_bucket = _wait_bucket(db, wait_minutes)
+    for day, specialty, queue_tag, wait_bucket_value, wait_sum, samples in (
+        _entries_query(wait_bucket, func.sum(wait_minutes), func.count(OnlineQueueEntry.id))
+        .filter(
+            OnlineQueueEntry.queue_time.is_not(None),
+            reference_time.is_not(None),
+        )
+        .group_by(*group, wait_bucket)
+        .all()
+    ):
+        bucket = _bucket(day, specialty, queue_tag)
+        bucket["wait_sum_minutes"] += float(wait_sum or 0.0)
+        bucket["wait_samples"] += samples
+        index = min(max(int(wait_bucket_value or 0), 0), WAIT_BUCKETS - 1)
+        histogram = bucket["wait_histogram"]
+        histogram[index] = histogram.get(index, 0) + samples
+
+    return [QueueFact(*key, **values) for key, values in buckets.items()]
+
+
+# ---------------------------------------------------------------------------
+# Чтение фактов за период: агрегаты для закрытых дней + сырые данные
+# ---------------------------------------------------------------------------
+
+def _plan(
+    db: Session,
+    first_day: date | None,
+    last_day: date,
+    *,
+    skip_days: Iterable[date] = (),
+) -> tuple[tuple[date, date] | None, list[tuple[date | None, date]]]:
+    """Разбить период на диапазон дней из агрегатов и диапазоны для сырых данных.
+
+    Возвращает ``(rolled, raw)``: ``rolled`` - (min, max) дней с готовыми
+    агрегатами (строки агрегатов существуют только для таких дней), ``raw`` -
+    непрерывные диапазоны остальных дней; ``None`` в начале диапазона -
+    "с начала истории".
+    """
+    closed_last = min(last_day, _today() - timedelta(days=1))
+    rolled_days: list[date] = []
+    if first_day is None or first_day <= closed_last:
+        query = select(AnalyticsRollupDay.day).where(AnalyticsRollupDay.day <= closed_last)
+        if first_day is not None:
+            query = query.where(AnalyticsRollupDay.day >= first_day)
+        excluded = set(skip_days)
+        rolled_days = sorted(
+            as_date(day)
+            for day in db.execute(query.order_by(AnalyticsRollupDay.day)).scalars()
+            if as_date(day) not in excluded
+        )
+
+    raw: list[tuple[date | None, date]] = []
+    cursor = first_day
+    for day in rolled_days:
+        if cursor is None or cursor < day:
+            raw.append((cursor, day - timedelta(days=1)))
+        cursor = day + timedelta(days=1)
+    if cursor is None or cursor <= last_day:
+        raw.append((cursor, last_day))
+
+    rolled = (rolled_days[0], rolled_days[-1]) if rolled_days else None
+    return rolled, raw
+
+
+def visit_facts(
+    db: Session, first_day: date, last_day: date, department: str | None = None
+) -> list[VisitFact]:
+    rolled, raw = _plan(db, first_day, last_day)
+    facts: list[VisitFact] = []
+    if rolled:
+        query = select(
+            VisitDailyRollup.day,
+            VisitDailyRollup.department,
+            VisitDailyRollup.doctor_id,
+            VisitDailyRollup.status,
+            VisitDailyRollup.hour,
+            VisitDailyRollup.visit_count,
+        ).where(VisitDailyRollup.day.between(*rolled))
+        if department:
+            query = query.where(VisitDailyRollup.department == department)
+        facts.extend(
+            VisitFact(as_date(row[0]), *row[1:]) for row in db.execute(query).all()
+        )
+    for raw_first, raw_last in raw:
+        facts.extend(aggregate_visits(db, raw_first, raw_last, department))
+    return facts
+
+
+def _naive(value: datetime) -> datetime:
+    return value.replace(tzinfo=None) if value.tzinfo else value
+
+
+def revenue_facts(
+    db: Session,
+    start: datetime | None,
+    end: datetime,
+    *,
+    by_day: bool = True,
+) -> list[RevenueFact]:
+    """Выручка за [start, end]; ``start=None`` - за всю историю.
+
+    Граничные дни, покрытые периодом не целиком, читаются из сырых таблиц с
+    точными границами.
+    """
+    first_day = start.date() if start is not None else None
+    last_day = end.date()
+    partial: list[date] = []
+    if start is not None and _naive(start) > datetime.combine(first_day, time.min):
+        partial.append(first_day)
+    if _naive(end) < datetime.combine(last_day, time.max):
+        partial.append(last_day)
+    rolled, raw = _plan(db, first_day, last_day, skip_days=partial)
+
+    facts: list[RevenueFact] = []
+    if rolled:
+        dims = [
+            RevenueDailyRollup.source,
+            RevenueDailyRollup.status,
+            RevenueDailyRollup.provider,
+            RevenueDailyRollup.method,
+            RevenueDailyRollup.department,
+        ]
+        group = [RevenueDailyRollup.day, *dims] if by_day else dims
+        query = (
+            select(
+                *group,
+                func.sum(RevenueDailyRollup.amount),
+                func.sum(RevenueDailyRollup.transactions),
+            )
+            .where(RevenueDailyRollup.day.between(*rolled))
+            .group_by(*group)
+        )
+        for row in db.execute(query).all():
+            day = as_date(row[0]) if by_day else None
+            source, status, provider, method, department, amount, count = (
+                row[1:] if by_day else row
+            )
+            facts.append(
+                RevenueFact(
+                    day, source, status, provider, method, department,
+                    Decimal(str(amount)), int(count),
+                )
+            )
+
+    for raw_first, raw_last in raw:
+        raw_start = datetime.combine(raw_first, time.min) if raw_first else None
+        if start is not None and (raw_start is None or _naive(start) > raw_start):
+            raw_start = start
+        raw_end = datetime.combine(raw_last, time.max)
+        if _naive(end) < raw_end:
+            raw_end = end
+        facts.extend(aggregate_revenue(db, raw_start, raw_end, by_day=by_day))
+    return facts
+
+
+def service_facts(db: Session, first_day: date, last_day: date) -> list[ServiceFact]:
+    rolled, raw = _plan(db, first_day, last_day)
+    facts: list[ServiceFact] = []
+    if rolled:
+        query = select(
+            ServiceDailyRollup.day,
+            ServiceDailyRollup.service_id,
+            ServiceDailyRollup.visit_count,
+        ).where(ServiceDailyRollup.day.between(*rolled))
+        facts.extend(
+            ServiceFact(as_date(day), service_id, count)
+            for day, service_id, count in db.execute(query).all()
+        )
+    for raw_first, raw_last in raw:
+        facts.extend(aggregate_services(db, raw_first, raw_last))
+    return facts
+
+
+def queue_facts(
+    db: Session, first_day: date, last_day: date, department: str | None = None
+) -> list[QueueFact]:
+    rolled, raw = _plan(db, first_day, last_day)
+    facts: list[QueueFact] = []
+    if rolled:
+        query = select(QueueDailyRollup).where(QueueDailyRollup.day.between(*rolled))
+        if department:
+            query = query.where(QueueDailyRollup.specialty == department)
+        for row in db.execute(query).scalars():
+            facts.append(
+                QueueFact(
+                    as_date(row.day),
+                    row.specialty,
+                    row.queue_tag,
+                    row.queue_count,
+                    row.total_entries,
+                    row.served,
+                    row.waiting,
+                    row.wait_sum_minutes,
+                    row.wait_samples,
+                    {int(k): v for k, v in (row.wait_histogram or {}).items()},
+                )
+            )
+    for raw_first, raw_last in raw:
+        facts.extend(aggregate_queues(db, raw_first, raw_last, department))
+    return facts
+
+
+# ---------------------------------------------------------------------------
+# Построение агрегатов
+# ---------------------------------------------------------------------------
+
+_FACT_MODELS = (VisitDailyRollup, RevenueDailyRollup, ServiceDailyRollup, QueueDailyRollup)
+
+
+def rollup_day(db: Session, day: date) -> dict[str, Any]:
+    """Пересчитать все дневные агрегаты за ``day`` (без commit).
+
+    Отметка дня пишется первой: параллельный пересчёт того же дня
+    блокируется на ней и завершится ошибкой уникальности, а не задвоит строки.
+    """
+    db.execute(delete(AnalyticsRollupDay).where(AnalyticsRollupDay.day == day))
+    db.execute(insert(AnalyticsRollupDay).values(day=day, rolled_up_at=datetime.now(UTC)))
+    for model in _FACT_MODELS:
+        db.execute(delete(model).where(model.day == day))
+
+    visits = aggregate_visits(db, day, day)
+    revenue = aggregate_revenue(
+        db, datetime.combine(day, time.min), datetime.combine(day, time.max)
+    )
+    services = aggregate_services(db, day, day)
+    queues = aggregate_queues(db, day, day)
+
+    if visits:
+        db.execute(
+            insert(VisitDailyRollup),
+            [
+                {
+                    "day": fact.day,
+                    "department": fact.department,
+                    "doctor_id": fact.doctor_id,
+                    "status": fact.status,
+                    "hour": fact.hour,
+                    "visit_count": fact.count,
+                }
+                for fact in visits
+            ],
+        )
+    if revenue:
+        db.execute(
+            insert(RevenueDailyRollup),
+            [fact._asdict() for fact in revenue],
+        )
+    if services:
+        db.execute(
+            insert(ServiceDailyRollup),
+            [
+                {"day": fact.day, "service_id": fact.service_id, "visit_count": fact.count}
+                for fact in services
+            ],
+        )
+    if queues:
+        db.execute(
+            insert(QueueDailyRollup),
+            [
+                {
+                    **fact._asdict(),
+                    "wait_histogram": {str(k): v for k, v in fact.wait_histogram.items()},
+                }
+                for fact in queues
+            ],
+        )
+
+    return {
+        "day": day.isoformat(),
+        "visits": len(visits),
+        "revenue": len(revenue),
+        "services": len(services),
+        "queues": len(queues),
+    }
+
+
+def backfill_rollups(
+    db: Session, first_day: date, last_day: date
+) -> list[dict[str, Any]]:
+    """Пересчитать агрегаты за диапазон закрытых дней, commit после каждого дня."""
+    last_day = min(last_day, _today() - timedelta(days=1))
+    results = []
+    day = first_day
+    while day <= last_day:
+        try:
+            results.append(rollup_day(db, day))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        day += timedelta(days=1)
+    return results
+
+
+def refresh_rollups(
+    db: Session, *, refresh_days: int | None = None
+) -> list[dict[str, Any]]:
+    """Инкрементальное обновление: новые закрытые дни + последние ``refresh_days``.
+
+    Если задача не запускалась несколько дней, пропущенные дни тоже будут
+    посчитаны (начиная со дня после последнего агрегата).
+    """
+    refresh_days = REFRESH_DAYS if refresh_days is None else refresh_days
+    last_closed = _today() - timedelta(days=1)
+    first_day = last_closed - timedelta(days=max(refresh_days, 1) - 1)
+    latest = db.execute(select(func.max(AnalyticsRollupDay.day))).scalar()
+    if latest is not None:
+        first_day = min(first_day, as_date(latest) + timedelta(days=1))
+    results = backfill_rollups(db, first_day, last_closed)
+    logger.info(
+        "analytics.rollup.refresh days=%s first=%s last=%s",
+        len(results), first_day.isoformat(), last_closed.isoformat(),
+    )
+    return results
@@ -0,0 +1,103 @@
+"""Caching of the clinic catalogue (departments, doctors, services, specialties).
+
+Every registrar screen loads the same catalogue payloads. They are cached
+with ``app.core.cache.cached`` under the ``CacheTags`` of the data they are
+built from, and invalidated automatically: an ORM listener collects the
+tags of catalogue rows touched in a session and bumps them once the
+transaction commits, so no write path has to remember to invalidate.
+
+The bump only reaches other uvicorn workers through a shared backend
+(CACHE_BACKEND=redis or tiered). With the per-process memory cache entries
+live just a few seconds, so an admin edit shows up everywhere almost at once.
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Any
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.core import cache
+from app.core.cache import CacheTags
+from app.core.roles import is_doctor_role
+from app.models.clinic import Doctor, Schedule, ServiceCategory
+from app.models.department import (
+    Department,
+    DepartmentQueueSettings,
+    DepartmentService,
+)
+from app.models.service import Service
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+CATALOGUE_CACHE_TTL_SECONDS = 300 if cache.cache_manager.is_shared else 5
+
+# Model -> tags of catalogue payloads built from it.
+_MODEL_TAGS: dict[type, tuple[str, ...]] = {
+    Department: (CacheTags.DEPARTMENT,),
+    DepartmentQueueSettings: (CacheTags.DEPARTMENT,),
+    DepartmentService: (CacheTags.DEPARTMENT, CacheTags.SERVICE),
+    Doctor: (CacheTags.DOCTOR,),
+    Schedule: (CacheTags.DOCTOR,),
+    Service: (CacheTags.SERVICE,),
+    ServiceCategory: (CacheTags.SERVICE,),
+}
+
+# Doctor payloads embed the linked user's name and username.
+_DOCTOR_USER_FIELDS = ("full_name", "username")
+
+_PENDING_TAGS_KEY = "catalogue_cache_tags"
+
+
+def catalogue_key(name: str, **params: Any) -> str:
+    """Cache key for a catalogue payload, e.g. ``clinic:departments:active_only=True``."""
+    suffix = ",".join(f"{k}={v}" for k, v in sorted(params.items()))
+    return f"{name}:{suffix}" if suffix else name
+
+
+def _user_tags(user: User, deleted: bool) -> tuple[str, ...]:
+    """Only a doctor's name change (or removal) touches doctor payloads."""
+    if not is_doctor_role(user.role):
+        return ()
+    if deleted:
+        return (CacheTags.DOCTOR,)
+    state = inspect(user)
+    if any(state.attrs[field].history.has_changes() for field in _DOCTOR_USER_FIELDS):
+        return (CacheTags.DOCTOR,)
+    return ()
+
+
+def _collect_tags(session: Session, flush_context: Any) -> None:
+    pending: set[str] | None = None
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if type(instance) is User:
+            # New users are not linked to a Doctor row yet
+            if instance in session.new:
+                continue
+            tags = _user_tags(instance, instance in session.deleted)
+        else:
+            tags = _MODEL_TAGS.get(type(instance))
+        if tags:
+            if pending is None:
+                pending = session.info.setdefault(_PENDING_TAGS_KEY, set())
+            pending.update(tags)
+
+
+def _bump_committed_tags(session: Session) -> None:
+    tags = session.info.pop(_PENDING_TAGS_KEY, None)
+    if not tags:
+        return
+    try:
+        cache.cache_manager.invalidate_tags(*sorted(tags))
+    except Exception:
+        logger.exception("Catalogue cache invalidation failed: tags=%s", tags)
+
+
+if not event.contains(Session, "after_flush", _collect_tags):
+    event.listen(Session, "after_flush", _collect_tags)
+    # Tags left over from a rolled back flush are bumped on the next
+    # commit; over-invalidating is harmless, missing a bump is not.
+    event.listen(Session, "after_commit", _bump_committed_tags)
@@ -0,0 +1,369 @@
+"""
+Кэш состояния дневных очередей для табло.
+
+Состояние каждой ``DailyQueue`` хранится в памяти вместе с номером версии.
+Обновление читает из БД только изменившиеся записи (в пуле потоков, чтобы
+не блокировать event loop) и отдаёт табло дифф ``queue_diff``; периодически
+вместо диффа отправляется полный снимок ``queue_update``. Табло, у которого
+``base_version`` диффа не совпадает с его версией, запрашивает снимок
+(``queue_resync``).
+
+Версия локальна для процесса: табло получает сообщения очереди только от
+своего воркера. Другие воркеры получают полное состояние очереди
+(``export``) и вливают его в свой кэш (``adopt``), отдавая своим табло
+дифф со своей версией. Периодический снимок и ресинхронизация перечитывают
+очередь из БД целиком, так что расхождение кэшей не живёт дольше
+SNAPSHOT_INTERVAL_SECONDS. Очереди прошлых дней и закрытые очереди
+вытесняются из кэша.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from starlette.concurrency import run_in_threadpool
+
+from app.db.session import SessionLocal
+from app.models.clinic import Doctor
+from app.models.online_queue import DailyQueue, OnlineQueueEntry
+
+logger = logging.getLogger(__name__)
+
+# Полный снимок отправляется не реже, чем раз в N диффов / секунд
+SNAPSHOT_EVERY_DIFFS = int(os.getenv("DISPLAY_QUEUE_SNAPSHOT_EVERY_DIFFS", "50"))
+SNAPSHOT_INTERVAL_SECONDS = float(
+    os.getenv("DISPLAY_QUEUE_SNAPSHOT_INTERVAL_SECONDS", "60")
+)
+
+_STAT_STATUSES = ("waiting", "called", "served")
+
+_ENTRY_COLUMNS = (
+    OnlineQueueEntry.id,
+    OnlineQueueEntry.number,
+    OnlineQueueEntry.patient_name,
+    OnlineQueueEntry.status,
+    OnlineQueueEntry.source,
+    OnlineQueueEntry.created_at,
+    OnlineQueueEntry.called_at,
+)
+
+
+@dataclass
+class QueueState:
+    """Последнее отправленное табло состояние одной дневной очереди."""
+
+    queue_id: int
+    header: dict[str, Any]
+    entries: dict[int, dict[str, Any]]
+    version: int = 0
+    # Очередь закрыта (DailyQueue.active = False) - вытесняется из кэша
+    closed: bool = False
+    status_counts: Counter = field(default_factory=Counter)
+    diffs_since_snapshot: int = 0
+    snapshot_at: float = 0.0
+
+    def __post_init__(self) -> None:
+        self.status_counts = Counter(row["status"] for row in self.entries.values())
+
+    def apply(self, entry_id: int, row: dict[str, Any] | None) -> dict[str, Any] | None:
+        """Применить новое значение записи; вернуть изменение или None."""
+        old = self.entries.get(entry_id)
+        if old == row:
+            return None
+        if old is not None:
+            self.status_counts[old["status"]] -= 1
+        if row is None:
+            del self.entries[entry_id]
+            return {"op": "remove", "id": entry_id, "number": old["number"]}
+        self.entries[entry_id] = row
+        self.status_counts[row["status"]] += 1
+        return {"op": "upsert", "entry": row}
+
+    def day(self) -> date:
+        return date.fromisoformat(self.header["queue_date"])
+
+    def export(self) -> dict[str, Any]:
+        """Полное состояние для других воркеров (см. DailyQueueStateCache.adopt)."""
+        return {
+            "queue_id": self.queue_id,
+            "header": self.header,
+            "entries": list(self.entries.values()),
+            "closed": self.closed,
+        }
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "total": len(self.entries),
+            **{status: self.status_counts[status] for status in _STAT_STATUSES},
+        }
+
+    def snapshot_message(self, event_type: str | None = None) -> dict[str, Any]:
+        return {
+            "type": "queue_update",
+            **({"event_type": event_type} if event_type else {}),
+            "data": {
+                **self.header,
+                "queue_id": self.queue_id,
+                "version": self.version,
+                "snapshot": True,
+                "queue_entries": sorted(
+                    self.entries.values(), key=lambda row: row["number"]
+                ),
+                "stats": self.stats(),
+            },
+        }
+
+
+class DailyQueueStateCache:
+    """Версионированные состояния очередей и построение сообщений для табло."""
+
+    def __init__(self, format_name: Callable[[str], str]) -> None:
+        self._format_name = format_name
+        self._states: dict[int, QueueState] = {}
+        self._locks: dict[int, asyncio.Lock] = {}
+
+    def get(self, queue_id: int) -> QueueState | None:
+        return self._states.get(queue_id)
+
+    def export(self, queue_id: int) -> dict[str, Any] | None:
+        state = self._states.get(queue_id)
+        return state.export() if state is not None else None
+
+    def forget(self, queue_id: int) -> None:
+        self._states.pop(queue_id, None)
+        self._locks.pop(queue_id, None)
+
+    def evict_stale(self, today: date | None = None) -> int:
+        """Вытеснить закрытые очереди и очереди прошлых дней."""
+        today = today or date.today()
+        stale = [
+            queue_id
+            for queue_id, state in self._states.items()
+            if (state.closed or state.day() < today)
+            and not self._lock(queue_id).locked()
+        ]
+        for queue_id in stale:
+            self.forget(queue_id)
+        return len(stale)
+
+    def _lock(self, queue_id: int) -> asyncio.Lock:
+        return self._locks.setdefault(queue_id, asyncio.Lock())
+
+    async def build_update(
+        self,
+        queue_id: int,
+        event_type: str | None = None,
+        changed_entry_ids: Iterable[int] | None = None,
+    ) -> dict[str, Any] | None:
+        """Обновить кэш очереди и вернуть сообщение для табло.
+
+        ``changed_entry_ids`` ограничивает чтение из БД этими записями; без
+        него очередь перечитывается целиком, но табло всё равно получает
+        только дифф. Возвращает None, если видимых изменений нет.
+        """
+        self.evict_stale()
+        async with self._lock(queue_id):
+            state = self._states.get(queue_id)
+            now = time.monotonic()
+
+            if state is None:
+                state = await self._load_state(queue_id)
+                if state is None:
+                    return None
+                return self._snapshot(state, now, event_type)
+
+            snapshot_due = (
+                state.diffs_since_snapshot >= SNAPSHOT_EVERY_DIFFS
+                or now - state.snapshot_at >= SNAPSHOT_INTERVAL_SECONDS
+            )
+            if snapshot_due:
+                # Периодический снимок строится из БД, а не из кэша
+                if not await self._reload_state(state):
+                    return None
+                state.version += 1
+                return self._snapshot(state, now, event_type)
+
+            ids = None if changed_entry_ids is None else set(changed_entry_ids)
+            rows = await run_in_threadpool(self._load_rows, queue_id, ids)
+            return self._diff(state, rows, ids, event_type)
+
+    async def adopt(
+        self, exported: dict[str, Any], event_type: str | None = None
+    ) -> dict[str, Any] | None:
+        """Влить состояние очереди от другого воркера.
+
+        Возвращает сообщение для своих табло в своей нумерации версий
+        (снимок для неизвестной очереди, иначе дифф) или None.
+        """
+        self.evict_stale()
+        queue_id = exported["queue_id"]
+        async with self._lock(queue_id):
+            rows = {row["id"]: row for row in exported["entries"]}
+            state = self._states.get(queue_id)
+            if state is None:
+                state = QueueState(
+                    queue_id=queue_id,
+                    header=exported["header"],
+                    entries=rows,
+                    version=1,
+                    closed=exported.get("closed", False),
+                )
+                self._states[queue_id] = state
+                return self._snapshot(state, time.monotonic(), event_type)
+
+            state.closed = exported.get("closed", False)
+            if state.header != exported["header"]:
+                state.header = exported["header"]
+                state.version += 1
+                return self._snapshot(state, time.monotonic(), event_type)
+            return self._diff(state, rows, None, event_type)
+
+    async def snapshot(self, queue_id: int) -> dict[str, Any] | None:
+        """Полный снимок для ресинхронизации одного табло (перечитывается из БД)."""
+        async with self._lock(queue_id):
+            state = self._states.get(queue_id)
+            if state is None:
+                state = await self._load_state(queue_id)
+                if state is None:
+                    return None
+                self._snapshot(state, time.monotonic())
+            else:
+                entries_before = dict(state.entries)
+                if not await self._reload_state(state):
+                    return None
+                if state.entries != entries_before:
+                    # Кэш разошёлся с БД: новая версия, остальные табло
+                    # ресинхронизируются на следующем диффе
+                    state.version += 1
+            return state.snapshot_message()
+
+    def _diff(
+        self,
+        state: QueueState,
+        rows: dict[int, dict[str, Any]],
+        ids: set[int] | None,
+        event_type: str | None,
+    ) -> dict[str, Any] | None:
+        if ids is None:
+            ids = set(state.entries) | set(rows)
+
+        changes = [
+            change
+            for entry_id in sorted(ids)
+            if (change := state.apply(entry_id, rows.get(entry_id))) is not None
+        ]
+        if not changes:
+            return None
+
+        state.version += 1
+        state.diffs_since_snapshot += 1
+        return {
+            "type": "queue_diff",
+            **({"event_type": event_type} if event_type else {}),
+            "data": {
+                "queue_id": state.queue_id,
+                "version": state.version,
+                "base_version": state.version - 1,
+                "changes": changes,
+                "stats": state.stats(),
+            },
+        }
+
+    def _snapshot(
+        self, state: QueueState, now: float, event_type: str | None = None
+    ) -> dict[str, Any]:
+        state.diffs_since_snapshot = 0
+        state.snapshot_at = now
+        return state.snapshot_message(event_type)
+
+    async def _load_state(self, queue_id: int) -> QueueState | None:
+        loaded = await run_in_threadpool(self._load_full, queue_id)
+        if loaded is None:
+            return None
+        header, rows, closed = loaded
+        state = QueueState(
+            queue_id=queue_id, header=header, entries=rows, version=1, closed=closed
+        )
+        self._states[queue_id] = state
+        return state
+
+    async def _reload_state(self, state: QueueState) -> bool:
+        """Перечитать очередь из БД в ``state``; False - очереди больше нет."""
+        loaded = await run_in_threadpool(self._load_full, state.queue_id)
+        if loaded is None:
+            self._states.pop(state.queue_id, None)
+            return False
+        state.header, state.entries, state.closed = loaded
+        state.status_counts = Counter(row["status"] for row in state.entries.values())
+        return True
+
+    def _row(self, entry: Any) -> dict[str, Any]:
+        return {
+            "id": entry.id,
+            "number": entry.number,
+            "patient_name": self._format_name(entry.patient_name),
+            "status": entry.status,
+            "source": entry.source,
+            "created_at": entry.created_at.isoformat() if entry.created_at else None,
+            "called_at": entry.called_at.isoformat() if entry.called_at else None,
+        }
+
+    def _load_rows(
+        self, queue_id: int, entry_ids: set[int] | None
+    ) -> dict[int, dict[str, Any]]:
+        query = select(*_ENTRY_COLUMNS).where(OnlineQueueEntry.queue_id == queue_id)
+        if entry_ids is not None:
+            if not entry_ids:
+                return {}
+            query = query.where(OnlineQueueEntry.id.in_(entry_ids))
+        db = SessionLocal()
+        try:
+            return {row.id: self._row(row) for row in db.execute(query)}
+        finally:
+            db.close()
+
+    def _load_full(
+        self, queue_id: int
+    ) -> tuple[dict[str, Any], dict[int, dict[str, Any]], bool] | None:
+        db = SessionLocal()
+        try:
+            daily_queue = db.execute(
+                select(DailyQueue)
+                .options(joinedload(DailyQueue.specialist).joinedload(Doctor.user))
+                .where(DailyQueue.id == queue_id)
+            ).scalar_one_or_none()
+            if daily_queue is None:
+                return None
+            specialist = daily_queue.specialist
+            header = {
+                "doctor_name": (
+                    specialist.user.full_name
+                    if specialist and specialist.user
+                    else "Врач"
+                ),
+                "specialty": specialist.specialty if specialist else "Специалист",
+                "cabinet": specialist.cabinet if specialist else None,
+                "queue_date": daily_queue.day.isoformat(),
+                "opened_at": (
+                    daily_queue.opened_at.isoformat() if daily_queue.opened_at else None
+                ),
+            }
+            rows = {
+                row.id: self._row(row)
+                for row in db.execute(
+                    select(*_ENTRY_COLUMNS).where(OnlineQueueEntry.queue_id == queue_id)
+                )
+            }
+            return header, rows, not daily_queue.active
+        finally:
+            db.close()
@@ -7,6 +7,8 @@ import asyncio
 import json
 import logging
 import os
+import weakref
+from collections import deque
 from datetime import UTC, datetime
 from typing import Any
 
@@ -14,11 +16,70 @@ from fastapi import WebSocket, WebSocketDisconnect
 
 from app.db.session import SessionLocal
 from app.models.online_queue import DailyQueue, OnlineQueueEntry
+from app.services.display_queue_state import DailyQueueStateCache
 from app.services.ws_redis_pubsub import RedisPubSubBridge
 
 logger = logging.getLogger(__name__)
 
 
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+# Максимальное время одной отправки на табло; дольше - табло считается зависшим
+SEND_TIMEOUT_SECONDS = _env_float("DISPLAY_WS_SEND_TIMEOUT_SECONDS", 5.0)
+# Сообщений в очереди одного соединения, после которых оно отключается
+MAX_PENDING_MESSAGES = int(_env_float("DISPLAY_WS_MAX_PENDING_MESSAGES", 32))
+# Сколько broadcast ждёт быстрые табло перед возвратом (медленные дочитают в фоне)
+BROADCAST_WAIT_SECONDS = _env_float("DISPLAY_WS_BROADCAST_WAIT_SECONDS", 0.25)
+# Канал pub/sub с полным состоянием очередей между воркерами
+QUEUE_STATE_CHANNEL = "queue_state"
+
+
+class _ConnectionOutbox:
+    """Ограниченная исходящая очередь одного WebSocket.
+
+    Сообщения отправляются строго по порядку одним drain-циклом; переполнение
+    очереди или таймаут отправки помечают соединение как отстающее.
+    """
+
+    __slots__ = ("websocket", "pending", "draining", "dead")
+
+    def __init__(self, websocket: WebSocket) -> None:
+        self.websocket = websocket
+        self.pending: deque[str] = deque()
+        self.draining = False
+        self.dead = False
+
+    def offer(self, text: str) -> bool:
+        if self.dead or len(self.pending) >= MAX_PENDING_MESSAGES:
+            return False
+        self.pending.append(text)
+        return True
+
+    async def drain(self) -> bool:
+        """Отправить всё из очереди; False - соединение нужно закрыть."""
+        self.draining = True
+        try:
+            while self.pending:
+                text = self.pending.popleft()
+                async with asyncio.timeout(SEND_TIMEOUT_SECONDS):
+                    await self.websocket.send_text(text)
+            return True
+        except (WebSocketDisconnect, TimeoutError):
+            self.dead = True
+            return False
+        except Exception as e:
+            logger.error(f"Ошибка отправки WebSocket сообщения: {e}")
+            self.dead = True
+            return False
+        finally:
+            self.draining = False
+
+
 class DisplayWebSocketManager:
     """Менеджер WebSocket соединений для табло"""
 
@@ -27,11 +88,20 @@ class DisplayWebSocketManager:
         self.connections: dict[str, set[WebSocket]] = {}
         # Последнее состояние каждого табло
         self.board_states: dict[str, dict[str, Any]] = {}
+        # Исходящие очереди соединений (создаются лениво при первой отправке)
+        self._outboxes: weakref.WeakKeyDictionary[WebSocket, _ConnectionOutbox] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._drain_tasks: set[asyncio.Task] = set()
+        self.dropped_connections = 0
+        # Версионированные состояния дневных очередей для диффов
+        self.queue_states = DailyQueueStateCache(self._format_patient_name)
         self._pubsub = pubsub or RedisPubSubBridge(
             channel_prefix="display_ws",
             redis_url=(os.getenv("WS_REDIS_URL") or os.getenv("REDIS_URL")),
         )
         self._redis_handlers: dict[str, Any] = {}
+        self._queue_state_handler: Any = None
 
     async def connect(self, websocket: WebSocket, board_id: str, user=None) -> None:
         """Подключение нового WebSocket с опциональной аутентификацией"""
@@ -69,6 +139,7 @@ class DisplayWebSocketManager:
     async def disconnect(self, websocket: WebSocket, board_id: str) -> None:
         """Отключение WebSocket"""
         try:
+            self._outboxes.pop(websocket, None)
             if board_id in self.connections:
                 self.connections[board_id].discard(websocket)
 
@@ -94,6 +165,10 @@ class DisplayWebSocketManager:
         return f"board:{board_id}"
 
     async def _ensure_redis_subscription(self, board_id: str) -> None:
+        if self._queue_state_handler is None:
+            self._queue_state_handler = self._on_remote_queue_state
+            await self._pubsub.subscribe(QUEUE_STATE_CHANNEL, self._queue_state_handler)
+
         if board_id in self._redis_handlers:
             return
 
@@ -109,6 +184,23 @@ class DisplayWebSocketManager:
             return
         await self._pubsub.unsubscribe(self._board_channel(board_id), handler)
 
+        if not self._redis_handlers and self._queue_state_handler is not None:
+            await self._pubsub.unsubscribe(QUEUE_STATE_CHANNEL, self._queue_state_handler)
+            self._queue_state_handler = None
+
+    async def _on_remote_queue_state(self, payload: dict[str, Any]) -> None:
+        """Состояние очереди от другого воркера: влить в кэш и разослать своим табло"""
+        try:
+            message = await self.queue_states.adopt(
+                payload["queue"], event_type=payload.get("event_type")
+            )
+            if message is None:
+                return
+            for board_id in payload.get("board_ids") or list(self.connections.keys()):
+                await self._broadcast_to_board_local(board_id, message)
+        except Exception as e:
+            logger.error(f"Ошибка применения состояния очереди от другого воркера: {e}")
+
     async def _broadcast_to_board_local(self, board_id: str, message: dict[str, Any]) -> None:
         if board_id not in self.connections:
             return
@@ -120,23 +212,75 @@ class DisplayWebSocketManager:
             "last_update": datetime.now(UTC).isoformat(),
         }
 
-        # Отправляем всем подключенным
-        disconnected = set()
-        for websocket in self.connections[board_id].copy():
-            try:
-                await websocket.send_text(json.dumps(message, ensure_ascii=False))
-            except WebSocketDisconnect:
-                disconnected.add(websocket)
-            except Exception as e:
-                logger.error(f"Ошибка отправки WebSocket сообщения: {e}")
-                disconnected.add(websocket)
+        # Сериализуем один раз и раздаём всем соединениям параллельно
+        text = json.dumps(message, ensure_ascii=False)
+        await self._fan_out(board_id, text)
+
+    async def _fan_out(self, board_id: str, text: str) -> None:
+        """Поставить сообщение в очередь каждого соединения табло.
+
+        Отправки идут параллельно; broadcast ждёт не дольше
+        BROADCAST_WAIT_SECONDS, остальное досылается в фоне. Соединения с
+        переполненной очередью или зависшей отправкой отключаются, не
+        задерживая остальные табло.
+        """
+        laggards: list[WebSocket] = []
+        drains: list[asyncio.Task] = []
+
+        for websocket in tuple(self.connections.get(board_id, ())):
+            outbox = self._outboxes.get(websocket)
+            if outbox is None:
+                outbox = _ConnectionOutbox(websocket)
+                self._outboxes[websocket] = outbox
+            if not outbox.offer(text):
+                laggards.append(websocket)
+            elif not outbox.draining:
+                # Помечаем до запуска задачи: следующий broadcast не должен
+                # стартовать второй drain, пока этот ещё не начал работу
+                outbox.draining = True
+                drains.append(
+                    asyncio.create_task(self._drain(board_id, outbox))
+                )
+
+        for websocket in laggards:
+            self._drop_connection(board_id, websocket, reason="queue overflow")
+
+        if drains:
+            _, pending = await asyncio.wait(drains, timeout=BROADCAST_WAIT_SECONDS)
+            for task in pending:
+                self._drain_tasks.add(task)
+                task.add_done_callback(self._drain_tasks.discard)
 
-        # Удаляем отключенные соединения
-        for ws in disconnected:
-            self.connections[board_id].discard(ws)
+    async def _drain(self, board_id: str, outbox: _ConnectionOutbox) -> None:
+        if not await outbox.drain():
+            self._drop_connection(board_id, outbox.websocket, reason="send failed")
 
-        if disconnected:
-            logger.info(f"Удалено {len(disconnected)} отключенных соединений")
+    def _drop_connection(self, board_id: str, websocket: WebSocket, reason: str) -> None:
+        """Отключить отстающее/оборванное соединение; табло переподключится."""
+        connections = self.connections.get(board_id)
+        if connections is None or websocket not in connections:
+            return
+        connections.discard(websocket)
+        outbox = self._outboxes.pop(websocket, None)
+        if outbox is not None:
+            outbox.dead = True
+            outbox.pending.clear()
+        self.dropped_connections += 1
+        logger.warning(f"Соединение с табло {board_id} отключено: {reason}")
+
+        close = getattr(websocket, "close", None)
+        if close is not None:
+            task = asyncio.create_task(self._close_quietly(close))
+            self._drain_tasks.add(task)
+            task.add_done_callback(self._drain_tasks.discard)
+
+    @staticmethod
+    async def _close_quietly(close) -> None:  # type: ignore[no-untyped-def]
+        try:
+            async with asyncio.timeout(SEND_TIMEOUT_SECONDS):
+                await close(code=1011)
+        except Exception:
+            pass
 
     async def broadcast_patient_call(
         self,
@@ -193,88 +337,44 @@ class DisplayWebSocketManager:
         daily_queue: DailyQueue,
         board_ids: list[str] = None,
         event_type: str | None = None,
+        changed_entry_ids: list[int] | None = None,
     ) -> None:
-        """Трансляция обновления очереди"""
-        try:
-            db = SessionLocal()
+        """Трансляция обновления очереди (дифф или периодический снимок)
 
-            # Получаем текущую очередь
-            queue_entries = (
-                db.query(OnlineQueueEntry)
-                .filter(OnlineQueueEntry.queue_id == daily_queue.id)
-                .order_by(OnlineQueueEntry.number)
-                .all()
+        Свои табло получают дифф в версиях этого воркера; другим воркерам
+        уходит полное состояние очереди, версии они ведут сами.
+        """
+        try:
+            update_message = await self.queue_states.build_update(
+                daily_queue.id,
+                event_type=event_type,
+                changed_entry_ids=changed_entry_ids,
             )
+            if update_message is None:
+                return
 
-            # Формируем данные очереди
-            queue_data = []
-            for entry in queue_entries:
-                queue_data.append(
-                    {
-                        "number": entry.number,
-                        "patient_name": self._format_patient_name(entry.patient_name),
-                        "status": entry.status,
-                        "source": entry.source,
-                        "created_at": entry.created_at.isoformat(),
-                        "called_at": (
-                            entry.called_at.isoformat() if entry.called_at else None
-                        ),
-                    }
-                )
-
-            update_message = {
-                "type": "queue_update",
-                **({"event_type": event_type} if event_type else {}),
-                "data": {
-                    "doctor_name": (
-                        daily_queue.specialist.user.full_name
-                        if daily_queue.specialist and daily_queue.specialist.user
-                        else "Врач"
-                    ),
-                    "specialty": (
-                        daily_queue.specialist.specialty
-                        if daily_queue.specialist
-                        else "Специалист"
-                    ),
-                    "cabinet": (
-                        daily_queue.specialist.cabinet
-                        if daily_queue.specialist
-                        else None
-                    ),
-                    "queue_date": daily_queue.day.isoformat(),
-                    "opened_at": (
-                        daily_queue.opened_at.isoformat()
-                        if daily_queue.opened_at
-                        else None
-                    ),
-                    "queue_entries": queue_data,
-                    "stats": {
-                        "total": len(queue_entries),
-                        "waiting": len(
-                            [e for e in queue_entries if e.status == "waiting"]
-                        ),
-                        "called": len(
-                            [e for e in queue_entries if e.status == "called"]
-                        ),
-                        "served": len(
-                            [e for e in queue_entries if e.status == "served"]
-                        ),
-                    },
-                },
-            }
-
-            # Отправляем на табло
-            if not board_ids:
-                board_ids = list(self.connections.keys())
-
-            for board_id in board_ids:
-                await self.broadcast_to_board(board_id, update_message)
+            for board_id in board_ids or list(self.connections.keys()):
+                await self._broadcast_to_board_local(board_id, update_message)
 
-            db.close()
+            exported = self.queue_states.export(daily_queue.id)
+            if exported is not None:
+                await self._pubsub.publish(
+                    QUEUE_STATE_CHANNEL,
+                    {"queue": exported, "event_type": event_type, "board_ids": board_ids},
+                )
 
         except Exception as e:
             logger.error(f"Ошибка трансляции обновления очереди: {e}")
 
+    async def send_queue_snapshot(self, websocket: WebSocket, queue_id: int) -> None:
+        """Отправить табло полный снимок очереди (ресинхронизация по версии)"""
+        try:
+            snapshot = await self.queue_states.snapshot(queue_id)
+            if snapshot is not None:
+                await websocket.send_text(json.dumps(snapshot, ensure_ascii=False))
+        except Exception as e:
+            logger.error(f"Ошибка отправки снимка очереди {queue_id}: {e}")
+
     async def broadcast_announcement(
         self,
         announcement_text: str,
@@ -460,6 +560,7 @@ class DisplayWebSocketManager:
                     await self.broadcast_daily_queue_state(
                         queue_entry.queue,
                         event_type=event_type,
+                        changed_entry_ids=[queue_entry.id],
                     )
                     return
 
@@ -0,0 +1,259 @@
+"""
+Индекс фраз врача в памяти процесса для DoctorPhraseService.suggest_phrases.
+
+Подсказки запрашиваются на каждое нажатие клавиши в редакторе EMR, поэтому
+горячий путь не ходит в БД. Для пары (врач, поле) фразы лежат в массиве,
+отсортированном по ключу (``prefix_index`` без обрезки), диапазон префикса
+находится бинарным поиском, а top-k по частоте и недавности для уже
+запрошенных префиксов хранится готовым и поддерживается при обновлениях.
+
+- Индекс загружается лениво, при первом запросе подсказок.
+- После ``index_doctor_phrases`` в этом процессе индекс обновляется на месте.
+- Раз в ``PHRASE_INDEX_TTL_SECONDS`` индекс перечитывается из БД, чтобы
+  подхватить изменения из других воркеров и batch-индексации.
+- Индексы неактивных врачей вытесняются LRU, когда суммарное число фраз
+  превышает ``PHRASE_INDEX_MAX_PHRASES``.
+"""
+
+from __future__ import annotations
+
+import heapq
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import UTC, datetime
+
+from sqlalchemy.orm import Session
+
+from app.models.doctor_phrase_history import DoctorPhraseHistory
+
+PHRASE_INDEX_MAX_PHRASES = int(os.getenv("PHRASE_INDEX_MAX_PHRASES", "200000"))
+PHRASE_INDEX_TTL_SECONDS = float(os.getenv("PHRASE_INDEX_TTL_SECONDS", "300"))
+
+# Префикс поиска ограничен длиной prefix_index
+PREFIX_LENGTH = 50
+# Готовый top-k на префикс: maxSuggestions <= 10, подсказки ищутся с запасом x2
+TOP_K = 20
+MAX_CACHED_PREFIXES = 1024
+
+_KEY_UPPER_BOUND = chr(0x10FFFF)
+
+
+def _timestamp(value: datetime | None) -> float:
+    if value is None:
+        return 0.0
+    if value.tzinfo is None:
+        # SQLite отдаёт naive datetime - в БД хранится UTC
+        value = value.replace(tzinfo=UTC)
+    return value.timestamp()
+
+
+@dataclass(eq=False, slots=True)
+class PhraseEntry:
+    """Фраза врача в индексе (сравнение по идентичности объекта)."""
+
+    key: str
+    phrase: str
+    specialty: str | None
+    usage_count: int
+    last_used: datetime | None
+
+    def sort_key(self) -> tuple[int, float, str]:
+        # Частота -> недавность -> стабильный порядок по тексту
+        return (-self.usage_count, -_timestamp(self.last_used), self.key)
+
+    def matches_specialty(self, specialty: str | None) -> bool:
+        return not specialty or self.specialty is None or self.specialty == specialty
+
+
+class PhraseIndex:
+    """Фразы одного врача по одному полю EMR."""
+
+    def __init__(self, entries: list[PhraseEntry], loaded_at: float):
+        self._entries = sorted(entries, key=lambda entry: entry.key)
+        self._keys = [entry.key for entry in self._entries]
+        self._by_phrase = {entry.phrase: entry for entry in self._entries}
+        self._top: dict[str, list[PhraseEntry]] = {}
+        self.loaded_at = loaded_at
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def top(self, prefix: str, limit: int, specialty: str | None = None) -> list[PhraseEntry]:
+        """До ``limit`` фраз с ключом на ``prefix`` (пустой - все фразы)."""
+        prefix = prefix[:PREFIX_LENGTH]
+        ranked = self._top.get(prefix)
+        if ranked is None:
+            if len(self._top) >= MAX_CACHED_PREFIXES:
+                self._top.clear()
+            ranked = self._top[prefix] = self._rank_range(prefix, TOP_K)
+
+        result = [entry for entry in ranked if entry.matches_specialty(specialty)]
+        if len(result) >= limit or len(ranked) < TOP_K:
+            return result[:limit]
+        # Фильтр по специальности отсёк слишком много - досчитываем по диапазону
+        return [
+            entry
+            for entry in self._rank_range(prefix, None)
+            if entry.matches_specialty(specialty)
+        ][:limit]
+
+    def upsert(
+        self,
+        phrase: str,
+        specialty: str | None,
+        usage_count: int,
+        last_used: datetime | None,
+    ) -> None:
+        entry = self._by_phrase.get(phrase)
+        if entry is None:
+            entry = PhraseEntry(
+                key=DoctorPhraseHistory.create_prefix_index(phrase, length=len(phrase)),
+                phrase=phrase,
+                specialty=specialty,
+                usage_count=usage_count,
+                last_used=last_used,
+            )
+            position = bisect_left(self._keys, entry.key)
+            self._keys.insert(position, entry.key)
+            self._entries.insert(position, entry)
+            self._by_phrase[phrase] = entry
+        else:
+            entry.usage_count = usage_count
+            entry.last_used = last_used
+
+        # Счётчик и время использования только растут, поэтому top-k префикса
+        # меняется лишь за счёт этой фразы: она поднимается или входит в список
+        entry_rank = entry.sort_key()
+        for length in range(min(len(entry.key), PREFIX_LENGTH) + 1):
+            ranked = self._top.get(entry.key[:length])
+            if ranked is None:
+                continue
+            if any(item is entry for item in ranked):
+                ranked.sort(key=PhraseEntry.sort_key)
+            elif len(ranked) < TOP_K or entry_rank < ranked[-1].sort_key():
+                insort(ranked, entry, key=PhraseEntry.sort_key)
+                del ranked[TOP_K:]
+
+    def _rank_range(self, prefix: str, limit: int | None) -> list[PhraseEntry]:
+        low = bisect_left(self._keys, prefix)
+        high = bisect_left(self._keys, prefix + _KEY_UPPER_BOUND, lo=low)
+        candidates = self._entries[low:high]
+        if limit is None:
+            return sorted(candidates, key=PhraseEntry.sort_key)
+        return heapq.nsmallest(limit, candidates, key=PhraseEntry.sort_key)
+
+
+class PhraseIndexCache:
+    """LRU индексов (врач, поле) с общим лимитом на число фраз."""
+
+    def __init__(
+        self,
+        max_phrases: int = PHRASE_INDEX_MAX_PHRASES,
+        ttl_seconds: float = PHRASE_INDEX_TTL_SECONDS,
+    ):
+        self.max_phrases = max_phrases
+        self.ttl_seconds = ttl_seconds
+        self._indexes: OrderedDict[tuple[int, str], PhraseIndex] = OrderedDict()
+        self._phrases = 0
+        self._lock = threading.Lock()
+
+    def top(
+        self,
+        db: Session,
+        doctor_id: int,
+        field: str,
+        prefix: str,
+        limit: int,
+        specialty: str | None = None,
+    ) -> list[PhraseEntry]:
+        key = (doctor_id, field)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None and time.monotonic() - index.loaded_at < self.ttl_seconds:
+                self._indexes.move_to_end(key)
+                return index.top(prefix, limit, specialty)
+
+        index = PhraseIndex(_load_entries(db, doctor_id, field), time.monotonic())
+        with self._lock:
+            self._store(key, index)
+            return index.top(prefix, limit, specialty)
+
+    def record(
+        self,
+        doctor_id: int,
+        field: str,
+        phrase: str,
+        specialty: str | None,
+        usage_count: int,
+        last_used: datetime | None,
+    ) -> None:
+        """Обновить уже загруженный индекс после сохранения фразы в БД."""
+        with self._lock:
+            index = self._indexes.get((doctor_id, field))
+            if index is None:
+                return
+            size = len(index)
+            index.upsert(phrase, specialty, usage_count, last_used)
+            self._phrases += len(index) - size
+            self._evict()
+
+    def invalidate(self, doctor_id: int, field: str | None = None) -> None:
+        with self._lock:
+            for key in [key for key in self._indexes if key[0] == doctor_id]:
+                if field is None or key[1] == field:
+                    self._phrases -= len(self._indexes.pop(key))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+            self._phrases = 0
+
+    def _store(self, key: tuple[int, str], index: PhraseIndex) -> None:
+        previous = self._indexes.pop(key, None)
+        if previous is not None:
+            self._phrases -= len(previous)
+        self._indexes[key] = index
+        self._phrases += len(index)
+        self._evict()
+
+    def _evict(self) -> None:
+        # Самый свежий индекс остаётся, даже если один превышает лимит
+        while self._phrases > self.max_phrases and len(self._indexes) > 1:
+            _, index = self._indexes.popitem(last=False)
+            self._phrases -= len(index)
+
+
+def _load_entries(db: Session, doctor_id: int, field: str) -> list[PhraseEntry]:
+    rows = (
+        db.query(
+            DoctorPhraseHistory.phrase,
+            DoctorPhraseHistory.specialty,
+            DoctorPhraseHistory.usage_count,
+            DoctorPhraseHistory.last_used,
+        )
+        .filter(
+            DoctorPhraseHistory.doctor_id == doctor_id,
+            DoctorPhraseHistory.field == field,
+        )
+        .all()
+    )
+    entries: dict[str, PhraseEntry] = {}
+    for phrase, specialty, usage_count, last_used in rows:
+        entry = PhraseEntry(
+            key=DoctorPhraseHistory.create_prefix_index(phrase, length=len(phrase)),
+            phrase=phrase,
+            specialty=specialty,
+            usage_count=usage_count or 0,
+            last_used=last_used,
+        )
+        existing = entries.get(phrase)
+        if existing is None or entry.sort_key() < existing.sort_key():
+            entries[phrase] = entry
+    return list(entries.values())
+
+
+phrase_index_cache = PhraseIndexCache()
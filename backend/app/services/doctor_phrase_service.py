@@ -11,10 +11,12 @@ import re
 from datetime import UTC, datetime
 from typing import Any
 
-from sqlalchemy import desc
+from sqlalchemy import Row, insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from app.models.doctor_phrase_history import DoctorPhraseHistory
+from app.services.doctor_phrase_index import PhraseEntry, phrase_index_cache
 
 
 class DoctorPhraseService:
@@ -123,6 +125,8 @@ class DoctorPhraseService:
             Количество добавленных/обновлённых фраз
         """
         indexed_count = 0
+        indexed = []
+        now = datetime.now(UTC)
 
         for field in self.INDEXABLE_FIELDS:
             text = emr_data.get(field)
@@ -132,15 +136,26 @@ class DoctorPhraseService:
             phrases = self.extract_phrases(text, field)
 
             for phrase in phrases:
-                self._upsert_phrase(
+                record = self._upsert_phrase(
                     doctor_id=doctor_id,
                     field=field,
                     phrase=phrase,
                     specialty=specialty
                 )
+                # Значения фразы после upsert (RETURNING)
+                indexed.append(
+                    (field, record.phrase, record.specialty,
+                     record.usage_count or 1, record.last_used or now)
+                )
                 indexed_count += 1
 
         self.db.commit()
+
+        # Обновляем индекс подсказок в памяти только после успешного commit
+        for field, phrase, phrase_specialty, usage_count, last_used in indexed:
+            phrase_index_cache.record(
+                doctor_id, field, phrase, phrase_specialty, usage_count, last_used
+            )
         return indexed_count
 
     def _upsert_phrase(
@@ -149,35 +164,67 @@ class DoctorPhraseService:
         field: str,
         phrase: str,
         specialty: str | None = None
-    ) -> DoctorPhraseHistory:
-        """Добавить или обновить фразу в истории"""
-
-        prefix_index = DoctorPhraseHistory.create_prefix_index(phrase)
-
-        # Ищем существующую
-        existing = self.db.query(DoctorPhraseHistory).filter(
-            DoctorPhraseHistory.doctor_id == doctor_id,
-            DoctorPhraseHistory.field == field,
-            DoctorPhraseHistory.phrase == phrase
-        ).first()
-
-        if existing:
-            # Увеличиваем счётчик
-            existing.usage_count += 1
-            existing.last_used = datetime.now(UTC)
-            return existing
+    ) -> Row:
+        """
+        Добавить или обновить фразу в истории.
+
+        Один INSERT ... ON CONFLICT DO UPDATE: параллельные сохранения EMR
+        с одной и той же фразой не падают на uq_doctor_phrase_history_phrase.
+        Возвращает (phrase, specialty, usage_count, last_used).
+        """
+        table = DoctorPhraseHistory.__table__
+        now = datetime.now(UTC)
+        values = {
+            "doctor_id": doctor_id,
+            "field": field,
+            "phrase": phrase,
+            "prefix_index": DoctorPhraseHistory.create_prefix_index(phrase),
+            "specialty": specialty,
+            "usage_count": 1,
+            "last_used": now,
+            "first_used": now,
+        }
+        returning = (table.c.phrase, table.c.specialty, table.c.usage_count, table.c.last_used)
+
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
         else:
-            # Создаём новую
-            new_phrase = DoctorPhraseHistory(
-                doctor_id=doctor_id,
-                field=field,
-                phrase=phrase,
-                prefix_index=prefix_index,
-                specialty=specialty,
-                usage_count=1
-            )
-            self.db.add(new_phrase)
-            return new_phrase
+            return self._upsert_phrase_with_retry(values, returning)
+
+        stmt = dialect_insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.doctor_id, table.c.field, table.c.phrase],
+            set_={"usage_count": table.c.usage_count + 1, "last_used": now},
+        )
+        return self.db.execute(stmt.returning(*returning)).one()
+
+    def _upsert_phrase_with_retry(self, values: dict[str, Any], returning: tuple) -> Row:
+        """UPDATE, иначе INSERT; проигравший гонку INSERT повторяется как UPDATE"""
+        table = DoctorPhraseHistory.__table__
+        key = (
+            (table.c.doctor_id == values["doctor_id"])
+            & (table.c.field == values["field"])
+            & (table.c.phrase == values["phrase"])
+        )
+        for _attempt in range(2):
+            updated = self.db.execute(
+                update(table).where(key).values(
+                    usage_count=table.c.usage_count + 1, last_used=values["last_used"]
+                )
+            ).rowcount
+            if not updated:
+                try:
+                    with self.db.begin_nested():
+                        self.db.execute(insert(table).values(**values))
+                except IntegrityError:
+                    continue  # фразу вставило параллельное сохранение
+            return self.db.execute(
+                select(*returning).where(key)
+            ).one()
+        raise RuntimeError("doctor phrase upsert did not converge")
 
     # ============================================
     # ПОИСК ПОДСКАЗОК
@@ -234,27 +281,13 @@ class DoctorPhraseService:
         if len(search_text) < 3:
             return self._get_frequent_phrases(doctor_id, field, specialty, max_suggestions)
 
-        # Prefix search
+        # Prefix search по индексу в памяти (см. doctor_phrase_index)
         prefix = search_text.lower()[:50]
 
-        # Запрос к БД
-        query = self.db.query(DoctorPhraseHistory).filter(
-            DoctorPhraseHistory.doctor_id == doctor_id,
-            DoctorPhraseHistory.field == field,
-            DoctorPhraseHistory.prefix_index.like(f"{prefix}%")
-        )
-
-        if specialty:
-            query = query.filter(
-                (DoctorPhraseHistory.specialty == specialty) |
-                (DoctorPhraseHistory.specialty.is_(None))
-            )
-
         # Ранжирование: частота → недавность
-        results = query.order_by(
-            desc(DoctorPhraseHistory.usage_count),
-            desc(DoctorPhraseHistory.last_used)
-        ).limit(max_suggestions * 2).all()
+        results = phrase_index_cache.top(
+            self.db, doctor_id, field, prefix, max_suggestions * 2, specialty
+        )
 
         # Формируем ответ с continuation (хвостом)
         suggestions = []
@@ -267,7 +300,7 @@ class DoctorPhraseService:
                     "full_phrase": phrase_record.phrase,
                     "source": "history",
                     "usageCount": phrase_record.usage_count,
-                    "lastUsed": phrase_record.last_used.isoformat() if phrase_record.last_used else None
+                    "lastUsed": self._format_last_used(phrase_record)
                 })
 
         # Убираем дубликаты и ограничиваем
@@ -308,21 +341,7 @@ class DoctorPhraseService:
     ) -> list[dict[str, Any]]:
         """Получить частые фразы (для пустого поля)"""
 
-        query = self.db.query(DoctorPhraseHistory).filter(
-            DoctorPhraseHistory.doctor_id == doctor_id,
-            DoctorPhraseHistory.field == field
-        )
-
-        if specialty:
-            query = query.filter(
-                (DoctorPhraseHistory.specialty == specialty) |
-                (DoctorPhraseHistory.specialty.is_(None))
-            )
-
-        results = query.order_by(
-            desc(DoctorPhraseHistory.usage_count),
-            desc(DoctorPhraseHistory.last_used)
-        ).limit(limit).all()
+        results = phrase_index_cache.top(self.db, doctor_id, field, "", limit, specialty)
 
         return [
             {
@@ -330,11 +349,15 @@ class DoctorPhraseService:
                 "full_phrase": r.phrase,
                 "source": "history",
                 "usageCount": r.usage_count,
-                "lastUsed": r.last_used.isoformat() if r.last_used else None
+                "lastUsed": self._format_last_used(r)
             }
             for r in results
         ]
 
+    @staticmethod
+    def _format_last_used(entry: PhraseEntry) -> str | None:
+        return entry.last_used.isoformat() if entry.last_used else None
+
 
 # Singleton instance
 _service_instance = None
@@ -8,19 +8,34 @@ EMRPhraseIndexer - Batch-индексатор для миграции сущес
 реальных фраз из истории врача.
 """
 
+import json
 import logging
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
 from dataclasses import dataclass
 from datetime import UTC, datetime
 
-from sqlalchemy import func
+from sqlalchemy import func, insert
 from sqlalchemy.orm import Session
 
+from app.models.doctor_phrase_history import DoctorPhraseHistory
 from app.models.emr import EMR
-from app.models.user import User
+from app.models.setting import Setting
 from app.services.doctor_phrase_service import DoctorPhraseService
 
 logger = logging.getLogger(__name__)
 
+# Bulk-индексация: страница EMR = одна транзакция записи + checkpoint
+BULK_PAGE_SIZE = int(os.getenv("PHRASE_INDEX_PAGE_SIZE", "5000"))
+BULK_YIELD_PER = 500
+BULK_UPSERT_CHUNK = 1000
+BULK_WORKERS = int(os.getenv("PHRASE_INDEX_WORKERS", str(min(4, os.cpu_count() or 1))))
+CHECKPOINT_CATEGORY = "emr_phrase_indexer"
+
+# (doctor_id, field, phrase) -> (число EMR с фразой, специальность первой EMR)
+PhraseCounts = dict[tuple[int, str, str], tuple[int, str | None]]
+
 
 @dataclass
 class IndexResult:
@@ -42,6 +57,38 @@ class BatchResult:
     doctors_now_ready: int
     duration_ms: int
     errors: list[str]
+    emrs_per_second: float = 0.0
+    # Последняя проиндексированная EMR (checkpoint для следующего запуска)
+    last_emr_id: int = 0
+    resumed_from_emr_id: int = 0
+
+
+def extract_phrase_counts(rows: list[tuple[int, str | None, dict[str, str]]]) -> PhraseCounts:
+    """
+    Извлечь фразы из пачки EMR и посчитать их.
+
+    Выполняется в процессах пула, поэтому принимает и возвращает только
+    простые значения. Каждая EMR добавляет фразе +1, как
+    DoctorPhraseService.index_doctor_phrases.
+    """
+    service = DoctorPhraseService(None)
+    counts: PhraseCounts = {}
+    for doctor_id, specialty, emr_data in rows:
+        for field in DoctorPhraseService.INDEXABLE_FIELDS:
+            text = emr_data.get(field)
+            if not text:
+                continue
+            for phrase in service.extract_phrases(text, field):
+                key = (doctor_id, field, phrase)
+                count, first_specialty = counts.get(key, (0, specialty))
+                counts[key] = (count + 1, first_specialty)
+    return counts
+
+
+def _merge_counts(target: PhraseCounts, counts: PhraseCounts) -> None:
+    for key, (count, specialty) in counts.items():
+        total, first_specialty = target.get(key, (0, specialty))
+        target[key] = (total + count, first_specialty)
 
 
 class EMRPhraseIndexer:
@@ -133,14 +180,34 @@ class EMRPhraseIndexer:
     def index_all_doctors(
         self,
         limit: int | None = None,
-        offset: int = 0
+        offset: int = 0,
+        *,
+        resume: bool = True,
+        workers: int | None = None,
+        page_size: int | None = None,
     ) -> BatchResult:
         """
-        Проиндексировать EMR всех врачей.
+        Проиндексировать EMR всех врачей (bulk).
+
+        EMR читаются страницами по id (внутри страницы - потоково через
+        yield_per), фразы извлекаются в пуле процессов, пока читается
+        следующая страница, и пишутся одним INSERT ... ON CONFLICT DO UPDATE
+        на страницу. В той же транзакции сохраняется checkpoint (последний
+        id EMR), поэтому прерванный запуск продолжается с места остановки, а
+        повторный индексирует только новые EMR. ``resume=False`` начинает
+        заново.
+
+        Args:
+            limit, offset: Страница врачей (по умолчанию - все врачи)
+            resume: Продолжить с сохранённого checkpoint
+            workers: Процессов для извлечения фраз (<= 1 - в текущем процессе)
+            page_size: EMR на страницу (транзакцию)
         """
         from app.models.appointment import Appointment
-        start_time = datetime.now(UTC)
-        errors = []
+        started = time.perf_counter()
+        workers = BULK_WORKERS if workers is None else workers
+        page_size = page_size or BULK_PAGE_SIZE
+        errors: list[str] = []
 
         # Находим всех уникальных врачей, у которых есть сохранённые EMR
         doctors_query = self.db.query(
@@ -151,57 +218,226 @@ class EMRPhraseIndexer:
         ).filter(
             EMR.is_draft == False,
             Appointment.doctor_id.is_not(None)
-        ).group_by(Appointment.doctor_id)
+        ).group_by(Appointment.doctor_id).order_by(Appointment.doctor_id)
 
         if limit:
             doctors_query = doctors_query.limit(limit).offset(offset)
 
-        doctors = doctors_query.all()
+        doctor_ids = [row[0] for row in doctors_query.all()]
+        checkpoint_key = f"bulk:{offset}:{limit}" if limit else "bulk"
+        resumed_from = self._load_checkpoint(checkpoint_key) if resume else 0
+        last_emr_id = resumed_from
 
         total_emrs = 0
         total_phrases = 0
-        doctors_now_ready = 0
-
-        for doctor_row in doctors:
-            doctor_id = doctor_row[0]
-
-            try:
-                # Получаем специальность врача
-                user = self.db.query(User).filter(User.id == doctor_id).first()
-                specialty = getattr(user, 'specialty', None) if user else None
-
-                # Индексируем
-                result = self.index_doctor_emrs(doctor_id, specialty)
-
-                total_emrs += result.total_emrs
-                total_phrases += result.total_phrases
-
-                # Проверяем readiness
-                from app.services.doctor_autocomplete_readiness import (
-                    DoctorAutocompleteReadiness,
+        indexed_doctors: set[int] = set()
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        pending: tuple[list[Future] | PhraseCounts, int, int] | None = None
+
+        try:
+            while True:
+                # Следующая страница читается, пока пул обрабатывает текущую
+                page = self._read_emr_page(
+                    Appointment, last_emr_id if pending is None else pending[1],
+                    page_size, doctor_ids if limit else None,
                 )
-                readiness_service = DoctorAutocompleteReadiness(self.db)
-                readiness = readiness_service.check_readiness(doctor_id)
-
-                if readiness.ready:
-                    doctors_now_ready += 1
-                    logger.info(f"Doctor {doctor_id} is now ready for autocomplete")
-
-            except Exception:
-                error_msg = "Internal error"
-                logger.error(error_msg)
-                errors.append(error_msg)
-
-        duration_ms = int((datetime.now(UTC) - start_time).total_seconds() * 1000)
+                if pending is not None:
+                    extracted, page_last_id, page_emrs = pending
+                    pending = None
+                    counts = self._collect_counts(extracted)
+                    total_phrases += self._write_page(counts, checkpoint_key, page_last_id)
+                    indexed_doctors.update(doctor_id for doctor_id, _, _ in counts)
+                    total_emrs += page_emrs
+                    last_emr_id = page_last_id
+                if not page:
+                    break
+                pending = (
+                    self._submit_extraction(executor, page, workers),
+                    page[-1][0],
+                    len(page),
+                )
+        except Exception:
+            self.db.rollback()
+            logger.exception("Bulk phrase indexing stopped at EMR id %s", last_emr_id)
+            errors.append("Internal error")
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        # Индекс подсказок в памяти перечитает изменённых врачей
+        from app.services.doctor_phrase_index import phrase_index_cache
+        for doctor_id in indexed_doctors:
+            phrase_index_cache.invalidate(doctor_id)
+
+        doctors_now_ready = self._count_ready_doctors(indexed_doctors)
+        elapsed = time.perf_counter() - started
 
         return BatchResult(
-            total_doctors=len(doctors),
+            total_doctors=len(doctor_ids),
             total_emrs=total_emrs,
             total_phrases=total_phrases,
             doctors_now_ready=doctors_now_ready,
-            duration_ms=duration_ms,
-            errors=errors
+            duration_ms=int(elapsed * 1000),
+            errors=errors,
+            emrs_per_second=round(total_emrs / elapsed, 1) if elapsed > 0 else 0.0,
+            last_emr_id=last_emr_id,
+            resumed_from_emr_id=resumed_from,
+        )
+
+    def _read_emr_page(
+        self,
+        appointment_model,
+        after_emr_id: int,
+        page_size: int,
+        doctor_ids: list[int] | None,
+    ) -> list[tuple[int, int, str | None, dict[str, str]]]:
+        """Страница завершённых EMR после ``after_emr_id``: (id, врач, специальность, поля).
+
+        Специальность - из профиля врача, а если её нет - из самой EMR.
+        """
+        from app.models.clinic import Doctor
+        columns = [getattr(EMR, field) for field in self.INDEXABLE_FIELDS]
+        query = self.db.query(
+            EMR.id,
+            appointment_model.doctor_id,
+            func.coalesce(Doctor.specialty, EMR.specialty),
+            *columns,
+        ).join(
+            appointment_model, EMR.appointment_id == appointment_model.id
+        ).outerjoin(
+            Doctor, Doctor.id == appointment_model.doctor_id
+        ).filter(
+            EMR.is_draft == False,
+            appointment_model.doctor_id.is_not(None),
+            EMR.id > after_emr_id,
+        )
+        if doctor_ids is not None:
+            query = query.filter(appointment_model.doctor_id.in_(doctor_ids))
+
+        page = []
+        for row in query.order_by(EMR.id).limit(page_size).yield_per(BULK_YIELD_PER):
+            emr_data = {
+                field: value.strip()
+                for field, value in zip(self.INDEXABLE_FIELDS, row[3:], strict=True)
+                if value and isinstance(value, str) and len(value.strip()) >= 10
+            }
+            page.append((row[0], row[1], row[2], emr_data))
+        return page
+
+    @staticmethod
+    def _submit_extraction(
+        executor: ProcessPoolExecutor | None,
+        page: list[tuple[int, int, str | None, dict[str, str]]],
+        workers: int,
+    ) -> list[Future] | PhraseCounts:
+        rows = [(doctor_id, specialty, emr_data) for _, doctor_id, specialty, emr_data in page if emr_data]
+        if executor is None:
+            return extract_phrase_counts(rows)
+        size = max(1, -(-len(rows) // workers))
+        return [
+            executor.submit(extract_phrase_counts, rows[index:index + size])
+            for index in range(0, len(rows), size)
+        ]
+
+    @staticmethod
+    def _collect_counts(extracted: list[Future] | PhraseCounts) -> PhraseCounts:
+        if isinstance(extracted, dict):
+            return extracted
+        counts: PhraseCounts = {}
+        for future in extracted:
+            _merge_counts(counts, future.result())
+        return counts
+
+    def _write_page(self, counts: PhraseCounts, checkpoint_key: str, last_emr_id: int) -> int:
+        """Записать фразы страницы и checkpoint одной транзакцией."""
+        now = datetime.now(UTC)
+        rows = [
+            {
+                "doctor_id": doctor_id,
+                "field": field,
+                "phrase": phrase,
+                "prefix_index": DoctorPhraseHistory.create_prefix_index(phrase),
+                "specialty": specialty,
+                "usage_count": count,
+                "last_used": now,
+                "first_used": now,
+            }
+            for (doctor_id, field, phrase), (count, specialty) in counts.items()
+        ]
+        for index in range(0, len(rows), BULK_UPSERT_CHUNK):
+            self._upsert_phrases(rows[index:index + BULK_UPSERT_CHUNK])
+        self._save_checkpoint(checkpoint_key, last_emr_id)
+        self.db.commit()
+        return sum(count for count, _ in counts.values())
+
+    def _upsert_phrases(self, rows: list[dict]) -> None:
+        if not rows:
+            return
+        table = DoctorPhraseHistory.__table__
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            for row in rows:
+                existing = self.db.query(DoctorPhraseHistory).filter(
+                    DoctorPhraseHistory.doctor_id == row["doctor_id"],
+                    DoctorPhraseHistory.field == row["field"],
+                    DoctorPhraseHistory.phrase == row["phrase"]
+                ).first()
+                if existing:
+                    existing.usage_count += row["usage_count"]
+                    existing.last_used = row["last_used"]
+                else:
+                    self.db.execute(insert(table).values(**row))
+            return
+
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.doctor_id, table.c.field, table.c.phrase],
+            set_={
+                "usage_count": table.c.usage_count + stmt.excluded.usage_count,
+                "last_used": stmt.excluded.last_used,
+            },
+        )
+        self.db.execute(stmt, rows)
+
+    def _checkpoint_setting(self, key: str) -> Setting | None:
+        return self.db.query(Setting).filter(
+            Setting.category == CHECKPOINT_CATEGORY,
+            Setting.key == key
+        ).first()
+
+    def _load_checkpoint(self, key: str) -> int:
+        setting = self._checkpoint_setting(key)
+        if not setting or not setting.value:
+            return 0
+        try:
+            return int(json.loads(setting.value).get("last_emr_id", 0))
+        except (ValueError, TypeError, AttributeError):
+            logger.warning("Ignoring malformed phrase indexer checkpoint %s", key)
+            return 0
+
+    def _save_checkpoint(self, key: str, last_emr_id: int) -> None:
+        value = json.dumps({"last_emr_id": last_emr_id})
+        setting = self._checkpoint_setting(key)
+        if setting:
+            setting.value = value
+        else:
+            self.db.add(Setting(category=CHECKPOINT_CATEGORY, key=key, value=value))
+
+    def _count_ready_doctors(self, doctor_ids: set[int]) -> int:
+        from app.services.doctor_autocomplete_readiness import (
+            DoctorAutocompleteReadiness,
         )
+        readiness_service = DoctorAutocompleteReadiness(self.db)
+        ready = 0
+        for doctor_id in sorted(doctor_ids):
+            if readiness_service.check_readiness(doctor_id).ready:
+                ready += 1
+                logger.info(f"Doctor {doctor_id} is now ready for autocomplete")
+        return ready
 
     # ============================================
     # INCREMENTAL INDEXING (on EMR save)
@@ -266,6 +502,7 @@ class EMRPhraseIndexer:
         from datetime import timedelta
 
         from app.models.doctor_phrase_history import DoctorPhraseHistory
+        from app.services.doctor_phrase_index import phrase_index_cache
 
         cutoff_date = datetime.now(UTC) - timedelta(days=max_age_days)
 
@@ -276,6 +513,7 @@ class EMRPhraseIndexer:
         ).delete()
 
         self.db.commit()
+        phrase_index_cache.invalidate(doctor_id)
 
         return deleted
 
@@ -11,7 +11,9 @@ import os
 import shutil
 import tempfile
 import zipfile
-from datetime import UTC, datetime
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
 from pathlib import Path, PurePosixPath
 from typing import Any
 
@@ -22,6 +24,7 @@ from sqlalchemy.orm import Session
 from app.crud.file_system import (
     file,
     file_access_log,
+    file_blob,
     file_quota,
     file_share,
     file_version,
@@ -47,10 +50,76 @@ from app.schemas.file_system import (
     FileTypeEnum,
     FileUploadRequest,
 )
+from app.services.image_compression_service import get_image_processing_pool
 
 logger = logging.getLogger(__name__)
 
 FILE_READ_CHUNK_BYTES = 1024 * 1024
+EXPORT_CHUNK_BYTES = 256 * 1024
+
+# Уже сжатые форматы кладутся в экспорт без сжатия (ZIP_STORED):
+# повторный deflate почти не уменьшает размер, но тратит CPU
+STORED_MIME_TYPES = frozenset(
+    {
+        "application/pdf",
+        "application/zip",
+        "application/gzip",
+        "application/x-7z-compressed",
+        "application/x-rar-compressed",
+        "image/jpeg",
+        "image/png",
+        "image/gif",
+        "image/webp",
+    }
+)
+STORED_MIME_PREFIXES = ("video/", "audio/")
+
+
+@dataclass(frozen=True, slots=True)
+class _ExportEntry:
+    file_path: str
+    arcname: str
+    mime_type: str | None
+    metadata: dict[str, Any] | None
+
+
+class _ZipSink:
+    """Приёмник для zipfile.ZipFile: копит записанные байты до выдачи в ответ"""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> Iterator[bytes]:
+        if self._chunks:
+            data = b"".join(self._chunks)
+            self._chunks.clear()
+            yield data
+
+
+def _export_compress_type(mime_type: str | None) -> int:
+    mime_type = (mime_type or "").lower()
+    if mime_type in STORED_MIME_TYPES or mime_type.startswith(STORED_MIME_PREFIXES):
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+def _unique_arcname(name: str, used_names: set[str]) -> str:
+    """Имя записи без повторов: file.pdf, file (2).pdf, ..."""
+    candidate = name
+    stem, suffix = os.path.splitext(name)
+    counter = 2
+    while candidate in used_names:
+        candidate = f"{stem} ({counter}){suffix}"
+        counter += 1
+    used_names.add(candidate)
+    return candidate
 
 
 class FileSystemService:
@@ -59,6 +128,18 @@ class FileSystemService:
     def __init__(self):
         self.base_storage_path = os.getenv("FILE_STORAGE_PATH", "storage/files")
         self.temp_storage_path = os.getenv("TEMP_STORAGE_PATH", "storage/temp")
+        # Загрузки пишутся сюда и переименовываются в хранилище - та же ФС,
+        # поэтому os.replace атомарен
+        self.incoming_storage_path = os.path.join(self.base_storage_path, ".incoming")
+        # Содержимое файлов по SHA-256: blobs/ab/cd/abcd... (см. FileBlob)
+        self.blob_storage_path = os.path.join(self.base_storage_path, "blobs")
+        self.blob_gc_grace_seconds = int(os.getenv("FILE_BLOB_GC_GRACE_SECONDS", 3600))
+        self.blob_gc_batch_size = int(os.getenv("FILE_BLOB_GC_BATCH_SIZE", 500))
+        # Миниатюры и веб-версии изображений по хешу blob: их считает
+        # общий пул обработки изображений и хранит в своём кеше
+        # (IMAGE_DERIVATIVE_PATH, по умолчанию FILE_STORAGE_PATH/derivatives)
+        self.image_pool = get_image_processing_pool()
+        self.derivative_cache = self.image_pool.cache
         self.max_file_size = int(os.getenv("MAX_FILE_SIZE", 100 * 1024 * 1024))  # 100MB
         self.max_import_archive_size = int(
             os.getenv("MAX_IMPORT_ARCHIVE_SIZE", self.max_file_size)
@@ -85,38 +166,66 @@ class FileSystemService:
         # Создаем директории если их нет
         self._ensure_directories()
 
-    def _read_upload_file_limited(
+    def _spool_upload_file(
         self, upload_file: UploadFile, max_bytes: int
-    ) -> tuple[bytes, int]:
-        chunks: list[bytes] = []
+    ) -> tuple[str, int, str]:
+        """Записать загрузку во временный файл рядом с хранилищем.
+
+        SHA-256 считается по ходу чтения, в памяти одновременно не больше
+        FILE_READ_CHUNK_BYTES. Возвращает (временный путь, размер, хеш);
+        временный файл затем переносится в хранилище (_move_into_storage)
+        или удаляется (_discard_spooled_file).
+        """
+        os.makedirs(self.incoming_storage_path, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self.incoming_storage_path, suffix=".part")
+        digest = hashlib.sha256()
         total_size = 0
 
-        while True:
-            chunk = upload_file.file.read(FILE_READ_CHUNK_BYTES)
-            if not chunk:
-                break
+        try:
+            with os.fdopen(fd, "wb") as target:
+                while True:
+                    chunk = upload_file.file.read(FILE_READ_CHUNK_BYTES)
+                    if not chunk:
+                        break
+
+                    total_size += len(chunk)
+                    if total_size > max_bytes:
+                        raise HTTPException(
+                            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=(
+                                f"Файл слишком большой. Максимальный размер: {max_bytes} байт"
+                            ),
+                        )
+                    digest.update(chunk)
+                    target.write(chunk)
 
-            total_size += len(chunk)
-            if total_size > max_bytes:
-                raise HTTPException(
-                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                    detail=(
-                        f"Файл слишком большой. Максимальный размер: {max_bytes} байт"
-                    ),
-                )
-            chunks.append(chunk)
+                target.flush()
+                os.fsync(target.fileno())
+        except BaseException:
+            self._discard_spooled_file(temp_path)
+            raise
 
-        return b"".join(chunks), total_size
+        return temp_path, total_size, digest.hexdigest()
+
+    @staticmethod
+    def _move_into_storage(temp_path: str, file_path: str) -> None:
+        """Атомарно поставить файл на место: читатели видят либо старый, либо целый."""
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        os.replace(temp_path, file_path)
+
+    @staticmethod
+    def _discard_spooled_file(temp_path: str) -> None:
+        try:
+            os.unlink(temp_path)
+        except FileNotFoundError:
+            pass  # уже перенесён в хранилище
 
     def _ensure_directories(self):
         """Создать необходимые директории"""
         os.makedirs(self.base_storage_path, exist_ok=True)
         os.makedirs(self.temp_storage_path, exist_ok=True)
-
-        # Создаем поддиректории по годам и месяцам
-        current_date = datetime.now()
-        year_month = current_date.strftime("%Y/%m")
-        os.makedirs(os.path.join(self.base_storage_path, year_month), exist_ok=True)
+        os.makedirs(self.incoming_storage_path, exist_ok=True)
+        os.makedirs(self.blob_storage_path, exist_ok=True)
 
     def _get_file_type(self, filename: str, mime_type: str) -> FileType:
         """Определить тип файла по имени и MIME типу"""
@@ -140,10 +249,6 @@ class FileSystemService:
 
         return FileType.OTHER
 
-    def _generate_file_hash(self, file_content: bytes) -> str:
-        """Генерировать SHA-256 хеш файла"""
-        return hashlib.sha256(file_content).hexdigest()
-
     @staticmethod
     def _share_is_not_expired(share: Any) -> bool:
         expires_at = getattr(share, "expires_at", None)
@@ -225,30 +330,50 @@ class FileSystemService:
             with zipf.open(info) as source, target_path.open("wb") as target:
                 shutil.copyfileobj(source, target, length=1024 * 1024)
 
-    def _generate_file_path(self, filename: str, file_hash: str) -> str:
-        """Генерировать путь для сохранения файла.
+    def _blob_path(self, sha256: str) -> str:
+        """Путь blob в хранилище: два уровня шардирования по префиксу хеша.
 
-        FILES-AUDIT-28 P0-1: sanitize filename to prevent path traversal.
-        Раньше `../../etc/passwd` в filename мог выйти за пределы storage dir.
+        Имя файла - только хеш, поэтому пользовательское имя не попадает
+        в путь на диске (FILES-AUDIT-28 P0-1: path traversal).
         """
-        # Используем первые 2 символа хеша для создания поддиректории
-        hash_prefix = file_hash[:2]
-        current_date = datetime.now()
-        year_month = current_date.strftime("%Y/%m")
-
-        # Создаем уникальное имя файла
-        name, ext = os.path.splitext(filename)
-        # Sanitize: remove path separators, dots-only names, null bytes
-        safe_name = os.path.basename(name)  # strips directory components
-        safe_name = safe_name.replace("..", "").replace("/", "").replace("\\", "").replace("\x00", "")
-        if not safe_name or safe_name.startswith("."):
-            safe_name = "file"
-        safe_ext = os.path.splitext(ext)[1]  # just the extension
-        unique_filename = f"{file_hash[:8]}_{safe_name}{safe_ext}"
-
-        return os.path.join(
-            self.base_storage_path, year_month, hash_prefix, unique_filename
+        return os.path.join(self.blob_storage_path, sha256[:2], sha256[2:4], sha256)
+
+    def _store_blob(
+        self, db: Session, temp_path: str, sha256: str, size: int
+    ) -> tuple[str, bool]:
+        """Сослаться на содержимое по хешу и вернуть (путь, создан ли файл).
+
+        Дубликат не пишется на диск повторно: временный файл переносится в
+        хранилище, только если такого содержимого там ещё нет. Созданный
+        файл до commit принадлежит вызывающему: при ошибке его нужно убрать
+        (_discard_uncommitted_blob), иначе он останется без строки FileBlob.
+        """
+        blob = file_blob.acquire(
+            db, sha256=sha256, size=size, storage_path=self._blob_path(sha256)
         )
+        if not os.path.exists(blob.storage_path):
+            blob.storage_path = self._blob_path(sha256)
+            self._move_into_storage(temp_path, blob.storage_path)
+            logger.info(f"Создан новый blob: {sha256[:8]}...")
+            return blob.storage_path, True
+        logger.info(f"Используется существующий blob по хешу: {sha256[:8]}...")
+        return blob.storage_path, False
+
+    @staticmethod
+    def _discard_uncommitted_blob(blob_path: str | None) -> None:
+        """Удалить файл blob, созданный в транзакции, которая не зафиксирована.
+
+        Вызывается до отката: пока строка FileBlob заблокирована этой
+        транзакцией, параллельная загрузка того же содержимого ждёт и затем
+        сама положит файл на место.
+        """
+        if blob_path is None:
+            return
+        try:
+            os.unlink(blob_path)
+            logger.info(f"Удалён незафиксированный blob: {os.path.basename(blob_path)[:8]}...")
+        except FileNotFoundError:
+            pass
 
     def _check_file_quota(
         self, db: Session, user_id: int, file_size: int
@@ -346,10 +471,12 @@ class FileSystemService:
         user_id: int,
     ) -> File:
         """Загрузить файл"""
+        temp_path: str | None = None
+        new_blob_path: str | None = None
         try:
             self._validate_upload_context(db, file_data)
 
-            file_content, file_size = self._read_upload_file_limited(
+            temp_path, file_size, file_hash = self._spool_upload_file(
                 upload_file, self.max_file_size
             )
 
@@ -369,35 +496,11 @@ class FileSystemService:
             )
             _file_type = self._get_file_type(upload_file.filename, mime_type)
 
-            # Генерируем хеш файла
-            file_hash = self._generate_file_hash(file_content)
-
-            # Проверяем, не загружен ли уже такой файл
-            existing_file = file.get_by_hash(db, file_hash=file_hash)
-
-            # ✅ CERTIFICATION: Всегда генерируем file_path для нового файла
-            # Используем существующий путь только если файл физически существует
-            if (
-                existing_file
-                and existing_file.file_path
-                and os.path.exists(existing_file.file_path)
-            ):
-                # Дедупликация: используем существующий файл
-                file_path = existing_file.file_path
-                logger.info(
-                    f"Используется существующий файл по хешу: {file_hash[:8]}... (путь: {file_path})"
-                )
-            else:
-                # Генерируем путь для нового файла
-                file_path = self._generate_file_path(upload_file.filename, file_hash)
-
-                # Создаем директорию если нужно
-                os.makedirs(os.path.dirname(file_path), exist_ok=True)
-
-                # Сохраняем файл
-                with open(file_path, 'wb') as f:
-                    f.write(file_content)
-                logger.info(f"Создан новый файл: {file_path}")
+            # Дедупликация: одинаковое содержимое хранится одним blob,
+            # ссылка фиксируется в той же транзакции, что и запись File
+            file_path, blob_created = self._store_blob(db, temp_path, file_hash, file_size)
+            if blob_created:
+                new_blob_path = file_path
 
             # ✅ CERTIFICATION: file_path всегда установлен перед созданием FileCreate
             assert (
@@ -446,6 +549,7 @@ class FileSystemService:
             db_file.status = FileStatusEnum.READY
             db.add(db_file)
             db.commit()
+            new_blob_path = None  # blob зафиксирован вместе с записью File
 
             # Обновляем квоту пользователя
             file_quota.update_usage(
@@ -460,13 +564,19 @@ class FileSystemService:
             return db_file
 
         except HTTPException:
+            self._discard_uncommitted_blob(new_blob_path)
             raise
         except Exception as e:
             logger.error(f"Ошибка загрузки файла: {e}")
+            self._discard_uncommitted_blob(new_blob_path)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="Внутренняя ошибка",
             )
+        finally:
+            # Дубликат по хешу или ошибка - временный файл больше не нужен
+            if temp_path is not None:
+                self._discard_spooled_file(temp_path)
 
     def get_file(
         self, db: Session, file_id: int, user_id: int | None = None
@@ -491,9 +601,17 @@ class FileSystemService:
         return file_obj.status == FileStatusEnum.DELETED
 
     def _check_file_access(
-        self, db: Session, file_obj: File, user_id: int | None
+        self,
+        db: Session,
+        file_obj: File,
+        user_id: int | None,
+        shares: list[FileShare] | None = None,
     ) -> bool:
-        """Проверить права доступа к файлу"""
+        """Проверить права доступа к файлу.
+
+        shares - заранее загруженные совместные использования файла
+        (для пакетных операций); по умолчанию читаются из БД.
+        """
         if not user_id:
             return file_obj.permission == FilePermissionEnum.PUBLIC
 
@@ -502,7 +620,8 @@ class FileSystemService:
             return True
 
         # Проверяем совместное использование
-        shares = file_share.get_file_shares(db, file_id=file_obj.id)
+        if shares is None:
+            shares = file_share.get_file_shares(db, file_id=file_obj.id)
         for share in shares:
             if share.shared_with_user_id == user_id and self._share_is_not_expired(
                 share
@@ -524,8 +643,12 @@ class FileSystemService:
 
     def download_file(
         self, db: Session, file_id: int, user_id: int | None = None
-    ) -> tuple[bytes, str, str]:
-        """Скачать файл"""
+    ) -> tuple[str, str, str]:
+        """Скачать файл: (путь на диске, имя, MIME тип).
+
+        Содержимое не читается в память - эндпоинт отдаёт файл по пути
+        кусками (FileResponse, с поддержкой HTTP Range).
+        """
         db_file = self.get_file(db, file_id, user_id)
         if not db_file:
             raise HTTPException(
@@ -538,17 +661,27 @@ class FileSystemService:
                 status_code=status.HTTP_404_NOT_FOUND, detail="Файл не найден на диске"
             )
 
-        # Читаем файл
-        with open(db_file.file_path, 'rb') as f:
-            file_content = f.read()
-
         # Логируем скачивание
         if user_id:
             file_access_log.create(
                 db, file_id=file_id, user_id=user_id, action="download"
             )
 
-        return file_content, db_file.filename, db_file.mime_type
+        return db_file.file_path, db_file.filename, db_file.mime_type
+
+    async def render_image_preview(
+        self, file_path: str, file_hash: str | None
+    ) -> tuple[bytes, str]:
+        """Веб-версия изображения для предпросмотра и её MIME-тип.
+
+        Считается в пуле процессов, а не в event loop, и кешируется по хешу
+        blob: повторный просмотр того же содержимого файл не читает и не
+        перекодирует. PNG/WebP с прозрачностью остаются в своём формате.
+        """
+        preview, metadata = await self.image_pool.web_version_of_file(
+            file_path, source_hash=file_hash or None
+        )
+        return preview, f"image/{metadata['output_format'].lower()}"
 
     def search_files(
         self, db: Session, search_request: FileSearchRequest, user_id: int
@@ -599,12 +732,29 @@ class FileSystemService:
                 detail="Нет прав для замены содержимого файла",
             )
 
-        new_content, new_size = self._read_upload_file_limited(
+        temp_path, new_size, new_hash = self._spool_upload_file(
             new_file, self.max_file_size
         )
+        try:
+            return self._replace_with_spooled_file(
+                db, db_file, new_file, user_id, change_description,
+                temp_path, new_size, new_hash,
+            )
+        finally:
+            self._discard_spooled_file(temp_path)
 
-        # Вычисляем хеш нового содержимого
-        new_hash = self._generate_file_hash(new_content)
+    def _replace_with_spooled_file(
+        self,
+        db: Session,
+        db_file: File,
+        new_file: UploadFile,
+        user_id: int,
+        change_description: str | None,
+        temp_path: str,
+        new_size: int,
+        new_hash: str,
+    ) -> File:
+        file_id = db_file.id
 
         # Если хеш совпадает, файл не изменился
         if db_file.file_hash == new_hash:
@@ -614,6 +764,7 @@ class FileSystemService:
             )
 
         # ✅ CERTIFICATION: Создаем версию старого файла перед заменой
+        # (версия забирает ссылку файла на старый blob)
         old_version_data = {
             "file_path": db_file.file_path,
             "file_size": db_file.file_size,
@@ -626,30 +777,26 @@ class FileSystemService:
             db, file_id=file_id, version_data=old_version_data, created_by=user_id
         )
 
-        # Генерируем путь для нового файла
-        new_file_path = self._generate_file_path(
-            new_file.filename or db_file.filename, new_hash
-        )
-
-        # Создаем директорию если нужно
-        os.makedirs(os.path.dirname(new_file_path), exist_ok=True)
-
-        # Сохраняем новый файл
-        with open(new_file_path, 'wb') as f:
-            f.write(new_content)
+        # Новое содержимое - ссылка на blob (дубликат не пишется повторно)
+        new_file_path, blob_created = self._store_blob(db, temp_path, new_hash, new_size)
 
         # Обновляем запись файла
         old_size = db_file.file_size
-        db_file.file_path = new_file_path
-        db_file.file_size = new_size
-        db_file.file_hash = new_hash  # ✅ Обязательный хеш
-        db_file.mime_type = (
-            new_file.content_type
-            or mimetypes.guess_type(new_file.filename)[0]
-            or db_file.mime_type
-        )
-        db.add(db_file)
-        db.commit()
+        try:
+            db_file.file_path = new_file_path
+            db_file.file_size = new_size
+            db_file.file_hash = new_hash  # ✅ Обязательный хеш
+            db_file.mime_type = (
+                new_file.content_type
+                or mimetypes.guess_type(new_file.filename)[0]
+                or db_file.mime_type
+            )
+            db.add(db_file)
+            db.commit()
+        except BaseException:
+            if blob_created:
+                self._discard_uncommitted_blob(new_file_path)
+            raise
         db.refresh(db_file)
 
         # Обновляем квоту (разница в размере)
@@ -711,63 +858,133 @@ class FileSystemService:
 
     def export_files(
         self, db: Session, export_request: FileExportRequest, user_id: int
-    ) -> str:
-        """Экспортировать файлы в архив"""
-        # Получаем файлы для экспорта
-        files_to_export = []
-        for file_id in export_request.file_ids:
-            db_file = self.get_file(db, file_id, user_id)
-            if db_file:
-                files_to_export.append(db_file)
+    ) -> Iterator[bytes]:
+        """Экспортировать файлы в ZIP архив, который отдаётся потоком.
+
+        Файлы и права проверяются сразу (ошибки - до первого байта ответа),
+        архив собирается по мере чтения итератора и нигде не хранится.
+        """
+        if export_request.format != "zip":
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Only ZIP exports are supported",
+            )
 
+        files_to_export = self._get_files_for_export(
+            db, export_request.file_ids, user_id
+        )
         if not files_to_export:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Файлы для экспорта не найдены",
             )
 
-        # Создаем временный архив
-        temp_dir = tempfile.mkdtemp()
-        archive_path = os.path.join(
-            temp_dir,
-            f"export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_request.format}",
-        )
+        entries = [
+            self._export_entry(db_file, export_request.include_metadata)
+            for db_file in files_to_export
+        ]
+        return self._stream_zip(entries)
+
+    def _get_files_for_export(
+        self, db: Session, file_ids: list[int], user_id: int
+    ) -> list[File]:
+        """Доступные пользователю файлы в порядке запроса (без запроса на файл)"""
+        requested_ids = list(dict.fromkeys(file_ids))
+        files_by_id = {
+            db_file.id: db_file
+            for db_file in file.get_by_ids(db, ids=requested_ids)
+            if not self._is_deleted_file(db_file)
+        }
 
-        try:
-            with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for db_file in files_to_export:
-                    if os.path.exists(db_file.file_path):
-                        # Добавляем файл в архив
-                        arcname = db_file.original_filename
-                        zipf.write(db_file.file_path, arcname)
-
-                        # Добавляем метаданные если нужно
-                        if export_request.include_metadata:
-                            metadata = {
-                                "filename": db_file.filename,
-                                "original_filename": db_file.original_filename,
-                                "file_type": db_file.file_type,
-                                "mime_type": db_file.mime_type,
-                                "file_size": db_file.file_size,
-                                "title": db_file.title,
-                                "description": db_file.description,
-                                "tags": db_file.tags,
-                                "created_at": db_file.created_at.isoformat(),
-                                "updated_at": db_file.updated_at.isoformat(),
-                            }
-                            zipf.writestr(
-                                f"{arcname}.metadata.json",
-                                json.dumps(metadata, ensure_ascii=False, indent=2),
-                            )
+        shares_by_file: dict[int, list[FileShare]] = {
+            file_id: [] for file_id in files_by_id
+        }
+        foreign_file_ids = [
+            db_file.id for db_file in files_by_id.values() if db_file.owner_id != user_id
+        ]
+        for share in file_share.get_shares_for_files(db, file_ids=foreign_file_ids):
+            shares_by_file[share.file_id].append(share)
+
+        files_to_export = [
+            files_by_id[file_id]
+            for file_id in requested_ids
+            if file_id in files_by_id
+            and self._check_file_access(
+                db, files_by_id[file_id], user_id, shares_by_file[file_id]
+            )
+        ]
+
+        if files_to_export:
+            file_access_log.create_many(
+                db,
+                file_ids=[db_file.id for db_file in files_to_export],
+                user_id=user_id,
+                action="download",
+            )
+        return files_to_export
 
-            return archive_path
+    @staticmethod
+    def _export_entry(db_file: File, include_metadata: bool) -> "_ExportEntry":
+        # Всё нужное читается из ORM заранее: итератор архива выполняется
+        # уже после выхода из обработчика запроса
+        metadata = None
+        if include_metadata:
+            metadata = {
+                "filename": db_file.filename,
+                "original_filename": db_file.original_filename,
+                "file_type": db_file.file_type,
+                "mime_type": db_file.mime_type,
+                "file_size": db_file.file_size,
+                "title": db_file.title,
+                "description": db_file.description,
+                "tags": db_file.tags,
+                "created_at": db_file.created_at.isoformat(),
+                "updated_at": db_file.updated_at.isoformat(),
+            }
+        return _ExportEntry(
+            file_path=db_file.file_path,
+            arcname=db_file.original_filename,
+            mime_type=db_file.mime_type,
+            metadata=metadata,
+        )
 
-        except Exception as e:
-            logger.error(f"Ошибка создания архива: {e}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail="Внутренняя ошибка",
-            )
+    @staticmethod
+    def _stream_zip(entries: list["_ExportEntry"]) -> Iterator[bytes]:
+        """Собирать ZIP кусками: записи сжимаются и отдаются по мере чтения"""
+        sink = _ZipSink()
+        used_names: set[str] = set()
+
+        with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zipf:
+            for entry in entries:
+                if not os.path.exists(entry.file_path):
+                    logger.warning(
+                        "Файл экспорта отсутствует на диске: %s", entry.file_path
+                    )
+                    continue
+
+                arcname = _unique_arcname(entry.arcname, used_names)
+                zinfo = zipfile.ZipInfo.from_file(entry.file_path, arcname)
+                zinfo.compress_type = _export_compress_type(entry.mime_type)
+
+                # Приёмник не seekable: zipfile пишет размеры в data descriptor
+                # после данных, file_size из from_file нужен только для ZIP64
+                with open(entry.file_path, "rb") as source, zipf.open(
+                    zinfo, "w"
+                ) as target:
+                    while chunk := source.read(EXPORT_CHUNK_BYTES):
+                        target.write(chunk)
+                        yield from sink.drain()
+                yield from sink.drain()
+
+                if entry.metadata is not None:
+                    zipf.writestr(
+                        _unique_arcname(f"{arcname}.metadata.json", used_names),
+                        json.dumps(entry.metadata, ensure_ascii=False, indent=2),
+                    )
+                    yield from sink.drain()
+
+        # Центральный каталог записывается при закрытии архива
+        yield from sink.drain()
 
     async def import_files(
         self, db: Session, import_request: FileImportRequest, user_id: int
@@ -804,10 +1021,6 @@ class FileSystemService:
                     file_path = os.path.join(root, filename)
 
                     try:
-                        # Читаем файл
-                        with open(file_path, 'rb') as f:
-                            file_content = f.read()
-
                         # Определяем тип файла
                         mime_type = (
                             mimetypes.guess_type(filename)[0]
@@ -815,13 +1028,6 @@ class FileSystemService:
                         )
                         file_type = self._get_file_type(filename, mime_type)
 
-                        # Создаем UploadFile объект
-                        upload_file = UploadFile(
-                            filename=filename,
-                            file=io.BytesIO(file_content),
-                            size=len(file_content),
-                        )
-
                         # Создаем данные для загрузки
                         file_data = FileUploadRequest(
                             filename=filename,
@@ -829,8 +1035,14 @@ class FileSystemService:
                             folder_id=import_request.target_folder_id,
                         )
 
-                        # Загружаем файл
-                        await self.upload_file(db, upload_file, file_data, user_id)
+                        # Загружаем файл потоково, прямо из распакованной копии
+                        with open(file_path, 'rb') as f:
+                            upload_file = UploadFile(
+                                filename=filename,
+                                file=f,
+                                size=os.path.getsize(file_path),
+                            )
+                            self.upload_file(db, upload_file, file_data, user_id)
                         processed_files += 1
 
                     except Exception:
@@ -893,13 +1105,14 @@ class FileSystemService:
             .all()
         )
 
-        # Использование квоты
+        # Использование квоты и фактический объём на диске (с учётом дедупликации)
         quota = file_quota.get_user_quota(db, user_id=user_id)
         storage_usage = {
             "used_bytes": quota.used_storage_bytes if quota else 0,
             "max_bytes": quota.max_storage_bytes if quota else 0,
             "used_files": quota.used_files if quota else 0,
             "max_files": quota.max_files if quota else 0,
+            **file_blob.get_storage_stats(db, owner_id=user_id),
         }
 
         return {
@@ -915,6 +1128,49 @@ class FileSystemService:
         """Очистить истекшие файлы"""
         return file.cleanup_expired_files(db)
 
+    def collect_unreferenced_blobs(
+        self, db: Session, batch_size: int | None = None
+    ) -> dict[str, int]:
+        """Удалить с диска blob без ссылок (одна порция, для периодической задачи).
+
+        Blob удаляется, только если ссылок нет дольше grace-периода. Файл
+        удаляется до commit удаления строки: параллельная загрузка того же
+        содержимого либо успела взять ссылку (строка не удаляется), либо
+        ждёт commit и затем пишет содержимое заново.
+        """
+        cutoff = datetime.now(UTC) - timedelta(seconds=self.blob_gc_grace_seconds)
+        # Значения читаются заранее: после commit объекты ORM истекают
+        candidates = [
+            (blob.sha256, blob.storage_path, blob.size)
+            for blob in file_blob.get_unreferenced(
+                db, older_than=cutoff, limit=batch_size or self.blob_gc_batch_size
+            )
+        ]
+
+        collected = 0
+        freed_bytes = 0
+        for sha256, storage_path, size in candidates:
+            if not file_blob.delete_unreferenced(db, sha256=sha256):
+                continue
+            try:
+                os.unlink(storage_path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Не удалось удалить blob {sha256[:8]}...: {e}")
+                db.rollback()
+                break
+            db.commit()
+            # Производные удалённого содержимого тоже не должны оставаться
+            self.derivative_cache.discard(sha256)
+            collected += 1
+            freed_bytes += size
+        db.commit()  # снять блокировки пропущенных кандидатов
+
+        if collected:
+            logger.info(f"GC blob-хранилища: удалено {collected}, освобождено {freed_bytes} байт")
+        return {"collected": collected, "freed_bytes": freed_bytes}
+
 
 # Глобальный экземпляр сервиса
 file_system_service = FileSystemService()
@@ -29,6 +29,7 @@ from app.models.refund_deposit import (
 )
 from app.models.visit import Visit
 from app.services.fcm_service import get_fcm_service
+from app.services.queue_svc._numbering import allocate_queue_number
 
 logger = logging.getLogger(__name__)
 
@@ -128,11 +129,13 @@ class ForceMajeureService:
         failed = []
         notification_targets = []
 
-        # Получаем следующий номер в очереди на завтра
-        next_number = self._get_next_queue_number(tomorrow_queue.id)
-
         for entry in entries:
             try:
+                # Номер выдаёт счётчик очереди - так же, как при обычной регистрации
+                next_number = allocate_queue_number(self.db, tomorrow_queue.id, start_number=1)
+                if next_number is None:
+                    raise ForceMajeureError(f"DailyQueue {tomorrow_queue.id} not found")
+
                 # Создаём новую запись на завтра
                 new_entry = OnlineQueueEntry(
                     queue_id=tomorrow_queue.id,
@@ -181,8 +184,6 @@ class ForceMajeureService:
                         "new_date": tomorrow
                     })
 
-                next_number += 1
-
             except Exception as e:
                 logger.error(f"Ошибка при переносе записи {entry.id}: {e}")
                 failed.append({
@@ -358,15 +359,6 @@ class ForceMajeureService:
 
         return queue
 
-    def _get_next_queue_number(self, queue_id: int) -> int:
-        """Получить следующий номер в очереди с учётом приоритета"""
-        max_number = self.db.query(OnlineQueueEntry.number).filter(
-            OnlineQueueEntry.queue_id == queue_id,
-            OnlineQueueEntry.status != "cancelled"
-        ).order_by(OnlineQueueEntry.number.desc()).first()
-
-        return (max_number[0] + 1) if max_number else 1
-
     def _get_payment_for_entry(self, entry: OnlineQueueEntry) -> Payment | None:
         """Получить платёж для записи"""
         if not entry.visit_id:
@@ -2,12 +2,48 @@
 
 from __future__ import annotations
 
+import os
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from datetime import UTC, date, datetime, timedelta
 
-from sqlalchemy.orm import Session
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import SingletonThreadPool, StaticPool
 
 from app.repositories.global_search_api_repository import GlobalSearchApiRepository
 
+# Каждая категория в параллельном поиске держит своё соединение из пула
+SEARCH_WORKERS = int(os.getenv("GLOBAL_SEARCH_WORKERS", "8"))
+
+_search_executor: ThreadPoolExecutor | None = None
+
+
+def _get_search_executor() -> ThreadPoolExecutor:
+    global _search_executor
+    if _search_executor is None:
+        _search_executor = ThreadPoolExecutor(
+            max_workers=SEARCH_WORKERS, thread_name_prefix="global-search"
+        )
+    return _search_executor
+
+
+def _independent_session_factory(db: Session | None) -> Callable[[], Session] | None:
+    """Фабрика отдельных сессий для параллельного поиска по категориям.
+
+    Только для сессии, привязанной к Engine с настоящим пулом: сессия на
+    Connection (внешняя транзакция, тесты) не видна из других соединений,
+    а StaticPool/SingletonThreadPool отдают потокам одно и то же соединение.
+    """
+    if db is None or SEARCH_WORKERS < 2:
+        return None
+    bind = db.get_bind()
+    if not isinstance(bind, Engine) or isinstance(
+        bind.pool, (StaticPool, SingletonThreadPool)
+    ):
+        return None
+    return sessionmaker(bind=bind, autoflush=False)
+
 
 class GlobalSearchApiService:
     """Aggregates global search results and handles audit logging."""
@@ -16,69 +52,93 @@ class GlobalSearchApiService:
         self,
         db: Session,
         repository: GlobalSearchApiRepository | None = None,
+        session_factory: Callable[[], Session] | None = None,
     ):
         self.repository = repository or GlobalSearchApiRepository(db)
+        if session_factory is None and repository is None:
+            session_factory = _independent_session_factory(db)
+        self._session_factory = session_factory
 
     def search_patients(self, *, query: str, limit: int) -> list[dict]:
-        results = []
+        return self._search_patients(self.repository, query, limit)
+
+    def search_visits(self, *, query: str, limit: int) -> list[dict]:
+        return self._search_visits(self.repository, query, limit)
+
+    def search_lab_results(self, *, query: str, limit: int) -> list[dict]:
+        return self._search_lab_results(self.repository, query, limit)
+
+    def search_all(self, *, query: str, limit: int):
+        """Все три категории; при наличии пула - параллельно в своих сессиях,
+        так что задержка равна самой медленной категории, а не сумме."""
+        searches = (self._search_patients, self._search_visits, self._search_lab_results)
+        if self._session_factory is None:
+            patients, visits, lab_results = (
+                search(self.repository, query, limit) for search in searches
+            )
+            return patients, visits, lab_results
+
+        executor = _get_search_executor()
+        futures = [
+            executor.submit(self._search_isolated, search, query, limit)
+            for search in searches
+        ]
+        patients, visits, lab_results = (future.result() for future in futures)
+        return patients, visits, lab_results
+
+    def _search_isolated(self, search, query: str, limit: int) -> list[dict]:
+        with self._session_factory() as db:
+            return search(GlobalSearchApiRepository(db), query, limit)
+
+    @classmethod
+    def _search_patients(cls, repository, query: str, limit: int) -> list[dict]:
+        results: dict[int, dict] = {}
         if query.isdigit():
-            patient = self.repository.get_patient(int(query))
+            patient = repository.get_patient(int(query))
             if patient:
-                results.append(self._patient_payload(patient))
+                results[patient.id] = cls._patient_payload(patient)
 
-        for patient in self.repository.search_patients(query=query, limit=limit):
-            if not any(result["id"] == patient.id for result in results):
-                results.append(self._patient_payload(patient))
+        for patient in repository.search_patients(query=query, limit=limit):
+            if patient.id not in results:
+                results[patient.id] = cls._patient_payload(patient)
 
-        return results[:limit]
+        return list(results.values())[:limit]
 
-    def search_visits(self, *, query: str, limit: int) -> list[dict]:
-        results = []
+    @classmethod
+    def _search_visits(cls, repository, query: str, limit: int) -> list[dict]:
+        results: dict[int, dict] = {}
         if query.isdigit():
-            visit = self.repository.get_visit(int(query))
-            if visit:
-                patient = self.repository.get_patient(visit.patient_id)
-                results.append(self._visit_payload(visit, patient))
+            row = repository.get_visit_with_patient(int(query))
+            if row:
+                visit, patient = row
+                results[visit.id] = cls._visit_payload(visit, patient)
 
-        for visit in self.repository.search_recent_visits_by_patient_name(
+        for visit, patient in repository.search_recent_visits_by_patient_name(
             query=query,
             since_date=date.today() - timedelta(days=7),
             limit=limit,
         ):
-            if not any(result["id"] == visit.id for result in results):
-                patient = self.repository.get_patient(visit.patient_id)
-                results.append(self._visit_payload(visit, patient))
+            if visit.id not in results:
+                results[visit.id] = cls._visit_payload(visit, patient)
 
-        return results[:limit]
+        return list(results.values())[:limit]
 
-    def search_lab_results(self, *, query: str, limit: int) -> list[dict]:
-        results = []
+    @classmethod
+    def _search_lab_results(cls, repository, query: str, limit: int) -> list[dict]:
+        results: dict[int, dict] = {}
         if query.isdigit():
-            order = self.repository.get_lab_order(int(query))
-            if order:
-                patient = (
-                    self.repository.get_patient(order.patient_id)
-                    if order.patient_id
-                    else None
-                )
-                results.append(self._lab_payload(order, patient))
-
-        for order in self.repository.search_lab_orders_by_patient_name(query=query, limit=limit):
-            if not any(result["id"] == order.id for result in results):
-                patient = (
-                    self.repository.get_patient(order.patient_id)
-                    if order.patient_id
-                    else None
-                )
-                results.append(self._lab_payload(order, patient))
-
-        return results[:limit]
+            row = repository.get_lab_order_with_patient(int(query))
+            if row:
+                order, patient = row
+                results[order.id] = cls._lab_payload(order, patient)
 
-    def search_all(self, *, query: str, limit: int):
-        patients = self.search_patients(query=query, limit=limit)
-        visits = self.search_visits(query=query, limit=limit)
-        lab_results = self.search_lab_results(query=query, limit=limit)
-        return patients, visits, lab_results
+        for order, patient in repository.search_lab_orders_by_patient_name(
+            query=query, limit=limit
+        ):
+            if order.id not in results:
+                results[order.id] = cls._lab_payload(order, patient)
+
+        return list(results.values())[:limit]
 
     def log_search_query(
         self,
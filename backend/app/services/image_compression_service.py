@@ -1,14 +1,57 @@
 """
 Image Compression Service
 Сервис для оптимизации и сжатия изображений
+
+Pillow нагружает CPU, поэтому из обработчиков запросов изображения
+обрабатываются через ImageProcessingPool: пул процессов с ограниченной
+очередью. Производные (миниатюра, веб-версия) сохраняются на диск по хешу
+исходника и параметрам (ImageDerivativeCache) и считаются один раз.
 """
+import asyncio
+import hashlib
 import io
+import json
 import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
 
 from PIL import Image
 
+from app.core.prometheus import (
+    record_image_derivative_cache,
+    record_image_processing,
+    set_image_queue_depth,
+)
+
 logger = logging.getLogger(__name__)
 
+# 0 - обработка в потоке вместо процессов (окружения без fork, тесты)
+IMAGE_POOL_WORKERS = int(os.getenv("IMAGE_POOL_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Сколько изображений может ждать или обрабатываться одновременно
+IMAGE_QUEUE_SIZE = int(os.getenv("IMAGE_QUEUE_SIZE", "32"))
+IMAGE_DERIVATIVE_PATH = os.getenv(
+    "IMAGE_DERIVATIVE_PATH",
+    os.path.join(os.getenv("FILE_STORAGE_PATH", "storage/files"), "derivatives"),
+)
+
+# Как в Image.thumbnail: JPEG декодируется уменьшенным (DCT scaling),
+# но не меньше удвоенного целевого размера - дальше LANCZOS
+DRAFT_REDUCING_GAP = 2.0
+
+# Форматы, в которых веб-версия сохраняет прозрачность исходника
+ALPHA_WEB_FORMATS = frozenset({"PNG", "WEBP"})
+
+
+class ImageQueueFullError(RuntimeError):
+    """Очередь обработки изображений заполнена"""
+
 
 class ImageCompressor:
     """
@@ -77,94 +120,22 @@ class ImageCompressor:
             Tuple[bytes, dict]: Сжатые данные и метаданные
         """
         try:
-            # Открываем изображение
-            img = Image.open(io.BytesIO(image_data))
-
-            # Сохраняем оригинальные данные
-            original_size = len(image_data)
-            original_dimensions = img.size
-            original_format = img.format
-
-            # EXIF данные
-            exif_data = None
-            if preserve_exif and hasattr(img, '_getexif'):
-                try:
-                    exif_data = img.info.get('exif')
-                except Exception:
-                    pass
-
-            # Конвертируем RGBA в RGB для JPEG
             target_format = output_format or self.output_format
-            if target_format == "JPEG" and img.mode in ('RGBA', 'P'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[3] if img.mode == 'RGBA' else None)
-                img = background
-            elif img.mode not in ('RGB', 'RGBA', 'L'):
-                img = img.convert('RGB')
-
-            # Изменяем размер если нужно
-            target_size = max_size or self.max_size
-            if img.size[0] > target_size[0] or img.size[1] > target_size[1]:
-                img.thumbnail(target_size, Image.Resampling.LANCZOS)
+            img, source = self._load(
+                image_data, max_size or self.max_size, target_format, preserve_exif
+            )
 
             # Компрессия
-            output = io.BytesIO()
             target_quality = quality or self.quality
+            compressed_data = self._encode(img, target_format, target_quality, source["exif"])
 
-            save_kwargs = {}
-
-            if target_format == "JPEG":
-                save_kwargs = {
-                    "format": "JPEG",
-                    "quality": target_quality,
-                    "optimize": True,
-                    "progressive": True,
-                }
-                if exif_data:
-                    save_kwargs["exif"] = exif_data
-
-            elif target_format == "PNG":
-                save_kwargs = {
-                    "format": "PNG",
-                    "optimize": True,
-                }
-
-            elif target_format == "WEBP":
-                save_kwargs = {
-                    "format": "WEBP",
-                    "quality": target_quality,
-                    "method": 6,  # Максимальное сжатие
-                }
-                if exif_data:
-                    save_kwargs["exif"] = exif_data
-            else:
-                save_kwargs = {
-                    "format": target_format,
-                }
-
-            img.save(output, **save_kwargs)
-            compressed_data = output.getvalue()
-
-            # Статистика
-            compressed_size = len(compressed_data)
-            compression_ratio = (1 - compressed_size / original_size) * 100 if original_size > 0 else 0
-
-            metadata = {
-                "original_size": original_size,
-                "compressed_size": compressed_size,
-                "compression_ratio": round(compression_ratio, 2),
-                "original_dimensions": original_dimensions,
-                "new_dimensions": img.size,
-                "original_format": original_format,
-                "output_format": target_format,
-                "quality": target_quality,
-            }
+            metadata = self._metadata(
+                image_data, compressed_data, img, source, target_format, target_quality
+            )
 
             logger.info(
-                f"Image compressed: {original_size} -> {compressed_size} bytes "
-                f"({compression_ratio:.1f}% reduction)"
+                f"Image compressed: {metadata['original_size']} -> {metadata['compressed_size']} bytes "
+                f"({metadata['compression_ratio']:.1f}% reduction)"
             )
 
             return compressed_data, metadata
@@ -173,11 +144,143 @@ class ImageCompressor:
             logger.error(f"Image compression error: {e}")
             raise
 
+    def _load(
+        self,
+        image_data: bytes,
+        target_size: tuple[int, int],
+        target_format: str,
+        preserve_exif: bool,
+    ) -> tuple[Image.Image, dict]:
+        """Открыть, привести режим и уменьшить до target_size"""
+        # Открываем изображение
+        img = Image.open(io.BytesIO(image_data))
+        return self._prepare(img, target_size, target_format, preserve_exif)
+
+    def _prepare(
+        self,
+        img: Image.Image,
+        target_size: tuple[int, int],
+        target_format: str,
+        preserve_exif: bool,
+    ) -> tuple[Image.Image, dict]:
+        """Привести режим открытого изображения и уменьшить до target_size"""
+        # Сохраняем оригинальные данные
+        source = {
+            "dimensions": img.size,
+            "format": img.format,
+            "exif": None,
+        }
+
+        # EXIF данные
+        if preserve_exif and hasattr(img, '_getexif'):
+            try:
+                source["exif"] = img.info.get('exif')
+            except Exception:
+                pass
+
+        needs_resize = img.size[0] > target_size[0] or img.size[1] > target_size[1]
+
+        # JPEG уменьшается уже при декодировании (1/2, 1/4, 1/8): быстрее
+        # и без буфера полного размера - важно для фото с камер в десятки Мп
+        if needs_resize and img.format == "JPEG":
+            img.draft(
+                None,
+                (
+                    int(target_size[0] * DRAFT_REDUCING_GAP),
+                    int(target_size[1] * DRAFT_REDUCING_GAP),
+                ),
+            )
+
+        # Конвертируем RGBA в RGB для JPEG
+        if target_format == "JPEG" and img.mode in ('RGBA', 'P'):
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            if img.mode == 'P':
+                img = img.convert('RGBA')
+            background.paste(img, mask=img.split()[3] if img.mode == 'RGBA' else None)
+            img = background
+        elif img.mode not in ('RGB', 'RGBA', 'L'):
+            img = img.convert('RGBA' if _has_alpha(img) else 'RGB')
+
+        # Изменяем размер если нужно
+        if needs_resize:
+            img.thumbnail(target_size, Image.Resampling.LANCZOS)
+
+        return img, source
+
+    @staticmethod
+    def _encode(
+        img: Image.Image,
+        target_format: str,
+        target_quality: int,
+        exif_data: bytes | None = None,
+    ) -> bytes:
+        output = io.BytesIO()
+
+        save_kwargs = {}
+
+        if target_format == "JPEG":
+            save_kwargs = {
+                "format": "JPEG",
+                "quality": target_quality,
+                "optimize": True,
+                "progressive": True,
+            }
+            if exif_data:
+                save_kwargs["exif"] = exif_data
+
+        elif target_format == "PNG":
+            save_kwargs = {
+                "format": "PNG",
+                "optimize": True,
+            }
+
+        elif target_format == "WEBP":
+            save_kwargs = {
+                "format": "WEBP",
+                "quality": target_quality,
+                "method": 6,  # Максимальное сжатие
+            }
+            if exif_data:
+                save_kwargs["exif"] = exif_data
+        else:
+            save_kwargs = {
+                "format": target_format,
+            }
+
+        img.save(output, **save_kwargs)
+        return output.getvalue()
+
+    @staticmethod
+    def _metadata(
+        image_data: bytes,
+        compressed_data: bytes,
+        img: Image.Image,
+        source: dict,
+        target_format: str,
+        target_quality: int,
+    ) -> dict:
+        # Статистика
+        original_size = len(image_data)
+        compressed_size = len(compressed_data)
+        compression_ratio = (1 - compressed_size / original_size) * 100 if original_size > 0 else 0
+
+        return {
+            "original_size": original_size,
+            "compressed_size": compressed_size,
+            "compression_ratio": round(compression_ratio, 2),
+            "original_dimensions": source["dimensions"],
+            "new_dimensions": img.size,
+            "original_format": source["format"],
+            "output_format": target_format,
+            "quality": target_quality,
+        }
+
     def compress_for_web(
         self,
         image_data: bytes,
         target_size_kb: int = 200,
         min_quality: int = 40,
+        keep_alpha: bool = False,
     ) -> tuple[bytes, dict]:
         """
         Сжимает изображение до целевого размера в KB
@@ -187,37 +290,56 @@ class ImageCompressor:
             image_data: Исходные байты
             target_size_kb: Целевой размер в KB
             min_quality: Минимальное качество
+            keep_alpha: PNG/WebP с прозрачностью оставить в своём формате,
+                а не сводить на белый фон в JPEG
 
         Returns:
             Tuple[bytes, dict]: Сжатые данные и метаданные
         """
         target_size_bytes = target_size_kb * 1024
 
+        img = Image.open(io.BytesIO(image_data))
+        target_format = self.output_format
+        if keep_alpha and img.format in ALPHA_WEB_FORMATS and _has_alpha(img):
+            target_format = img.format
+
         # Если уже достаточно маленькое
         if len(image_data) <= target_size_bytes:
-            return self.compress(image_data)
+            return self.compress(image_data, output_format=target_format)
+
+        # Декодируем и уменьшаем один раз - в поиске только кодирование
+        img, source = self._prepare(img, self.max_size, target_format, False)
+
+        # PNG сжимается без потерь - подбирать качество нечего
+        if target_format == "PNG":
+            png_data = self._encode(img, target_format, self.quality)
+            return png_data, self._metadata(
+                image_data, png_data, img, source, target_format, self.quality
+            )
 
         # Бинарный поиск оптимального качества
         low, high = min_quality, 95
         best_data = None
-        best_metadata = None
+        best_quality = min_quality
 
         while low <= high:
             mid = (low + high) // 2
-            compressed, metadata = self.compress(image_data, quality=mid)
+            compressed = self._encode(img, target_format, mid)
 
             if len(compressed) <= target_size_bytes:
                 best_data = compressed
-                best_metadata = metadata
+                best_quality = mid
                 low = mid + 1  # Пробуем более высокое качество
             else:
                 high = mid - 1  # Нужно больше сжатия
 
         if best_data is None:
             # Если не удалось достичь целевого размера, возвращаем минимальное качество
-            best_data, best_metadata = self.compress(image_data, quality=min_quality)
+            best_data = self._encode(img, target_format, min_quality)
 
-        return best_data, best_metadata
+        return best_data, self._metadata(
+            image_data, best_data, img, source, target_format, best_quality
+        )
 
     def create_thumbnail(
         self,
@@ -257,8 +379,285 @@ class ImageCompressor:
         return self.compress(image_data, max_size=size, quality=85)
 
 
+def _has_alpha(img: Image.Image) -> bool:
+    return img.mode in ("RGBA", "LA", "PA") or (
+        img.mode == "P" and "transparency" in img.info
+    )
+
+
+class ImageDerivativeCache:
+    """
+    Производные изображений на диске, по хешу исходника и параметрам
+
+    Раскладка: <root>/<ab>/<sha256>/<операция>-<хеш параметров>.bin (+ .json
+    с метаданными). Все производные исходника лежат в одной директории и
+    удаляются вместе с ним (discard).
+    """
+
+    def __init__(self, root: str = IMAGE_DERIVATIVE_PATH):
+        self.root = root
+
+    @staticmethod
+    def derivative_name(operation: str, params: dict[str, Any]) -> str:
+        canonical = json.dumps(params, sort_keys=True)
+        return f"{operation}-{hashlib.sha256(canonical.encode()).hexdigest()[:16]}"
+
+    def _source_dir(self, source_hash: str) -> str:
+        return os.path.join(self.root, source_hash[:2], source_hash)
+
+    def get(
+        self, source_hash: str, operation: str, params: dict[str, Any]
+    ) -> tuple[bytes, dict] | None:
+        base = os.path.join(
+            self._source_dir(source_hash), self.derivative_name(operation, params)
+        )
+        try:
+            # .json пишется последним: если он есть, данные уже на месте
+            with open(f"{base}.json", encoding="utf-8") as meta_file:
+                metadata = json.load(meta_file)
+            with open(f"{base}.bin", "rb") as data_file:
+                data = data_file.read()
+        except FileNotFoundError:
+            return None
+
+        for key in ("original_dimensions", "new_dimensions"):
+            if isinstance(metadata.get(key), list):
+                metadata[key] = tuple(metadata[key])
+        return data, metadata
+
+    def put(
+        self,
+        source_hash: str,
+        operation: str,
+        params: dict[str, Any],
+        data: bytes,
+        metadata: dict,
+    ) -> None:
+        directory = self._source_dir(source_hash)
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.derivative_name(operation, params))
+        self._write_atomic(f"{base}.bin", data)
+        self._write_atomic(
+            f"{base}.json", json.dumps(metadata, ensure_ascii=False).encode("utf-8")
+        )
+
+    def discard(self, source_hash: str) -> None:
+        """Удалить все производные исходника"""
+        shutil.rmtree(self._source_dir(source_hash), ignore_errors=True)
+
+    @staticmethod
+    def _write_atomic(path: str, payload: bytes) -> None:
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as target:
+                target.write(payload)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+
+# Методы ImageCompressor, доступные через пул
+_POOL_OPERATIONS = frozenset(
+    {"compress", "compress_for_web", "create_thumbnail", "optimize_for_storage"}
+)
+
+
+def _run_operation(
+    operation: str, image_data: bytes, params: dict[str, Any]
+) -> tuple[bytes, dict, float]:
+    """Выполнить операцию ImageCompressor (в процессе пула)"""
+    started = time.perf_counter()
+    data, metadata = getattr(get_image_compressor(), operation)(image_data, **params)
+    return data, metadata, time.perf_counter() - started
+
+
+class ImageProcessingPool:
+    """
+    Обработка изображений вне event loop
+
+    Пул процессов с ограниченной очередью: когда в работе уже
+    max_queue изображений, новые отклоняются (ImageQueueFullError), а не
+    копятся в памяти. Производные берутся из ImageDerivativeCache;
+    одновременные запросы одной производной считают её один раз.
+    """
+
+    def __init__(
+        self,
+        workers: int = IMAGE_POOL_WORKERS,
+        max_queue: int = IMAGE_QUEUE_SIZE,
+        cache: ImageDerivativeCache | None = None,
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.cache = cache if cache is not None else ImageDerivativeCache()
+        self._executor: Executor | None = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._inflight: dict[tuple[str, str], asyncio.Future] = {}
+
+    @property
+    def queue_depth(self) -> int:
+        return self._pending
+
+    async def compress(self, image_data: bytes, **params: Any) -> tuple[bytes, dict]:
+        """Сжать изображение (без кеширования результата)"""
+        return await self._run("compress", image_data, params)
+
+    async def thumbnail(
+        self,
+        image_data: bytes,
+        *,
+        size: tuple[int, int] = (150, 150),
+        quality: int = 80,
+        source_hash: str | None = None,
+    ) -> tuple[bytes, dict]:
+        """Миниатюра; source_hash - SHA-256 исходника, если уже известен"""
+        return await self._derivative(
+            "create_thumbnail",
+            lambda: image_data,
+            {"size": size, "quality": quality},
+            source_hash,
+        )
+
+    async def web_version(
+        self,
+        image_data: bytes,
+        *,
+        target_size_kb: int = 200,
+        min_quality: int = 40,
+        source_hash: str | None = None,
+    ) -> tuple[bytes, dict]:
+        """Веб-версия до target_size_kb; source_hash - как в thumbnail
+
+        PNG/WebP с прозрачностью остаются в своём формате (см. output_format
+        в метаданных), остальное - JPEG.
+        """
+        return await self._derivative(
+            "compress_for_web",
+            lambda: image_data,
+            self._web_params(target_size_kb, min_quality),
+            source_hash,
+        )
+
+    async def web_version_of_file(
+        self,
+        file_path: str,
+        *,
+        target_size_kb: int = 200,
+        min_quality: int = 40,
+        source_hash: str | None = None,
+    ) -> tuple[bytes, dict]:
+        """Веб-версия файла; при известном source_hash и попадании в кеш файл не читается"""
+        return await self._derivative(
+            "compress_for_web",
+            Path(file_path).read_bytes,
+            self._web_params(target_size_kb, min_quality),
+            source_hash,
+        )
+
+    @staticmethod
+    def _web_params(target_size_kb: int, min_quality: int) -> dict[str, Any]:
+        return {
+            "target_size_kb": target_size_kb,
+            "min_quality": min_quality,
+            "keep_alpha": True,
+        }
+
+    async def _derivative(
+        self,
+        operation: str,
+        read_source: Callable[[], bytes],
+        params: dict[str, Any],
+        source_hash: str | None,
+    ) -> tuple[bytes, dict]:
+        """Производная из кеша; read_source вызывается только при промахе"""
+        image_data: bytes | None = None
+        if source_hash is None:
+            image_data = await asyncio.to_thread(read_source)
+            source_hash = await asyncio.to_thread(_sha256, image_data)
+
+        key = (source_hash, ImageDerivativeCache.derivative_name(operation, params))
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await asyncio.to_thread(self.cache.get, source_hash, operation, params)
+            record_image_derivative_cache(hit=result is not None)
+            if result is None:
+                if image_data is None:
+                    image_data = await asyncio.to_thread(read_source)
+                result = await self._run(operation, image_data, params)
+                await asyncio.to_thread(
+                    self.cache.put, source_hash, operation, params, *result
+                )
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # ожидающих может не быть - не логировать как потерянную
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _run(
+        self, operation: str, image_data: bytes, params: dict[str, Any]
+    ) -> tuple[bytes, dict]:
+        if operation not in _POOL_OPERATIONS:
+            raise ValueError(f"Unknown image operation: {operation}")
+
+        with self._lock:
+            if self._pending >= self.max_queue:
+                raise ImageQueueFullError(
+                    f"Очередь обработки изображений заполнена ({self.max_queue})"
+                )
+            self._pending += 1
+            set_image_queue_depth(self._pending)
+        try:
+            data, metadata, elapsed = await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), _run_operation, operation, image_data, params
+            )
+            record_image_processing(operation, elapsed)
+            return data, metadata
+        finally:
+            with self._lock:
+                self._pending -= 1
+                set_image_queue_depth(self._pending)
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.workers > 0:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=1, thread_name_prefix="image-processing"
+                    )
+            return self._executor
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
 # Глобальный экземпляр
 _compressor_instance = None
+_pool_instance: ImageProcessingPool | None = None
 
 
 def get_image_compressor() -> ImageCompressor:
@@ -269,6 +668,14 @@ def get_image_compressor() -> ImageCompressor:
     return _compressor_instance
 
 
+def get_image_processing_pool() -> ImageProcessingPool:
+    """Получить глобальный пул обработки изображений"""
+    global _pool_instance
+    if _pool_instance is None:
+        _pool_instance = ImageProcessingPool()
+    return _pool_instance
+
+
 def compress_image(
     image_data: bytes,
     max_size: tuple[int, int] = (1920, 1920),
@@ -22,10 +22,11 @@ class LabReportPDFService(
     """Composed of focused mixin modules."""
 
     def __init__(self) -> None:
-        self.backend_root = Path(__file__).resolve().parents[2]
+        self.backend_root = Path(__file__).resolve().parents[3]
         self.templates_dir = self.backend_root / "app" / "templates" / "print"
         self.jinja_env = Environment(autoescape=True,
             loader=FileSystemLoader(self.templates_dir),
             trim_blocks=True,
             lstrip_blocks=True,
         )
+        self._logo_file_urls: dict[str, str] = {}
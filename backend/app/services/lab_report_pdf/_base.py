@@ -16,6 +16,7 @@ from jinja2 import Environment, FileSystemLoader  # noqa: F401
 from app.services.pdf_service import (  # noqa: F401
     REPORTLAB_AVAILABLE,
     _load_weasyprint_components,
+    _write_pdf,
 )
 
 logger = logging.getLogger(__name__)
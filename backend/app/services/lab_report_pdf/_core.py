@@ -5,20 +5,25 @@ Split from lab_report_pdf_service.py.
 from __future__ import annotations
 
 from app.services.lab_report_pdf._base import *  # noqa: F401, F403
-from app.services.lab_report_pdf._base import LabReportPDFServiceMixinBase
+from app.services.lab_report_pdf._base import (
+    LabReportPDFServiceMixinBase,
+    _load_weasyprint_components,
+    _write_pdf,
+)
 
 
 class CoreMixin(LabReportPDFServiceMixinBase):
     """Core methods."""
 
     def __init__(self) -> None:
-        self.backend_root = Path(__file__).resolve().parents[2]
+        self.backend_root = Path(__file__).resolve().parents[3]
         self.templates_dir = self.backend_root / "app" / "templates" / "print"
         self.jinja_env = Environment(autoescape=True,
             loader=FileSystemLoader(self.templates_dir),
             trim_blocks=True,
             lstrip_blocks=True,
         )
+        self._logo_file_urls: dict[str, str] = {}
 
 
     def render_report(self, context: dict[str, Any]) -> bytes:
@@ -40,7 +45,7 @@ class CoreMixin(LabReportPDFServiceMixinBase):
             page_settings,
         )
         try:
-            weasy_css, weasy_html = _load_weasyprint_components()
+            _load_weasyprint_components()
         except (ImportError, OSError) as exc:
             if REPORTLAB_AVAILABLE:
                 logger.warning("[LAB][PDF] falling back to ReportLab renderer: %s", exc)
@@ -50,9 +55,7 @@ class CoreMixin(LabReportPDFServiceMixinBase):
         template = self.jinja_env.get_template("lab_report_fixed.j2")
         html_content = template.render(**context)
         css_content = self._build_css(layout_preset=layout_preset, page_settings=page_settings)
-        html_doc = weasy_html(string=html_content, base_url=str(self.backend_root))
-        css_doc = weasy_css(string=css_content)
-        return html_doc.write_pdf(stylesheets=[css_doc])
+        return _write_pdf(html_content, css_content, str(self.backend_root))
 
 
     def _resolve_copy_count(self, context: dict[str, Any]) -> int:
@@ -251,13 +251,19 @@ class DocxMixin(LabReportPDFServiceMixinBase):
             return None
         if logo_url.startswith(("http://", "https://", "data:")):
             return logo_url
+        # Логотип клиники один на все бланки - путь проверяется один раз
+        cached = self._logo_file_urls.get(logo_url)
+        if cached is not None:
+            return cached
         if logo_url.startswith("/"):
             candidate = self.backend_root / logo_url.lstrip("/")
             if candidate.exists():
-                return candidate.resolve().as_uri()
-        candidate = Path(logo_url)
-        if candidate.exists():
-            return candidate.resolve().as_uri()
+                cached = candidate.resolve().as_uri()
+        if cached is None and Path(logo_url).exists():
+            cached = Path(logo_url).resolve().as_uri()
+        if cached is not None:
+            self._logo_file_urls[logo_url] = cached
+            return cached
         logger.warning("[LAB][PDF] logo asset not found for %s", logo_url)
         return None
 
@@ -0,0 +1,298 @@
+"""Compiled template versions for LabReportingService.
+
+Visibility, reference and highlight rules are JSON dicts interpreted by
+RuleEngineMixin. A template version is compiled once into plain
+snapshots with evaluator closures (pre-split context paths, operators
+resolved up front, sections and fields pre-sorted), so materialization,
+flag resolution and PDF rendering of many reports do not walk the JSON
+and the ORM relationships again for every report.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Callable
+from copy import deepcopy
+from dataclasses import dataclass
+from typing import Any
+
+from app.models.lab import LabReportFieldDef, LabReportTemplateVersion
+
+# Compiled published/archived versions kept per process
+LAB_COMPILED_TEMPLATE_CACHE_SIZE = int(os.getenv("LAB_COMPILED_TEMPLATE_CACHE_SIZE", "256"))
+
+Condition = Callable[[dict[str, Any]], bool]
+RulePayload = Callable[[dict[str, Any]], dict[str, Any]]
+
+
+def _always_true(context: dict[str, Any]) -> bool:
+    return True
+
+
+def _always_false(context: dict[str, Any]) -> bool:
+    return False
+
+
+def _empty_payload(context: dict[str, Any]) -> dict[str, Any]:
+    return {}
+
+
+def compile_lookup(source: str | None) -> Callable[[dict[str, Any]], Any]:
+    """Dotted context path (``patient.sex``) split once into a getter."""
+    if not source:
+        return lambda context: None
+    parts = tuple(source.split("."))
+
+    def lookup(context: dict[str, Any]) -> Any:
+        current: Any = context
+        for part in parts:
+            if isinstance(current, dict):
+                current = current.get(part)
+            else:
+                current = getattr(current, part, None)
+            if current is None:
+                return None
+        return current
+
+    return lookup
+
+
+def _casefold(value: Any) -> str:
+    return str(value).strip().casefold()
+
+
+def _compile_comparison(condition: dict[str, Any]) -> Condition:
+    lookup = compile_lookup(condition.get("source"))
+    op = condition.get("op", "exists")
+    right = condition.get("value")
+
+    if op == "exists":
+        def evaluate(context):
+            left = lookup(context)
+            return left is not None and left != ""
+    elif op == "eq":
+        def evaluate(context):
+            return lookup(context) == right
+    elif op == "neq":
+        def evaluate(context):
+            return lookup(context) != right
+    elif op == "ieq":
+        folded_right = None if right is None else _casefold(right)
+
+        def evaluate(context):
+            left = lookup(context)
+            if left is None or right is None:
+                return left == right
+            return _casefold(left) == folded_right
+    elif op == "ineq":
+        folded_right = None if right is None else _casefold(right)
+
+        def evaluate(context):
+            left = lookup(context)
+            if left is None or right is None:
+                return left != right
+            return _casefold(left) != folded_right
+    elif op == "gt":
+        def evaluate(context):
+            left = lookup(context)
+            return left is not None and left > right
+    elif op == "gte":
+        def evaluate(context):
+            left = lookup(context)
+            return left is not None and left >= right
+    elif op == "lt":
+        def evaluate(context):
+            left = lookup(context)
+            return left is not None and left < right
+    elif op == "lte":
+        def evaluate(context):
+            left = lookup(context)
+            return left is not None and left <= right
+    elif op == "between":
+        low, high = condition.get("min"), condition.get("max")
+
+        def evaluate(context):
+            left = lookup(context)
+            return left is not None and low <= left <= high
+    elif op == "in":
+        values = condition.get("values") or []
+
+        def evaluate(context):
+            return lookup(context) in values
+    else:
+        return _always_false
+    return evaluate
+
+
+def compile_condition(condition: dict[str, Any] | None) -> Condition:
+    """Compile a visibility/``when`` condition into ``evaluate(context) -> bool``."""
+    if not condition:
+        return _always_true
+    if "all" in condition:
+        items = tuple(compile_condition(item) for item in condition["all"])
+        return lambda context: all(item(context) for item in items)
+    if "any" in condition:
+        items = tuple(compile_condition(item) for item in condition["any"])
+        return lambda context: any(item(context) for item in items)
+    return _compile_comparison(condition)
+
+
+def compile_rule_payload(rule: dict[str, Any] | None) -> RulePayload:
+    """Compile a ``cases``/``default`` rule into ``resolve(context) -> payload``."""
+    if not rule:
+        return _empty_payload
+    cases = tuple(
+        (compile_condition(case.get("when")), case) for case in rule.get("cases") or []
+    )
+    default = rule.get("default")
+    if not isinstance(default, dict):
+        default = None
+
+    def resolve(context: dict[str, Any]) -> dict[str, Any]:
+        for when, case in cases:
+            if when(context):
+                return case
+        return default if default is not None else {}
+
+    return resolve
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledField:
+    """Detached snapshot of LabReportFieldDef with compiled rules.
+
+    Carries the same attributes as the model, so catalog and flag helpers
+    accept it in place of the ORM object.
+    """
+
+    id: int
+    analyte_code: str | None
+    unit_code: str | None
+    field_key: str
+    label: str
+    value_type: str
+    unit: str | None
+    reference_mode: str
+    reference_text: str | None
+    reference_rule: dict[str, Any] | None
+    visibility_rule: dict[str, Any] | None
+    highlight_rule: dict[str, Any] | None
+    choice_options: list[str] | None
+    sort_order: int
+    required: bool
+    is_visible: Condition
+    resolve_reference_rule: RulePayload
+    resolve_highlight_rule: RulePayload
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledSection:
+    id: int
+    key: str
+    title: str | None
+    sort_order: int
+    section_style: dict[str, Any] | None
+    fields: tuple[CompiledField, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledTemplateVersion:
+    version_id: int
+    sections: tuple[CompiledSection, ...]
+    fields_by_key: dict[str, CompiledField]
+
+
+def compile_field(field_def: LabReportFieldDef | CompiledField) -> CompiledField:
+    if isinstance(field_def, CompiledField):
+        return field_def
+    reference_rule = deepcopy(field_def.reference_rule)
+    visibility_rule = deepcopy(field_def.visibility_rule)
+    highlight_rule = deepcopy(field_def.highlight_rule)
+    return CompiledField(
+        id=field_def.id,
+        analyte_code=field_def.analyte_code,
+        unit_code=field_def.unit_code,
+        field_key=field_def.field_key,
+        label=field_def.label,
+        value_type=field_def.value_type,
+        unit=field_def.unit,
+        reference_mode=field_def.reference_mode,
+        reference_text=field_def.reference_text,
+        reference_rule=reference_rule,
+        visibility_rule=visibility_rule,
+        highlight_rule=highlight_rule,
+        choice_options=deepcopy(field_def.choice_options),
+        sort_order=field_def.sort_order,
+        required=field_def.required,
+        is_visible=compile_condition(visibility_rule),
+        resolve_reference_rule=compile_rule_payload(reference_rule),
+        resolve_highlight_rule=compile_rule_payload(highlight_rule),
+    )
+
+
+def compile_template_version(version: LabReportTemplateVersion) -> CompiledTemplateVersion:
+    compiled_fields = {
+        field_def.id: compile_field(field_def)
+        for section in version.sections
+        for field_def in section.fields
+    }
+    sections = tuple(
+        CompiledSection(
+            id=section.id,
+            key=section.key,
+            title=section.title,
+            sort_order=section.sort_order,
+            section_style=deepcopy(section.section_style),
+            fields=tuple(
+                compiled_fields[field_def.id]
+                for field_def in sorted(section.fields, key=lambda item: item.sort_order)
+            ),
+        )
+        for section in sorted(version.sections, key=lambda item: item.sort_order)
+    )
+    # Same order as _field_map: relationship order, not sort_order
+    fields_by_key = {
+        field_def.field_key: compiled_fields[field_def.id]
+        for section in version.sections
+        for field_def in section.fields
+    }
+    return CompiledTemplateVersion(
+        version_id=version.id, sections=sections, fields_by_key=fields_by_key
+    )
+
+
+_compiled_versions: OrderedDict[tuple[Any, ...], CompiledTemplateVersion] = OrderedDict()
+_compiled_versions_lock = threading.Lock()
+
+
+def get_compiled_template_version(
+    version: LabReportTemplateVersion,
+) -> CompiledTemplateVersion:
+    """Compiled version from the process cache.
+
+    Only published and archived versions are cached - their sections can
+    no longer change. Drafts are editable and compiled on every call.
+    created_at guards against a reused primary key (recreated database).
+    """
+    if version.status == "DRAFT":
+        return compile_template_version(version)
+
+    key = (version.id, version.created_at)
+    with _compiled_versions_lock:
+        compiled = _compiled_versions.get(key)
+        if compiled is not None:
+            _compiled_versions.move_to_end(key)
+            return compiled
+
+    compiled = compile_template_version(version)
+    with _compiled_versions_lock:
+        _compiled_versions[key] = compiled
+        while len(_compiled_versions) > LAB_COMPILED_TEMPLATE_CACHE_SIZE:
+            _compiled_versions.popitem(last=False)
+    return compiled
+
+
+def clear_compiled_template_versions() -> None:
+    with _compiled_versions_lock:
+        _compiled_versions.clear()
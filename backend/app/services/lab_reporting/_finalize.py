@@ -20,18 +20,19 @@ class FinalizeMixin(LabReportingServiceMixinBase):
             for value in instance.values
         }
         field_map = self._field_map(instance.template_version)
+        compiled = self._compiled_version(instance.template_version)
         context = self._build_rule_context(instance.patient_snapshot, current_values)
+        value_map: dict[str, LabReportValue] = {}
+        for item in instance.values:
+            value_map.setdefault(item.field_key, item)
 
         visible_required_fields = []
-        for field_def in field_map.values():
-            if self._is_visible(field_def.visibility_rule, context):
+        for field_def in compiled.fields_by_key.values():
+            if field_def.is_visible(context):
                 if field_def.required:
                     visible_required_fields.append(field_def.field_key)
                 reference = self._resolve_reference(field_def, context)
-                value = next(
-                    (item for item in instance.values if item.field_key == field_def.field_key),
-                    None,
-                )
+                value = value_map.get(field_def.field_key)
                 if value:
                     value.resolved_reference_text = reference.get("text")
                     flag = self._resolve_flag(
@@ -160,7 +160,7 @@ class InstancesMixin(LabReportingServiceMixinBase):
         # WF-06 fix: optimistic locking — проверяем что никто не изменил
         # бланк с момента последнего чтения frontend'ом.
         self._assert_not_concurrently_modified(instance, expected_updated_at)
-        field_map = self._field_map(instance.template_version)
+        field_map = self._compiled_version(instance.template_version).fields_by_key
         existing_by_key = {value.field_key: value for value in instance.values}
         current_values = {
             value.field_key: self._extract_effective_value(value)
@@ -18,11 +18,12 @@ class MaterializationMixin(LabReportingServiceMixinBase):
             for field_key, value in value_map.items()
         }
         context = self._build_rule_context(instance.patient_snapshot, current_values)
+        compiled = self._compiled_version(instance.template_version)
         sections: list[dict[str, Any]] = []
-        for section in sorted(instance.template_version.sections, key=lambda item: item.sort_order):
+        for section in compiled.sections:
             rows = []
-            for field_def in sorted(section.fields, key=lambda item: item.sort_order):
-                if not self._is_visible(field_def.visibility_rule, context):
+            for field_def in section.fields:
+                if not field_def.is_visible(context):
                     continue
                 reference = self._resolve_reference(field_def, context)
                 value = value_map.get(field_def.field_key)
@@ -6,6 +6,14 @@ from __future__ import annotations
 
 from app.services.lab_reporting._base import *  # noqa: F401, F403
 from app.services.lab_reporting._base import LabReportingServiceMixinBase
+from app.services.lab_reporting._compiled_rules import (
+    CompiledField,
+    CompiledTemplateVersion,
+    compile_condition,
+    compile_lookup,
+    compile_rule_payload,
+    get_compiled_template_version,
+)
 
 
 class RuleEngineMixin(LabReportingServiceMixinBase):
@@ -21,72 +29,24 @@ class RuleEngineMixin(LabReportingServiceMixinBase):
         return {"patient": patient_snapshot, "field": field_values}
 
 
+    def _compiled_version(self, version: LabReportTemplateVersion) -> CompiledTemplateVersion:
+        return get_compiled_template_version(version)
+
+
     def _lookup_context_value(self, source: str | None, context: dict[str, Any]) -> Any:
-        if not source:
-            return None
-        current: Any = context
-        for part in source.split("."):
-            if isinstance(current, dict):
-                current = current.get(part)
-            else:
-                current = getattr(current, part, None)
-            if current is None:
-                return None
-        return current
+        return compile_lookup(source)(context)
 
 
     def _evaluate_condition(
         self, condition: dict[str, Any] | None, context: dict[str, Any]
     ) -> bool:
-        if not condition:
-            return True
-        if "all" in condition:
-            return all(self._evaluate_condition(item, context) for item in condition["all"])
-        if "any" in condition:
-            return any(self._evaluate_condition(item, context) for item in condition["any"])
-
-        left = self._lookup_context_value(condition.get("source"), context)
-        op = condition.get("op", "exists")
-        right = condition.get("value")
-        if op == "exists":
-            return left is not None and left != ""
-        if op == "eq":
-            return left == right
-        if op == "neq":
-            return left != right
-        if op == "ieq":
-            if left is None or right is None:
-                return left == right
-            return str(left).strip().casefold() == str(right).strip().casefold()
-        if op == "ineq":
-            if left is None or right is None:
-                return left != right
-            return str(left).strip().casefold() != str(right).strip().casefold()
-        if op == "gt":
-            return left is not None and left > right
-        if op == "gte":
-            return left is not None and left >= right
-        if op == "lt":
-            return left is not None and left < right
-        if op == "lte":
-            return left is not None and left <= right
-        if op == "between":
-            return left is not None and condition.get("min") <= left <= condition.get("max")
-        if op == "in":
-            return left in (condition.get("values") or [])
-        return False
+        return compile_condition(condition)(context)
 
 
     def _resolve_rule_payload(
         self, rule: dict[str, Any] | None, context: dict[str, Any]
     ) -> dict[str, Any]:
-        if not rule:
-            return {}
-        for case in rule.get("cases") or []:
-            if self._evaluate_condition(case.get("when"), context):
-                return case
-        default = rule.get("default")
-        return default if isinstance(default, dict) else {}
+        return compile_rule_payload(rule)(context)
 
 
     def _resolve_reference(
@@ -95,7 +55,11 @@ class RuleEngineMixin(LabReportingServiceMixinBase):
         if field_def.reference_mode == "catalog":
             return self._resolve_catalog_reference(field_def, context)
         if field_def.reference_mode == "rule_based":
-            payload = self._resolve_rule_payload(field_def.reference_rule, context)
+            payload = (
+                field_def.resolve_reference_rule(context)
+                if isinstance(field_def, CompiledField)
+                else self._resolve_rule_payload(field_def.reference_rule, context)
+            )
             return {
                 "text": payload.get("text") or field_def.reference_text or "",
                 "low": payload.get("low"),
@@ -335,7 +299,11 @@ class RuleEngineMixin(LabReportingServiceMixinBase):
             payload = reference
             source = f"{field_def.reference_mode}_reference"
         elif rule:
-            payload = self._resolve_rule_payload(rule, context)
+            payload = (
+                field_def.resolve_highlight_rule(context)
+                if isinstance(field_def, CompiledField)
+                else self._resolve_rule_payload(rule, context)
+            )
             source = "highlight_rule"
         else:
             payload = {}
@@ -27,15 +27,25 @@ class FormattingMixin(NotificationSenderMixinBase):
 
 
     def _prepare_notification_data(
-        self, db: Session, visit: Any, patient: Any
+        self,
+        db: Session,
+        visit: Any,
+        patient: Any,
+        visit_services: list[Any] | None = None,
+        doctor: Any = None,
     ) -> dict[str, Any]:
-        """Подготавливает данные для уведомления"""
+        """Подготавливает данные для уведомления
+
+        visit_services и doctor можно передать уже загруженными (пакетная
+        рассылка), тогда запросы к БД не выполняются.
+        """
         from app.models.clinic import Doctor
         from app.models.visit import VisitService
 
-        visit_services = (
-            db.query(VisitService).filter(VisitService.visit_id == visit.id).all()
-        )
+        if visit_services is None:
+            visit_services = (
+                db.query(VisitService).filter(VisitService.visit_id == visit.id).all()
+            )
 
         services_text = []
         total_amount = 0
@@ -45,7 +55,8 @@ class FormattingMixin(NotificationSenderMixinBase):
 
         doctor_name = "Без врача"
         if visit.doctor_id:
-            doctor = db.query(Doctor).filter(Doctor.id == visit.doctor_id).first()
+            if doctor is None:
+                doctor = db.query(Doctor).filter(Doctor.id == visit.doctor_id).first()
             if doctor and doctor.user:
                 doctor_name = doctor.user.full_name or doctor.user.username
 
@@ -30,9 +30,27 @@ class RemindersMixin(NotificationSenderMixinBase):
             patient = db.query(Patient).filter(Patient.id == visit.patient_id).first()
             if not patient:
                 return {"success": False, "error": "Пациент не найден"}
+        except Exception as e:
+            logger.error(f"Ошибка отправки напоминания: {e}")
+            return {"success": False, "error": str(e)}
 
+        return await self.send_visit_reminder(db, visit, patient, hours_before)
+
+    async def send_visit_reminder(
+        self,
+        db: Session,
+        visit: Any,
+        patient: Any,
+        hours_before: int = 24,
+        visit_services: list[Any] | None = None,
+        doctor: Any = None,
+    ) -> dict[str, Any]:
+        """Напоминание по уже загруженным визиту и пациенту (пакетная рассылка)"""
+        try:
             channel = self._determine_best_channel(patient)
-            notification_data = self._prepare_notification_data(db, visit, patient)
+            notification_data = self._prepare_notification_data(
+                db, visit, patient, visit_services=visit_services, doctor=doctor
+            )
             notification_data["is_reminder"] = True
             notification_data["hours_before"] = hours_before
 
@@ -43,7 +61,7 @@ class RemindersMixin(NotificationSenderMixinBase):
                 result = await self.telegram_bot.send_confirmation_invitation(
                     chat_id=patient.telegram_id, message=message, keyboard=keyboard
                 )
-                return {"success": result.get("success"), "error": result.get("error")}
+                return {"success": result.get("success"), "error": result.get("error"), "channel": channel}
             elif channel == "pwa":
                  return await self._send_pwa_invitation(patient, notification_data)
             else:
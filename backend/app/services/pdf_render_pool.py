@@ -0,0 +1,235 @@
+"""
+Пул рендеринга PDF вне event loop
+
+WeasyPrint нагружает CPU и держит GIL, поэтому документы рендерятся в
+отдельных процессах. Процесс прогревается один раз при старте: шрифты
+(FontConfiguration), разобранные стили бланков и скомпилированные
+Jinja-шаблоны остаются в его памяти и переиспользуются всеми
+последующими документами.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any
+
+from app.core.prometheus import (
+    record_pdf_render,
+    record_pdf_render_failure,
+    set_pdf_render_queue_depth,
+)
+from app.services.lab_report_pdf_service import lab_report_pdf_service
+from app.services.pdf_service import (
+    _get_font_configuration,
+    _get_stylesheet,
+    pdf_service,
+)
+
+logger = logging.getLogger(__name__)
+
+# 0 - рендеринг в потоке вместо процессов (окружения без fork, тесты)
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", str(min(2, os.cpu_count() or 1))))
+# Сколько документов может ждать или рендериться одновременно
+PDF_RENDER_QUEUE_SIZE = int(os.getenv("PDF_RENDER_QUEUE_SIZE", "64"))
+PDF_RENDER_TIMEOUT_SECONDS = float(os.getenv("PDF_RENDER_TIMEOUT_SECONDS", "60"))
+
+# Бланки, стили которых разбираются при прогреве процесса
+_WARM_PAPER_SIZES = ("A4", "A5")
+_WARM_ORIENTATIONS = ("portrait", "landscape")
+_WARM_LAB_PRESETS = ("lab_table_classic_v1", "lab_table_compact_v1")
+_LAB_REPORT_TEMPLATE = "lab_report_fixed.j2"
+_PDF_TEMPLATE_SUFFIXES = (".j2", ".html")
+
+
+class PDFQueueFullError(RuntimeError):
+    """Очередь рендеринга PDF заполнена"""
+
+
+class PDFRenderTimeoutError(RuntimeError):
+    """Документ не отрендерился за отведённое время"""
+
+
+def _warm_worker() -> None:
+    """Инициализатор процесса: шаблоны, шрифты и стили - до первого документа"""
+    for service, names in (
+        (pdf_service, None),
+        (lab_report_pdf_service, [_LAB_REPORT_TEMPLATE]),
+    ):
+        # Шаблоны в процессе не меняются - без stat() на каждый get_template
+        service.jinja_env.auto_reload = False
+        if names is None:
+            names = service.jinja_env.list_templates(
+                filter_func=lambda name: name.endswith(_PDF_TEMPLATE_SUFFIXES)
+            )
+        for name in names:
+            try:
+                service.jinja_env.get_template(name)
+            except Exception as exc:
+                logger.debug("[PDF] template %s not precompiled: %s", name, exc)
+
+    try:
+        _get_font_configuration()
+        for paper_size in _WARM_PAPER_SIZES:
+            _get_stylesheet(pdf_service._get_page_css(paper_size))
+            for orientation in _WARM_ORIENTATIONS:
+                for preset in _WARM_LAB_PRESETS:
+                    _get_stylesheet(
+                        lab_report_pdf_service._build_css(
+                            layout_preset=preset,
+                            page_settings={
+                                "paper_size": paper_size,
+                                "orientation": orientation,
+                            },
+                        )
+                    )
+    except (ImportError, OSError) as exc:
+        logger.warning("[PDF] WeasyPrint unavailable, render worker not warmed: %s", exc)
+
+
+def _run_render(kind: str, payload: dict[str, Any]) -> tuple[bytes, float]:
+    """Рендеринг одного документа в процессе пула"""
+    started = time.perf_counter()
+    if kind == "html":
+        data = pdf_service.generate_pdf_from_html(**payload)
+    elif kind == "lab_report":
+        data = lab_report_pdf_service.render_report(payload)
+    else:
+        raise ValueError(f"Unknown PDF render kind: {kind}")
+    return data, time.perf_counter() - started
+
+
+class PDFRenderPool:
+    """
+    Рендеринг PDF вне event loop
+
+    Пул прогретых процессов с ограниченной очередью: когда в работе уже
+    max_queue документов, новые отклоняются (PDFQueueFullError).
+    Ожидание результата ограничено timeout (PDFRenderTimeoutError); сам
+    документ при этом дорендеривается и занимает место в очереди до
+    конца, чтобы очередь отражала реальную загрузку процессов.
+    """
+
+    def __init__(
+        self,
+        workers: int = PDF_RENDER_WORKERS,
+        max_queue: int = PDF_RENDER_QUEUE_SIZE,
+        timeout: float = PDF_RENDER_TIMEOUT_SECONDS,
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor: Executor | None = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def queue_depth(self) -> int:
+        return self._pending
+
+    async def render_html(
+        self,
+        template_name: str,
+        data: dict[str, Any],
+        paper_size: str = "A4",
+        *,
+        timeout: float | None = None,
+    ) -> bytes:
+        """PDF из HTML-шаблона (PDFService.generate_pdf_from_html)"""
+        payload = {"template_name": template_name, "data": data, "paper_size": paper_size}
+        return await self._submit("html", payload, timeout)
+
+    async def render_lab_report(
+        self, context: dict[str, Any], *, timeout: float | None = None
+    ) -> bytes:
+        """Бланк лабораторного отчёта (LabReportPDFService.render_report)"""
+        return await self._submit("lab_report", context, timeout)
+
+    async def _submit(
+        self, kind: str, payload: dict[str, Any], timeout: float | None
+    ) -> bytes:
+        with self._lock:
+            if self._pending >= self.max_queue:
+                record_pdf_render_failure(kind, "queue_full")
+                raise PDFQueueFullError(
+                    f"Очередь рендеринга PDF заполнена ({self.max_queue})"
+                )
+            self._pending += 1
+            set_pdf_render_queue_depth(self._pending)
+
+        try:
+            future = asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), _run_render, kind, payload
+            )
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._on_render_done)
+
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            data, elapsed = await asyncio.wait_for(asyncio.shield(future), timeout)
+        except TimeoutError as e:
+            record_pdf_render_failure(kind, "timeout")
+            raise PDFRenderTimeoutError(
+                f"PDF не отрендерился за {timeout:g} с"
+            ) from e
+        except BrokenProcessPool:
+            record_pdf_render_failure(kind, "error")
+            self._reset_executor()
+            raise
+        except Exception:
+            record_pdf_render_failure(kind, "error")
+            raise
+        record_pdf_render(kind, elapsed)
+        return data
+
+    def _on_render_done(self, future: asyncio.Future) -> None:
+        self._release()
+        if not future.cancelled():
+            future.exception()  # после таймаута результат никто не ждёт
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+            set_pdf_render_queue_depth(self._pending)
+
+    def _get_executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.workers > 0:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, initializer=_warm_worker
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=1, thread_name_prefix="pdf-render"
+                    )
+            return self._executor
+
+    def _reset_executor(self) -> None:
+        """Упавший процесс ломает весь ProcessPoolExecutor - пересоздать"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def shutdown(self) -> None:
+        self._reset_executor()
+
+
+# Глобальный экземпляр
+_pool_instance: PDFRenderPool | None = None
+
+
+def get_pdf_render_pool() -> PDFRenderPool:
+    """Получить глобальный пул рендеринга PDF"""
+    global _pool_instance
+    if _pool_instance is None:
+        _pool_instance = PDFRenderPool()
+    return _pool_instance
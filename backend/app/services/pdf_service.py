@@ -8,6 +8,7 @@ import io
 import logging
 import os
 import re
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Any
@@ -21,6 +22,14 @@ LEGACY_COMMENT_BLOCK_RE = re.compile(r"{% comment %}.*?{% endcomment %}", re.S)
 WEASYPRINT_AVAILABLE = False
 _WEASYPRINT_DLL_HANDLES = []
 
+# Разобранные стили WeasyPrint по тексту CSS: размеры бумаги и пресеты
+# бланков повторяются, поэтому CSS разбирается один раз на поток
+PDF_STYLESHEET_CACHE_SIZE = int(os.getenv("PDF_STYLESHEET_CACHE_SIZE", "64"))
+
+# WeasyPrint (Pango/fontconfig) не потокобезопасен - шрифты и стили
+# кешируются отдельно для каждого потока
+_weasyprint_local = threading.local()
+
 
 def _configure_weasyprint_dll_directories():
     """Register Windows DLL directories for WeasyPrint native deps."""
@@ -75,6 +84,44 @@ def _load_weasyprint_components():
     WEASYPRINT_AVAILABLE = True
     return weasy_css, weasy_html
 
+
+def _get_font_configuration():
+    """FontConfiguration WeasyPrint: шрифты ищутся один раз на поток"""
+    font_config = getattr(_weasyprint_local, "font_config", None)
+    if font_config is None:
+        _load_weasyprint_components()
+        from weasyprint.text.fonts import FontConfiguration
+
+        font_config = _weasyprint_local.font_config = FontConfiguration()
+    return font_config
+
+
+def _get_stylesheet(css_content: str):
+    """Разобранный CSS WeasyPrint из кеша потока"""
+    stylesheets = getattr(_weasyprint_local, "stylesheets", None)
+    if stylesheets is None:
+        stylesheets = _weasyprint_local.stylesheets = {}
+
+    stylesheet = stylesheets.get(css_content)
+    if stylesheet is None:
+        weasy_css, _ = _load_weasyprint_components()
+        if len(stylesheets) >= PDF_STYLESHEET_CACHE_SIZE:
+            stylesheets.clear()
+        stylesheet = stylesheets[css_content] = weasy_css(
+            string=css_content, font_config=_get_font_configuration()
+        )
+    return stylesheet
+
+
+def _write_pdf(html_content: str, css_content: str, base_url: str) -> bytes:
+    """HTML + CSS -> PDF с общими шрифтами и закешированными стилями"""
+    _, weasy_html = _load_weasyprint_components()
+    html_doc = weasy_html(string=html_content, base_url=base_url)
+    return html_doc.write_pdf(
+        stylesheets=[_get_stylesheet(css_content)],
+        font_config=_get_font_configuration(),
+    )
+
 try:
     from reportlab.lib import colors
     from reportlab.lib.enums import TA_CENTER
@@ -139,7 +186,7 @@ class PDFService:
         Генерация PDF из HTML шаблона с помощью WeasyPrint
         """
         try:
-            weasy_css, weasy_html = _load_weasyprint_components()
+            _load_weasyprint_components()
         except (ImportError, OSError) as exc:
             raise Exception(
                 f"WeasyPrint недоступен в текущем окружении: {exc}"
@@ -159,12 +206,7 @@ class PDFService:
             css_content = self._get_page_css(paper_size)
 
             # Генерируем PDF
-            html_doc = weasy_html(string=html_content, base_url=str(self.templates_dir))
-            css_doc = weasy_css(string=css_content)
-
-            pdf_bytes = html_doc.write_pdf(stylesheets=[css_doc])
-
-            return pdf_bytes
+            return _write_pdf(html_content, css_content, str(self.templates_dir))
 
         except Exception:
             raise Exception("Внутренняя ошибка")
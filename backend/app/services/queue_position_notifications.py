@@ -12,6 +12,7 @@ from __future__ import annotations
 
 import asyncio
 import logging
+from bisect import bisect_left
 from datetime import UTC, datetime
 from typing import Any
 
@@ -40,6 +41,9 @@ class QueuePositionNotificationService:
     # Пороги для уведомлений (человек перед вами)
     NOTIFICATION_THRESHOLDS = [5, 3, 1, 0]
 
+    # Сколько уведомлений батча отправляется одновременно
+    BATCH_NOTIFY_CONCURRENCY = 8
+
     def __init__(self, db: Session):
         self.db = db
         self.fcm_service = get_fcm_service()
@@ -186,52 +190,58 @@ class QueuePositionNotificationService:
         Returns:
             Результат массовой отправки
         """
-        # Получаем записи со статусом waiting после указанного номера
-        entries = self.db.query(OnlineQueueEntry).filter(
+        # Одним запросом получаем всю ожидающую очередь в порядке обслуживания:
+        # позиции считаются по ней, а не COUNT-запросом на каждую запись
+        waiting = self.db.query(OnlineQueueEntry).filter(
             OnlineQueueEntry.queue_id == queue_id,
             OnlineQueueEntry.status == "waiting",
-            OnlineQueueEntry.number > changed_after_number
         ).order_by(
             OnlineQueueEntry.priority.desc(),
             OnlineQueueEntry.queue_time
         ).all()
 
-        if not entries:
+        candidates = [e for e in waiting if e.number > changed_after_number]
+        if not candidates:
             return {
                 "success": True,
                 "total_notified": 0,
                 "message": "Нет записей для уведомления"
             }
 
-        results = []
-        position = 1  # Позиция после обслуженного
-
-        for entry in entries:
-            # Вычисляем количество людей впереди
-            people_ahead = self._count_people_ahead(entry)
-
+        people_ahead_by_id = self._people_ahead_by_entry(waiting)
+        to_notify = []
+        for entry in candidates:
+            people_ahead = people_ahead_by_id[entry.id]
             # Отправляем уведомление только для порогов или <= 5
             if people_ahead in self.NOTIFICATION_THRESHOLDS or people_ahead <= 5:
+                to_notify.append((entry, people_ahead))
+
+        semaphore = asyncio.Semaphore(self.BATCH_NOTIFY_CONCURRENCY)
+
+        async def _notify(entry: OnlineQueueEntry, people_ahead: int) -> dict[str, Any]:
+            async with semaphore:
                 try:
                     result = await self.notify_position_update(
                         entry=entry,
                         people_ahead=people_ahead
                     )
-                    results.append({
+                    return {
                         "entry_id": entry.id,
                         "number": entry.number,
                         "people_ahead": people_ahead,
                         "sent": result.get("sent", False),
                         "success": result.get("success", False)
-                    })
+                    }
                 except Exception as e:
                     logger.error(f"Error notifying entry {entry.id}: {e}")
-                    results.append({
+                    return {
                         "entry_id": entry.id,
                         "error": str(e)
-                    })
+                    }
 
-            position += 1
+        results = await asyncio.gather(
+            *(_notify(entry, people_ahead) for entry, people_ahead in to_notify)
+        )
 
         sent_count = sum(1 for r in results if r.get("sent"))
 
@@ -313,6 +323,34 @@ class QueuePositionNotificationService:
             priority="high"
         )
 
+    @staticmethod
+    def _people_ahead_by_entry(waiting: list[OnlineQueueEntry]) -> dict[int, int]:
+        """
+        Количество людей впереди для каждой ожидающей записи за один проход
+
+        Та же семантика, что и у _count_people_ahead: впереди все с большим
+        приоритетом и с тем же приоритетом, но более ранним queue_time
+        (записи без queue_time внутри своего приоритета никого не опережают).
+        """
+        by_priority: dict[int, list[OnlineQueueEntry]] = {}
+        for entry in waiting:
+            by_priority.setdefault(entry.priority, []).append(entry)
+
+        result: dict[int, int] = {}
+        higher_priority = 0
+        for priority in sorted(by_priority, reverse=True):
+            group = by_priority[priority]
+            times = sorted(e.queue_time for e in group if e.queue_time is not None)
+            for entry in group:
+                same_priority_ahead = (
+                    bisect_left(times, entry.queue_time)
+                    if entry.queue_time is not None
+                    else 0
+                )
+                result[entry.id] = higher_priority + same_priority_ahead
+            higher_priority += len(group)
+        return result
+
     def _count_people_ahead(self, entry: OnlineQueueEntry) -> int:
         """Подсчитать количество людей впереди в очереди"""
         count = self.db.query(OnlineQueueEntry).filter(
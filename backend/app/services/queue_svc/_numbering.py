@@ -0,0 +1,113 @@
+"""Counter-backed queue number allocation.
+
+The next number of a queue is a single ``UPDATE daily_queues ... RETURNING``
+on ``DailyQueue.last_number``: allocation never scans ``queue_entries`` (a
+queue created before the counter existed is seeded from ``MAX(number)``
+inside the same statement, once) and never needs ``SELECT ... FOR UPDATE``.
+Cross-queue (``scope="global"``) numbering uses a ``QueueNumberCounter`` row
+the same way; it never falls behind ``MAX(number)``, so it cannot repeat a
+number already issued by a queue counter.
+
+The increment is part of the caller's transaction, so a rolled back
+registration releases its number and numbering stays gapless.
+"""
+from __future__ import annotations
+
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models.online_queue import DailyQueue, OnlineQueueEntry, QueueNumberCounter
+
+GLOBAL_COUNTER_KEY = "global"
+
+_queues = DailyQueue.__table__
+_entries = OnlineQueueEntry.__table__
+_counters = QueueNumberCounter.__table__
+
+
+def _bounded_increment(current, start_number: int):  # type: ignore[no-untyped-def]
+    next_value = current + 1
+    return case((next_value < start_number, start_number), else_=next_value)
+
+
+def allocate_queue_number(db: Session, queue_id: int, *, start_number: int) -> int | None:
+    """Выдать следующий номер очереди ``queue_id``; None - очереди нет."""
+    current = func.coalesce(
+        _queues.c.last_number,
+        select(func.max(_entries.c.number))
+        .where(_entries.c.queue_id == queue_id)
+        .scalar_subquery(),
+        0,
+    )
+    return db.execute(
+        update(_queues)
+        .where(_queues.c.id == queue_id)
+        .values(last_number=_bounded_increment(current, start_number))
+        .returning(_queues.c.last_number)
+    ).scalar_one_or_none()
+
+
+def reserve_queue_number(db: Session, queue_id: int, number: int) -> None:
+    """Учесть номер, назначенный вручную, чтобы счётчик не выдал его повторно.
+
+    Неинициализированный счётчик не трогаем: он засеется по MAX(number).
+    """
+    db.execute(
+        update(_queues)
+        .where(
+            _queues.c.id == queue_id,
+            _queues.c.last_number.is_not(None),
+            _queues.c.last_number < number,
+        )
+        .values(last_number=number)
+    )
+
+
+def _increment_counter(db: Session, key: str, start_number: int) -> int | None:
+    # Номера, выданные счётчиками очередей, тоже учитываются (MAX по индексу)
+    issued = func.coalesce(select(func.max(_entries.c.number)).scalar_subquery(), 0)
+    current = case(
+        (issued > _counters.c.last_number, issued), else_=_counters.c.last_number
+    )
+    return db.execute(
+        update(_counters)
+        .where(_counters.c.key == key)
+        .values(
+            last_number=_bounded_increment(current, start_number),
+            updated_at=func.now(),
+        )
+        .returning(_counters.c.last_number)
+    ).scalar_one_or_none()
+
+
+def _create_counter(db: Session, key: str, last_number: int) -> None:
+    values = {"key": key, "last_number": last_number}
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        try:
+            with db.begin_nested():
+                db.execute(insert(_counters).values(**values))
+        except IntegrityError:
+            pass  # счётчик создан параллельной транзакцией
+        return
+    db.execute(
+        dialect_insert(_counters)
+        .values(**values)
+        .on_conflict_do_nothing(index_elements=[_counters.c.key])
+    )
+
+
+def allocate_global_number(db: Session, *, start_number: int) -> int:
+    """Выдать следующий сквозной номер (по всем очередям)."""
+    number = _increment_counter(db, GLOBAL_COUNTER_KEY, start_number)
+    if number is not None:
+        return number
+
+    # Первое обращение: счётчик создаётся пустым и сразу догоняет MAX(number)
+    _create_counter(db, GLOBAL_COUNTER_KEY, 0)
+    return _increment_counter(db, GLOBAL_COUNTER_KEY, start_number)  # type: ignore[return-value]
@@ -6,6 +6,11 @@ from __future__ import annotations
 
 from app.services.queue_svc._base import *  # noqa: F401, F403
 from app.services.queue_svc._base import QueueBusinessServiceMixinBase, _now
+from app.services.queue_svc._numbering import (
+    allocate_global_number,
+    allocate_queue_number,
+    reserve_queue_number,
+)
 
 
 class OperationsMixin(QueueBusinessServiceMixinBase):
@@ -140,41 +145,38 @@ class OperationsMixin(QueueBusinessServiceMixinBase):
 
 
     def calculate_next_number(cls, db: Session, daily_queue: DailyQueue) -> int:
-        """Вычислить следующий номер в очереди"""
-        max_number = (
-            db.query(func.max(OnlineQueueEntry.number))
-            .filter(OnlineQueueEntry.queue_id == daily_queue.id)
-            .scalar()
-        ) or 0
-
+        """Выдать следующий номер в очереди (атомарно, по счётчику очереди)"""
         start_number = getattr(
             daily_queue, "start_number", None
         ) or cls.SPECIALTY_START_NUMBERS.get("default", 1)
-        return max(max_number + 1, start_number)
+        number = allocate_queue_number(db, daily_queue.id, start_number=start_number)
+        if number is None:
+            raise QueueNotFoundError(f"DailyQueue {daily_queue.id} not found")
+        return number
 
     @classmethod
 
 
     def get_queue_statistics(cls, db: Session, daily_queue: DailyQueue) -> dict:
         """Получить статистику очереди"""
-        entries = (
-            db.query(OnlineQueueEntry)
+        by_status = dict(
+            db.query(OnlineQueueEntry.status, func.count(OnlineQueueEntry.id))
             .filter(OnlineQueueEntry.queue_id == daily_queue.id)
+            .group_by(OnlineQueueEntry.status)
             .all()
         )
+        max_slots = getattr(daily_queue, 'max_slots', None) or cls.DEFAULT_MAX_SLOTS
 
         stats = {
-            "total_entries": len(entries),
-            "waiting": len([e for e in entries if e.status == "waiting"]),
-            "called": len([e for e in entries if e.status == "called"]),
-            "completed": len([e for e in entries if e.status == "completed"]),
-            "cancelled": len([e for e in entries if e.status == "cancelled"]),
-            "max_slots": getattr(daily_queue, 'max_slots', None)
-            or cls.DEFAULT_MAX_SLOTS,
+            "total_entries": sum(by_status.values()),
+            "waiting": by_status.get("waiting", 0),
+            "called": by_status.get("called", 0),
+            "completed": by_status.get("completed", 0),
+            "cancelled": by_status.get("cancelled", 0),
+            "max_slots": max_slots,
             "available_slots": max(
                 0,
-                (getattr(daily_queue, 'max_slots', None) or cls.DEFAULT_MAX_SLOTS)
-                - len([e for e in entries if e.status in ["waiting", "called"]]),
+                max_slots - by_status.get("waiting", 0) - by_status.get("called", 0),
             ),
             "is_open": daily_queue.opened_at is not None,
             "opened_at": (
@@ -360,20 +362,25 @@ class OperationsMixin(QueueBusinessServiceMixinBase):
             fallback_start = self.SPECIALTY_START_NUMBERS.get("default", 1)
 
         if scope == "global":
-            max_number = db.query(func.max(OnlineQueueEntry.number)).scalar() or 0
-            return max(max_number + 1, fallback_start)
-
-        if daily_queue is None:
-            if queue_id is None:
-                raise QueueValidationError("daily_queue or queue_id must be provided")
-            daily_queue = db.query(DailyQueue).filter(DailyQueue.id == queue_id).with_for_update().first()
-            if not daily_queue:
-                raise QueueNotFoundError(f"DailyQueue {queue_id} not found")
+            number = allocate_global_number(db, start_number=fallback_start)
+            if daily_queue is not None or queue_id is not None:
+                # Счётчик очереди не должен выдать этот номер повторно
+                reserve_queue_number(
+                    db, daily_queue.id if daily_queue is not None else queue_id, number
+                )
+            return number
 
-        # start_number не является полем DailyQueue, используется только для вычисления номера записи
-        # Не нужно устанавливать его в daily_queue
+        if daily_queue is not None:
+            queue_id = daily_queue.id
+        elif queue_id is None:
+            raise QueueValidationError("daily_queue or queue_id must be provided")
 
-        return self.calculate_next_number(db, daily_queue)
+        # Один атомарный UPDATE ... RETURNING по счётчику очереди,
+        # без блокировки DailyQueue и без сканирования записей
+        number = allocate_queue_number(db, queue_id, start_number=fallback_start)
+        if number is None:
+            raise QueueNotFoundError(f"DailyQueue {queue_id} not found")
+        return number
 
 
     def assign_queue_token(
@@ -835,6 +842,8 @@ class OperationsMixin(QueueBusinessServiceMixinBase):
                 daily_queue=queue_obj,
                 queue_tag=queue_obj.queue_tag,
             )
+        else:
+            reserve_queue_number(db, queue_obj.id, number)
 
         queue_dt = queue_time or self.get_local_timestamp(db)
 
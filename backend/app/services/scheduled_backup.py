@@ -23,6 +23,13 @@ class ScheduledBackupService:
         self.running = False
         self.task: asyncio.Task | None = None
 
+    def run_backup(self) -> dict:
+        """Create one scheduled backup (used by app.tasks.periodic and backup_loop)"""
+        logger.info("🔄 Starting scheduled backup...")
+        backup_info = self.backup_service.create_backup("scheduled")
+        logger.info(f"✅ Scheduled backup completed: {backup_info['filename']}")
+        return backup_info
+
     async def start_daily_backups(
         self, backup_time: time = time(2, 0)  # 2 AM by default
     ):
@@ -55,10 +62,8 @@ class ScheduledBackupService:
                     await asyncio.sleep(wait_seconds)
 
                     if self.running:
-                        logger.info("🔄 Starting scheduled backup...")
                         try:
-                            backup_info = self.backup_service.create_backup("scheduled")
-                            logger.info(f"✅ Scheduled backup completed: {backup_info['filename']}")
+                            self.run_backup()
                         except Exception as e:
                             logger.error(f"❌ Scheduled backup failed: {e}")
 
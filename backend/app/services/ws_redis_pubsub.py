@@ -14,6 +14,18 @@ logger = logging.getLogger(__name__)
 Handler = Callable[[dict], Awaitable[None]]
 
 
+def _default_instance_id() -> str:
+    """Per-process id: messages from the same id are treated as our own.
+
+    WS_INSTANCE_ID is shared by every uvicorn worker of a container, so it is
+    only a readable prefix - the pid and a random suffix keep sibling workers
+    from dropping each other's messages.
+    """
+    suffix = f"{os.getpid()}:{uuid4().hex[:8]}"
+    prefix = os.getenv("WS_INSTANCE_ID")
+    return f"{prefix}:{suffix}" if prefix else suffix
+
+
 class RedisPubSubBridge:
     """
     Lightweight Redis pub/sub bridge for cross-instance websocket broadcasts.
@@ -34,7 +46,7 @@ class RedisPubSubBridge:
             or os.getenv("REDIS_URL")
             or ""
         )
-        self.instance_id = instance_id or os.getenv("WS_INSTANCE_ID") or uuid4().hex
+        self.instance_id = instance_id or _default_instance_id()
         self.enabled = bool(self.redis_url)
 
         self._redis_mod = None
@@ -48,17 +60,25 @@ class RedisPubSubBridge:
     def _channel(self, logical_channel: str) -> str:
         return f"{self.channel_prefix}:{logical_channel}"
 
-    async def publish(self, logical_channel: str, payload: dict) -> bool:
-        if not await self._ensure_ready():
-            return False
+    def encode(self, logical_channel: str, payload: dict) -> tuple[str, str]:
+        """Return ``(channel, message)`` in the bridge wire format.
 
-        assert self._redis_client is not None
+        Lets synchronous publishers (e.g. a sync redis client) emit messages
+        that this bridge's listeners decode and de-duplicate by source.
+        """
         envelope = {
             "source": self.instance_id,
             "payload": payload,
         }
-        channel = self._channel(logical_channel)
-        await self._redis_client.publish(channel, json.dumps(envelope, ensure_ascii=False))
+        return self._channel(logical_channel), json.dumps(envelope, ensure_ascii=False)
+
+    async def publish(self, logical_channel: str, payload: dict) -> bool:
+        if not await self._ensure_ready():
+            return False
+
+        assert self._redis_client is not None
+        channel, message = self.encode(logical_channel, payload)
+        await self._redis_client.publish(channel, message)
         return True
 
     async def subscribe(self, logical_channel: str, handler: Handler) -> None:
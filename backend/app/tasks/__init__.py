@@ -15,13 +15,17 @@ Each task function is async and idempotent. The arq worker entry point is
 """
 
 from app.tasks.scheduler import (
+    enqueue_analytics_rollup_refresh,
     enqueue_data_retention,
     enqueue_reminder,
     enqueue_scheduled_report,
+    enqueue_visit_reminders_batch,
 )
 
 __all__ = [
     "enqueue_reminder",
+    "enqueue_visit_reminders_batch",
     "enqueue_data_retention",
     "enqueue_scheduled_report",
+    "enqueue_analytics_rollup_refresh",
 ]
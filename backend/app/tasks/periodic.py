@@ -0,0 +1,446 @@
+"""Leader-elected periodic job scheduler for the API process.
+
+Replaces the ad-hoc ``while True: ...; await asyncio.sleep(...)`` loops that
+used to be started from app.main. Every uvicorn worker runs a
+PeriodicScheduler, but each schedule slot of a job is executed by exactly
+one of them:
+
+- A schedule maps wall-clock time to an integer slot (Interval: every N
+  seconds, DailyAt: once a day at a local time).
+- Before running slot N a worker claims the job's lease. The claim succeeds
+  only if N is newer than the last claimed slot *and* nobody holds the
+  running lock, so a slow run is never overlapped by the next slot.
+- The running lock has a TTL that is extended by a heartbeat while the job
+  runs, so a crashed worker releases the job automatically.
+
+Leases live in Redis (SCHEDULER_REDIS_URL or REDIS_URL, not under TESTING)
+or, without Redis, in the scheduler_leases table.
+
+Job functions are synchronous (they use SessionLocal like the rest of the
+services) and run in a small dedicated thread pool, never on the event loop.
+
+Env:
+    SCHEDULER_ENABLED        - "0" disables the scheduler (default "1")
+    SCHEDULER_WORKERS        - job thread pool size (default 2)
+    SCHEDULER_LEASE_SECONDS  - running lock TTL, heartbeat every TTL/3 (default 60)
+    LAB_NOTIFICATION_SWEEP_ENABLED
+                             - "1" enables the lab notification sweep every 5 min
+                               (default "0": run_lab_notifications() does not
+                               deduplicate and would re-notify every completed order)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import random
+import socket
+import time
+import uuid
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import UTC, date, datetime, timedelta
+from datetime import time as dt_time
+from typing import Any, Protocol
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from app.core.prometheus import record_scheduler_job_run
+from app.db.session import SessionLocal
+from app.models.scheduler_lease import SchedulerLease
+
+logger = logging.getLogger(__name__)
+
+_TESTING = os.getenv("TESTING", "").lower() in ("1", "true", "yes")
+
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1").lower() in ("1", "true", "yes")
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "2"))
+SCHEDULER_LEASE_SECONDS = float(os.getenv("SCHEDULER_LEASE_SECONDS", "60"))
+
+# Lease claim results
+CLAIMED = "claimed"
+# The slot was already run (or is running) elsewhere
+TAKEN = "taken"
+# The previous run still holds the lock - this slot is skipped
+BUSY = "busy"
+
+
+# -----------------------------------------------------------------------------
+# Schedules
+# -----------------------------------------------------------------------------
+class Schedule(Protocol):
+    def slot(self, now: float) -> int: ...
+
+    def slot_start(self, slot: int) -> float: ...
+
+
+@dataclass(frozen=True)
+class Interval:
+    """Every ``seconds`` seconds, aligned to the epoch (same slots in every worker)."""
+
+    seconds: float
+
+    def slot(self, now: float) -> int:
+        return int(now // self.seconds)
+
+    def slot_start(self, slot: int) -> float:
+        return slot * self.seconds
+
+
+@dataclass(frozen=True)
+class DailyAt:
+    """Once a day at a local wall-clock time; the slot is the date's ordinal."""
+
+    at: dt_time
+
+    def slot(self, now: float) -> int:
+        local = datetime.fromtimestamp(now)
+        day = local.date()
+        if local.time() < self.at:
+            day -= timedelta(days=1)
+        return day.toordinal()
+
+    def slot_start(self, slot: int) -> float:
+        return datetime.combine(date.fromordinal(slot), self.at).timestamp()
+
+
+@dataclass(frozen=True)
+class PeriodicJob:
+    name: str
+    func: Callable[[], Any]
+    schedule: Schedule
+    # Random delay (seconds) added to every slot start, spreads DB load
+    jitter: float = 0.0
+    # Claim the current slot at startup instead of waiting for the next one
+    run_on_start: bool = False
+
+
+# -----------------------------------------------------------------------------
+# Leases
+# -----------------------------------------------------------------------------
+class Lease(Protocol):
+    def claim(self, job: str, slot: int, owner: str, ttl: float) -> str: ...
+
+    def heartbeat(self, job: str, owner: str, ttl: float) -> bool: ...
+
+    def finish(self, job: str, owner: str, success: bool) -> None: ...
+
+
+class DatabaseLease:
+    """Lease rows in scheduler_leases; claims are a single conditional UPDATE."""
+
+    def __init__(self, session_factory: Callable[[], Any] = SessionLocal) -> None:
+        self._session_factory = session_factory
+
+    def claim(self, job: str, slot: int, owner: str, ttl: float) -> str:
+        now = datetime.now(UTC)
+        db = self._session_factory()
+        try:
+            result = db.execute(
+                update(SchedulerLease)
+                .where(
+                    SchedulerLease.job_name == job,
+                    SchedulerLease.last_slot < slot,
+                    (SchedulerLease.locked_until.is_(None)) | (SchedulerLease.locked_until < now),
+                )
+                .values(owner=owner, last_slot=slot, locked_until=now + timedelta(seconds=ttl))
+            )
+            db.commit()
+            if result.rowcount:
+                return CLAIMED
+
+            lease = db.get(SchedulerLease, job)
+            if lease is not None:
+                return TAKEN if lease.last_slot >= slot else BUSY
+
+            db.add(
+                SchedulerLease(
+                    job_name=job,
+                    owner=owner,
+                    last_slot=slot,
+                    locked_until=now + timedelta(seconds=ttl),
+                )
+            )
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker inserted the row first
+                db.rollback()
+                return TAKEN
+            return CLAIMED
+        finally:
+            db.close()
+
+    def heartbeat(self, job: str, owner: str, ttl: float) -> bool:
+        db = self._session_factory()
+        try:
+            result = db.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.job_name == job, SchedulerLease.owner == owner)
+                .values(locked_until=datetime.now(UTC) + timedelta(seconds=ttl))
+            )
+            db.commit()
+            return bool(result.rowcount)
+        finally:
+            db.close()
+
+    def finish(self, job: str, owner: str, success: bool) -> None:
+        values: dict[str, Any] = {"locked_until": None}
+        if success:
+            values["last_success_at"] = datetime.now(UTC)
+        db = self._session_factory()
+        try:
+            db.execute(
+                update(SchedulerLease)
+                .where(SchedulerLease.job_name == job, SchedulerLease.owner == owner)
+                .values(**values)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+
+# KEYS[1] - lease hash; ARGV: slot, owner, now, ttl.
+# Returns 1 claimed, 0 slot taken, -1 previous run still holds the lock.
+_CLAIM_LUA = """
+local state = redis.call('HMGET', KEYS[1], 'slot', 'until')
+local slot = tonumber(ARGV[1])
+local now = tonumber(ARGV[3])
+if (tonumber(state[1]) or -1) >= slot then
+    return 0
+end
+if (tonumber(state[2]) or 0) > now then
+    return -1
+end
+redis.call('HSET', KEYS[1], 'slot', slot, 'owner', ARGV[2], 'until', now + tonumber(ARGV[4]))
+return 1
+"""
+
+# KEYS[1] - lease hash; ARGV: owner, until. Returns 1 if the owner still holds it.
+_HEARTBEAT_LUA = """
+if redis.call('HGET', KEYS[1], 'owner') ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'until', ARGV[2])
+return 1
+"""
+
+# KEYS[1] - lease hash; ARGV: owner, now, success.
+_FINISH_LUA = """
+if redis.call('HGET', KEYS[1], 'owner') ~= ARGV[1] then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'until', 0)
+if ARGV[3] == '1' then
+    redis.call('HSET', KEYS[1], 'last_success', ARGV[2])
+end
+return 1
+"""
+
+
+class RedisLease:
+    """Lease hashes in Redis (slot, owner, until), updated by atomic Lua scripts."""
+
+    KEY_PREFIX = "scheduler-lease:"
+
+    def __init__(self, client: Any, key_prefix: str = KEY_PREFIX) -> None:
+        self._key_prefix = key_prefix
+        self._claim = client.register_script(_CLAIM_LUA)
+        self._heartbeat = client.register_script(_HEARTBEAT_LUA)
+        self._finish = client.register_script(_FINISH_LUA)
+
+    def claim(self, job: str, slot: int, owner: str, ttl: float) -> str:
+        result = int(
+            self._claim(keys=[f"{self._key_prefix}{job}"], args=[slot, owner, time.time(), ttl])
+        )
+        return {1: CLAIMED, 0: TAKEN}.get(result, BUSY)
+
+    def heartbeat(self, job: str, owner: str, ttl: float) -> bool:
+        return bool(
+            self._heartbeat(keys=[f"{self._key_prefix}{job}"], args=[owner, time.time() + ttl])
+        )
+
+    def finish(self, job: str, owner: str, success: bool) -> None:
+        self._finish(
+            keys=[f"{self._key_prefix}{job}"], args=[owner, time.time(), "1" if success else "0"]
+        )
+
+
+def create_lease() -> Lease:
+    """Redis lease if SCHEDULER_REDIS_URL/REDIS_URL is configured, else the DB table."""
+    redis_url = "" if _TESTING else (
+        os.getenv("SCHEDULER_REDIS_URL") or os.getenv("REDIS_URL") or ""
+    ).strip()
+    if redis_url:
+        try:
+            import redis
+
+            return RedisLease(redis.Redis.from_url(redis_url))
+        except ImportError:
+            logger.warning("redis package not installed - using database scheduler leases")
+    return DatabaseLease()
+
+
+# -----------------------------------------------------------------------------
+# Scheduler
+# -----------------------------------------------------------------------------
+def _default_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class PeriodicScheduler:
+    """Runs periodic jobs; each slot of a job runs in exactly one process."""
+
+    def __init__(
+        self,
+        jobs: list[PeriodicJob],
+        lease: Lease | None = None,
+        *,
+        workers: int = SCHEDULER_WORKERS,
+        lease_seconds: float = SCHEDULER_LEASE_SECONDS,
+        owner: str | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.jobs = jobs
+        self.lease = lease or create_lease()
+        self.lease_seconds = lease_seconds
+        self.owner = owner or _default_owner()
+        self._clock = clock
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="periodic-job"
+        )
+        self._tasks: list[asyncio.Task] = []
+
+    def start(self) -> None:
+        for job in self.jobs:
+            self._tasks.append(asyncio.create_task(self._job_loop(job), name=f"periodic:{job.name}"))
+        logger.info(
+            "Periodic scheduler started (owner=%s, jobs=%s)",
+            self.owner,
+            ", ".join(job.name for job in self.jobs),
+        )
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        logger.info("Periodic scheduler stopped")
+
+    async def run_job_once(self, job: PeriodicJob, slot: int) -> str | None:
+        """Claim ``slot`` and run the job if this process won it.
+
+        Returns "success", "failure", "skipped" (previous run still holds the
+        lock) or None (the slot belongs to another process).
+        """
+        claim = await asyncio.to_thread(
+            self.lease.claim, job.name, slot, self.owner, self.lease_seconds
+        )
+        if claim == TAKEN:
+            return None
+        if claim == BUSY:
+            logger.warning("Periodic job %s: previous run still in progress, slot skipped", job.name)
+            record_scheduler_job_run(job.name, "skipped")
+            return "skipped"
+
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        started = time.perf_counter()
+        success = False
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, job.func)
+            success = True
+        except Exception:
+            logger.exception("Periodic job %s failed", job.name)
+        finally:
+            heartbeat.cancel()
+            duration = time.perf_counter() - started
+            try:
+                await asyncio.to_thread(self.lease.finish, job.name, self.owner, success)
+            except Exception as exc:
+                # The lock expires on its own after lease_seconds
+                logger.warning("Periodic job %s: failed to release lease: %s", job.name, exc)
+
+        outcome = "success" if success else "failure"
+        record_scheduler_job_run(job.name, outcome, duration)
+        logger.info("Periodic job %s: %s in %.2fs", job.name, outcome, duration)
+        return outcome
+
+    async def _heartbeat(self, job: PeriodicJob) -> None:
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                held = await asyncio.to_thread(
+                    self.lease.heartbeat, job.name, self.owner, self.lease_seconds
+                )
+                if not held:
+                    logger.warning("Periodic job %s: lease lost while running", job.name)
+            except Exception as exc:
+                logger.warning("Periodic job %s: lease heartbeat failed: %s", job.name, exc)
+
+    async def _job_loop(self, job: PeriodicJob) -> None:
+        current = job.schedule.slot(self._clock())
+        next_slot = current if job.run_on_start else current + 1
+        while True:
+            delay = job.schedule.slot_start(next_slot) - self._clock()
+            delay = max(0.0, delay) + random.uniform(0, job.jitter)
+            await asyncio.sleep(delay)
+            try:
+                await self.run_job_once(job, next_slot)
+            except Exception as exc:
+                logger.error("Periodic job %s: lease error: %s", job.name, exc)
+            # If the run overran several slots, do not replay the missed ones
+            next_slot = max(next_slot + 1, job.schedule.slot(self._clock()) + 1)
+
+
+# -----------------------------------------------------------------------------
+# Jobs
+# -----------------------------------------------------------------------------
+def run_scheduled_backup() -> None:
+    from app.services.scheduled_backup import ScheduledBackupService
+
+    db = SessionLocal()
+    try:
+        ScheduledBackupService(db).run_backup()
+    finally:
+        db.close()
+
+
+def run_lab_notification_sweep() -> None:
+    """#8: safety net for lab notifications missed by lab_reporting_service.finalize()."""
+    from app.services.lab_notification_service import run_lab_notifications
+
+    db = SessionLocal()
+    try:
+        asyncio.run(run_lab_notifications(db))
+    finally:
+        db.close()
+
+
+def build_default_jobs(settings: Any) -> list[PeriodicJob]:
+    """Jobs started by app.main.
+
+    Data retention (F-017) is not here: the arq cron ``run_data_retention``
+    in app.tasks.worker already runs it daily at 03:00 UTC.
+    """
+    jobs: list[PeriodicJob] = []
+    if settings.AUTO_BACKUP_ENABLED:
+        backup_time = dt_time(int(os.getenv("BACKUP_HOUR", "2")), int(os.getenv("BACKUP_MINUTE", "0")))
+        jobs.append(PeriodicJob("scheduled_backup", run_scheduled_backup, DailyAt(backup_time)))
+    # run_lab_notifications() does not deduplicate: every run re-notifies all
+    # completed orders. Opt-in until delivery is tracked per order.
+    if os.getenv("LAB_NOTIFICATION_SWEEP_ENABLED", "0").lower() in ("1", "true", "yes"):
+        jobs.append(
+            PeriodicJob(
+                "lab_notifications",
+                run_lab_notification_sweep,
+                Interval(300),
+                jitter=30,
+                run_on_start=True,
+            )
+        )
+    return jobs
@@ -89,11 +89,28 @@ async def enqueue_reminder(visit_id: int, channel: str = "telegram") -> str:
     )
 
 
+async def enqueue_visit_reminders_batch(visit_date: str | None = None) -> str:
+    """Remind all patients with an unconfirmed visit on `visit_date` (ISO, default: tomorrow).
+
+    Returns: job_id.
+    """
+    return await _enqueue(
+        "send_visit_reminders_batch",
+        visit_date=visit_date,
+        _job_id=f"reminder:batch:{visit_date or 'tomorrow'}",
+    )
+
+
 async def enqueue_data_retention() -> str:
     """Run the daily data retention cleanup (see data_retention.run_scheduled_cleanup)."""
     return await _enqueue("run_data_retention", _job_id="retention:daily")
 
 
+async def enqueue_analytics_rollup_refresh() -> str:
+    """Refresh daily analytics rollups now (see analytics_rollup.refresh_rollups)."""
+    return await _enqueue("refresh_analytics_rollups", _job_id="analytics:rollup:refresh")
+
+
 async def enqueue_scheduled_report(report_type: str, filters: dict[str, Any] | None = None) -> str:
     """Generate a scheduled report async (see reporting_service)."""
     return await _enqueue(
@@ -11,13 +11,24 @@ the Redis instance configured by settings.ARQ_REDIS_URL.
 
 Jobs are defined as async functions in this file. The scheduler in
 app/tasks/scheduler.py enqueues them by name.
+
+One SQLAlchemy engine (pool sized to max_jobs) is created per worker
+process in startup() and disposed in shutdown(); jobs take sessions from
+ctx["session_factory"]. Every job reports duration, outcome and retries
+to Prometheus; set ARQ_METRICS_PORT to expose them from the worker.
 """
 
 from __future__ import annotations
 
 import asyncio
+import functools
 import logging
+import os
 import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from datetime import UTC, date, datetime, timedelta
 from pathlib import Path
 
 from arq import cron
@@ -26,105 +37,240 @@ from arq.connections import RedisSettings
 # Ensure backend/ is on PYTHONPATH when run via `arq app.tasks.worker.WorkerSettings`
 sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
 
+from sqlalchemy import Engine, create_engine  # noqa: E402
+from sqlalchemy.orm import Session, sessionmaker  # noqa: E402
+
 from app.core.config import settings  # noqa: E402
+from app.core.prometheus import record_worker_job_run, start_worker_metrics_server  # noqa: E402
 
 logger = logging.getLogger(__name__)
 
+# Concurrent jobs per worker process; also the DB pool size
+ARQ_MAX_JOBS = int(os.getenv("ARQ_MAX_JOBS", "10"))
+# Port for the worker's /metrics endpoint (0 = not exposed)
+ARQ_METRICS_PORT = int(os.getenv("ARQ_METRICS_PORT", "0"))
+# Visits loaded per query by send_visit_reminders_batch
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "200"))
+
+
+# ---------------------------------------------------------------------------
+# DB sessions and job instrumentation
+# ---------------------------------------------------------------------------
+
+def _create_worker_engine() -> Engine:
+    """Worker-lifetime engine: one pooled connection per concurrent job."""
+    from app.db.session import DATABASE_URL
+
+    is_sqlite = DATABASE_URL.startswith("sqlite")
+    engine_kwargs: dict[str, object] = {"pool_pre_ping": True}
+    if is_sqlite:
+        engine_kwargs["connect_args"] = {"check_same_thread": False}
+    else:
+        engine_kwargs.update(pool_size=ARQ_MAX_JOBS, max_overflow=2, pool_recycle=1800)
+    return create_engine(DATABASE_URL, **engine_kwargs)
+
+
+@contextmanager
+def _job_session(ctx) -> Iterator[Session]:
+    """Session from the worker's pool (the app-wide pool outside the worker)."""
+    factory = ctx.get("session_factory")
+    if factory is None:
+        from app.db.session import SessionLocal as factory
+    db = factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _instrumented(func):
+    """Record duration, outcome and retries of a job in Prometheus."""
+
+    @functools.wraps(func)
+    async def wrapper(ctx, *args, **kwargs):
+        started = time.perf_counter()
+        outcome = "failure"
+        try:
+            result = await func(ctx, *args, **kwargs)
+            outcome = "success"
+            return result
+        finally:
+            record_worker_job_run(
+                func.__name__,
+                outcome,
+                time.perf_counter() - started,
+                attempt=ctx.get("job_try", 1),
+            )
+
+    return wrapper
+
 
 # ---------------------------------------------------------------------------
 # Job implementations
 # ---------------------------------------------------------------------------
 
+@_instrumented
 async def send_visit_reminder(ctx, *, visit_id: int, channel: str = "telegram") -> None:
     """Send a reminder to a patient about an upcoming visit.
 
     Enqueued by app.tasks.scheduler.enqueue_reminder().
     Idempotent: checks if a reminder was already sent for this visit before sending.
 
-    Uses the existing NotificationService.send_confirmation_reminder() which
-    handles Telegram/SMS/email dispatch based on patient preferences. The
+    Uses NotificationSenderService.send_visit_reminder() which handles
+    Telegram/SMS/email dispatch based on patient preferences. The
     `channel` argument is a hint — the service may override it via
     _determine_best_channel() based on patient contact info.
 
     Marks `visits.reminder_sent_at` on success so retries are idempotent.
     """
-    from sqlalchemy import create_engine, text
-    from sqlalchemy.orm import Session
-
+    from app.models.patient import Patient
     from app.models.visit import Visit
-    from app.services.notification_service import NotificationService
+    from app.services.notifications import notification_sender_service
 
     logger.info("job.send_visit_reminder visit_id=%s channel=%s", visit_id, channel)
 
-    engine = create_engine(str(settings.DATABASE_URL))
-    db = Session(engine)
-    try:
-        # Idempotency: skip if already sent
-        already_sent = db.execute(
-            text("SELECT reminder_sent_at FROM visits WHERE id = :vid"),
-            {"vid": visit_id},
-        ).scalar()
-        if already_sent:
-            logger.info(
-                "job.send_visit_reminder: visit %s already reminded at %s, skipping",
-                visit_id, already_sent,
+    with _job_session(ctx) as db:
+        try:
+            visit = db.get(Visit, visit_id)
+            if not visit:
+                logger.warning("job.send_visit_reminder: visit %s not found", visit_id)
+                return
+
+            # Idempotency: skip if already sent
+            if visit.reminder_sent_at:
+                logger.info(
+                    "job.send_visit_reminder: visit %s already reminded at %s, skipping",
+                    visit_id, visit.reminder_sent_at,
+                )
+                return
+
+            patient = db.get(Patient, visit.patient_id)
+            if not patient:
+                logger.warning("job.send_visit_reminder: patient of visit %s not found", visit_id)
+                return
+
+            # Send via the real notification service.
+            # This dispatches to Telegram bot / SMS gateway / email based on
+            # patient preferences and the channel hint.
+            result = await notification_sender_service.send_visit_reminder(
+                db, visit, patient, hours_before=24
             )
-            return
-
-        visit = db.query(Visit).filter(Visit.id == visit_id).first()
-        if not visit:
-            logger.warning("job.send_visit_reminder: visit %s not found", visit_id)
-            return
-
-        # Send via the real notification service.
-        # This dispatches to Telegram bot / SMS gateway / email based on
-        # patient preferences and the channel hint.
-        service = NotificationService(db)
-        result = await service.send_confirmation_reminder(visit, hours_before=24)
-
-        if not result.get("success"):
-            logger.warning(
-                "job.send_visit_reminder: send failed for visit %s: %s",
-                visit_id, result.get("error", "unknown"),
-            )
-            # Don't mark as sent — let arq retry
-            raise RuntimeError(f"Notification send failed: {result.get('error')}")
-
-        # Mark as sent
-        db.execute(
-            text("UPDATE visits SET reminder_sent_at = NOW() WHERE id = :vid"),
-            {"vid": visit_id},
-        )
-        db.commit()
-        logger.info(
-            "job.send_visit_reminder: visit %s reminded via %s",
-            visit_id, result.get("channel", channel),
-        )
-    except Exception:
-        db.rollback()
-        logger.exception("job.send_visit_reminder failed for visit %s", visit_id)
-        raise  # arq will retry per retry_policy
-    finally:
-        db.close()
 
+            if not result.get("success"):
+                logger.warning(
+                    "job.send_visit_reminder: send failed for visit %s: %s",
+                    visit_id, result.get("error", "unknown"),
+                )
+                # Don't mark as sent — let arq retry
+                raise RuntimeError(f"Notification send failed: {result.get('error')}")
+
+            # Mark as sent
+            visit.reminder_sent_at = datetime.now(UTC)
+            db.commit()
+            logger.info(
+                "job.send_visit_reminder: visit %s reminded via %s",
+                visit_id, result.get("channel", channel),
+            )
+        except Exception:
+            db.rollback()
+            logger.exception("job.send_visit_reminder failed for visit %s", visit_id)
+            raise  # arq will retry per retry_policy
+
+
+@_instrumented
+async def send_visit_reminders_batch(
+    ctx, *, visit_date: str | None = None, chunk_size: int = REMINDER_BATCH_SIZE
+) -> dict:
+    """Remind all patients with an unconfirmed visit on `visit_date` (default: tomorrow).
+
+    Visits are walked in id order, `chunk_size` at a time: one query loads a
+    chunk with its patients (plus one selectin query each for services and
+    doctors), and one UPDATE marks the delivered reminders before the chunk
+    is committed. Visits with `reminder_sent_at` set are skipped, so reruns
+    and retries only pick up what was not delivered.
+    """
+    from sqlalchemy import select, update
+    from sqlalchemy.orm import selectinload
 
+    from app.models.clinic import Doctor
+    from app.models.patient import Patient
+    from app.models.visit import Visit
+    from app.services.notifications import notification_sender_service
+
+    target = date.fromisoformat(visit_date) if visit_date else date.today() + timedelta(days=1)
+    logger.info("job.send_visit_reminders_batch starting date=%s", target)
+
+    sent = failed = 0
+    last_id = 0
+    with _job_session(ctx) as db:
+        while True:
+            rows = db.execute(
+                select(Visit, Patient)
+                .join(Patient, Patient.id == Visit.patient_id)
+                .where(
+                    Visit.visit_date == target,
+                    Visit.status == "pending_confirmation",
+                    Visit.reminder_sent_at.is_(None),
+                    Visit.id > last_id,
+                )
+                .options(
+                    selectinload(Visit.services),
+                    selectinload(Visit.doctor).selectinload(Doctor.user),
+                )
+                .order_by(Visit.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1][0].id
+
+            delivered: list[int] = []
+            for visit, patient in rows:
+                result = await notification_sender_service.send_visit_reminder(
+                    db,
+                    visit,
+                    patient,
+                    hours_before=24,
+                    visit_services=visit.services,
+                    doctor=visit.doctor,
+                )
+                if result.get("success"):
+                    delivered.append(visit.id)
+                else:
+                    failed += 1
+                    logger.warning(
+                        "job.send_visit_reminders_batch: send failed for visit %s: %s",
+                        visit.id, result.get("error", "unknown"),
+                    )
+
+            if delivered:
+                db.execute(
+                    update(Visit)
+                    .where(Visit.id.in_(delivered))
+                    .values(reminder_sent_at=datetime.now(UTC))
+                )
+            db.commit()
+            sent += len(delivered)
+            if len(rows) < chunk_size:
+                break
+
+    result = {"visit_date": target.isoformat(), "sent": sent, "failed": failed}
+    logger.info("job.send_visit_reminders_batch complete: %s", result)
+    return result
+
+
+@_instrumented
 async def run_data_retention(ctx) -> None:
     """Run the daily data retention cleanup. See data_retention.run_scheduled_cleanup."""
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import Session
-
     from app.services.data_retention import run_scheduled_cleanup
 
     logger.info("job.run_data_retention starting")
-    engine = create_engine(str(settings.DATABASE_URL))
-    db = Session(engine)
-    try:
+    with _job_session(ctx) as db:
         result = run_scheduled_cleanup(db)
         logger.info("job.run_data_retention complete: %s", result)
-    finally:
-        db.close()
 
 
+@_instrumented
 async def generate_scheduled_report(ctx, *, report_type: str, filters: dict | None = None) -> None:
     """Generate a scheduled report. See reporting_service."""
     logger.info("job.generate_scheduled_report type=%s filters=%s", report_type, list((filters or {}).keys()))
@@ -134,29 +280,66 @@ async def generate_scheduled_report(ctx, *, report_type: str, filters: dict | No
     logger.info("job.generate_scheduled_report complete (stub)")
 
 
+@_instrumented
 async def run_lab_follow_up_reminders(ctx) -> None:
     """Send lab follow-up reminders. See lab_notification_service.send_follow_up_reminders.
 
     Runs daily — checks for lab orders with upcoming follow-up dates and
     sends reminders to patients 3 days before the scheduled follow-up.
     """
-    from sqlalchemy import create_engine
-    from sqlalchemy.orm import Session
-
     from app.services.lab_notification_service import LabNotificationService
 
     logger.info("job.run_lab_follow_up_reminders starting")
-    engine = create_engine(str(settings.DATABASE_URL))
-    db = Session(engine)
-    try:
-        svc = LabNotificationService(db)
-        result = await svc.send_follow_up_reminders(days_before=3)
-        logger.info("job.run_lab_follow_up_reminders complete: %s", result)
-    except Exception:
-        db.rollback()
-        logger.exception("job.run_lab_follow_up_reminders failed")
-    finally:
-        db.close()
+    with _job_session(ctx) as db:
+        try:
+            svc = LabNotificationService(db)
+            result = await svc.send_follow_up_reminders(days_before=3)
+            logger.info("job.run_lab_follow_up_reminders complete: %s", result)
+        except Exception:
+            db.rollback()
+            logger.exception("job.run_lab_follow_up_reminders failed")
+
+
+@_instrumented
+async def refresh_analytics_rollups(ctx) -> None:
+    """Refresh daily analytics rollups. See analytics_rollup.refresh_rollups.
+
+    Rolls up closed days that are missing plus the last few days (late status
+    changes and refunds). Older history is filled by
+    `python -m app.scripts.backfill_analytics_rollups`.
+    """
+    from app.services.analytics_rollup import refresh_rollups
+
+    logger.info("job.refresh_analytics_rollups starting")
+    with _job_session(ctx) as db:
+        result = refresh_rollups(db)
+        logger.info("job.refresh_analytics_rollups complete: %d days", len(result))
+
+
+@_instrumented
+async def collect_file_blob_garbage(ctx, *, max_batches: int = 20) -> None:
+    """Reclaim file blobs nobody references. See FileSystemService.collect_unreferenced_blobs.
+
+    Incremental: each batch is committed on its own and the run stops after
+    `max_batches`, so a large backlog is worked off over several runs.
+    """
+    from app.services.file_system_service import get_file_system_service
+
+    logger.info("job.collect_file_blob_garbage starting")
+    service = get_file_system_service()
+    collected = freed_bytes = 0
+    with _job_session(ctx) as db:
+        for _ in range(max_batches):
+            result = service.collect_unreferenced_blobs(db)
+            collected += result["collected"]
+            freed_bytes += result["freed_bytes"]
+            if result["collected"] < service.blob_gc_batch_size:
+                break
+        logger.info(
+            "job.collect_file_blob_garbage complete: %d blobs, %d bytes",
+            collected,
+            freed_bytes,
+        )
 
 
 # ---------------------------------------------------------------------------
@@ -165,9 +348,18 @@ async def run_lab_follow_up_reminders(ctx) -> None:
 
 async def startup(ctx) -> None:
     logger.info("arq.worker.startup redis=%s", _redact_redis_url(settings.ARQ_REDIS_URL))
+    engine = _create_worker_engine()
+    ctx["db_engine"] = engine
+    ctx["session_factory"] = sessionmaker(bind=engine, autoflush=False)
+    if ARQ_METRICS_PORT:
+        start_worker_metrics_server(ARQ_METRICS_PORT)
 
 
 async def shutdown(ctx) -> None:
+    ctx.pop("session_factory", None)
+    engine = ctx.pop("db_engine", None)
+    if engine is not None:
+        engine.dispose()
     logger.info("arq.worker.shutdown")
 
 
@@ -219,7 +411,15 @@ class WorkerSettings:
         arq app.tasks.worker.WorkerSettings
     """
 
-    functions = [send_visit_reminder, run_data_retention, generate_scheduled_report, run_lab_follow_up_reminders]
+    functions = [
+        send_visit_reminder,
+        send_visit_reminders_batch,
+        run_data_retention,
+        generate_scheduled_report,
+        run_lab_follow_up_reminders,
+        refresh_analytics_rollups,
+        collect_file_blob_garbage,
+    ]
 
     on_startup = startup
     on_shutdown = shutdown
@@ -227,7 +427,7 @@ class WorkerSettings:
 
     redis_settings = _parse_redis_settings(settings.ARQ_REDIS_URL)
 
-    max_jobs = 10
+    max_jobs = ARQ_MAX_JOBS
     job_timeout = 300  # 5 min per job
     health_check_interval = 30
     queue_name = "clinic"
@@ -236,8 +436,19 @@ class WorkerSettings:
     cron_jobs = [
         cron(run_data_retention, hour=3, minute=0),  # Daily 03:00 UTC
         cron(run_lab_follow_up_reminders, hour=8, minute=0),  # Daily 08:00 UTC
+        cron(refresh_analytics_rollups, hour={0, 6, 12, 18}, minute=20),  # Every 6h
+        cron(collect_file_blob_garbage, minute=40),  # Hourly
+        cron(send_visit_reminders_batch, hour=13, minute=0),  # Daily 13:00 UTC, tomorrow's visits
     ]
 
 
 # Make functions importable from app.tasks (for scheduler.py)
-__all__ = ["send_visit_reminder", "run_data_retention", "generate_scheduled_report", "run_lab_follow_up_reminders"]
+__all__ = [
+    "send_visit_reminder",
+    "send_visit_reminders_batch",
+    "run_data_retention",
+    "generate_scheduled_report",
+    "run_lab_follow_up_reminders",
+    "refresh_analytics_rollups",
+    "collect_file_blob_garbage",
+]
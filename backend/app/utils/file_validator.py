@@ -105,6 +105,8 @@ SIZE_LIMITS = {
 }
 
 READ_CHUNK_BYTES = 1024 * 1024
+# Bytes kept for magic-number and plain-text checks (_is_probably_plain_text)
+VALIDATION_SAMPLE_BYTES = 4096
 
 
 # Allowed extensions by category
@@ -253,7 +255,9 @@ async def validate_upload_file(
         Tuple of (is_valid, error_message, file_info)
     """
     try:
-        chunks: list[bytes] = []
+        # Signatures and the text heuristic only look at the head of the file,
+        # so the rest is counted for the size limit but never buffered
+        content = b""
         file_size = 0
         read_limit = max_size or max(SIZE_LIMITS.values())
 
@@ -269,9 +273,8 @@ async def validate_upload_file(
                     f"File size {file_size} bytes exceeds limit {read_limit} bytes",
                     None,
                 )
-            chunks.append(chunk)
-
-        content = b"".join(chunks)
+            if len(content) < VALIDATION_SAMPLE_BYTES:
+                content += chunk[:VALIDATION_SAMPLE_BYTES - len(content)]
 
         # Reset file pointer for later use
         await upload_file.seek(0)
@@ -0,0 +1,56 @@
+"""Normalization helpers for name/phone search columns.
+
+The normalized form is lossy and used only for matching, never for display:
+case-folded, Cyrillic (Russian and Uzbek) transliterated to Latin, common
+spelling variants folded (``kh``/``x``, ``q``/``k``, ``zh``/``j``, Uzbek
+apostrophes dropped) and anything that is not a letter or digit collapsed
+to a single space. The same function is applied to stored values and to
+the search query, so "Иванов", "IVANOV" and "ivanov" all match each other.
+"""
+
+from __future__ import annotations
+
+import re
+
+_CYRILLIC_TO_LATIN = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e",
+    "ж": "j", "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m",
+    "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "x", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "",
+    "ы": "i", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+    # Узбекская кириллица
+    "ў": "o", "ғ": "g", "қ": "k", "ҳ": "h",
+}
+_TRANSLIT_TABLE = str.maketrans(_CYRILLIC_TO_LATIN)
+
+# Варианты латинской записи одного и того же звука (после транслитерации)
+_LATIN_FOLDS = (("kh", "x"), ("zh", "j"), ("q", "k"))
+_APOSTROPHES = re.compile(r"[ʻʼ‘’'`]")
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+_NON_DIGIT = re.compile(r"\D+")
+
+
+def normalize_search_text(value: str | None) -> str:
+    """Привести имя (или поисковый запрос) к форме для сопоставления."""
+    if not value:
+        return ""
+    text = _APOSTROPHES.sub("", value.casefold()).translate(_TRANSLIT_TABLE)
+    for source, target in _LATIN_FOLDS:
+        text = text.replace(source, target)
+    return _NON_ALNUM.sub(" ", text).strip()
+
+
+def normalize_phone_digits(value: str | None) -> str:
+    """Только цифры номера телефона."""
+    if not value:
+        return ""
+    return _NON_DIGIT.sub("", value)
+
+
+def patient_search_name(
+    last_name: str | None, first_name: str | None, middle_name: str | None = None
+) -> str:
+    """Нормализованное ФИО пациента: "фамилия имя отчество"."""
+    return normalize_search_text(
+        " ".join(part for part in (last_name, first_name, middle_name) if part)
+    )
@@ -332,12 +332,12 @@ async def chat_websocket_handler(websocket: WebSocket):
 
     # F-005: IP-based rate limit
     ip_address = websocket.client.host if websocket.client else "unknown"
-    allowed, reason = websocket_rate_limiter.check_rate_limit(ip_address)
+    allowed, reason = await websocket_rate_limiter.check_rate_limit(ip_address)
     if not allowed:
         logger.warning("Chat WS rate limit exceeded for IP %s: %s", ip_address, reason)
         await websocket.close(code=4008, reason=f"Rate limit: {reason}")
         return
-    websocket_rate_limiter.record_connection(ip_address)
+    await websocket_rate_limiter.record_connection(ip_address)
 
     if not await chat_manager.connect(user.id, websocket):
         websocket_rate_limiter.remove_connection(ip_address)
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+"""
+Бенчмарк AnalyticsService.get_visit_statistics / get_queue_statistics.
+
+Засевает временную SQLite-базу и сравнивает прежний подход (загрузка всех
+ORM-объектов и подсчёт в Python) с агрегацией в SQL.
+
+    python scripts/benchmarks/bench_analytics_aggregation.py --visits 100000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+_DB_PATH = Path(tempfile.gettempdir()) / "bench_analytics_aggregation.db"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB_PATH}")
+os.environ.setdefault("ALLOW_SQLITE_DATABASE_URL", "1")
+
+from sqlalchemy import create_engine, func, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.db import base  # noqa: E402,F401 - регистрация моделей
+from app.db.base_class import Base  # noqa: E402
+from app.models.online_queue import DailyQueue, OnlineQueueEntry  # noqa: E402
+from app.models.visit import Visit  # noqa: E402
+from app.services.analytics import AnalyticsService  # noqa: E402
+
+STATUSES = ["completed", "completed", "cancelled", "no_show", "open"]
+QUEUE_STATUSES = ["served", "served", "waiting", "called", "cancelled"]
+
+
+def _seed(engine, visits: int, queues: int, entries_per_queue: int) -> None:
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rnd = random.Random(42)
+    start = datetime(2030, 1, 1, 8, 0)
+    with engine.begin() as conn:
+        rows = []
+        for index in range(visits):
+            created = start + timedelta(minutes=rnd.randrange(0, 60 * 24 * 90))
+            rows.append(
+                {
+                    "patient_id": 1,
+                    "status": rnd.choice(STATUSES),
+                    "created_at": created,
+                    "visit_date": created.date() if index % 3 else None,
+                    "visit_time": f"{rnd.randrange(8, 18):02d}:{rnd.randrange(0, 60):02d}"
+                    if index % 5
+                    else None,
+                    "department": "cardiology",
+                    "discount_mode": "none",
+                    "approval_status": "none",
+                    "source": "desk",
+                }
+            )
+        conn.execute(insert(Visit.__table__), rows)
+
+        queue_rows = [
+            {
+                "id": queue_id,
+                "day": date(2030, 1, 1) + timedelta(days=queue_id % 90),
+                "specialist_id": 1,
+                "queue_tag": f"tag_{queue_id % 4}",
+                "active": True,
+            }
+            for queue_id in range(1, queues + 1)
+        ]
+        conn.execute(insert(DailyQueue.__table__), queue_rows)
+        entry_rows = []
+        for queue in queue_rows:
+            base_time = datetime.combine(queue["day"], datetime.min.time()) + timedelta(hours=8)
+            for number in range(1, entries_per_queue + 1):
+                queued = base_time + timedelta(minutes=number)
+                entry_rows.append(
+                    {
+                        "queue_id": queue["id"],
+                        "number": number,
+                        "patient_name": f"Patient {number}",
+                        "source": "desk",
+                        "status": rnd.choice(QUEUE_STATUSES),
+                        "queue_time": queued,
+                        "called_at": queued + timedelta(minutes=rnd.randrange(1, 60)),
+                    }
+                )
+        conn.execute(insert(OnlineQueueEntry.__table__), entry_rows)
+
+
+def _legacy_visit_statistics(db, start_date: datetime, end_date: datetime) -> int:
+    visit_date_expr = func.coalesce(Visit.visit_date, func.date(Visit.created_at))
+    visits = (
+        db.query(Visit)
+        .filter(visit_date_expr >= start_date.date(), visit_date_expr <= end_date.date())
+        .all()
+    )
+    day_stats: dict[str, int] = {}
+    hour_stats: dict[int, int] = {}
+    for visit in visits:
+        day = AnalyticsService._visit_activity_date(visit).strftime("%A")
+        day_stats[day] = day_stats.get(day, 0) + 1
+        hour = AnalyticsService._visit_activity_hour(visit)
+        hour_stats[hour] = hour_stats.get(hour, 0) + 1
+    return len([v for v in visits if v.status == "completed"])
+
+
+def _legacy_queue_statistics(db, start_date: datetime, end_date: datetime) -> int:
+    queues = (
+        db.query(DailyQueue)
+        .filter(DailyQueue.day >= start_date.date(), DailyQueue.day <= end_date.date())
+        .all()
+    )
+    served = 0
+    for queue in queues:
+        entries = db.query(OnlineQueueEntry).filter(OnlineQueueEntry.queue_id == queue.id).all()
+        served += len([e for e in entries if e.status == "served"])
+    return served
+
+
+def _measure(label: str, func_, *args) -> None:
+    tracemalloc.start()
+    started = time.perf_counter()
+    func_(*args)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {elapsed * 1000:9.1f} ms   peak {peak / 1024 / 1024:7.1f} MiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--visits", type=int, default=50_000)
+    parser.add_argument("--queues", type=int, default=300)
+    parser.add_argument("--entries", type=int, default=40, help="записей на очередь")
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{_DB_PATH}")
+    _seed(engine, args.visits, args.queues, args.entries)
+    Session = sessionmaker(bind=engine)
+    period = (datetime(2030, 1, 1), datetime(2030, 3, 31, 23, 59))
+
+    print(f"visits={args.visits} queues={args.queues} entries/queue={args.entries}")
+    with Session() as db:
+        _measure("visits: legacy (ORM)", _legacy_visit_statistics, db, *period)
+    with Session() as db:
+        _measure("visits: SQL GROUP BY", AnalyticsService.get_visit_statistics, db, *period)
+    with Session() as db:
+        _measure("queues: legacy (ORM)", _legacy_queue_statistics, db, *period)
+    with Session() as db:
+        _measure("queues: SQL GROUP BY", AnalyticsService.get_queue_statistics, db, *period)
+
+    engine.dispose()
+    _DB_PATH.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+"""
+Бенчмарк дашбордов на дневных агрегатах: время get_visit_statistics /
+calculate_revenue / get_queue_statistics при растущей истории - по сырым
+таблицам и после backfill_rollups.
+
+    python scripts/benchmarks/bench_analytics_rollup.py --days 90 365 --visits-per-day 300
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+_DB_PATH = Path(tempfile.gettempdir()) / "bench_analytics_rollup.db"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB_PATH}")
+os.environ.setdefault("ALLOW_SQLITE_DATABASE_URL", "1")
+
+from sqlalchemy import create_engine, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.db import base  # noqa: E402,F401 - регистрация моделей
+from app.db.base_class import Base  # noqa: E402
+from app.models.online_queue import DailyQueue, OnlineQueueEntry  # noqa: E402
+from app.models.payment_webhook import PaymentWebhook  # noqa: E402
+from app.models.visit import Visit  # noqa: E402
+from app.services.analytics import AnalyticsService  # noqa: E402
+from app.services.analytics_rollup import backfill_rollups  # noqa: E402
+
+STATUSES = ["completed", "completed", "cancelled", "no_show", "open"]
+
+
+def _seed(engine, days: int, per_day: int) -> date:
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rnd = random.Random(7)
+    last_day = date.today() - timedelta(days=1)
+    first_day = last_day - timedelta(days=days - 1)
+    with engine.begin() as conn:
+        visits, webhooks, queues, entries = [], [], [], []
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            opened = datetime.combine(day, datetime.min.time()) + timedelta(hours=8)
+            queues.append(
+                {"id": offset + 1, "day": day, "specialist_id": 1,
+                 "queue_tag": "general", "active": True}
+            )
+            for index in range(per_day):
+                created = opened + timedelta(minutes=rnd.randrange(0, 600))
+                visits.append(
+                    {
+                        "patient_id": 1, "status": rnd.choice(STATUSES),
+                        "created_at": created, "visit_date": day,
+                        "visit_time": created.strftime("%H:%M"), "department": "cardiology",
+                        "discount_mode": "none", "approval_status": "none", "source": "desk",
+                    }
+                )
+                webhooks.append(
+                    {
+                        "provider": rnd.choice(["click", "payme"]),
+                        "webhook_id": f"{offset}-{index}", "transaction_id": f"{offset}-{index}",
+                        "status": "success", "amount": rnd.randrange(1000, 100000),
+                        "currency": "UZS", "raw_data": {}, "created_at": created,
+                    }
+                )
+                queued = opened + timedelta(minutes=index)
+                entries.append(
+                    {
+                        "queue_id": offset + 1, "number": index + 1,
+                        "patient_name": f"P{index}", "source": "desk", "status": "served",
+                        "queue_time": queued,
+                        "called_at": queued + timedelta(minutes=rnd.randrange(1, 90)),
+                    }
+                )
+        conn.execute(insert(Visit.__table__), visits)
+        conn.execute(insert(PaymentWebhook.__table__), webhooks)
+        conn.execute(insert(DailyQueue.__table__), queues)
+        conn.execute(insert(OnlineQueueEntry.__table__), entries)
+    return first_day
+
+
+def _dashboard(Session, start: datetime, end: datetime) -> float:
+    with Session() as db:
+        started = time.perf_counter()
+        AnalyticsService.get_visit_statistics(db, start, end)
+        AnalyticsService.calculate_revenue(db, start, end)
+        AnalyticsService.get_queue_statistics(db, start, end)
+        return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, nargs="+", default=[30, 180, 365])
+    parser.add_argument("--visits-per-day", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{_DB_PATH}")
+    Session = sessionmaker(bind=engine)
+    print(f"{'history':>8} {'raw ms':>10} {'rollup ms':>10} {'backfill s':>11}")
+    for days in args.days:
+        first_day = _seed(engine, days, args.visits_per_day)
+        start = datetime.combine(first_day, datetime.min.time())
+        end = datetime.now()
+        _dashboard(Session, start, end)  # прогрев: импорты, компиляция запросов
+        raw = _dashboard(Session, start, end)
+
+        with Session() as db:
+            started = time.perf_counter()
+            backfill_rollups(db, first_day, date.today())
+            backfill = time.perf_counter() - started
+        rolled = _dashboard(Session, start, end)
+        print(f"{days:>7}d {raw * 1000:>10.1f} {rolled * 1000:>10.1f} {backfill:>11.1f}")
+
+    engine.dispose()
+    _DB_PATH.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
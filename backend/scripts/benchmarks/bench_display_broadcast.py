@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+"""
+Бенчмарк рассылки на табло: N фейковых WebSocket, часть из них медленные.
+
+Измеряет задержку "вызов -> экран" (от broadcast_to_board до send_text на
+каждом табло) и время возврата broadcast. Ничего не пишет в БД.
+
+    python scripts/benchmarks/bench_display_broadcast.py --boards 500 --slow 10
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+# Импорт менеджера тянет app.db.session; для бенчмарка БД не используется.
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench_display_broadcast.db")
+os.environ.setdefault("ALLOW_SQLITE_DATABASE_URL", "1")
+
+from app.services.display_websocket import DisplayWebSocketManager  # noqa: E402
+
+
+class _NullBridge:
+    async def publish(self, logical_channel: str, payload: dict) -> bool:
+        return True
+
+    async def subscribe(self, logical_channel: str, handler) -> None:
+        return None
+
+    async def unsubscribe(self, logical_channel: str, handler) -> None:
+        return None
+
+
+class _FakeWebSocket:
+    def __init__(self, latency: float, sent_at: dict[int, list[float]]) -> None:
+        self.latency = latency
+        self.sent_at = sent_at
+
+    async def send_text(self, data: str) -> None:
+        await asyncio.sleep(self.latency)
+        self.sent_at.setdefault(id(self), []).append(time.perf_counter())
+
+    async def close(self, code: int = 1000) -> None:
+        return None
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+async def run(boards: int, slow: int, slow_latency: float, calls: int) -> None:
+    manager = DisplayWebSocketManager(pubsub=_NullBridge())
+    sent_at: dict[int, list[float]] = {}
+    sockets = [
+        _FakeWebSocket(slow_latency if i < slow else 0.001, sent_at)
+        for i in range(boards)
+    ]
+    manager.connections["bench"] = set(sockets)
+    fast_ids = {id(ws) for ws in sockets[slow:]}
+
+    latencies: list[float] = []
+    returns: list[float] = []
+    for n in range(calls):
+        sent_at.clear()
+        started = time.perf_counter()
+        await manager.broadcast_to_board(
+            "bench",
+            {"type": "patient_call", "data": {"queue_number": n, "cabinet": "101"}},
+        )
+        returns.append(time.perf_counter() - started)
+        await asyncio.sleep(0.01)
+        latencies.extend(
+            stamps[0] - started
+            for ws_id, stamps in sent_at.items()
+            if ws_id in fast_ids
+        )
+
+    print(f"boards={boards} slow={slow} calls={calls}")
+    print(f"broadcast return: median={statistics.median(returns) * 1000:.1f}ms "
+          f"max={max(returns) * 1000:.1f}ms")
+    if latencies:
+        print(f"call->screen (fast boards): p50={_percentile(latencies, 0.5) * 1000:.1f}ms "
+              f"p99={_percentile(latencies, 0.99) * 1000:.1f}ms")
+    print(f"connected={len(manager.connections['bench'])} "
+          f"dropped={manager.dropped_connections}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--boards", type=int, default=500)
+    parser.add_argument("--slow", type=int, default=10)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--calls", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.boards, args.slow, args.slow_latency, args.calls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+"""
+Бенчмарк экспорта файлов в ZIP (FileSystemService.export_files).
+
+Создаёт во временной директории набор файлов (половина - "JPEG" со
+случайными байтами, половина - сжимаемый текст) и сравнивает прежнюю
+сборку архива целиком во временный файл с потоковой сборкой
+(FileSystemService._stream_zip): время до первого байта, общее время
+и пик памяти Python (tracemalloc).
+
+    python scripts/benchmarks/bench_file_export.py --total-mb 2048 --files 40
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+_DB_PATH = Path(tempfile.gettempdir()) / "bench_file_export.db"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB_PATH}")
+os.environ.setdefault("ALLOW_SQLITE_DATABASE_URL", "1")
+
+from app.services.file_system_service import (  # noqa: E402
+    FileSystemService,
+    _ExportEntry,
+)
+
+WRITE_CHUNK_BYTES = 4 * 1024 * 1024
+RESPONSE_CHUNK_BYTES = 64 * 1024
+
+
+def _seed(directory: Path, total_mb: int, files: int) -> list[_ExportEntry]:
+    size = total_mb * 1024 * 1024 // files
+    text_block = b"Patient record line: complaints, examination, treatment.\n" * 1024
+    entries = []
+    for index in range(files):
+        is_image = index % 2 == 0
+        path = directory / (f"scan_{index}.jpg" if is_image else f"record_{index}.txt")
+        with open(path, "wb") as target:
+            written = 0
+            while written < size:
+                length = min(WRITE_CHUNK_BYTES, size - written)
+                block = (
+                    os.urandom(length)
+                    if is_image
+                    else (text_block * (length // len(text_block) + 1))[:length]
+                )
+                target.write(block)
+                written += length
+        entries.append(
+            _ExportEntry(
+                file_path=str(path),
+                arcname=path.name,
+                mime_type="image/jpeg" if is_image else "text/plain",
+                metadata={"title": path.stem},
+            )
+        )
+    return entries
+
+
+def _staged_archive(entries: list[_ExportEntry], workdir: Path):
+    """Прежний путь: архив целиком во временный файл, затем отдача с диска."""
+    archive_path = workdir / "export.zip"
+    with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_DEFLATED) as zipf:
+        for entry in entries:
+            zipf.write(entry.file_path, entry.arcname)
+    with open(archive_path, "rb") as source:
+        while chunk := source.read(RESPONSE_CHUNK_BYTES):
+            yield chunk
+    archive_path.unlink()
+
+
+def _measure(label: str, chunks) -> None:
+    tracemalloc.start()
+    started = time.perf_counter()
+    first_byte = None
+    total = 0
+    for chunk in chunks:
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+        total += len(chunk)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{label:<10} ttfb={first_byte * 1000:9.1f} ms  total={elapsed:7.2f} s  "
+        f"archive={total / 1024 / 1024:8.1f} MB  peak_py={peak / 1024 / 1024:6.1f} MB"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--total-mb", type=int, default=2048)
+    parser.add_argument("--files", type=int, default=40)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_file_export_"))
+    try:
+        entries = _seed(workdir, args.total_mb, args.files)
+        print(f"{args.files} files, {args.total_mb} MB")
+        _measure("staged", _staged_archive(entries, workdir))
+        _measure("streaming", FileSystemService._stream_zip(entries))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+"""
+Бенчмарк материализации лабораторного бланка (LabReportingService.materialize_instance).
+
+Строит в памяти опубликованную версию шаблона "биохимия" на --analytes
+показателей (половые/возрастные референсы по правилам, условная
+видимость, подсветка по правилам) и сравнивает:
+    - cold: версия компилируется заново для каждого отчёта (кеш сброшен);
+    - warm: скомпилированная версия берётся из кеша процесса.
+Плюс разрешение флагов по всем показателям (как в bulk_upsert_values).
+
+    python scripts/benchmarks/bench_lab_materialization.py --analytes 80 --reports 500
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import UTC, datetime
+from decimal import Decimal
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+_DB_PATH = Path(tempfile.gettempdir()) / "bench_lab_materialization.db"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB_PATH}")
+os.environ.setdefault("ALLOW_SQLITE_DATABASE_URL", "1")
+
+from app.models.lab import (  # noqa: E402
+    LabReportFieldDef,
+    LabReportInstance,
+    LabReportSection,
+    LabReportTemplateVersion,
+    LabReportValue,
+)
+from app.services.lab_reporting import LabReportingService  # noqa: E402
+from app.services.lab_reporting._compiled_rules import (  # noqa: E402
+    clear_compiled_template_versions,
+)
+
+SECTION_SIZE = 10
+
+
+def _reference_rule(index: int) -> dict:
+    low, high = Decimal(index % 7 + 1), Decimal(index % 7 + 6)
+    return {
+        "cases": [
+            {
+                "when": {
+                    "all": [
+                        {"source": "patient.sex", "op": "eq", "value": "F"},
+                        {"source": "patient.age_months", "op": "gte", "value": 216},
+                    ]
+                },
+                "text": f"{low} - {high - 1}",
+                "low": str(low),
+                "high": str(high - 1),
+                "critical_high": str(high * 2),
+            },
+            {
+                "when": {"source": "patient.sex", "op": "ieq", "value": "m"},
+                "text": f"{low + 1} - {high}",
+                "low": str(low + 1),
+                "high": str(high),
+                "critical_high": str(high * 2),
+            },
+        ],
+        "default": {"text": f"{low} - {high}", "low": str(low), "high": str(high)},
+    }
+
+
+def _version(analytes: int) -> LabReportTemplateVersion:
+    sections = []
+    for section_index in range(0, analytes, SECTION_SIZE):
+        fields = []
+        for index in range(section_index, min(section_index + SECTION_SIZE, analytes)):
+            fields.append(
+                LabReportFieldDef(
+                    id=index + 1,
+                    field_key=f"analyte_{index}",
+                    label=f"Показатель {index}",
+                    value_type="number",
+                    unit="ммоль/л",
+                    reference_mode="rule_based",
+                    reference_rule=_reference_rule(index),
+                    visibility_rule=(
+                        {"source": "patient.sex", "op": "in", "values": ["F", "M"]}
+                        if index % 5 == 0
+                        else None
+                    ),
+                    highlight_rule={"mode": "rule_based_reference"},
+                    # Обратный порядок - materialize сортирует по sort_order
+                    sort_order=SECTION_SIZE - index % SECTION_SIZE,
+                    required=False,
+                )
+            )
+        sections.append(
+            LabReportSection(
+                id=section_index // SECTION_SIZE + 1,
+                key=f"section_{section_index // SECTION_SIZE}",
+                title=f"Раздел {section_index // SECTION_SIZE}",
+                sort_order=-section_index,
+                section_style={},
+                fields=fields,
+            )
+        )
+    return LabReportTemplateVersion(
+        id=1,
+        status="PUBLISHED",
+        layout_preset="lab_table_classic_v1",
+        created_at=datetime.now(UTC),
+        sections=sections,
+    )
+
+
+def _instance(version: LabReportTemplateVersion, analytes: int) -> LabReportInstance:
+    return LabReportInstance(
+        template_version=version,
+        patient_snapshot={"sex": "F", "age_months": 420},
+        values=[
+            LabReportValue(field_key=f"analyte_{index}", value_numeric=Decimal(index % 13))
+            for index in range(analytes)
+        ],
+    )
+
+
+def _resolve_flags(service: LabReportingService, instance: LabReportInstance) -> None:
+    compiled = service._compiled_version(instance.template_version)
+    current_values = {value.field_key: value.value_numeric for value in instance.values}
+    context = service._build_rule_context(instance.patient_snapshot, current_values)
+    for field_def in compiled.fields_by_key.values():
+        reference = service._resolve_reference(field_def, context)
+        service._resolve_flag(
+            field_def=field_def,
+            effective_value=current_values[field_def.field_key],
+            context=context,
+            reference=reference,
+        )
+
+
+def _measure(label: str, reports: int, run) -> None:
+    started = time.perf_counter()
+    for _ in range(reports):
+        run()
+    elapsed = time.perf_counter() - started
+    print(
+        f"{label:<12} reports={reports:5d}  total={elapsed:7.3f} s  "
+        f"per_report={elapsed / reports * 1000:7.3f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--analytes", type=int, default=80)
+    parser.add_argument("--reports", type=int, default=500)
+    args = parser.parse_args()
+
+    service = LabReportingService(db=None)
+    instance = _instance(_version(args.analytes), args.analytes)
+    print(f"{args.analytes} analytes, {args.reports} reports")
+
+    def cold():
+        clear_compiled_template_versions()
+        service.materialize_instance(instance)
+
+    _measure("cold", args.reports, cold)
+    _measure("warm", args.reports, lambda: service.materialize_instance(instance))
+    _measure("flags warm", args.reports, lambda: _resolve_flags(service, instance))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+"""
+Бенчмарк накладных расходов middleware-стека на запрос.
+
+Тривиальный эндпоинт (GET и POST с Idempotency-Key) гоняется через
+httpx.ASGITransport дважды: без middleware и со стеком в порядке
+app.main (Idempotency -> Observability -> TenantScope -> Security ->
+Audit). Печатает среднее время запроса и разницу - стоимость стека.
+
+Скрипт импортирует только модули middleware, поэтому его можно запустить
+и на старом дереве (git worktree) для сравнения.
+
+    python scripts/benchmarks/bench_middleware_stack.py --requests 5000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+_DB_PATH = Path(tempfile.gettempdir()) / "bench_middleware_stack.db"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB_PATH}")
+os.environ.setdefault("ALLOW_SQLITE_DATABASE_URL", "1")
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+from app.middleware.audit_middleware import AuditMiddleware  # noqa: E402
+from app.middleware.idempotency_middleware import IdempotencyMiddleware  # noqa: E402
+from app.middleware.observability_middleware import ObservabilityMiddleware  # noqa: E402
+from app.middleware.security_middleware import SecurityMiddleware  # noqa: E402
+from app.middleware.tenant_scope_middleware import TenantScopeMiddleware  # noqa: E402
+
+
+def _build_app(with_stack: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/v1/ping")
+    async def ping():
+        return {"ok": True}
+
+    @app.post("/api/v1/ping")
+    async def ping_write():
+        return {"ok": True}
+
+    if with_stack:
+        # add_middleware добавляет снаружи - последний будет внешним
+        app.add_middleware(AuditMiddleware)
+        app.add_middleware(SecurityMiddleware)
+        app.add_middleware(TenantScopeMiddleware)
+        app.add_middleware(ObservabilityMiddleware)
+        app.add_middleware(IdempotencyMiddleware)
+    return app
+
+
+async def _measure(app: FastAPI, method: str, requests: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(50):
+            await client.request(method, "/api/v1/ping")
+
+        started = time.perf_counter()
+        for index in range(requests):
+            headers = {
+                # Разные IP - чтобы счётчики rate limit не росли в одном ключе
+                "X-Forwarded-For": f"10.0.{index % 256}.{index // 256 % 256}",
+            }
+            if method == "POST":
+                headers["Idempotency-Key"] = f"bench-{index}"
+            response = await client.request(method, "/api/v1/ping", headers=headers)
+            assert response.status_code == 200, response.text
+        return (time.perf_counter() - started) / requests * 1_000_000
+
+
+async def _run(requests: int) -> None:
+    for method in ("GET", "POST"):
+        bare = await _measure(_build_app(with_stack=False), method, requests)
+        stacked = await _measure(_build_app(with_stack=True), method, requests)
+        print(
+            f"{method:<5} requests={requests:6d}  bare={bare:8.1f} us  "
+            f"stack={stacked:8.1f} us  overhead={stacked - bare:8.1f} us/request"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(_run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+"""
+Бенчмарк GlobalSearchApiRepository.search_patients.
+
+Засевает временную SQLite-базу пациентами (кириллица и латиница вперемешку)
+и сравнивает прежний ILIKE по first_name/last_name/phone с поиском по
+нормализованным колонкам search_name/search_phone. На SQLite оба варианта -
+полный просмотр; триграммные GIN-индексы работают только на PostgreSQL,
+поэтому здесь сравнивается в основном стоимость выражений и полнота выдачи.
+
+    python scripts/benchmarks/bench_patient_search.py --patients 500000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+_DB_PATH = Path(tempfile.gettempdir()) / "bench_patient_search.db"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB_PATH}")
+os.environ.setdefault("ALLOW_SQLITE_DATABASE_URL", "1")
+
+from sqlalchemy import create_engine, insert, or_  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.db import base  # noqa: E402,F401 - регистрация моделей
+from app.db.base_class import Base  # noqa: E402
+from app.models.patient import Patient  # noqa: E402
+from app.repositories.global_search_api_repository import (  # noqa: E402
+    GlobalSearchApiRepository,
+)
+from app.utils.text_search import normalize_phone_digits, patient_search_name  # noqa: E402
+
+LAST_NAMES = [
+    "Хасанов", "Khasanov", "Қодиров", "Qodirov", "Иванов", "Ivanov",
+    "Юсупов", "Yusupov", "Ғуломов", "G'ulomov", "Каримов", "Karimov",
+]
+FIRST_NAMES = ["Анвар", "Anvar", "Дилноза", "Dilnoza", "Шухрат", "Shuxrat", "Ольга", "Olga"]
+QUERIES = ["хасанов", "KHASANOV", "qodirov анвар", "гуломов", "90 123", "+998 91 55"]
+
+
+def _seed(engine, patients: int) -> None:
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rnd = random.Random(42)
+    batch: list[dict] = []
+    with engine.begin() as conn:
+        for _ in range(patients):
+            last_name = f"{rnd.choice(LAST_NAMES)}{rnd.choice(['', 'а', 'a'])}"
+            first_name = rnd.choice(FIRST_NAMES)
+            phone = f"+998 9{rnd.randrange(10)} {rnd.randrange(1000000, 9999999)}"
+            batch.append(
+                {
+                    "last_name": last_name,
+                    "first_name": first_name,
+                    "phone": phone,
+                    # Core insert минует ORM-событие - считаем колонки как миграция
+                    "search_name": patient_search_name(last_name, first_name),
+                    "search_phone": normalize_phone_digits(phone),
+                }
+            )
+            if len(batch) >= 10_000:
+                conn.execute(insert(Patient.__table__), batch)
+                batch.clear()
+        if batch:
+            conn.execute(insert(Patient.__table__), batch)
+
+
+def _legacy_search(db, query: str, limit: int) -> list[Patient]:
+    search_term = f"%{query}%"
+    return (
+        db.query(Patient)
+        .filter(
+            or_(
+                Patient.first_name.ilike(search_term),
+                Patient.last_name.ilike(search_term),
+                Patient.phone.ilike(search_term),
+            )
+        )
+        .limit(limit)
+        .all()
+    )
+
+
+def _measure(label: str, search, repeats: int) -> None:
+    for query in QUERIES:
+        timings = []
+        found = 0
+        for _ in range(repeats):
+            started = time.perf_counter()
+            found = len(search(query))
+            timings.append(time.perf_counter() - started)
+        print(
+            f"{label:<12} {query!r:<18} median {statistics.median(timings) * 1000:8.1f} ms"
+            f"   found {found}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{_DB_PATH}")
+    _seed(engine, args.patients)
+    Session = sessionmaker(bind=engine)
+
+    print(f"patients={args.patients} limit={args.limit}")
+    with Session() as db:
+        _measure("legacy", lambda q: _legacy_search(db, q, args.limit), args.repeats)
+        repository = GlobalSearchApiRepository(db)
+        _measure(
+            "normalized",
+            lambda q: repository.search_patients(query=q, limit=args.limit),
+            args.repeats,
+        )
+
+    engine.dispose()
+    _DB_PATH.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+"""
+Бенчмарк рендеринга лабораторных бланков (LabReportPDFService.render_report).
+
+Сравнивает пропускную способность (отчётов в секунду):
+    - direct: прежний путь - WeasyPrint в вызывающем потоке, CSS
+      разбирается и шрифты ищутся заново для каждого отчёта;
+    - cached: тот же поток, но с закешированными стилями и шрифтами;
+    - pool:   PDFRenderPool с прогретыми процессами, --concurrency
+      одновременных запросов из event loop.
+
+Требует рабочего WeasyPrint (Pango/Cairo в системе).
+
+    python scripts/benchmarks/bench_pdf_render.py --reports 50 --workers 4
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+_DB_PATH = Path(tempfile.gettempdir()) / "bench_pdf_render.db"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB_PATH}")
+os.environ.setdefault("ALLOW_SQLITE_DATABASE_URL", "1")
+
+from app.services.lab_report_pdf_service import lab_report_pdf_service  # noqa: E402
+from app.services.pdf_render_pool import PDFRenderPool  # noqa: E402
+from app.services.pdf_service import _load_weasyprint_components  # noqa: E402
+
+
+def _context(index: int) -> dict:
+    rows = [
+        {
+            "name": f"Показатель {row}",
+            "value": f"{4.2 + row / 10:.1f}",
+            "unit": "ммоль/л",
+            "reference": "3.5 - 5.5",
+            "flag": "H" if row % 7 == 0 else "",
+        }
+        for row in range(24)
+    ]
+    return {
+        "template_name": "Биохимия",
+        "layout_preset": "lab_table_classic_v1",
+        "page_settings": {"paper_size": "A4", "orientation": "portrait"},
+        "branding": {"clinic_name": "Клиника"},
+        "patient": {"full_name": f"Пациент {index}", "birth_date": "01.01.1980"},
+        "signers": {},
+        "sections": [{"title": "Биохимия крови", "rows": rows, "section_style": {}}],
+        "critical_findings": [],
+        "footer_notes": "",
+        "report_date": datetime.now(UTC).strftime("%d.%m.%Y"),
+    }
+
+
+def _render_direct(context: dict) -> bytes:
+    """Прежний путь render_report: CSS и шрифты - заново на каждый отчёт"""
+    weasy_css, weasy_html = _load_weasyprint_components()
+    service = lab_report_pdf_service
+    context = dict(context)
+    context["generated_at"] = datetime.now(UTC)
+    context["copy_count"] = service._resolve_copy_count(context)
+    html_content = service.jinja_env.get_template("lab_report_fixed.j2").render(**context)
+    css_content = service._build_css(
+        layout_preset=context["layout_preset"], page_settings=context["page_settings"]
+    )
+    html_doc = weasy_html(string=html_content, base_url=str(service.backend_root))
+    return html_doc.write_pdf(stylesheets=[weasy_css(string=css_content)])
+
+
+def _measure_sync(label: str, render, contexts: list[dict]) -> None:
+    started = time.perf_counter()
+    for context in contexts:
+        render(context)
+    _report(label, len(contexts), time.perf_counter() - started)
+
+
+async def _measure_pool(pool: PDFRenderPool, contexts: list[dict], concurrency: int) -> None:
+    # Первый документ прогревает процессы - не в зачёт
+    await asyncio.gather(*(pool.render_lab_report(contexts[0]) for _ in range(pool.workers)))
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def render(context: dict) -> bytes:
+        async with semaphore:
+            return await pool.render_lab_report(context)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(render(context) for context in contexts))
+    _report(f"pool x{pool.workers}", len(contexts), time.perf_counter() - started)
+
+
+def _report(label: str, reports: int, elapsed: float) -> None:
+    print(
+        f"{label:<10} reports={reports:4d}  total={elapsed:7.2f} s  "
+        f"throughput={reports / elapsed:6.2f} reports/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--reports", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    contexts = [_context(index) for index in range(args.reports)]
+    _render_direct(contexts[0])
+
+    _measure_sync("direct", _render_direct, contexts)
+    _measure_sync("cached", lab_report_pdf_service.render_report, contexts)
+
+    pool = PDFRenderPool(workers=args.workers, max_queue=args.reports + args.workers)
+    try:
+        asyncio.run(_measure_pool(pool, contexts, args.concurrency))
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+"""
+Бенчмарк DoctorPhraseService.suggest_phrases.
+
+Засевает временную SQLite-базу историей фраз врача и сравнивает прежний
+запрос ``LIKE 'prefix%'`` к doctor_phrase_history с индексом в памяти
+(app.services.doctor_phrase_index) на последовательности нажатий клавиш.
+
+    python scripts/benchmarks/bench_phrase_suggest.py --phrases 20000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+_DB_PATH = Path(tempfile.gettempdir()) / "bench_phrase_suggest.db"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB_PATH}")
+os.environ.setdefault("ALLOW_SQLITE_DATABASE_URL", "1")
+
+from sqlalchemy import create_engine, desc, insert  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.db import base  # noqa: E402,F401 - регистрация моделей
+from app.db.base_class import Base  # noqa: E402
+from app.models.doctor_phrase_history import DoctorPhraseHistory  # noqa: E402
+from app.services.doctor_phrase_service import DoctorPhraseService  # noqa: E402
+
+DOCTOR_ID = 1
+FIELD = "complaints"
+HEADS = ["Головная боль", "Боль в груди", "Одышка при нагрузке", "Слабость", "Кашель"]
+WORDS = ["давящего", "характера", "по утрам", "к вечеру", "в покое", "умеренная", "острая"]
+TYPED = "Головная боль давящего"
+
+
+def _seed(engine, phrases: int) -> None:
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rnd = random.Random(42)
+    rows = {}
+    while len(rows) < phrases:
+        phrase = f"{rnd.choice(HEADS)} {' '.join(rnd.sample(WORDS, 3))} {rnd.randrange(10**6)}"
+        rows[phrase] = {
+            "doctor_id": DOCTOR_ID,
+            "field": FIELD,
+            "phrase": phrase,
+            "prefix_index": DoctorPhraseHistory.create_prefix_index(phrase),
+            "usage_count": rnd.randrange(1, 50),
+        }
+    with engine.begin() as conn:
+        conn.execute(insert(DoctorPhraseHistory.__table__), list(rows.values()))
+
+
+def _legacy_lookup(db, prefix: str, limit: int) -> int:
+    return len(
+        db.query(DoctorPhraseHistory)
+        .filter(
+            DoctorPhraseHistory.doctor_id == DOCTOR_ID,
+            DoctorPhraseHistory.field == FIELD,
+            DoctorPhraseHistory.prefix_index.like(f"{prefix}%"),
+        )
+        .order_by(desc(DoctorPhraseHistory.usage_count), desc(DoctorPhraseHistory.last_used))
+        .limit(limit)
+        .all()
+    )
+
+
+def _keystrokes(label: str, lookup, repeats: int) -> None:
+    timings = []
+    for _ in range(repeats):
+        for length in range(3, len(TYPED) + 1):
+            started = time.perf_counter()
+            lookup(TYPED[:length])
+            timings.append(time.perf_counter() - started)
+    print(
+        f"{label:<10} median {statistics.median(timings) * 1000:7.3f} ms"
+        f"   p99 {sorted(timings)[int(len(timings) * 0.99)] * 1000:7.3f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--phrases", type=int, default=20_000)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine(f"sqlite:///{_DB_PATH}")
+    _seed(engine, args.phrases)
+    Session = sessionmaker(bind=engine)
+
+    print(f"phrases={args.phrases} keystrokes={len(TYPED) - 2}")
+    with Session() as db:
+        _keystrokes("legacy", lambda text: _legacy_lookup(db, text.lower(), 10), args.repeats)
+        service = DoctorPhraseService(db)
+
+        def _suggest(text: str) -> None:
+            service.suggest_phrases(DOCTOR_ID, FIELD, text, len(text))
+
+        _suggest(TYPED)  # ленивая загрузка индекса
+        _keystrokes("in-memory", _suggest, args.repeats)
+
+    engine.dispose()
+    _DB_PATH.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
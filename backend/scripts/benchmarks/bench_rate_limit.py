@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+"""
+Бенчмарк проверки rate limit в SecurityMiddleware.
+
+Сравнивает стоимость одной проверки для "горячего" IP, у которого уже
+--prior запросов в окне (лимит api по умолчанию - 5000 в час):
+    - list:   прежний путь - список timestamps на ключ, пересобираемый
+              на каждый запрос;
+    - engine: общий движок (скользящее окно из двух счётчиков).
+
+    python scripts/benchmarks/bench_rate_limit.py --prior 4000 --checks 20000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+if str(BACKEND_ROOT) not in sys.path:
+    sys.path.insert(0, str(BACKEND_ROOT))
+
+_DB_PATH = Path(tempfile.gettempdir()) / "bench_rate_limit.db"
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_DB_PATH}")
+os.environ.setdefault("ALLOW_SQLITE_DATABASE_URL", "1")
+
+from app.core.rate_limit_engine import RateLimiter  # noqa: E402
+
+LIMIT = 1_000_000
+WINDOW = 3600
+
+
+def _bench_list(prior: int, checks: int) -> float:
+    """Прежний SecurityMiddleware._check_rate_limit"""
+    now = time.time()
+    request_counts = {"api:10.0.0.1": [now - index * 0.1 for index in range(prior)]}
+    started = time.perf_counter()
+    for _ in range(checks):
+        current_timestamp = time.time()
+        key = "api:10.0.0.1"
+        request_counts[key] = [ts for ts in request_counts[key] if current_timestamp - ts < WINDOW]
+        if len(request_counts[key]) < LIMIT:
+            request_counts[key].append(current_timestamp)
+        # Держим размер окна постоянным
+        request_counts[key].pop(0)
+    return (time.perf_counter() - started) / checks * 1_000_000
+
+
+async def _bench_engine(prior: int, checks: int) -> float:
+    limiter = RateLimiter("bench")
+    for _ in range(prior):
+        await limiter.hit("api:10.0.0.1", LIMIT, WINDOW)
+    started = time.perf_counter()
+    for _ in range(checks):
+        await limiter.hit("api:10.0.0.1", LIMIT, WINDOW)
+    return (time.perf_counter() - started) / checks * 1_000_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--prior", type=int, default=4000)
+    parser.add_argument("--checks", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"prior={args.prior} checks={args.checks}")
+    print(f"list    {_bench_list(args.prior, args.checks):8.2f} us/check")
+    print(f"engine  {asyncio.run(_bench_engine(args.prior, args.checks)):8.2f} us/check")
+
+
+if __name__ == "__main__":
+    main()
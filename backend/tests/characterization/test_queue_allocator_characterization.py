@@ -289,7 +289,8 @@ def test_force_majeure_transfer_characterization_preserves_current_allocator_beh
         )
         .one()
     )
-    assert transferred_entry.number == 5
+    # Счётчик очереди засевается по MAX(number) всех записей, отменённые номера не переиспользуются
+    assert transferred_entry.number == 100
     assert transferred_entry.status == "waiting"
     assert transferred_entry.priority == ForceMajeureService.TRANSFER_PRIORITY
     assert transferred_entry.queue_time is not None
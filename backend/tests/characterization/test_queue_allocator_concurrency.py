@@ -174,3 +174,72 @@ def test_parallel_duplicate_join_read_phase_can_observe_no_existing_entry(test_d
             cleanup.commit()
         finally:
             cleanup.close()
+
+
+@pytest.mark.integration
+@pytest.mark.queue
+def test_parallel_joins_get_unique_gapless_numbers(test_db):
+    queue_id, _queue_tag, doctor_id, user_id = _make_concurrency_queue(
+        test_db,
+        suffix=uuid.uuid4().hex[:8],
+    )
+    SessionLocal = sessionmaker(bind=test_db, autocommit=False, autoflush=False)
+    workers = 24
+    barrier = threading.Barrier(workers)
+    errors: list[BaseException] = []
+    lock = threading.Lock()
+
+    def worker(index: int) -> None:
+        session = SessionLocal()
+        try:
+            barrier.wait()
+            entry = queue_service.create_queue_entry(
+                session,
+                queue_id=queue_id,
+                patient_name=f"Parallel {index}",
+                source="online",
+                auto_number=True,
+                commit=False,
+            )
+            assert entry.number >= 2
+            # Каждая четвёртая регистрация откатывается - номер не должен пропасть
+            if index % 4 == 0:
+                session.rollback()
+            else:
+                session.commit()
+        except BaseException as exc:  # noqa: BLE001
+            with lock:
+                errors.append(exc)
+        finally:
+            session.close()
+
+    try:
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        check = SessionLocal()
+        try:
+            numbers = sorted(
+                number
+                for (number,) in check.query(OnlineQueueEntry.number).filter(
+                    OnlineQueueEntry.queue_id == queue_id
+                )
+            )
+        finally:
+            check.close()
+        committed = workers - len(range(0, workers, 4))
+        assert numbers == list(range(1, committed + 2))
+    finally:
+        cleanup = SessionLocal()
+        try:
+            cleanup.query(OnlineQueueEntry).filter(OnlineQueueEntry.queue_id == queue_id).delete()
+            cleanup.query(DailyQueue).filter(DailyQueue.id == queue_id).delete()
+            cleanup.query(Doctor).filter(Doctor.id == doctor_id).delete()
+            cleanup.query(User).filter(User.id == user_id).delete()
+            cleanup.commit()
+        finally:
+            cleanup.close()
@@ -469,4 +469,45 @@ class TestFileSecurity:
             headers=auth_headers,
         )
         assert second_delete_response.status_code == 404
-
+
+    def test_image_preview_is_served_as_web_version(
+        self,
+        client: TestClient,
+        db_session: Session,
+        auth_headers: dict[str, str],
+        tmp_path,
+        monkeypatch,
+    ):
+        from PIL import Image
+
+        from app.services.file_system_service import get_file_system_service
+        from app.services.image_compression_service import (
+            ImageDerivativeCache,
+            ImageProcessingPool,
+        )
+
+        # Пул в потоке и кеш производных во временном каталоге
+        pool = ImageProcessingPool(
+            workers=0, cache=ImageDerivativeCache(str(tmp_path / "derivatives"))
+        )
+        monkeypatch.setattr(get_file_system_service(), "image_pool", pool)
+
+        png = BytesIO()
+        Image.radial_gradient("L").resize((1200, 800)).save(png, "PNG")
+        upload_response = client.post(
+            "/api/v1/files/upload",
+            files={"file": ("scan.png", BytesIO(png.getvalue()), "image/png")},
+            data={"file_type": "image", "permission": "public"},
+            headers=auth_headers,
+        )
+        assert upload_response.status_code == 200
+
+        response = client.get(
+            f"/api/v1/files/{upload_response.json()['id']}/preview",
+            headers=auth_headers,
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "image/jpeg"
+        assert response.headers["x-content-type-options"] == "nosniff"
+        assert Image.open(BytesIO(response.content)).format == "JPEG"
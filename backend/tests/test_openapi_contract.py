@@ -91,6 +91,15 @@ def test_openapi_qr_token_info_exposes_join_read_contract(client: TestClient) ->
         assert field_name in properties
 
 
+def test_openapi_files_export_declares_zip_stream(client: TestClient) -> None:
+    schema = _get_openapi_schema(client)
+    operation = schema["paths"]["/api/v1/files/export"]["post"]
+
+    assert operation["responses"]["200"]["content"] == {
+        "application/zip": {"schema": {"type": "string", "format": "binary"}}
+    }
+
+
 def test_openapi_telegram_onboarding_contract_has_stable_operation_ids(
     client: TestClient,
 ) -> None:
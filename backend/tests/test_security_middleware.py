@@ -350,22 +350,32 @@ class TestSecurityMiddlewareIntegration:
 
     def test_rate_limit_reset_after_window(self, client: TestClient):
         """Тест: rate limit сбрасывается после окна времени"""
-        # Этот тест сложно выполнить без мокирования времени
-        # Но можно проверить, что счетчики очищаются
+        import asyncio
+        import time
+
+        from app.core.rate_limit_engine import RateLimiter
+
+        now = [time.time() - 2000]  # 2000 секунд назад (больше окна login в 5 минут)
         middleware = SecurityMiddleware(None)
-
-        # Симулируем старые записи (старше окна)
-        import time
-        old_timestamp = time.time() - 2000  # 2000 секунд назад (больше окна в 1 час)
-        middleware.request_counts["test:127.0.0.1"] = [old_timestamp]
-
-        # Вызываем cleanup
-        middleware._cleanup_old_records()
-
-        # Проверяем, что старые записи удалены
-        # Используем обычный dict вместо defaultdict для проверки
-        if "test:127.0.0.1" in middleware.request_counts:
-            assert len(middleware.request_counts["test:127.0.0.1"]) == 0
+        middleware.rate_limiter = RateLimiter("security", clock=lambda: now[0])
+
+        async def scenario():
+            for _ in range(5):
+                assert (await middleware._check_rate_limit("127.0.0.1", "login")).allowed
+            assert not (await middleware._check_rate_limit("127.0.0.1", "login")).allowed
+
+            # Через два окна лимит снова доступен
+            now[0] += 600
+            assert (await middleware._check_rate_limit("127.0.0.1", "login")).allowed
+
+        asyncio.run(scenario())
+
+        # Cleanup удаляет истекшие счётчики
+        now[0] -= 600
+        asyncio.run(middleware.rate_limiter.hit("login:10.0.0.1", 5, 300))
+        middleware.last_cleanup = middleware.last_cleanup - middleware.cleanup_interval
+        middleware._cleanup_old_records()
+        assert "security:login:10.0.0.1" not in middleware.rate_limiter.local
 
     def test_minimal_login_path_is_classified_as_login(self):
         """Тест: classifier распознает minimal-login как login endpoint."""
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import event
+
+from app.models.online_queue import DailyQueue, OnlineQueueEntry
+from app.models.visit import Visit
+from app.services.analytics import AnalyticsService
+from app.services.queue_service import queue_service
+
+DEPARTMENT = "aggregation_dept"
+START = datetime(2031, 3, 1)
+END = datetime(2031, 3, 31, 23, 59)
+
+
+@pytest.fixture
+def visits(db_session, test_patient):
+    rows = [
+        # (visit_date, visit_time, created_at, status)
+        (date(2031, 3, 3), "09:15", datetime(2031, 3, 1, 7, 0), "completed"),
+        (date(2031, 3, 3), "09:45:00", datetime(2031, 3, 1, 7, 0), "completed"),
+        (date(2031, 3, 4), "bad", datetime(2031, 3, 1, 14, 30), "cancelled"),
+        (None, None, datetime(2031, 3, 5, 16, 0), "no_show"),
+        (None, None, datetime(2031, 3, 5, 16, 20), "open"),
+        # вне периода
+        (date(2031, 4, 2), "10:00", datetime(2031, 4, 1, 10, 0), "completed"),
+    ]
+    for visit_date, visit_time, created_at, status in rows:
+        db_session.add(
+            Visit(
+                patient_id=test_patient.id,
+                visit_date=visit_date,
+                visit_time=visit_time,
+                created_at=created_at,
+                status=status,
+                department=DEPARTMENT,
+            )
+        )
+    db_session.flush()
+
+
+def test_visit_statistics_are_aggregated_in_sql(db_session, visits):
+    stats = AnalyticsService.get_visit_statistics(db_session, START, END, DEPARTMENT)
+
+    assert stats["total_visits"] == 5
+    assert stats["completed_visits"] == 2
+    assert stats["cancelled_visits"] == 1
+    assert stats["no_show_visits"] == 1
+    assert stats["completion_rate"] == 40.0
+    # 2031-03-03 - понедельник, 03-04 - вторник, 03-05 - среда
+    assert stats["by_day_of_week"] == {"Monday": 2, "Tuesday": 1, "Wednesday": 2}
+    # некорректное visit_time -> час создания, пустое -> час создания
+    assert stats["by_hour"] == {9: 2, 14: 1, 16: 2}
+
+
+def test_visit_statistics_issue_constant_number_of_queries(db_session, visits):
+    statements: list[str] = []
+    bind = db_session.get_bind()
+
+    def _before(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(bind, "before_cursor_execute", _before)
+    try:
+        AnalyticsService.get_visit_statistics(db_session, START, END, DEPARTMENT)
+    finally:
+        event.remove(bind, "before_cursor_execute", _before)
+
+    # Период в будущем - агрегатов нет, один GROUP BY по visits
+    assert len(statements) == 1
+    assert "GROUP BY" in statements[0]
+
+
+@pytest.fixture
+def queues(db_session, test_doctor):
+    cardio = DailyQueue(day=date(2031, 3, 2), specialist_id=test_doctor.id, queue_tag="cardio")
+    # Очереди без врача (запись о специалисте отсутствует) группируются по тегу
+    orphan_id = test_doctor.id + 100000
+    tagged = DailyQueue(day=date(2031, 3, 2), specialist_id=orphan_id, queue_tag="lab")
+    empty = DailyQueue(day=date(2031, 3, 3), specialist_id=orphan_id, queue_tag=None)
+    db_session.add_all([cardio, tagged, empty])
+    db_session.flush()
+
+    rows = [
+        # (queue, status, queue_time, called_at, created_at)
+        (cardio, "served", datetime(2031, 3, 2, 8, 0), datetime(2031, 3, 2, 8, 30), None),
+        (cardio, "waiting", datetime(2031, 3, 2, 8, 10), None, datetime(2031, 3, 2, 8, 20)),
+        (cardio, "cancelled", None, None, datetime(2031, 3, 2, 8, 0)),
+        (tagged, "called", datetime(2031, 3, 2, 9, 0), datetime(2031, 3, 2, 9, 20), None),
+    ]
+    for number, (queue, status, queue_time, called_at, created_at) in enumerate(rows, 1):
+        db_session.add(
+            OnlineQueueEntry(
+                queue_id=queue.id,
+                number=number,
+                patient_name=f"Patient {number}",
+                source="desk",
+                status=status,
+                queue_time=queue_time,
+                called_at=called_at,
+                created_at=created_at,
+            )
+        )
+    db_session.flush()
+    return cardio, tagged, empty
+
+
+def test_queue_statistics_group_by_department(db_session, test_doctor, queues):
+    stats = AnalyticsService.get_queue_statistics(db_session, START, END)
+
+    assert stats["total_queues"] == 3
+    assert stats["total_entries"] == 4
+    assert stats["total_served"] == 1
+    assert stats["total_waiting"] == 2
+    assert stats["service_rate"] == 25.0
+    # (30 + 10 + 20) / 3
+    assert stats["average_wait_time_minutes"] == 20.0
+    assert stats["average_wait_time"] == "20 минут"
+    assert stats["by_department"] == {
+        test_doctor.specialty: {"total_entries": 3, "served": 1, "waiting": 1},
+        "lab": {"total_entries": 1, "served": 0, "waiting": 1},
+        "Общее": {"total_entries": 0, "served": 0, "waiting": 0},
+    }
+
+
+def test_queue_statistics_department_filter(db_session, test_doctor, queues):
+    stats = AnalyticsService.get_queue_statistics(
+        db_session, START, END, test_doctor.specialty
+    )
+
+    assert stats["total_queues"] == 1
+    assert stats["total_entries"] == 3
+    assert list(stats["by_department"]) == [test_doctor.specialty]
+    assert stats["average_wait_time_minutes"] == 20.0
+
+
+def test_queue_statistics_without_data(db_session):
+    stats = AnalyticsService.get_queue_statistics(
+        db_session, datetime(2040, 1, 1), datetime(2040, 1, 2)
+    )
+
+    assert stats["total_queues"] == 0
+    assert stats["average_wait_time_minutes"] == 0.0
+    assert stats["average_wait_time"] == "0 минут"
+    assert stats["by_department"] == {}
+
+
+def test_single_queue_statistics_count_by_status(db_session, queues):
+    cardio, _, _ = queues
+
+    stats = queue_service.get_queue_statistics(db_session, cardio)
+
+    assert stats["total_entries"] == 3
+    assert (stats["waiting"], stats["called"], stats["cancelled"]) == (1, 0, 1)
+    assert stats["available_slots"] == stats["max_slots"] - 1
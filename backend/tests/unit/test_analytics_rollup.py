@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event, func, select
+
+from app.models.analytics_rollup import AnalyticsRollupDay, VisitDailyRollup
+from app.models.online_queue import DailyQueue, OnlineQueueEntry
+from app.models.payment import Payment
+from app.models.payment_webhook import PaymentWebhook
+from app.models.service import Service
+from app.models.visit import Visit, VisitService
+from app.services import analytics_rollup
+from app.services.analytics import AnalyticsService
+from app.services.analytics_rollup import (
+    backfill_rollups,
+    refresh_rollups,
+    rollup_day,
+    wait_percentile,
+)
+
+DEPARTMENT = "rollup_dept"
+DAY_1 = date(2020, 6, 1)
+DAY_2 = date(2020, 6, 2)
+START = datetime(2020, 6, 1)
+END = datetime(2020, 6, 2, 23, 59, 59, 999999)
+
+
+@pytest.fixture
+def history(db_session, test_patient, test_doctor):
+    service = Service(name="Rollup ECG", code="RLP-ECG", price=Decimal("50000"), active=True)
+    db_session.add(service)
+    db_session.flush()
+
+    visits = []
+    for day, visit_time, status in (
+        (DAY_1, "09:30", "completed"),
+        (DAY_1, None, "cancelled"),
+        (DAY_2, "10:00", "completed"),
+    ):
+        visit = Visit(
+            patient_id=test_patient.id,
+            visit_date=day,
+            visit_time=visit_time,
+            created_at=datetime.combine(day, datetime.min.time()) + timedelta(hours=8),
+            status=status,
+            department=DEPARTMENT,
+        )
+        db_session.add(visit)
+        db_session.flush()
+        visits.append(visit)
+        db_session.add(VisitService(visit_id=visit.id, service_id=service.id, name="ECG"))
+
+    db_session.add_all(
+        [
+            Payment(
+                visit_id=visits[0].id, amount=Decimal("120.50"), method="cash",
+                status="paid", created_at=datetime(2020, 6, 1, 9, 45),
+            ),
+            Payment(
+                visit_id=visits[2].id, amount=Decimal("80.00"), method="card",
+                status="paid", created_at=datetime(2020, 6, 2, 10, 15),
+            ),
+            PaymentWebhook(
+                provider="click", webhook_id="rollup-1", transaction_id="t1",
+                status="success", amount=30000, raw_data={},
+                created_at=datetime(2020, 6, 1, 12, 0),
+            ),
+            PaymentWebhook(
+                provider="payme", webhook_id="rollup-2", transaction_id="t2",
+                status="processed", amount=15000, raw_data={},
+                created_at=datetime(2020, 6, 2, 18, 0),
+            ),
+        ]
+    )
+
+    queue = DailyQueue(day=DAY_1, specialist_id=test_doctor.id, queue_tag="rollup")
+    db_session.add(queue)
+    db_session.flush()
+    for number, wait in enumerate((3, 12, 40), 1):
+        queued = datetime(2020, 6, 1, 8, 0) + timedelta(minutes=number)
+        db_session.add(
+            OnlineQueueEntry(
+                queue_id=queue.id, number=number, patient_name=f"P{number}",
+                source="desk", status="served", queue_time=queued,
+                called_at=queued + timedelta(minutes=wait),
+            )
+        )
+    db_session.flush()
+    return service
+
+
+def _snapshot(db_session, test_doctor):
+    return {
+        "visits": AnalyticsService.get_visit_statistics(db_session, START, END, DEPARTMENT),
+        "revenue": AnalyticsService.calculate_revenue(db_session, START, END, DEPARTMENT),
+        "queues": AnalyticsService.get_queue_statistics(
+            db_session, START, END, test_doctor.specialty
+        ),
+        "services": [
+            s for s in AnalyticsService.get_service_statistics(db_session, START, END)["services"]
+            if s["name"] == "Rollup ECG"
+        ],
+    }
+
+
+def test_rollups_reproduce_raw_statistics(db_session, test_doctor, history):
+    raw = _snapshot(db_session, test_doctor)
+
+    backfill_rollups(db_session, DAY_1, DAY_2)
+
+    assert _snapshot(db_session, test_doctor) == raw
+    assert raw["visits"]["total_visits"] == 3
+    assert raw["visits"]["by_hour"] == {9: 1, 8: 1, 10: 1}
+    assert raw["revenue"]["total_revenue"] == 500.5  # 120.5 + 80 + 300 (success)
+    assert raw["revenue"]["by_provider"] == {"click": 300.0}
+    assert raw["queues"]["average_wait_time_minutes"] == round((3 + 12 + 40) / 3, 2)
+    assert raw["queues"]["wait_time_percentiles_minutes"] == {"p50": 15.0, "p90": 45.0}
+    assert raw["services"][0]["visit_count"] == 3
+
+
+def test_closed_days_are_read_from_rollups_only(db_session, history):
+    backfill_rollups(db_session, DAY_1, DAY_2)
+    statements: list[str] = []
+    bind = db_session.get_bind()
+
+    def _before(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(bind, "before_cursor_execute", _before)
+    try:
+        AnalyticsService.get_visit_statistics(db_session, START, END, DEPARTMENT)
+        AnalyticsService.calculate_revenue(db_session, START, END)
+    finally:
+        event.remove(bind, "before_cursor_execute", _before)
+
+    raw_tables = ("FROM visits", "FROM payments", "FROM payment_webhooks")
+    assert not [s for s in statements if any(table in s for table in raw_tables)]
+
+
+def test_partial_edge_day_reads_raw_rows(db_session, history):
+    backfill_rollups(db_session, DAY_1, DAY_2)
+
+    # Второй день покрыт до 12:00 - платёж из вебхука в 18:00 не попадает
+    revenue = AnalyticsService.calculate_revenue(
+        db_session, START, datetime(2020, 6, 2, 12, 0)
+    )
+
+    assert revenue["daily_revenue"] == {"2020-06-01": 420.5, "2020-06-02": 80.0}
+
+
+def test_unrolled_gap_falls_back_to_raw(db_session, history):
+    rollup_day(db_session, DAY_2)
+
+    stats = AnalyticsService.get_visit_statistics(db_session, START, END, DEPARTMENT)
+
+    assert stats["total_visits"] == 3
+
+
+def test_rollup_day_is_idempotent(db_session, history):
+    rollup_day(db_session, DAY_1)
+    first = db_session.execute(select(func.count(VisitDailyRollup.id))).scalar()
+    rollup_day(db_session, DAY_1)
+
+    assert db_session.execute(select(func.count(VisitDailyRollup.id))).scalar() == first
+
+
+def test_backfill_skips_open_days(db_session, monkeypatch):
+    monkeypatch.setattr(analytics_rollup, "_today", lambda: date(2020, 6, 3))
+
+    results = backfill_rollups(db_session, DAY_1, date(2020, 6, 10))
+
+    assert [r["day"] for r in results] == ["2020-06-01", "2020-06-02"]
+
+
+def test_refresh_catches_up_from_last_rollup(db_session, monkeypatch):
+    monkeypatch.setattr(analytics_rollup, "_today", lambda: date(2020, 6, 10))
+    # Без агрегатов - только окно обновления
+    assert [r["day"] for r in refresh_rollups(db_session, refresh_days=2)] == [
+        "2020-06-08",
+        "2020-06-09",
+    ]
+
+    monkeypatch.setattr(analytics_rollup, "_today", lambda: date(2020, 6, 14))
+    days = [r["day"] for r in refresh_rollups(db_session, refresh_days=2)]
+
+    assert days == ["2020-06-10", "2020-06-11", "2020-06-12", "2020-06-13"]
+    assert db_session.get(AnalyticsRollupDay, date(2020, 6, 13)) is not None
+
+
+def test_wait_percentile_uses_bucket_upper_bound():
+    assert wait_percentile({}, 0.5) == 0.0
+    assert wait_percentile({0: 1, 2: 1, 9: 2}, 0.5) == 15.0
+    assert wait_percentile({0: 1, 2: 1, 9: 2}, 0.9) == 50.0
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.middleware.audit_middleware import AuditMiddleware
+from app.middleware.idempotency_middleware import (
+    IdempotencyMiddleware,
+    get_idempotency_cache,
+)
+from app.middleware.observability_middleware import ObservabilityMiddleware
+
+
+def _build_app(calls: list[str]) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/api/v1/items")
+    async def create_item(request: Request):
+        calls.append("create")
+        return {"created": len(calls), "request_id": request.state.request_id}
+
+    @app.get("/api/v1/stream")
+    async def stream():
+        async def chunks():
+            for index in range(3):
+                yield f"chunk-{index};".encode()
+
+        return StreamingResponse(chunks(), media_type="text/plain")
+
+    @app.post("/api/v1/fail")
+    async def fail():
+        calls.append("fail")
+        return StreamingResponse(iter([b"nope"]), status_code=409)
+
+    # Порядок как в app.main: Idempotency снаружи, Audit внутри
+    app.add_middleware(AuditMiddleware)
+    app.add_middleware(ObservabilityMiddleware)
+    app.add_middleware(IdempotencyMiddleware)
+    return app
+
+
+def test_request_state_is_shared_and_headers_are_set():
+    client = TestClient(_build_app([]))
+
+    response = client.post("/api/v1/items", headers={"traceparent": "00-" + "a" * 32 + "-" + "b" * 16 + "-01"})
+
+    assert response.status_code == 200
+    assert response.headers["X-Trace-ID"] == "a" * 32
+    # Audit (внутренний) кладёт свой request_id в state - хендлер видит его
+    assert response.json()["request_id"]
+    assert response.headers["X-Request-ID"]
+
+
+def test_streaming_response_passes_through():
+    client = TestClient(_build_app([]))
+
+    response = client.get("/api/v1/stream")
+
+    assert response.status_code == 200
+    assert response.text == "chunk-0;chunk-1;chunk-2;"
+    assert response.headers["X-Trace-ID"]
+
+
+def test_idempotency_replays_cached_body_and_skips_errors():
+    get_idempotency_cache().clear()
+    calls: list[str] = []
+    client = TestClient(_build_app(calls))
+    headers = {"Idempotency-Key": "key-1"}
+
+    first = client.post("/api/v1/items", headers=headers)
+    second = client.post("/api/v1/items", headers=headers)
+    client.post("/api/v1/fail", headers={"Idempotency-Key": "key-2"})
+    client.post("/api/v1/fail", headers={"Idempotency-Key": "key-2"})
+
+    assert calls == ["create", "fail", "fail"]
+    assert second.status_code == 200
+    assert second.content == first.content
+    assert second.headers["content-type"] == "application/json"
+    get_idempotency_cache().clear()
@@ -0,0 +1,496 @@
+"""Unit tests for app.core.cache.
+
+Covers:
+- LRU ordering and entry-count eviction
+- Byte budget accounting and eviction
+- Per-entry TTL and heap-driven expiry
+- Hit/miss/eviction/expiration counters in get_stats()
+- Tiered L1 + Redis mode with pub/sub invalidation (fake Redis)
+- Tag-versioned invalidation and namespaced Redis clear()
+"""
+
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from app.core import cache as cache_module
+from app.core.cache import (
+    CacheManager,
+    CacheTags,
+    InMemoryCache,
+    RedisCache,
+    cached,
+    estimate_size,
+    invalidate_department_cache,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {"t": 1_000.0}
+    monkeypatch.setattr(cache_module.time, "time", lambda: now["t"])
+    return now
+
+
+def _cache(**kwargs) -> InMemoryCache:
+    kwargs.setdefault("expiry_interval", 0)
+    return InMemoryCache(**kwargs)
+
+
+class TestLRU:
+    def test_evicts_least_recently_used(self):
+        cache = _cache(max_size=3)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("c", 3)
+        assert cache.get("a") == 1  # "b" is now the LRU entry
+
+        cache.set("d", 4)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("d") == 4
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_overwrite_does_not_evict(self):
+        cache = _cache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.set("a", 10)
+
+        assert cache.get("a") == 10
+        assert cache.get("b") == 2
+        assert cache.get_stats()["evictions"] == 0
+
+
+class TestByteBudget:
+    def test_bytes_tracked_per_entry(self):
+        cache = _cache()
+        cache.set("k", "x" * 1000)
+        assert cache.get_stats()["bytes"] >= 1000
+
+        cache.delete("k")
+        assert cache.get_stats()["bytes"] == 0
+
+    def test_evicts_to_fit_byte_budget(self):
+        value = "x" * 1000
+        entry_size = estimate_size(value) + estimate_size("k0")
+        cache = _cache(max_bytes=entry_size * 3)
+        for i in range(5):
+            cache.set(f"k{i}", value)
+
+        stats = cache.get_stats()
+        assert stats["size"] == 3
+        assert stats["bytes"] <= entry_size * 3
+        assert stats["evictions"] == 2
+        assert cache.get("k0") is None
+        assert cache.get("k4") == value
+
+    def test_oversized_value_is_not_stored(self):
+        cache = _cache(max_bytes=512)
+        cache.set("small", 1)
+        cache.set("huge", "x" * 10_000)
+
+        assert cache.get("huge") is None
+        assert cache.get("small") == 1
+
+
+class TestExpiry:
+    def test_expired_entry_is_a_miss(self, clock):
+        cache = _cache()
+        cache.set("k", "v", ttl=10)
+        clock["t"] += 11
+
+        assert cache.get("k") is None
+        stats = cache.get_stats()
+        assert stats["misses"] == 1
+        assert stats["expirations"] == 1
+        assert stats["bytes"] == 0
+
+    def test_cleanup_expired_uses_latest_ttl(self, clock):
+        cache = _cache()
+        cache.set("short", 1, ttl=5)
+        cache.set("long", 2, ttl=5)
+        cache.set("long", 2, ttl=100)  # stale heap item must be ignored
+        clock["t"] += 10
+
+        assert cache.cleanup_expired() == 1
+        assert cache.get("long") == 2
+        assert cache.get_stats()["size"] == 1
+
+    def test_writes_purge_expired_entries(self, clock):
+        cache = _cache()
+        for i in range(4):
+            cache.set(f"old{i}", i, ttl=1)
+        clock["t"] += 5
+        cache.set("new", 1)
+
+        assert cache.get_stats()["size"] == 1
+
+
+def test_stats_counters():
+    cache = _cache()
+    cache.set("a", 1)
+    cache.get("a")
+    cache.get("a")
+    cache.get("missing")
+
+    stats = cache.get_stats()
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == "66.7%"
+
+
+def test_concurrent_access_keeps_accounting_consistent():
+    cache = _cache(max_size=50)
+
+    def worker(offset: int) -> None:
+        for i in range(500):
+            cache.set(f"{offset}:{i % 80}", i)
+            cache.get(f"{offset}:{(i * 7) % 80}")
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.get_stats()
+    assert stats["size"] <= 50
+    assert stats["bytes"] == sum(e.size for e in cache._cache.values())
+
+
+def test_cache_manager_reads_limits_from_env(monkeypatch):
+    monkeypatch.setenv("CACHE_MAX_ENTRIES", "7")
+    monkeypatch.setenv("CACHE_MAX_BYTES", "4096")
+    monkeypatch.setenv("CACHE_EXPIRY_INTERVAL_SECONDS", "0")
+
+    stats = CacheManager().get_stats()
+
+    assert stats["backend"] == "memory"
+    assert stats["max_size"] == 7
+    assert stats["max_bytes"] == 4096
+
+
+# ---------------------------------------------------------------------------
+# Tiered (L1 + Redis) mode
+# ---------------------------------------------------------------------------
+
+
+class _FakeRedis:
+    """Minimal sync redis client shared by several "workers"."""
+
+    def __init__(self) -> None:
+        self.store: dict[str, str] = {}
+        self.published: list[tuple[str, str]] = []
+
+    def get(self, key):
+        return self.store.get(key)
+
+    def setex(self, key, ttl, value):
+        self.store[key] = value
+
+    def delete(self, *keys):
+        return sum(1 for key in keys if self.store.pop(key, None) is not None)
+
+    def scan_iter(self, match, count=None):
+        prefix = match.rstrip("*")
+        return [key for key in list(self.store) if key.startswith(prefix)]
+
+    def unlink(self, *keys):
+        return self.delete(*keys)
+
+    def mget(self, keys):
+        return [self.store.get(key) for key in keys]
+
+    def incr(self, key):
+        self.store[key] = str(int(self.store.get(key, 0)) + 1)
+        return int(self.store[key])
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+        return 1
+
+
+class _FakePipeline:
+    def __init__(self, redis: _FakeRedis) -> None:
+        self._redis = redis
+        self._ops: list = []
+
+    def incr(self, key):
+        self._ops.append(key)
+
+    def execute(self):
+        return [self._redis.incr(key) for key in self._ops]
+
+
+class _FakeBridge:
+    """Routes messages published through _FakeRedis to other fake bridges."""
+
+    def __init__(self, hub: list, instance_id: str) -> None:
+        from app.services.ws_redis_pubsub import RedisPubSubBridge
+
+        self._codec = RedisPubSubBridge("cache", redis_url="", instance_id=instance_id)
+        self.instance_id = instance_id
+        self.handlers = []
+        hub.append(self)
+
+    def encode(self, logical_channel, payload):
+        return self._codec.encode(logical_channel, payload)
+
+    async def subscribe(self, logical_channel, handler):
+        self.handlers.append(handler)
+
+
+async def _deliver(redis: _FakeRedis, hub: list) -> None:
+    import json
+
+    for _, message in redis.published:
+        envelope = json.loads(message)
+        for bridge in hub:
+            if bridge.instance_id == envelope["source"]:
+                continue
+            for handler in bridge.handlers:
+                await handler(envelope["payload"])
+    redis.published.clear()
+
+
+def _tiered_manager(redis: _FakeRedis, hub: list, name: str) -> CacheManager:
+    return CacheManager(tiered=True, redis_client=redis, pubsub=_FakeBridge(hub, name))
+
+
+@pytest.mark.asyncio
+async def test_tiered_invalidation_reaches_other_workers(monkeypatch):
+    monkeypatch.setenv("CACHE_EXPIRY_INTERVAL_SECONDS", "0")
+    redis, hub = _FakeRedis(), []
+    worker_a = _tiered_manager(redis, hub, "a")
+    worker_b = _tiered_manager(redis, hub, "b")
+    await worker_a.start()
+    await worker_b.start()
+
+    worker_a.set("clinic:doctors:all", [1, 2], ttl=300)
+    await _deliver(redis, hub)
+    assert worker_b.get("clinic:doctors:all") == [1, 2]  # L2 hit, now in B's L1
+
+    redis.store["cache:clinic:doctors:all"] = '[1, 2, 3]'  # no broadcast
+    assert worker_b.get("clinic:doctors:all") == [1, 2]  # served from L1
+
+    worker_a.delete_pattern("clinic:doctors")
+    await _deliver(redis, hub)
+
+    assert worker_b.get("clinic:doctors:all") is None
+    stats = worker_b.get_stats()
+    assert stats["backend"] == "tiered"
+    assert stats["invalidations_received"] >= 1
+
+
+def test_bridges_in_one_container_get_distinct_instance_ids(monkeypatch):
+    from app.services.ws_redis_pubsub import RedisPubSubBridge
+
+    # WS_INSTANCE_ID is shared by every uvicorn worker of a container
+    monkeypatch.setenv("WS_INSTANCE_ID", "api-1")
+    first = RedisPubSubBridge("cache", redis_url="")
+    second = RedisPubSubBridge("cache", redis_url="")
+
+    assert first.instance_id != second.instance_id
+    assert first.instance_id.startswith("api-1:")
+
+
+def test_tiered_degrades_to_l1_without_redis(monkeypatch):
+    monkeypatch.setenv("CACHE_EXPIRY_INTERVAL_SECONDS", "0")
+    monkeypatch.setattr(RedisCache, "_connect", lambda self: None)
+
+    manager = CacheManager(tiered=True)
+    manager.set("k", "v")
+
+    assert manager.get("k") == "v"
+    stats = manager.get_stats()
+    assert stats["backend"] == "tiered"
+    assert stats["l2_available"] is False
+
+
+# ---------------------------------------------------------------------------
+# Tag-versioned invalidation
+# ---------------------------------------------------------------------------
+
+
+def test_redis_clear_and_patterns_stay_in_cache_namespace():
+    redis = _FakeRedis()
+    redis.store["rate_limit:127.0.0.1"] = "5"
+    cache = RedisCache(client=redis)
+    cache.set("clinic:doctors", [1])
+    cache.set("clinic:services", [2])
+
+    assert cache.delete_pattern("clinic:doc") == 1
+    cache.clear()
+
+    assert redis.store == {"rate_limit:127.0.0.1": "5"}
+
+
+@pytest.mark.parametrize("backend", ["memory", "redis", "tiered"])
+def test_tag_bump_invalidates_decorated_results(monkeypatch, backend):
+    monkeypatch.setenv("CACHE_EXPIRY_INTERVAL_SECONDS", "0")
+    redis = _FakeRedis()
+    manager = CacheManager(
+        use_redis=backend == "redis",
+        tiered=backend == "tiered",
+        redis_client=redis,
+        pubsub=_FakeBridge([], "solo"),
+    )
+    monkeypatch.setattr(cache_module, "cache_manager", manager)
+    calls = []
+
+    @cached(ttl=300, key_prefix="departments", tags=(CacheTags.DEPARTMENT,))
+    def list_departments():
+        calls.append(1)
+        return ["cardio", "derma"]
+
+    assert list_departments() == ["cardio", "derma"]
+    assert list_departments() == ["cardio", "derma"]
+    assert len(calls) == 1
+
+    invalidate_department_cache()
+
+    assert list_departments() == ["cardio", "derma"]
+    assert len(calls) == 2
+    if backend != "memory":
+        assert redis.store["cache-tag:department"] == "1"
+
+
+def test_callable_tags_scope_invalidation_per_patient(monkeypatch):
+    monkeypatch.setattr(cache_module, "cache_manager", CacheManager())
+    calls = []
+
+    @cached(
+        ttl=60,
+        key_builder=lambda patient_id: f"patient:{patient_id}",
+        tags=lambda patient_id: (CacheTags.PATIENT, CacheTags.patient(patient_id)),
+    )
+    def get_patient(patient_id: int):
+        calls.append(patient_id)
+        return {"id": patient_id}
+
+    get_patient(1)
+    get_patient(2)
+    cache_module.invalidate_patient_cache(1)
+    get_patient(1)
+    get_patient(2)
+    assert calls == [1, 2, 1]
+
+    cache_module.invalidate_patient_cache()
+    get_patient(2)
+    assert calls == [1, 2, 1, 2]
+
+
+# ---------------------------------------------------------------------------
+# cached(): async, single-flight, stale-while-revalidate
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture
+def fresh_manager(monkeypatch):
+    manager = CacheManager()
+    monkeypatch.setattr(cache_module, "cache_manager", manager)
+    return manager
+
+
+@pytest.mark.asyncio
+async def test_async_single_flight_coalesces_concurrent_misses(fresh_manager):
+    import asyncio
+
+    calls = []
+
+    @cached(ttl=60, key_builder=lambda db, *, active_only: f"deps:{active_only}")
+    async def load(db, *, active_only):
+        calls.append(active_only)
+        await asyncio.sleep(0.01)
+        return {"active_only": active_only}
+
+    results = await asyncio.gather(*(load(object(), active_only=True) for _ in range(20)))
+
+    assert calls == [True]
+    assert all(r == {"active_only": True} for r in results)
+    assert await load(object(), active_only=True) == {"active_only": True}
+    assert calls == [True]
+
+
+@pytest.mark.asyncio
+async def test_async_single_flight_propagates_errors(fresh_manager):
+    import asyncio
+
+    calls = []
+
+    @cached(ttl=60, key_prefix="boom")
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("db down")
+
+    results = await asyncio.gather(load(), load(), return_exceptions=True)
+
+    assert len(calls) == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_sync_single_flight_coalesces_threads(fresh_manager):
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    @cached(ttl=60, key_prefix="services")
+    def load(specialty):
+        calls.append(specialty)
+        started.set()
+        release.wait(2)
+        return [specialty]
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(load("cardio")))
+        for _ in range(8)
+    ]
+    threads[0].start()
+    started.wait(2)
+    for thread in threads[1:]:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["cardio"]
+    assert results == [["cardio"]] * 8
+
+
+@pytest.mark.asyncio
+async def test_stale_value_served_while_refreshing(fresh_manager, clock):
+    import asyncio
+
+    version = {"n": 1}
+
+    @cached(ttl=10, stale_ttl=60, key_prefix="doctors")
+    async def load():
+        await asyncio.sleep(0)
+        return {"version": version["n"]}
+
+    assert await load() == {"version": 1}
+    version["n"] = 2
+    clock["t"] += 11
+
+    assert await load() == {"version": 1}  # stale, refresh scheduled
+    await asyncio.sleep(0.01)
+    assert await load() == {"version": 2}
+
+
+def test_default_key_is_readable_for_scalar_args(fresh_manager):
+    @cached(ttl=60, key_prefix="doctors")
+    def load(specialty, active=True):
+        return [specialty]
+
+    load("cardio", active=False)
+
+    assert fresh_manager.get("doctors:load:'cardio',active=False") == ["cardio"]
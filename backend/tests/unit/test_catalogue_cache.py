@@ -0,0 +1,60 @@
+"""Catalogue cache invalidation driven by ORM commits."""
+
+from __future__ import annotations
+
+import pytest
+
+from app.core.cache import CacheTags, cache_manager
+from app.models.department import Department
+from app.services import catalogue_cache
+
+
+def _versions() -> list[int]:
+    return cache_manager.get_tag_versions(
+        [CacheTags.DEPARTMENT, CacheTags.DOCTOR, CacheTags.SERVICE]
+    )
+
+
+def test_commit_of_catalogue_row_bumps_its_tag(db_session):
+    department, doctor, service = _versions()
+
+    db_session.add(
+        Department(key="catcache", name_ru="Кэш", name_uz="Kesh", active=True)
+    )
+    db_session.flush()
+    assert _versions() == [department, doctor, service]  # not yet committed
+
+    db_session.commit()
+
+    assert _versions() == [department + 1, doctor, service]
+
+
+def test_commit_without_catalogue_rows_keeps_tags(db_session):
+    before = _versions()
+
+    db_session.commit()
+
+    assert _versions() == before
+
+
+def test_only_doctor_name_changes_bump_doctor_tag(db_session, registrar_user, cardio_user):
+    _, doctor, _ = _versions()
+
+    registrar_user.full_name = "Registrar Renamed"
+    db_session.commit()
+    assert _versions()[1] == doctor
+
+    cardio_user.email = "cardio-renamed@test.com"
+    db_session.commit()
+    assert _versions()[1] == doctor
+
+    cardio_user.full_name = "Cardio Renamed"
+    db_session.commit()
+    assert _versions()[1] == doctor + 1
+
+
+def test_memory_backend_keeps_catalogue_entries_briefly():
+    if cache_manager.is_shared:
+        pytest.skip("CACHE_BACKEND is shared in this environment")
+    # Per-process cache is not invalidated across workers
+    assert catalogue_cache.CATALOGUE_CACHE_TTL_SECONDS <= 5
@@ -0,0 +1,210 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.models.online_queue import DailyQueue, OnlineQueueEntry
+from app.services import display_queue_state
+from app.services.display_queue_state import DailyQueueStateCache
+
+
+@pytest.fixture
+def queue_cache(db_session, monkeypatch):
+    # Загрузчики работают в своих сессиях - привязываем их к тестовому соединению
+    monkeypatch.setattr(
+        display_queue_state,
+        "SessionLocal",
+        sessionmaker(bind=db_session.connection()),
+    )
+    return DailyQueueStateCache(lambda name: name or "Пациент")
+
+
+@pytest.fixture
+def daily_queue(db_session, test_doctor):
+    queue = DailyQueue(
+        day=date.today(),
+        specialist_id=test_doctor.id,
+        queue_tag="cardiology_common",
+        active=True,
+    )
+    db_session.add(queue)
+    db_session.flush()
+    for number, status in ((1, "served"), (2, "called"), (3, "waiting")):
+        db_session.add(
+            OnlineQueueEntry(
+                queue_id=queue.id,
+                number=number,
+                patient_name=f"Patient {number}",
+                source="desk",
+                status=status,
+            )
+        )
+    db_session.flush()
+    return queue
+
+
+def _entry(db_session, queue, number):
+    return (
+        db_session.query(OnlineQueueEntry)
+        .filter_by(queue_id=queue.id, number=number)
+        .one()
+    )
+
+
+@pytest.mark.asyncio
+async def test_first_update_is_versioned_snapshot(queue_cache, daily_queue):
+    message = await queue_cache.build_update(daily_queue.id, event_type="queue.called")
+
+    assert message["type"] == "queue_update"
+    assert message["event_type"] == "queue.called"
+    data = message["data"]
+    assert data["snapshot"] is True
+    assert data["version"] == 1
+    assert [row["number"] for row in data["queue_entries"]] == [1, 2, 3]
+    assert data["stats"] == {"total": 3, "waiting": 1, "called": 1, "served": 1}
+    assert data["doctor_name"]
+
+
+@pytest.mark.asyncio
+async def test_status_change_is_sent_as_diff(queue_cache, daily_queue, db_session):
+    await queue_cache.build_update(daily_queue.id)
+    entry = _entry(db_session, daily_queue, 3)
+    entry.status = "called"
+    db_session.flush()
+
+    message = await queue_cache.build_update(
+        daily_queue.id, event_type="queue.called", changed_entry_ids=[entry.id]
+    )
+
+    assert message["type"] == "queue_diff"
+    data = message["data"]
+    assert (data["base_version"], data["version"]) == (1, 2)
+    assert [c["op"] for c in data["changes"]] == ["upsert"]
+    assert data["changes"][0]["entry"]["status"] == "called"
+    assert data["stats"] == {"total": 3, "waiting": 0, "called": 2, "served": 1}
+
+
+@pytest.mark.asyncio
+async def test_unchanged_queue_sends_nothing(queue_cache, daily_queue, db_session):
+    await queue_cache.build_update(daily_queue.id)
+    entry = _entry(db_session, daily_queue, 1)
+
+    assert await queue_cache.build_update(daily_queue.id, changed_entry_ids=[entry.id]) is None
+    assert queue_cache.get(daily_queue.id).version == 1
+
+
+@pytest.mark.asyncio
+async def test_full_reload_detects_added_and_removed_entries(
+    queue_cache, daily_queue, db_session
+):
+    await queue_cache.build_update(daily_queue.id)
+    removed = _entry(db_session, daily_queue, 1)
+    removed_id = removed.id
+    db_session.delete(removed)
+    db_session.add(
+        OnlineQueueEntry(
+            queue_id=daily_queue.id, number=4, patient_name="New", source="online",
+            status="waiting",
+        )
+    )
+    db_session.flush()
+
+    message = await queue_cache.build_update(daily_queue.id)
+
+    changes = message["data"]["changes"]
+    assert {"op": "remove", "id": removed_id, "number": 1} in changes
+    assert [c["entry"]["number"] for c in changes if c["op"] == "upsert"] == [4]
+    assert message["data"]["stats"]["total"] == 3
+
+
+@pytest.mark.asyncio
+async def test_periodic_snapshot_after_diff_budget(
+    queue_cache, daily_queue, db_session, monkeypatch
+):
+    monkeypatch.setattr(display_queue_state, "SNAPSHOT_EVERY_DIFFS", 2)
+    await queue_cache.build_update(daily_queue.id)
+    entry = _entry(db_session, daily_queue, 3)
+
+    types = []
+    for status in ("called", "served", "waiting"):
+        entry.status = status
+        db_session.flush()
+        message = await queue_cache.build_update(
+            daily_queue.id, changed_entry_ids=[entry.id]
+        )
+        types.append((message["type"], message["data"]["version"]))
+
+    assert types == [("queue_diff", 2), ("queue_diff", 3), ("queue_update", 4)]
+
+
+@pytest.mark.asyncio
+async def test_resync_snapshot_matches_current_version(
+    queue_cache, daily_queue, db_session
+):
+    await queue_cache.build_update(daily_queue.id)
+    entry = _entry(db_session, daily_queue, 3)
+    entry.status = "called"
+    db_session.flush()
+    await queue_cache.build_update(daily_queue.id, changed_entry_ids=[entry.id])
+
+    snapshot = await queue_cache.snapshot(daily_queue.id)
+
+    assert snapshot["data"]["version"] == 2
+    assert snapshot["data"]["stats"]["called"] == 2
+
+
+@pytest.mark.asyncio
+async def test_other_worker_adopts_state_in_its_own_versions(
+    queue_cache, daily_queue, db_session
+):
+    other_worker = DailyQueueStateCache(lambda name: name or "Пациент")
+    await queue_cache.build_update(daily_queue.id)
+    first = await other_worker.adopt(queue_cache.export(daily_queue.id))
+    assert first["type"] == "queue_update"
+    assert first["data"]["version"] == 1
+
+    # Воркер-источник ушёл вперёд по своей нумерации
+    entry = _entry(db_session, daily_queue, 3)
+    for status in ("called", "served"):
+        entry.status = status
+        db_session.flush()
+        await queue_cache.build_update(daily_queue.id, changed_entry_ids=[entry.id])
+    assert queue_cache.get(daily_queue.id).version == 3
+
+    message = await other_worker.adopt(queue_cache.export(daily_queue.id))
+
+    assert message["type"] == "queue_diff"
+    assert (message["data"]["base_version"], message["data"]["version"]) == (1, 2)
+    assert message["data"]["changes"][0]["entry"]["status"] == "served"
+    assert await other_worker.adopt(queue_cache.export(daily_queue.id)) is None
+
+
+@pytest.mark.asyncio
+async def test_resync_rereads_queue_from_db(queue_cache, daily_queue, db_session):
+    await queue_cache.build_update(daily_queue.id)
+    # Изменение, о котором этот воркер не узнал
+    entry = _entry(db_session, daily_queue, 3)
+    entry.status = "called"
+    db_session.flush()
+
+    snapshot = await queue_cache.snapshot(daily_queue.id)
+
+    assert snapshot["data"]["version"] == 2
+    assert snapshot["data"]["stats"]["called"] == 2
+
+
+@pytest.mark.asyncio
+async def test_past_day_and_closed_queues_are_evicted(
+    queue_cache, daily_queue, db_session
+):
+    await queue_cache.build_update(daily_queue.id)
+    assert queue_cache.evict_stale() == 0
+
+    assert queue_cache.evict_stale(today=date.today() + timedelta(days=1)) == 1
+    assert queue_cache.get(daily_queue.id) is None
+
+    daily_queue.active = False
+    db_session.flush()
+    await queue_cache.build_update(daily_queue.id)
+    assert queue_cache.get(daily_queue.id).closed is True
+    assert queue_cache.evict_stale() == 1
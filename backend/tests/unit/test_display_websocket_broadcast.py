@@ -0,0 +1,153 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services import display_websocket
+from app.services.display_websocket import DisplayWebSocketManager
+
+
+class _NullBridge:
+    async def publish(self, logical_channel: str, payload: dict) -> bool:
+        return True
+
+    async def subscribe(self, logical_channel: str, handler) -> None:
+        return None
+
+    async def unsubscribe(self, logical_channel: str, handler) -> None:
+        return None
+
+
+class _FakeWebSocket:
+    def __init__(self, delay: float = 0.0, fail: bool = False) -> None:
+        self.delay = delay
+        self.fail = fail
+        self.sent: list[str] = []
+        self.closed_with: int | None = None
+
+    async def send_text(self, data: str) -> None:
+        if self.fail:
+            raise RuntimeError("socket is gone")
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(data)
+
+    async def close(self, code: int = 1000) -> None:
+        self.closed_with = code
+
+
+def _manager(*sockets: _FakeWebSocket) -> DisplayWebSocketManager:
+    manager = DisplayWebSocketManager(pubsub=_NullBridge())
+    manager.connections["board"] = set(sockets)
+    return manager
+
+
+@pytest.mark.asyncio
+async def test_broadcast_serializes_message_once(monkeypatch):
+    calls = 0
+    real_dumps = json.dumps
+
+    def counting_dumps(*args, **kwargs):
+        nonlocal calls
+        calls += 1
+        return real_dumps(*args, **kwargs)
+
+    monkeypatch.setattr(display_websocket.json, "dumps", counting_dumps)
+    sockets = [_FakeWebSocket() for _ in range(50)]
+    manager = _manager(*sockets)
+
+    await manager.broadcast_to_board("board", {"type": "patient_call", "n": 1})
+
+    assert calls == 1
+    assert all(ws.sent == ['{"type": "patient_call", "n": 1}'] for ws in sockets)
+
+
+@pytest.mark.asyncio
+async def test_slow_board_does_not_delay_others(monkeypatch):
+    monkeypatch.setattr(display_websocket, "BROADCAST_WAIT_SECONDS", 0.05)
+    slow = _FakeWebSocket(delay=1.0)
+    fast = [_FakeWebSocket() for _ in range(10)]
+    manager = _manager(slow, *fast)
+
+    started = asyncio.get_running_loop().time()
+    await manager.broadcast_to_board("board", {"type": "announcement"})
+
+    assert asyncio.get_running_loop().time() - started < 0.5
+    assert all(len(ws.sent) == 1 for ws in fast)
+    assert slow.sent == []
+    assert slow in manager.connections["board"]
+
+
+@pytest.mark.asyncio
+async def test_stalled_send_drops_connection(monkeypatch):
+    monkeypatch.setattr(display_websocket, "SEND_TIMEOUT_SECONDS", 0.05)
+    monkeypatch.setattr(display_websocket, "BROADCAST_WAIT_SECONDS", 0.2)
+    stalled = _FakeWebSocket(delay=10)
+    healthy = _FakeWebSocket()
+    manager = _manager(stalled, healthy)
+
+    await manager.broadcast_to_board("board", {"type": "queue_update"})
+    await asyncio.sleep(0)
+
+    assert manager.connections["board"] == {healthy}
+    assert stalled.closed_with == 1011
+    assert manager.dropped_connections == 1
+
+
+@pytest.mark.asyncio
+async def test_queue_overflow_drops_laggard(monkeypatch):
+    monkeypatch.setattr(display_websocket, "MAX_PENDING_MESSAGES", 3)
+    monkeypatch.setattr(display_websocket, "BROADCAST_WAIT_SECONDS", 0)
+    laggard = _FakeWebSocket(delay=10)
+    healthy = _FakeWebSocket()
+    manager = _manager(laggard, healthy)
+
+    for n in range(6):
+        await manager.broadcast_to_board("board", {"type": "tick", "n": n})
+        await asyncio.sleep(0)
+
+    assert laggard not in manager.connections["board"]
+    assert [json.loads(m)["n"] for m in healthy.sent] == list(range(6))
+
+
+@pytest.mark.asyncio
+async def test_failed_send_drops_connection_and_keeps_order():
+    broken = _FakeWebSocket(fail=True)
+    healthy = _FakeWebSocket(delay=0.001)
+    manager = _manager(broken, healthy)
+
+    for n in range(3):
+        await manager.broadcast_to_board("board", {"n": n})
+
+    assert manager.connections["board"] == {healthy}
+    assert [json.loads(m)["n"] for m in healthy.sent] == [0, 1, 2]
+
+
+@pytest.mark.asyncio
+async def test_back_to_back_broadcasts_share_one_drain(monkeypatch):
+    monkeypatch.setattr(display_websocket, "BROADCAST_WAIT_SECONDS", 0)
+
+    class _ConcurrencyProbe(_FakeWebSocket):
+        in_flight = 0
+        max_in_flight = 0
+
+        async def send_text(self, data: str) -> None:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                await super().send_text(data)
+            finally:
+                self.in_flight -= 1
+
+    probe = _ConcurrencyProbe(delay=0.01)
+    manager = _manager(probe)
+
+    # Следующие broadcast приходят раньше, чем первый drain успел стартовать
+    await asyncio.gather(
+        *(manager.broadcast_to_board("board", {"n": n}) for n in range(3))
+    )
+    while manager._drain_tasks:
+        await asyncio.gather(*manager._drain_tasks)
+
+    assert probe.max_in_flight == 1
+    assert [json.loads(m)["n"] for m in probe.sent] == [0, 1, 2]
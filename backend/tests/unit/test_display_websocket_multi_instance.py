@@ -77,3 +77,55 @@ async def test_display_manager_redis_pubsub_two_instance_propagation():
     await asyncio.sleep(0)
 
     assert any(msg.get("event") == "queue.created" for msg in ws_2.messages)
+
+
+@pytest.mark.asyncio
+async def test_queue_state_reaches_other_worker_in_its_own_versions(
+    db_session, test_doctor, monkeypatch
+):
+    from datetime import date
+
+    from sqlalchemy.orm import sessionmaker
+
+    from app.models.online_queue import DailyQueue, OnlineQueueEntry
+    from app.services import display_queue_state
+
+    monkeypatch.setattr(
+        display_queue_state, "SessionLocal", sessionmaker(bind=db_session.connection())
+    )
+    queue = DailyQueue(day=date.today(), specialist_id=test_doctor.id, active=True)
+    db_session.add(queue)
+    db_session.flush()
+    entry = OnlineQueueEntry(
+        queue_id=queue.id, number=1, patient_name="P", source="desk", status="waiting"
+    )
+    db_session.add(entry)
+    db_session.flush()
+
+    manager_1 = DisplayWebSocketManager(pubsub=_FakePubSubBridge())
+    manager_2 = DisplayWebSocketManager(pubsub=_FakePubSubBridge())
+
+    async def _skip_initial_state(*args, **kwargs):
+        return None
+
+    manager_1._send_current_state = _skip_initial_state  # type: ignore[method-assign]
+    manager_2._send_current_state = _skip_initial_state  # type: ignore[method-assign]
+    ws_1, ws_2 = _FakeWebSocket(), _FakeWebSocket()
+    await manager_1.connect(ws_1, "board-q")
+    await manager_2.connect(ws_2, "board-q")
+
+    # Второй воркер уже видел очередь - его счётчик версий впереди
+    await manager_2.queue_states.build_update(queue.id)
+    manager_2.queue_states.get(queue.id).version = 7
+
+    await manager_1.broadcast_daily_queue_state(queue)
+    entry.status = "called"
+    db_session.flush()
+    await manager_1.broadcast_daily_queue_state(queue, changed_entry_ids=[entry.id])
+    await asyncio.sleep(0.3)
+
+    assert [m["type"] for m in ws_1.messages] == ["queue_update", "queue_diff"]
+    assert [m["type"] for m in ws_2.messages] == ["queue_diff"]
+    assert ws_2.messages[0]["data"]["base_version"] == 7
+    await manager_1.disconnect(ws_1, "board-q")
+    await manager_2.disconnect(ws_2, "board-q")
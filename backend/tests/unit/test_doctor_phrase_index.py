@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.models.doctor_phrase_history import DoctorPhraseHistory
+from app.services import doctor_phrase_index
+from app.services.doctor_phrase_index import PhraseIndexCache, phrase_index_cache
+from app.services.doctor_phrase_service import DoctorPhraseService
+
+DOCTOR_ID = 910001
+FIELD = "complaints"
+
+
+@pytest.fixture(autouse=True)
+def _clear_phrase_index():
+    phrase_index_cache.clear()
+    yield
+    phrase_index_cache.clear()
+
+
+def _add_phrase(db_session, phrase, usage_count, *, doctor_id=DOCTOR_ID, specialty=None, age_days=0):
+    db_session.add(
+        DoctorPhraseHistory(
+            doctor_id=doctor_id,
+            field=FIELD,
+            phrase=phrase,
+            prefix_index=DoctorPhraseHistory.create_prefix_index(phrase),
+            usage_count=usage_count,
+            specialty=specialty,
+            last_used=datetime.now(UTC) - timedelta(days=age_days),
+        )
+    )
+
+
+@pytest.fixture
+def phrases(db_session):
+    _add_phrase(db_session, "Головная боль давящего характера", 3)
+    _add_phrase(db_session, "Головная боль пульсирующая", 7)
+    _add_phrase(db_session, "Головная боль по утрам", 3, age_days=10)
+    _add_phrase(db_session, "Головокружение при ходьбе", 20)
+    _add_phrase(db_session, "Головная боль после нагрузки", 9, specialty="cardiology")
+    db_session.flush()
+
+
+def _suggest(db_session, text, **kwargs):
+    return DoctorPhraseService(db_session).suggest_phrases(
+        doctor_id=DOCTOR_ID,
+        field=FIELD,
+        current_text=text,
+        cursor_position=len(text),
+        **kwargs,
+    )
+
+
+def test_suggestions_are_ranked_by_usage_then_recency(db_session, phrases):
+    suggestions = _suggest(db_session, "головная боль", specialty="therapy")
+
+    assert [s["full_phrase"] for s in suggestions] == [
+        "Головная боль пульсирующая",
+        "Головная боль давящего характера",
+        "Головная боль по утрам",
+    ]
+    assert suggestions[0]["text"] == " пульсирующая"
+    assert suggestions[0]["usageCount"] == 7
+
+    # Без специальности видны фразы всех специальностей
+    assert _suggest(db_session, "Головная боль")[0]["full_phrase"] == (
+        "Головная боль после нагрузки"
+    )
+
+
+def test_frequent_phrases_for_empty_text(db_session, phrases):
+    suggestions = _suggest(db_session, "", max_suggestions=2)
+
+    assert [s["text"] for s in suggestions] == [
+        "Головокружение при ходьбе",
+        "Головная боль после нагрузки",
+    ]
+
+
+def test_hot_path_does_not_query_database(db_session, phrases):
+    _suggest(db_session, "Гол")
+
+    statements = []
+    bind = db_session.get_bind()
+
+    def _before(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(bind, "before_cursor_execute", _before)
+    try:
+        for text in ("Голо", "Головн", "Головная бо", "Головок", ""):
+            _suggest(db_session, text)
+    finally:
+        event.remove(bind, "before_cursor_execute", _before)
+
+    assert statements == []
+
+
+def test_indexing_updates_loaded_index_incrementally(db_session, phrases, monkeypatch):
+    assert _suggest(db_session, "Головная боль", specialty="therapy")[0]["full_phrase"] == (
+        "Головная боль пульсирующая"
+    )
+    # Перезагрузка из БД сломала бы тест - индекс должен обновиться на месте
+    monkeypatch.setattr(
+        doctor_phrase_index, "_load_entries", lambda *args: pytest.fail("index reloaded")
+    )
+
+    service = DoctorPhraseService(db_session)
+    for _ in range(5):
+        service.index_doctor_phrases(
+            DOCTOR_ID,
+            {FIELD: "Головная боль по утрам. Головная боль в висках"},
+        )
+
+    suggestions = _suggest(db_session, "Головная боль", specialty="therapy")
+
+    assert [s["full_phrase"] for s in suggestions][:3] == [
+        "Головная боль по утрам",
+        "Головная боль пульсирующая",
+        "Головная боль в висках",
+    ]
+    assert suggestions[0]["usageCount"] == 8
+
+
+def test_cache_evicts_least_recently_used_doctor(db_session):
+    _add_phrase(db_session, "Жалобы на слабость", 1, doctor_id=DOCTOR_ID)
+    _add_phrase(db_session, "Жалобы на одышку", 1, doctor_id=DOCTOR_ID)
+    _add_phrase(db_session, "Жалобы на кашель", 1, doctor_id=DOCTOR_ID + 1)
+    _add_phrase(db_session, "Жалобы на боли в груди", 1, doctor_id=DOCTOR_ID + 1)
+    db_session.flush()
+    cache = PhraseIndexCache(max_phrases=3, ttl_seconds=300)
+
+    cache.top(db_session, DOCTOR_ID, FIELD, "жалобы", 5)
+    cache.top(db_session, DOCTOR_ID + 1, FIELD, "жалобы", 5)
+
+    assert list(cache._indexes) == [(DOCTOR_ID + 1, FIELD)]
+    assert cache._phrases == 2
+
+
+def test_cache_reloads_index_after_ttl(db_session):
+    _add_phrase(db_session, "Жалобы на слабость", 1)
+    db_session.flush()
+    cache = PhraseIndexCache(max_phrases=100, ttl_seconds=0)
+
+    assert len(cache.top(db_session, DOCTOR_ID, FIELD, "жалобы", 5)) == 1
+    _add_phrase(db_session, "Жалобы на одышку", 1)
+    db_session.flush()
+
+    assert len(cache.top(db_session, DOCTOR_ID, FIELD, "жалобы", 5)) == 2
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+
+from app.models.appointment import Appointment
+from app.models.doctor_phrase_history import DoctorPhraseHistory
+from app.models.emr import EMR
+from app.services.emr_phrase_indexer import EMRPhraseIndexer
+
+DOCTOR_A = 920001
+DOCTOR_B = 920002
+
+
+def _emr(db_session, patient_id, doctor_id, *, is_draft=False, **fields):
+    appointment = Appointment(
+        patient_id=patient_id, doctor_id=doctor_id, appointment_date=date(2030, 1, 1)
+    )
+    db_session.add(appointment)
+    db_session.flush()
+    emr = EMR(appointment_id=appointment.id, is_draft=is_draft, specialty="therapy", **fields)
+    db_session.add(emr)
+    db_session.flush()
+    return emr
+
+
+@pytest.fixture
+def emrs(db_session, test_patient):
+    db_session.add(
+        DoctorPhraseHistory(
+            doctor_id=DOCTOR_A,
+            field="complaints",
+            phrase="Головная боль давящего характера",
+            prefix_index="головная боль давящего характера",
+            usage_count=3,
+        )
+    )
+    _emr(db_session, test_patient.id, DOCTOR_A, complaints="Головная боль давящего характера. Слабость по утрам")
+    _emr(db_session, test_patient.id, DOCTOR_A, complaints="Головная боль давящего характера")
+    _emr(db_session, test_patient.id, DOCTOR_B, diagnosis="Артериальная гипертензия 2 ст")
+    _emr(db_session, test_patient.id, DOCTOR_B, is_draft=True, diagnosis="Черновик не индексируется")
+    db_session.flush()
+
+
+def _usage(db_session):
+    return {
+        (row.doctor_id, row.field, row.phrase): row.usage_count
+        for row in db_session.query(DoctorPhraseHistory)
+        .filter(DoctorPhraseHistory.doctor_id.in_([DOCTOR_A, DOCTOR_B]))
+        .all()
+    }
+
+
+EXPECTED = {
+    (DOCTOR_A, "complaints", "Головная боль давящего характера"): 5,
+    (DOCTOR_A, "complaints", "Слабость по утрам"): 1,
+    (DOCTOR_B, "diagnosis", "Артериальная гипертензия 2 ст"): 1,
+}
+
+
+def test_bulk_index_aggregates_and_upserts(db_session, emrs):
+    result = EMRPhraseIndexer(db_session).index_all_doctors(workers=1)
+
+    assert result.errors == []
+    assert result.total_doctors == 2
+    assert result.total_emrs == 3
+    assert result.total_phrases == 4
+    assert result.emrs_per_second > 0
+    assert result.resumed_from_emr_id == 0
+    assert _usage(db_session) == EXPECTED
+
+    # Повторный запуск продолжает с checkpoint и не считает EMR второй раз
+    again = EMRPhraseIndexer(db_session).index_all_doctors(workers=1)
+    assert again.total_emrs == 0
+    assert again.resumed_from_emr_id == result.last_emr_id
+    assert _usage(db_session) == EXPECTED
+
+
+def test_interrupted_run_resumes_from_checkpoint(db_session, emrs, monkeypatch):
+    indexer = EMRPhraseIndexer(db_session)
+    write_page = EMRPhraseIndexer._write_page
+    calls = []
+
+    def _failing_write_page(self, counts, checkpoint_key, last_emr_id):
+        calls.append(last_emr_id)
+        if len(calls) == 2:
+            raise RuntimeError("connection lost")
+        return write_page(self, counts, checkpoint_key, last_emr_id)
+
+    monkeypatch.setattr(EMRPhraseIndexer, "_write_page", _failing_write_page)
+    interrupted = indexer.index_all_doctors(workers=1, page_size=1)
+    monkeypatch.setattr(EMRPhraseIndexer, "_write_page", write_page)
+
+    assert interrupted.errors == ["Internal error"]
+    assert interrupted.total_emrs == 1
+
+    resumed = indexer.index_all_doctors(workers=1, page_size=1)
+
+    assert resumed.errors == []
+    assert resumed.resumed_from_emr_id == calls[0]
+    assert resumed.total_emrs == 2
+    assert _usage(db_session) == EXPECTED
+
+
+def test_bulk_index_with_process_pool(db_session, emrs):
+    result = EMRPhraseIndexer(db_session).index_all_doctors(workers=2, page_size=2)
+
+    assert result.errors == []
+    assert result.total_emrs == 3
+    assert _usage(db_session) == EXPECTED
+
+
+def test_bulk_index_prefers_doctor_profile_specialty(db_session, test_patient, test_doctor):
+    _emr(db_session, test_patient.id, test_doctor.id, complaints="Боль за грудиной при нагрузке")
+    _emr(db_session, test_patient.id, DOCTOR_B, complaints="Кашель с мокротой по утрам")
+
+    EMRPhraseIndexer(db_session).index_all_doctors(workers=1, resume=False)
+
+    specialties = {
+        row.phrase: row.specialty
+        for row in db_session.query(DoctorPhraseHistory).filter(
+            DoctorPhraseHistory.doctor_id.in_([test_doctor.id, DOCTOR_B])
+        )
+    }
+    # Специальность из профиля врача; без профиля - из EMR
+    assert specialties == {
+        "Боль за грудиной при нагрузке": "Кардиология",
+        "Кашель с мокротой по утрам": "therapy",
+    }
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import os
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from PIL import Image
+
+from app.crud.file_system import file as file_crud
+from app.models.file_system import FileBlob
+from app.schemas.file_system import FileTypeEnum, FileUploadRequest
+from app.services import image_compression_service as image_module
+from app.services.file_system_service import FileSystemService
+from app.services.image_compression_service import (
+    ImageDerivativeCache,
+    ImageProcessingPool,
+)
+
+
+def _service(tmp_path, monkeypatch, grace_seconds: int = 0) -> FileSystemService:
+    monkeypatch.setenv("FILE_STORAGE_PATH", str(tmp_path / "files"))
+    monkeypatch.setenv("TEMP_STORAGE_PATH", str(tmp_path / "temp"))
+    monkeypatch.setenv("FILE_BLOB_GC_GRACE_SECONDS", str(grace_seconds))
+    return FileSystemService()
+
+
+def _upload(service, db_session, user, content: bytes, name: str = "scan.txt", **extra):
+    return service.upload_file(
+        db_session,
+        UploadFile(file=io.BytesIO(content), filename=name, size=len(content)),
+        FileUploadRequest(filename=name, file_type=FileTypeEnum.DOCUMENT, **extra),
+        user.id,
+    )
+
+
+def _blob(db_session, sha256: str) -> FileBlob | None:
+    db_session.expire_all()
+    return db_session.get(FileBlob, sha256)
+
+
+def test_duplicate_uploads_share_one_sharded_blob(db_session, admin_user, tmp_path, monkeypatch):
+    service = _service(tmp_path, monkeypatch)
+
+    first = _upload(service, db_session, admin_user, b"same scan", "first.txt")
+    second = _upload(service, db_session, admin_user, b"same scan", "second.txt")
+
+    sha256 = first.file_hash
+    assert first.file_path == second.file_path == service._blob_path(sha256)
+    assert first.file_path.endswith(os.path.join(sha256[:2], sha256[2:4], sha256))
+    assert _blob(db_session, sha256).ref_count == 2
+    assert len([path for path in (tmp_path / "files" / "blobs").rglob("*") if path.is_file()]) == 1
+
+    stats = service.get_file_statistics(db_session, admin_user.id)["storage_usage"]
+    assert stats["logical_bytes"] == 2 * len(b"same scan")
+    assert stats["physical_bytes"] == len(b"same scan")
+    assert stats["deduplicated_bytes"] == len(b"same scan")
+    assert stats["unique_blobs"] == 1
+
+
+def _blob_files(tmp_path) -> list:
+    return [path for path in (tmp_path / "files" / "blobs").rglob("*") if path.is_file()]
+
+
+def test_failed_upload_does_not_leave_blob_file(db_session, admin_user, tmp_path, monkeypatch):
+    service = _service(tmp_path, monkeypatch)
+    kept = _upload(service, db_session, admin_user, b"kept scan")
+
+    def broken_create(db, obj_in, owner_id):
+        raise RuntimeError("db is down")
+
+    monkeypatch.setattr(file_crud, "create", broken_create)
+    with pytest.raises(HTTPException):
+        _upload(service, db_session, admin_user, b"new scan")
+    # Дубликат уже сохранённого содержимого: чужой blob не трогаем
+    with pytest.raises(HTTPException):
+        _upload(service, db_session, admin_user, b"kept scan")
+    db_session.rollback()
+
+    assert [str(path) for path in _blob_files(tmp_path)] == [kept.file_path]
+
+
+def test_blob_is_collected_only_after_last_reference(db_session, admin_user, tmp_path, monkeypatch):
+    service = _service(tmp_path, monkeypatch)
+    first = _upload(service, db_session, admin_user, b"shared content")
+    second = _upload(service, db_session, admin_user, b"shared content")
+    sha256, blob_path = first.file_hash, first.file_path
+
+    assert service.delete_file(db_session, first.id, admin_user.id)
+    assert service.collect_unreferenced_blobs(db_session)["collected"] == 0
+    assert _blob(db_session, sha256).ref_count == 1
+
+    assert service.delete_file(db_session, second.id, admin_user.id)
+    blob = _blob(db_session, sha256)
+    assert blob.ref_count == 0
+    assert blob.unreferenced_at is not None
+
+    result = service.collect_unreferenced_blobs(db_session)
+
+    assert result == {"collected": 1, "freed_bytes": len(b"shared content")}
+    assert _blob(db_session, sha256) is None
+    assert not os.path.exists(blob_path)
+
+
+def test_gc_keeps_blobs_within_grace_period(db_session, admin_user, tmp_path, monkeypatch):
+    service = _service(tmp_path, monkeypatch, grace_seconds=3600)
+    uploaded = _upload(service, db_session, admin_user, b"recently deleted")
+    service.delete_file(db_session, uploaded.id, admin_user.id)
+
+    assert service.collect_unreferenced_blobs(db_session)["collected"] == 0
+    assert os.path.exists(uploaded.file_path)
+
+
+def test_reupload_revives_unreferenced_blob(db_session, admin_user, tmp_path, monkeypatch):
+    service = _service(tmp_path, monkeypatch)
+    uploaded = _upload(service, db_session, admin_user, b"deleted then uploaded again")
+    service.delete_file(db_session, uploaded.id, admin_user.id)
+
+    again = _upload(service, db_session, admin_user, b"deleted then uploaded again")
+
+    blob = _blob(db_session, again.file_hash)
+    assert blob.ref_count == 1
+    assert blob.unreferenced_at is None
+    assert service.collect_unreferenced_blobs(db_session)["collected"] == 0
+    assert os.path.exists(again.file_path)
+
+
+def test_replaced_content_stays_referenced_by_version(db_session, admin_user, tmp_path, monkeypatch):
+    service = _service(tmp_path, monkeypatch)
+    uploaded = _upload(service, db_session, admin_user, b"version one")
+    old_hash, old_path = uploaded.file_hash, uploaded.file_path
+
+    replaced = service.replace_file_content(
+        db_session,
+        uploaded.id,
+        UploadFile(file=io.BytesIO(b"version two"), filename="scan.txt"),
+        admin_user.id,
+    )
+
+    assert replaced.file_path != old_path
+    assert _blob(db_session, old_hash).ref_count == 1
+    assert _blob(db_session, replaced.file_hash).ref_count == 1
+
+    service.delete_file(db_session, uploaded.id, admin_user.id)
+
+    assert _blob(db_session, old_hash).ref_count == 0
+    assert _blob(db_session, replaced.file_hash).ref_count == 0
+    assert service.collect_unreferenced_blobs(db_session)["collected"] == 2
+
+
+def test_expired_file_cleanup_keeps_content_shared_with_live_file(
+    db_session, admin_user, tmp_path, monkeypatch
+):
+    service = _service(tmp_path, monkeypatch)
+    _upload(
+        service,
+        db_session,
+        admin_user,
+        b"shared scan",
+        expires_at=datetime.now(UTC) - timedelta(days=1),
+    )
+    live = _upload(service, db_session, admin_user, b"shared scan")
+
+    assert file_crud.cleanup_expired_files(db_session) == 1
+    service.collect_unreferenced_blobs(db_session)
+
+    assert _blob(db_session, live.file_hash).ref_count == 1
+    assert os.path.exists(live.file_path)
+
+
+def test_image_preview_goes_through_pool_and_is_collected_with_blob(
+    db_session, admin_user, tmp_path, monkeypatch
+):
+    pool = ImageProcessingPool(workers=0, cache=ImageDerivativeCache(str(tmp_path / "derivatives")))
+    monkeypatch.setattr(image_module, "_pool_instance", pool)
+    service = _service(tmp_path, monkeypatch)
+    output = io.BytesIO()
+    Image.radial_gradient("L").resize((2400, 1600)).convert("RGB").save(output, "PNG")
+    uploaded = _upload(service, db_session, admin_user, output.getvalue(), "scan.png")
+    runs: list[str] = []
+    original_run = pool._run
+
+    async def counting_run(operation, image_data, params):
+        runs.append(operation)
+        return await original_run(operation, image_data, params)
+
+    monkeypatch.setattr(pool, "_run", counting_run)
+
+    async def scenario():
+        first = await service.render_image_preview(uploaded.file_path, uploaded.file_hash)
+        second = await service.render_image_preview(uploaded.file_path, uploaded.file_hash)
+        return first, second
+
+    (first, first_type), (second, _) = asyncio.run(scenario())
+
+    assert runs == ["compress_for_web"]
+    assert first == second
+    assert first_type == "image/jpeg"
+    assert Image.open(io.BytesIO(first)).format == "JPEG"
+    assert (tmp_path / "derivatives" / uploaded.file_hash[:2] / uploaded.file_hash).is_dir()
+
+    service.delete_file(db_session, uploaded.id, admin_user.id)
+    service.collect_unreferenced_blobs(db_session)
+
+    assert not (tmp_path / "derivatives" / uploaded.file_hash[:2] / uploaded.file_hash).exists()
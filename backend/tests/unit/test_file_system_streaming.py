@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import zipfile
+
+import pytest
+from fastapi import HTTPException, UploadFile
+from fastapi.testclient import TestClient
+
+from app.services import file_system_service as file_system_module
+from app.services.file_system_service import FileSystemService
+
+
+def _service(tmp_path, monkeypatch) -> FileSystemService:
+    monkeypatch.setenv("FILE_STORAGE_PATH", str(tmp_path / "files"))
+    monkeypatch.setenv("TEMP_STORAGE_PATH", str(tmp_path / "temp"))
+    return FileSystemService()
+
+
+def _upload(content: bytes, filename: str = "scan.txt") -> UploadFile:
+    return UploadFile(file=io.BytesIO(content), filename=filename, size=len(content))
+
+
+def test_spool_hashes_upload_chunk_by_chunk(tmp_path, monkeypatch):
+    service = _service(tmp_path, monkeypatch)
+    monkeypatch.setattr(file_system_module, "FILE_READ_CHUNK_BYTES", 3)
+    content = b"streamed upload content" * 10
+
+    temp_path, size, file_hash = service._spool_upload_file(_upload(content), 1024)
+
+    assert size == len(content)
+    assert file_hash == hashlib.sha256(content).hexdigest()
+    with open(temp_path, "rb") as spooled:
+        assert spooled.read() == content
+
+    target = tmp_path / "files" / "2026" / "10" / "scan.txt"
+    service._move_into_storage(temp_path, str(target))
+    assert target.read_bytes() == content
+    assert list((tmp_path / "files" / ".incoming").iterdir()) == []
+
+
+def test_spool_rejects_oversized_upload_without_leftovers(tmp_path, monkeypatch):
+    service = _service(tmp_path, monkeypatch)
+    monkeypatch.setattr(file_system_module, "FILE_READ_CHUNK_BYTES", 2)
+
+    with pytest.raises(HTTPException) as exc_info:
+        service._spool_upload_file(_upload(b"abcdef"), 3)
+
+    assert exc_info.value.status_code == 413
+    assert list((tmp_path / "files" / ".incoming").iterdir()) == []
+
+
+def test_download_supports_range_requests(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    monkeypatch,
+    tmp_path,
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    content = b"0123456789" * 100
+
+    create_response = client.post(
+        "/api/v1/files/upload",
+        headers=auth_headers,
+        data={"file_type": "document"},
+        files={"file": ("ranged.txt", content, "text/plain")},
+    )
+    assert create_response.status_code == 200
+    file_id = create_response.json()["id"]
+
+    full_response = client.get(f"/api/v1/files/{file_id}/download", headers=auth_headers)
+    assert full_response.status_code == 200
+    assert full_response.content == content
+    assert full_response.headers["accept-ranges"] == "bytes"
+    assert full_response.headers["content-disposition"].startswith("attachment;")
+
+    ranged_response = client.get(
+        f"/api/v1/files/{file_id}/download",
+        headers={**auth_headers, "Range": "bytes=100-199"},
+    )
+    assert ranged_response.status_code == 206
+    assert ranged_response.content == content[100:200]
+    assert ranged_response.headers["content-range"] == f"bytes 100-199/{len(content)}"
+
+
+def test_stream_zip_stores_compressed_media_and_deflates_the_rest(tmp_path):
+    scan = tmp_path / "scan.jpg"
+    scan.write_bytes(b"\xff\xd8\xff" + b"jpeg" * 1000)
+    notes = tmp_path / "notes.txt"
+    notes.write_bytes(b"notes " * 1000)
+    entries = [
+        file_system_module._ExportEntry(str(scan), "scan.jpg", "image/jpeg", None),
+        file_system_module._ExportEntry(
+            str(notes), "scan.jpg", "text/plain", {"title": "Заметки"}
+        ),
+        file_system_module._ExportEntry(
+            str(tmp_path / "missing.txt"), "missing.txt", "text/plain", None
+        ),
+    ]
+
+    chunks = list(FileSystemService._stream_zip(entries))
+
+    assert len(chunks) > 1
+    with zipfile.ZipFile(io.BytesIO(b"".join(chunks))) as archive:
+        assert archive.namelist() == [
+            "scan.jpg",
+            "scan (2).jpg",
+            "scan (2).jpg.metadata.json",
+        ]
+        assert archive.getinfo("scan.jpg").compress_type == zipfile.ZIP_STORED
+        assert archive.getinfo("scan (2).jpg").compress_type == zipfile.ZIP_DEFLATED
+        assert archive.read("scan.jpg") == scan.read_bytes()
+        assert archive.read("scan (2).jpg") == notes.read_bytes()
+        assert json.loads(archive.read("scan (2).jpg.metadata.json")) == {
+            "title": "Заметки"
+        }
+
+
+def test_export_streams_zip_of_requested_files(
+    client: TestClient,
+    auth_headers: dict[str, str],
+    monkeypatch,
+    tmp_path,
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    file_ids = []
+    for name, content in (("first.txt", b"first file"), ("second.txt", b"second file")):
+        response = client.post(
+            "/api/v1/files/upload",
+            headers=auth_headers,
+            data={"file_type": "document"},
+            files={"file": (name, content, "text/plain")},
+        )
+        assert response.status_code == 200
+        file_ids.append(response.json()["id"])
+
+    # Файлы выбираются одним запросом, а не get_file на каждый ID
+    monkeypatch.setattr(
+        file_system_module.file,
+        "get",
+        lambda *args, **kwargs: pytest.fail("export must not load files one by one"),
+    )
+    response = client.post(
+        "/api/v1/files/export",
+        headers=auth_headers,
+        json={"file_ids": [file_ids[1], file_ids[0], 999999], "format": "zip"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    assert response.headers["content-disposition"].startswith('attachment; filename="export_')
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.namelist() == [
+            "second.txt",
+            "second.txt.metadata.json",
+            "first.txt",
+            "first.txt.metadata.json",
+        ]
+        assert archive.read("first.txt") == b"first file"
+
+
+def test_export_rejects_non_zip_formats(
+    client: TestClient, auth_headers: dict[str, str]
+) -> None:
+    response = client.post(
+        "/api/v1/files/export",
+        headers=auth_headers,
+        json={"file_ids": [1], "format": "tar"},
+    )
+
+    assert response.status_code == 415
@@ -220,6 +220,51 @@ class TestForceMajeureApiService:
             == 0
         )
 
+    def test_transfer_takes_numbers_from_tomorrow_queue_counter(
+        self, db_session, test_doctor, test_patient
+    ):
+        today_queue = DailyQueue(
+            day=date.today(),
+            specialist_id=test_doctor.id,
+            queue_tag="cardiology_common",
+            active=True,
+        )
+        tomorrow_queue = DailyQueue(
+            day=date.today() + timedelta(days=1),
+            specialist_id=test_doctor.id,
+            queue_tag="cardiology_common",
+            active=True,
+            last_number=4,
+        )
+        db_session.add_all([today_queue, tomorrow_queue])
+        db_session.flush()
+        entries = [
+            OnlineQueueEntry(
+                queue_id=today_queue.id,
+                number=number,
+                patient_id=test_patient.id,
+                patient_name=test_patient.short_name(),
+                status="waiting",
+                source="desk",
+            )
+            for number in (1, 2)
+        ]
+        db_session.add_all(entries)
+        db_session.commit()
+
+        result = ForceMajeureService(db_session).transfer_entries_to_tomorrow(
+            entries=entries,
+            specialist_id=test_doctor.id,
+            reason="Doctor emergency",
+            performed_by_id=1,
+            send_notifications=False,
+        )
+
+        # Номер 4 уже выдан (пусть и отменён) - счётчик не отдаёт его повторно
+        assert [item["new_number"] for item in result["details"]] == [5, 6]
+        db_session.refresh(tomorrow_queue)
+        assert tomorrow_queue.last_number == 6
+
     def test_cancel_queue_with_refund_rejects_invalid_type(self, monkeypatch):
         monkeypatch.setattr(
             "app.services.force_majeure_api_service.get_force_majeure_service",
@@ -1,9 +1,16 @@
 from __future__ import annotations
 
+import threading
+from datetime import datetime
 from types import SimpleNamespace
 
 import pytest
+from sqlalchemy import event
 
+from app.models.lab import LabOrder
+from app.models.patient import Patient
+from app.models.visit import Visit
+from app.services import global_search_api_service
 from app.services.global_search_api_service import GlobalSearchApiService
 
 
@@ -47,3 +54,76 @@ class TestGlobalSearchApiService:
             opened_id=2,
         )
         assert response["status"] == "error"
+
+    def test_search_all_query_count_does_not_grow_with_results(self, db_session):
+        for index in range(6):
+            patient = Patient(last_name=f"Тошматов{index}", first_name="Бахтиёр")
+            db_session.add(patient)
+            db_session.flush()
+            db_session.add(
+                Visit(patient_id=patient.id, status="open", created_at=datetime.now())
+            )
+            db_session.add(LabOrder(patient_id=patient.id, status="ordered"))
+        db_session.flush()
+
+        service = GlobalSearchApiService(db_session)
+        # Сессия на Connection (внешняя транзакция) - категории идут последовательно
+        assert service._session_factory is None
+
+        statements = []
+        bind = db_session.get_bind()
+
+        def _before(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(bind, "before_cursor_execute", _before)
+        try:
+            patients, visits, lab_results = service.search_all(query="тошматов", limit=5)
+        finally:
+            event.remove(bind, "before_cursor_execute", _before)
+
+        assert len(patients) == len(visits) == len(lab_results) == 5
+        assert all(visit["patient_name"].startswith("Тошматов") for visit in visits)
+        assert all(lab["patient_name"].startswith("Тошматов") for lab in lab_results)
+        # По одному запросу на категорию, пациенты приходят в JOIN
+        assert len(statements) == 3
+
+    def test_search_all_runs_categories_concurrently(self, monkeypatch):
+        barrier = threading.Barrier(3, timeout=5)
+        opened = []
+
+        class Session:
+            def __enter__(self):
+                opened.append(self)
+                return self
+
+            def __exit__(self, *exc_info):
+                self.closed = True
+
+        class Repository:
+            def __init__(self, db):
+                self.db = db
+
+            def search_patients(self, *, query, limit):
+                barrier.wait()
+                return [SimpleNamespace(id=1, first_name="A", last_name="B")]
+
+            def search_recent_visits_by_patient_name(self, *, query, since_date, limit):
+                barrier.wait()
+                return []
+
+            def search_lab_orders_by_patient_name(self, *, query, limit):
+                barrier.wait()
+                return []
+
+        monkeypatch.setattr(global_search_api_service, "GlobalSearchApiRepository", Repository)
+        service = GlobalSearchApiService(
+            db=None, repository=Repository(None), session_factory=Session
+        )
+
+        # При последовательном выполнении barrier.wait() упал бы по таймауту
+        patients, visits, lab_results = service.search_all(query="abc", limit=5)
+
+        assert [patient["id"] for patient in patients] == [1]
+        assert visits == [] and lab_results == []
+        assert len(opened) == 3 and all(session.closed for session in opened)
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import jwt
+from fastapi import FastAPI
+from fastapi.responses import Response
+
+from app.core.config import settings
+from app.middleware import idempotency_middleware as idempotency_module
+from app.middleware.idempotency_middleware import (
+    IdempotencyMiddleware,
+    IdempotencyResponseCache,
+    RedisIdempotencyStore,
+    StoredResponse,
+)
+
+
+def _build_app(calls: list[str], release: asyncio.Event | None = None) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/api/v1/payments")
+    async def pay():
+        calls.append("pay")
+        if release is not None:
+            await release.wait()
+        return {"payment": len(calls)}
+
+    @app.post("/api/v1/refunds")
+    async def refund():
+        calls.append("refund")
+        return {"refund": len(calls)}
+
+    @app.post("/api/v1/exports")
+    async def export():
+        calls.append("export")
+        return Response(content=b"x" * 64, media_type="application/octet-stream")
+
+    app.add_middleware(IdempotencyMiddleware)
+    return app
+
+
+def _client(app: FastAPI) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def test_concurrent_duplicate_waits_for_first_result(monkeypatch):
+    monkeypatch.setattr(idempotency_module, "_idempotency_cache", IdempotencyResponseCache())
+    monkeypatch.setattr(idempotency_module, "_WAIT_POLL_SECONDS", 0.01)
+    calls: list[str] = []
+
+    async def scenario():
+        release = asyncio.Event()
+        async with _client(_build_app(calls, release)) as client:
+            headers = {"Idempotency-Key": "pay-1"}
+            first = asyncio.create_task(client.post("/api/v1/payments", headers=headers))
+            second = asyncio.create_task(client.post("/api/v1/payments", headers=headers))
+            await asyncio.sleep(0.05)
+            assert calls == ["pay"]
+            release.set()
+            return await first, await second
+
+    first, second = asyncio.run(scenario())
+
+    assert calls == ["pay"]
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json() == {"payment": 1}
+
+
+def test_duplicate_gets_409_when_first_request_outlives_wait(monkeypatch):
+    monkeypatch.setattr(idempotency_module, "_idempotency_cache", IdempotencyResponseCache())
+    monkeypatch.setattr(idempotency_module, "_WAIT_POLL_SECONDS", 0.01)
+    monkeypatch.setattr(idempotency_module, "IDEMPOTENCY_WAIT_SECONDS", 0.05)
+    calls: list[str] = []
+
+    async def scenario():
+        release = asyncio.Event()
+        async with _client(_build_app(calls, release)) as client:
+            headers = {"Idempotency-Key": "pay-2"}
+            first = asyncio.create_task(client.post("/api/v1/payments", headers=headers))
+            await asyncio.sleep(0.01)
+            second = await client.post("/api/v1/payments", headers=headers)
+            release.set()
+            await first
+            return second
+
+    second = asyncio.run(scenario())
+
+    assert second.status_code == 409
+    assert calls == ["pay"]
+
+
+def test_body_over_cap_is_not_stored(monkeypatch):
+    cache = IdempotencyResponseCache()
+    monkeypatch.setattr(idempotency_module, "_idempotency_cache", cache)
+    monkeypatch.setattr(idempotency_module, "IDEMPOTENCY_MAX_BODY_BYTES", 16)
+    calls: list[str] = []
+
+    async def scenario():
+        async with _client(_build_app(calls)) as client:
+            headers = {"Idempotency-Key": "export-1"}
+            first = await client.post("/api/v1/exports", headers=headers)
+            second = await client.post("/api/v1/exports", headers=headers)
+            return first, second, await cache.get("anonymous:POST:/api/v1/exports", "export-1")
+
+    first, second, stored = asyncio.run(scenario())
+
+    assert calls == ["export", "export"]
+    assert first.content == second.content == b"x" * 64
+    assert stored is None
+
+
+def _bearer(sub: str, secret: str | None = None) -> dict[str, str]:
+    token = jwt.encode(
+        {"sub": sub},
+        secret or settings.SECRET_KEY,
+        algorithm=getattr(settings, "ALGORITHM", "HS256"),
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_key_is_scoped_to_caller_method_and_path(monkeypatch):
+    monkeypatch.setattr(idempotency_module, "_idempotency_cache", IdempotencyResponseCache())
+    calls: list[str] = []
+
+    async def scenario():
+        async with _client(_build_app(calls)) as client:
+            key = {"Idempotency-Key": "same-key"}
+            alice = await client.post("/api/v1/payments", headers={**key, **_bearer("1")})
+            alice_retry = await client.post("/api/v1/payments", headers={**key, **_bearer("1")})
+            bob = await client.post("/api/v1/payments", headers={**key, **_bearer("2")})
+            # Подделанный токен с тем же sub не получает чужой ответ
+            forged = await client.post(
+                "/api/v1/payments", headers={**key, **_bearer("1", secret="not-the-key")}
+            )
+            other_path = await client.post("/api/v1/refunds", headers={**key, **_bearer("1")})
+            return alice, alice_retry, bob, forged, other_path
+
+    alice, alice_retry, bob, forged, other_path = asyncio.run(scenario())
+
+    assert calls == ["pay", "pay", "pay", "refund"]
+    assert alice.json() == alice_retry.json() == {"payment": 1}
+    assert bob.json() == {"payment": 2}
+    assert forged.json() == {"payment": 3}
+    assert other_path.json() == {"refund": 4}
+
+
+class _FakeRedis:
+    def __init__(self):
+        self.data: dict[str, str] = {}
+
+    def register_script(self, script):
+        async def release(keys, args):
+            if self.data.get(keys[0]) == args[0]:
+                del self.data[keys[0]]
+                return 1
+            return 0
+
+        return release
+
+    async def get(self, name):
+        return self.data.get(name)
+
+    async def set(self, name, value, nx=False, ex=None):
+        if nx and name in self.data:
+            return None
+        self.data[name] = value
+        return True
+
+
+def test_redis_store_round_trips_response_and_lock():
+    redis = _FakeRedis()
+    store = RedisIdempotencyStore(redis)
+    stored = StoredResponse(201, [(b"content-type", b"application/json"), (b"x-id", b"7")], b'{"id":7}')
+
+    async def scenario():
+        assert await store.acquire(5, "k", "token-a")
+        assert not await store.acquire(5, "k", "token-b")
+        await store.set(5, "k", stored)
+        await store.release(5, "k", "token-b")
+        assert "idempotency-lock:5:k" in redis.data
+        await store.release(5, "k", "token-a")
+        return await store.get(5, "k")
+
+    loaded = asyncio.run(scenario())
+
+    assert loaded == stored
+    assert "idempotency-lock:5:k" not in redis.data
+    assert loaded.to_response().headers["x-id"] == "7"
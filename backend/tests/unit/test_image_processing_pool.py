@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import io
+import threading
+
+import pytest
+from PIL import Image, JpegImagePlugin
+
+from app.services import image_compression_service as image_module
+from app.services.image_compression_service import (
+    ImageCompressor,
+    ImageDerivativeCache,
+    ImageProcessingPool,
+    ImageQueueFullError,
+)
+
+
+def _jpeg(size=(2400, 1600)) -> bytes:
+    output = io.BytesIO()
+    Image.radial_gradient("L").resize(size).convert("RGB").save(output, "JPEG", quality=95)
+    return output.getvalue()
+
+
+def test_jpeg_downscale_uses_draft_and_keeps_target_size(monkeypatch):
+    drafts = []
+    original_draft = JpegImagePlugin.JpegImageFile.draft
+
+    def recording_draft(self, mode, size):
+        drafts.append(size)
+        return original_draft(self, mode, size)
+
+    monkeypatch.setattr(JpegImagePlugin.JpegImageFile, "draft", recording_draft)
+
+    data, metadata = ImageCompressor().create_thumbnail(_jpeg(), size=(150, 150))
+
+    assert drafts[0] == (300, 300)
+    assert metadata["original_dimensions"] == (2400, 1600)
+    assert metadata["new_dimensions"] == (150, 100)
+    assert Image.open(io.BytesIO(data)).size == (150, 100)
+
+
+def test_compress_for_web_decodes_source_once(monkeypatch):
+    opened = []
+    original_open = Image.open
+
+    def counting_open(*args, **kwargs):
+        opened.append(1)
+        return original_open(*args, **kwargs)
+
+    monkeypatch.setattr(image_module.Image, "open", counting_open)
+
+    data, metadata = ImageCompressor().compress_for_web(_jpeg(), target_size_kb=20)
+
+    assert len(opened) == 1
+    assert len(data) <= 20 * 1024
+    assert metadata["compressed_size"] == len(data)
+
+
+def test_pool_persists_derivatives_and_computes_them_once(tmp_path, monkeypatch):
+    calls = []
+    original_run = image_module._run_operation
+
+    def counting_run(operation, image_data, params):
+        calls.append(operation)
+        return original_run(operation, image_data, params)
+
+    monkeypatch.setattr(image_module, "_run_operation", counting_run)
+    cache = ImageDerivativeCache(str(tmp_path / "derivatives"))
+    pool = ImageProcessingPool(workers=0, cache=cache)
+    source = _jpeg()
+
+    async def scenario():
+        concurrent = await asyncio.gather(*(pool.thumbnail(source) for _ in range(3)))
+        again = await ImageProcessingPool(workers=0, cache=cache).thumbnail(source)
+        return concurrent, again
+
+    try:
+        concurrent, again = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+
+    assert calls == ["create_thumbnail"]
+    assert again == concurrent[0]
+    assert again[1]["new_dimensions"] == (150, 100)
+    assert pool.queue_depth == 0
+
+    source_hash = image_module._sha256(source)
+    cache.discard(source_hash)
+    assert cache.get(source_hash, "create_thumbnail", {"size": (150, 150), "quality": 80}) is None
+
+
+def test_pool_rejects_work_beyond_queue_bound(monkeypatch):
+    release = threading.Event()
+
+    def blocking_run(operation, image_data, params):
+        release.wait(5)
+        return b"", {}, 0.0
+
+    monkeypatch.setattr(image_module, "_run_operation", blocking_run)
+    pool = ImageProcessingPool(workers=0, max_queue=1)
+
+    async def scenario():
+        first = asyncio.create_task(pool.compress(b"first"))
+        await asyncio.sleep(0.05)
+        assert pool.queue_depth == 1
+        with pytest.raises(ImageQueueFullError):
+            await pool.compress(b"second")
+        release.set()
+        await first
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+
+    assert pool.queue_depth == 0
+
+
+def test_web_version_of_file_reads_source_only_on_cache_miss(tmp_path, monkeypatch):
+    source_path = tmp_path / "scan.jpg"
+    source_path.write_bytes(_jpeg())
+    source_hash = image_module._sha256(source_path.read_bytes())
+    reads = []
+    original_read_bytes = image_module.Path.read_bytes
+
+    def counting_read_bytes(self):
+        reads.append(self.name)
+        return original_read_bytes(self)
+
+    monkeypatch.setattr(image_module.Path, "read_bytes", counting_read_bytes)
+    pool = ImageProcessingPool(workers=0, cache=ImageDerivativeCache(str(tmp_path / "derivatives")))
+
+    async def scenario():
+        first = await pool.web_version_of_file(str(source_path), source_hash=source_hash)
+        second = await pool.web_version_of_file(str(source_path), source_hash=source_hash)
+        return first, second
+
+    try:
+        first, second = asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+
+    assert reads == ["scan.jpg"]
+    assert first == second
+
+
+@pytest.mark.parametrize("image_format", ["PNG", "WEBP"])
+def test_web_version_keeps_transparent_images_in_source_format(tmp_path, image_format):
+    gradient = Image.radial_gradient("L").resize((1600, 1600))
+    image = Image.merge("RGBA", (gradient, gradient, gradient, gradient))
+    output = io.BytesIO()
+    image.save(output, image_format)
+    pool = ImageProcessingPool(workers=0, cache=ImageDerivativeCache(str(tmp_path / "derivatives")))
+
+    try:
+        data, metadata = asyncio.run(pool.web_version(output.getvalue(), target_size_kb=20))
+    finally:
+        pool.shutdown()
+
+    preview = Image.open(io.BytesIO(data))
+    assert metadata["output_format"] == image_format
+    assert preview.format == image_format
+    assert preview.mode == "RGBA"
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+import pytest
+
+from app.models.lab import LabReportFieldDef, LabReportSection, LabReportTemplateVersion
+from app.services.lab_reporting import _compiled_rules as compiled_rules
+from app.services.lab_reporting._compiled_rules import (
+    compile_condition,
+    compile_rule_payload,
+    get_compiled_template_version,
+)
+
+CONTEXT = {
+    "patient": {"sex": "F", "age_months": 420, "pregnant": True, "note": ""},
+    "field": {"glucose": 6.4, "color": " Yellow "},
+}
+
+
+@pytest.mark.parametrize(
+    ("condition", "expected"),
+    [
+        (None, True),
+        ({}, True),
+        ({"source": "patient.sex"}, True),
+        ({"source": "patient.note"}, False),
+        ({"source": "patient.missing.deeper"}, False),
+        ({"source": "patient.sex", "op": "eq", "value": "F"}, True),
+        ({"source": "patient.sex", "op": "neq", "value": "F"}, False),
+        ({"source": "field.color", "op": "ieq", "value": "yellow"}, True),
+        ({"source": "field.color", "op": "ineq", "value": "yellow"}, False),
+        ({"source": "field.absent", "op": "ieq", "value": None}, True),
+        ({"source": "field.glucose", "op": "gt", "value": 6}, True),
+        ({"source": "field.glucose", "op": "lte", "value": 6}, False),
+        ({"source": "field.absent", "op": "lt", "value": 6}, False),
+        ({"source": "patient.age_months", "op": "between", "min": 216, "max": 600}, True),
+        ({"source": "patient.sex", "op": "in", "values": ["M", "F"]}, True),
+        ({"source": "patient.sex", "op": "unknown", "value": "F"}, False),
+        (
+            {
+                "all": [
+                    {"source": "patient.sex", "op": "eq", "value": "F"},
+                    {"any": [{"source": "patient.pregnant"}, {"source": "field.absent"}]},
+                ]
+            },
+            True,
+        ),
+        ({"any": [{"source": "field.absent"}, {"source": "patient.note"}]}, False),
+    ],
+)
+def test_compiled_condition_matches_rule_semantics(condition, expected):
+    assert compile_condition(condition)(CONTEXT) is expected
+
+
+def test_compiled_rule_payload_returns_first_matching_case_or_default():
+    rule = {
+        "cases": [
+            {"when": {"source": "patient.sex", "op": "eq", "value": "M"}, "text": "male"},
+            {"when": {"source": "patient.sex", "op": "eq", "value": "F"}, "text": "female"},
+        ],
+        "default": {"text": "any"},
+    }
+
+    assert compile_rule_payload(rule)(CONTEXT)["text"] == "female"
+    assert compile_rule_payload(rule)({"patient": {}})["text"] == "any"
+    assert compile_rule_payload({"cases": [], "default": "broken"})(CONTEXT) == {}
+    assert compile_rule_payload(None)(CONTEXT) == {}
+
+
+def _field(field_id: int, key: str, sort_order: int, **extra) -> LabReportFieldDef:
+    return LabReportFieldDef(
+        id=field_id,
+        field_key=key,
+        label=key.title(),
+        value_type="number",
+        reference_mode="manual",
+        sort_order=sort_order,
+        required=False,
+        **extra,
+    )
+
+
+def _version(status: str = "PUBLISHED") -> LabReportTemplateVersion:
+    return LabReportTemplateVersion(
+        id=101,
+        status=status,
+        created_at=datetime(2026, 1, 1, tzinfo=UTC),
+        sections=[
+            LabReportSection(
+                id=2,
+                key="extra",
+                sort_order=20,
+                fields=[_field(3, "hcg", 1, visibility_rule={"source": "patient.pregnant"})],
+            ),
+            LabReportSection(
+                id=1,
+                key="main",
+                sort_order=10,
+                fields=[_field(2, "urea", 2), _field(1, "glucose", 1)],
+            ),
+        ],
+    )
+
+
+def test_published_version_is_compiled_once_with_sorted_sections(monkeypatch):
+    compiled_rules.clear_compiled_template_versions()
+    calls = []
+    original_compile = compiled_rules.compile_template_version
+
+    def counting_compile(version):
+        calls.append(version.id)
+        return original_compile(version)
+
+    monkeypatch.setattr(compiled_rules, "compile_template_version", counting_compile)
+    version = _version()
+
+    first = get_compiled_template_version(version)
+    version.sections[0].fields[0].label = "changed after publish"
+    second = get_compiled_template_version(version)
+
+    assert calls == [101]
+    assert first is second
+    assert [section.key for section in first.sections] == ["main", "extra"]
+    assert [field.field_key for field in first.sections[0].fields] == ["glucose", "urea"]
+    assert list(first.fields_by_key) == ["hcg", "urea", "glucose"]
+    hcg = first.fields_by_key["hcg"]
+    assert hcg.label == "Hcg"
+    assert hcg.is_visible(CONTEXT) is True
+    assert hcg.is_visible({"patient": {}}) is False
+    compiled_rules.clear_compiled_template_versions()
+
+
+def test_draft_version_is_recompiled_on_every_call():
+    compiled_rules.clear_compiled_template_versions()
+    version = _version(status="DRAFT")
+
+    first = get_compiled_template_version(version)
+    version.sections[1].fields[1].label = "Glucose, fasting"
+    second = get_compiled_template_version(version)
+
+    assert first is not second
+    assert second.fields_by_key["glucose"].label == "Glucose, fasting"
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from datetime import date, datetime
+
+import pytest
+
+from app.models.lab import LabOrder
+from app.models.patient import Patient
+from app.models.visit import Visit
+from app.repositories.global_search_api_repository import GlobalSearchApiRepository
+from app.utils.text_search import (
+    normalize_phone_digits,
+    normalize_search_text,
+    patient_search_name,
+)
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [
+        ("Иванов", "ivanov"),
+        ("IVANOV", "ivanov"),
+        ("Хасанов", "xasanov"),
+        ("Khasanov", "xasanov"),
+        ("Қодиров", "kodirov"),
+        ("Qodirov", "kodirov"),
+        ("Ғуломов", "gulomov"),
+        ("G'ulomov", "gulomov"),
+        ("Жуков", "jukov"),
+        ("Zhukov", "jukov"),
+        ("  Петров-Водкин ", "petrov vodkin"),
+        (None, ""),
+    ],
+)
+def test_normalize_search_text(value, expected):
+    assert normalize_search_text(value) == expected
+
+
+def test_normalize_phone_and_full_name():
+    assert normalize_phone_digits("+998 (90) 123-45-67") == "998901234567"
+    assert normalize_phone_digits(None) == ""
+    assert patient_search_name("Ёлкин", "Пётр", None) == "elkin petr"
+
+
+def test_search_fields_are_maintained_on_save(db_session):
+    patient = Patient(last_name="Зуфаров", first_name="Анвар", phone="+998 90 111-22-33")
+    db_session.add(patient)
+    db_session.flush()
+
+    assert patient.search_name == "zufarov anvar"
+    assert patient.search_phone == "998901112233"
+
+    patient.middle_name = "Хамидович"
+    patient.phone = None
+    db_session.flush()
+
+    assert patient.search_name == "zufarov anvar xamidovich"
+    assert patient.search_phone is None
+
+
+@pytest.fixture
+def patients(db_session):
+    rows = [
+        Patient(last_name="Зуфаров", first_name="Анвар", phone="+998 90 555-01-01"),
+        Patient(last_name="Zufarova", first_name="Dilnoza", phone="+998 91 555-02-02"),
+        Patient(last_name="Абдуллаев", first_name="Зуфар", phone="+998 93 777-03-03"),
+    ]
+    db_session.add_all(rows)
+    db_session.flush()
+    return rows
+
+
+def test_search_matches_across_scripts_and_case(db_session, patients):
+    repository = GlobalSearchApiRepository(db_session)
+
+    latin = repository.search_patients(query="ZUFAROV", limit=10)
+    cyrillic = repository.search_patients(query="зуфаров", limit=10)
+
+    assert [p.id for p in latin] == [patients[0].id, patients[1].id]
+    assert [p.id for p in cyrillic] == [patients[0].id, patients[1].id]
+
+
+def test_search_ranks_prefix_matches_first(db_session, patients):
+    repository = GlobalSearchApiRepository(db_session)
+
+    results = repository.search_patients(query="зуфар", limit=10)
+
+    # Начало ФИО, затем начало другого слова ("Абдуллаев Зуфар")
+    assert [p.id for p in results] == [patients[0].id, patients[1].id, patients[2].id]
+
+
+def test_search_tokens_in_any_order(db_session, patients):
+    repository = GlobalSearchApiRepository(db_session)
+
+    results = repository.search_patients(query="Анвар Зуфаров", limit=10)
+
+    assert [p.id for p in results] == [patients[0].id]
+
+
+def test_search_by_formatted_phone(db_session, patients):
+    repository = GlobalSearchApiRepository(db_session)
+
+    assert [p.id for p in repository.search_patients(query="91 555-02", limit=10)] == [
+        patients[1].id
+    ]
+    assert repository.search_patients(query="!!!", limit=10) == []
+
+
+def test_visit_and_lab_search_use_normalized_name(db_session, patients):
+    visit = Visit(patient_id=patients[0].id, status="open", created_at=datetime.now())
+    db_session.add(visit)
+    db_session.add(LabOrder(patient_id=patients[1].id, status="ordered"))
+    db_session.flush()
+    repository = GlobalSearchApiRepository(db_session)
+
+    visits = repository.search_recent_visits_by_patient_name(
+        query="ANVAR", since_date=date(2000, 1, 1), limit=10
+    )
+    orders = repository.search_lab_orders_by_patient_name(query="дилноза", limit=10)
+
+    assert [(v.id, p.id) for v, p in visits] == [(visit.id, patients[0].id)]
+    assert [(o.patient_id, p.id) for o, p in orders] == [(patients[1].id, patients[1].id)]
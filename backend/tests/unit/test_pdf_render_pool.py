@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import pytest
+
+from app.services import pdf_render_pool as pool_module
+from app.services import pdf_service as pdf_module
+from app.services.lab_report_pdf import LabReportPDFService
+from app.services.lab_report_pdf import _core as lab_core_module
+from app.services.pdf_render_pool import (
+    PDFQueueFullError,
+    PDFRenderPool,
+    PDFRenderTimeoutError,
+)
+
+
+class _FakeWeasyprint:
+    def __init__(self):
+        self.parsed_css = []
+        self.rendered = []
+
+    def components(self):
+        weasyprint = self
+
+        class CSS:
+            def __init__(self, *, string, font_config):
+                weasyprint.parsed_css.append(string)
+
+        class HTML:
+            def __init__(self, *, string, base_url):
+                self.string = string
+
+            def write_pdf(self, *, stylesheets, font_config):
+                weasyprint.rendered.append((self.string, stylesheets))
+                return b"%PDF-fake"
+
+        return CSS, HTML
+
+
+@pytest.fixture
+def fake_weasyprint(monkeypatch):
+    weasyprint = _FakeWeasyprint()
+    monkeypatch.setattr(pdf_module, "_load_weasyprint_components", weasyprint.components)
+    monkeypatch.setattr(lab_core_module, "_load_weasyprint_components", weasyprint.components)
+    monkeypatch.setattr(pdf_module, "_get_font_configuration", lambda: object())
+    monkeypatch.setattr(pdf_module, "_weasyprint_local", threading.local())
+    return weasyprint
+
+
+def test_lab_report_stylesheet_is_parsed_once_per_preset(fake_weasyprint, tmp_path):
+    logo = tmp_path / "logo.png"
+    logo.write_bytes(b"png")
+    service = LabReportPDFService()
+    context = {
+        "layout_preset": "lab_table_compact_v1",
+        "page_settings": {"paper_size": "A4", "orientation": "portrait"},
+        "branding": {"logo_url": str(logo)},
+        "patient": {"full_name": "Иванов Иван"},
+        "signers": {},
+        "sections": [],
+        "critical_findings": [],
+        "footer_notes": "",
+        "report_date": "17.10.2026",
+    }
+
+    first = service.render_report(context)
+    logo.unlink()
+    second = service.render_report(context)
+
+    assert first == second == b"%PDF-fake"
+    assert len(fake_weasyprint.parsed_css) == 1
+    assert fake_weasyprint.rendered[0][1] == fake_weasyprint.rendered[1][1]
+    assert service._resolve_logo_url(str(logo)) == logo.resolve().as_uri()
+
+
+def test_pool_renders_off_loop_and_releases_queue(monkeypatch):
+    calls = []
+
+    def recording_render(kind, payload):
+        calls.append((kind, payload, threading.current_thread().name))
+        return b"%PDF", 0.01
+
+    monkeypatch.setattr(pool_module, "_run_render", recording_render)
+    pool = PDFRenderPool(workers=0)
+
+    try:
+        data = asyncio.run(pool.render_html("prescription_a5.j2", {"id": 1}, "A5"))
+    finally:
+        pool.shutdown()
+
+    assert data == b"%PDF"
+    kind, payload, thread_name = calls[0]
+    assert kind == "html"
+    assert payload == {"template_name": "prescription_a5.j2", "data": {"id": 1}, "paper_size": "A5"}
+    assert thread_name.startswith("pdf-render")
+    assert pool.queue_depth == 0
+
+
+def test_pool_times_out_but_keeps_slot_until_render_finishes(monkeypatch):
+    release = threading.Event()
+    finished = threading.Event()
+
+    def slow_render(kind, payload):
+        release.wait(5)
+        finished.set()
+        return b"%PDF", 0.0
+
+    monkeypatch.setattr(pool_module, "_run_render", slow_render)
+    pool = PDFRenderPool(workers=0, max_queue=1)
+
+    async def scenario():
+        with pytest.raises(PDFRenderTimeoutError):
+            await pool.render_lab_report({"sections": []}, timeout=0.05)
+        assert pool.queue_depth == 1
+        with pytest.raises(PDFQueueFullError):
+            await pool.render_lab_report({"sections": []})
+        release.set()
+        while pool.queue_depth:
+            await asyncio.sleep(0.01)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        pool.shutdown()
+
+    assert finished.is_set()
+    assert pool.queue_depth == 0
+
+
+def test_pool_propagates_render_errors(monkeypatch):
+    def failing_render(kind, payload):
+        raise ValueError("broken template")
+
+    monkeypatch.setattr(pool_module, "_run_render", failing_render)
+    pool = PDFRenderPool(workers=0)
+
+    try:
+        with pytest.raises(ValueError, match="broken template"):
+            asyncio.run(pool.render_lab_report({}))
+    finally:
+        pool.shutdown()
+
+    assert pool.queue_depth == 0
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import UTC, datetime, timedelta
+from datetime import time as dt_time
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.scheduler_lease import SchedulerLease
+from app.tasks.periodic import (
+    BUSY,
+    CLAIMED,
+    TAKEN,
+    DailyAt,
+    DatabaseLease,
+    Interval,
+    PeriodicJob,
+    PeriodicScheduler,
+    build_default_jobs,
+)
+from app.tasks.worker import WorkerSettings
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    # Файловая БД: у каждой сессии своё соединение, как у разных воркеров
+    engine = create_engine(f"sqlite:///{tmp_path / 'leases.db'}")
+    SchedulerLease.__table__.create(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+def test_interval_and_daily_slots():
+    interval = Interval(300)
+    assert interval.slot(1_000_299.0) == 3334
+    assert interval.slot_start(3334) == 1_000_200.0
+
+    daily = DailyAt(dt_time(3, 0))
+    before = datetime(2026, 10, 17, 2, 59).timestamp()
+    after = datetime(2026, 10, 17, 3, 0).timestamp()
+    # До 03:00 текущий слот - вчерашний запуск
+    assert daily.slot(before) == daily.slot(after) - 1
+    assert daily.slot_start(daily.slot(after)) == after
+
+
+def test_only_one_worker_claims_a_slot(session_factory):
+    lease = DatabaseLease(session_factory)
+
+    assert lease.claim("job", 10, "worker-a", 60) == CLAIMED
+    assert lease.claim("job", 10, "worker-b", 60) == TAKEN
+    lease.finish("job", "worker-a", success=True)
+    assert lease.claim("job", 10, "worker-b", 60) == TAKEN
+
+    with session_factory() as db:
+        row = db.get(SchedulerLease, "job")
+        assert row.owner == "worker-a"
+        assert row.locked_until is None
+        assert row.last_success_at is not None
+
+
+def test_running_lease_blocks_next_slot_until_it_expires(session_factory):
+    lease = DatabaseLease(session_factory)
+
+    assert lease.claim("job", 10, "worker-a", 60) == CLAIMED
+    assert lease.claim("job", 11, "worker-b", 60) == BUSY
+
+    # worker-a упал, не освободив аренду
+    with session_factory() as db:
+        db.get(SchedulerLease, "job").locked_until = datetime.now(UTC) - timedelta(seconds=1)
+        db.commit()
+
+    assert lease.claim("job", 11, "worker-b", 60) == CLAIMED
+    assert not lease.heartbeat("job", "worker-a", 60)
+
+
+def test_scheduler_runs_slot_once_and_releases_lease_on_failure(session_factory):
+    lease = DatabaseLease(session_factory)
+    calls = []
+
+    def flaky():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+
+    job = PeriodicJob("flaky", flaky, Interval(60))
+    first = PeriodicScheduler([job], lease, owner="worker-a")
+    second = PeriodicScheduler([job], lease, owner="worker-b")
+
+    async def scenario():
+        outcomes = await asyncio.gather(first.run_job_once(job, 5), second.run_job_once(job, 5))
+        # Неудачный запуск освобождает аренду - следующий слот не заблокирован
+        outcomes.append(await second.run_job_once(job, 6))
+        await first.stop()
+        await second.stop()
+        return outcomes
+
+    outcomes = asyncio.run(scenario())
+
+    assert sorted(outcomes[:2], key=str) == [None, "failure"]
+    assert outcomes[2] == "success"
+    assert calls == [0, 1]
+
+
+def test_retention_runs_only_as_arq_cron(monkeypatch):
+    monkeypatch.delenv("LAB_NOTIFICATION_SWEEP_ENABLED", raising=False)
+    jobs = build_default_jobs(SimpleNamespace(AUTO_BACKUP_ENABLED=True))
+
+    assert [job.name for job in jobs] == ["scheduled_backup"]
+    # Очистку по F-017 выполняет только cron воркера arq
+    assert "cron:run_data_retention" in {cron.name for cron in WorkerSettings.cron_jobs}
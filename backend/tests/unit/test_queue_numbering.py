@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from app.models.online_queue import DailyQueue, OnlineQueueEntry
+from app.services.queue_service import QueueNotFoundError, queue_service
+from app.services.queue_svc._numbering import (
+    allocate_global_number,
+    allocate_queue_number,
+    reserve_queue_number,
+)
+
+
+@pytest.fixture
+def daily_queue(db_session, test_doctor):
+    queue = DailyQueue(
+        day=date.today(),
+        specialist_id=test_doctor.id,
+        queue_tag="numbering",
+        active=True,
+    )
+    db_session.add(queue)
+    db_session.flush()
+    return queue
+
+
+def _add_entry(db_session, queue, number):
+    db_session.add(
+        OnlineQueueEntry(
+            queue_id=queue.id,
+            number=number,
+            patient_name=f"Patient {number}",
+            source="desk",
+            status="waiting",
+        )
+    )
+    db_session.flush()
+
+
+def test_first_allocation_continues_existing_numbers(db_session, daily_queue):
+    _add_entry(db_session, daily_queue, 1)
+    _add_entry(db_session, daily_queue, 7)
+
+    assert allocate_queue_number(db_session, daily_queue.id, start_number=1) == 8
+    assert allocate_queue_number(db_session, daily_queue.id, start_number=1) == 9
+
+
+def test_allocation_respects_start_number(db_session, daily_queue):
+    assert allocate_queue_number(db_session, daily_queue.id, start_number=15) == 15
+    assert allocate_queue_number(db_session, daily_queue.id, start_number=15) == 16
+
+
+def test_allocation_after_seed_does_not_touch_entries(db_session, daily_queue):
+    allocate_queue_number(db_session, daily_queue.id, start_number=1)
+    statements: list[str] = []
+    bind = db_session.get_bind()
+
+    def _before(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(bind, "before_cursor_execute", _before)
+    try:
+        allocate_queue_number(db_session, daily_queue.id, start_number=1)
+    finally:
+        event.remove(bind, "before_cursor_execute", _before)
+
+    assert len(statements) == 1
+    assert statements[0].lstrip().upper().startswith("UPDATE DAILY_QUEUES")
+
+
+def test_reserved_manual_number_is_not_issued_again(db_session, daily_queue):
+    assert allocate_queue_number(db_session, daily_queue.id, start_number=1) == 1
+    reserve_queue_number(db_session, daily_queue.id, 5)
+    reserve_queue_number(db_session, daily_queue.id, 3)
+
+    assert allocate_queue_number(db_session, daily_queue.id, start_number=1) == 6
+
+
+def test_create_queue_entry_with_explicit_number_moves_counter(db_session, daily_queue):
+    queue_service.create_queue_entry(
+        db_session, daily_queue=daily_queue, patient_name="Auto", auto_number=True,
+        commit=False,
+    )
+    queue_service.create_queue_entry(
+        db_session, daily_queue=daily_queue, patient_name="Manual", number=10,
+        commit=False,
+    )
+    entry = queue_service.create_queue_entry(
+        db_session, daily_queue=daily_queue, patient_name="Auto 2", auto_number=True,
+        commit=False,
+    )
+
+    assert entry.number == 11
+
+
+def test_unknown_queue_raises(db_session):
+    with pytest.raises(QueueNotFoundError):
+        queue_service.get_next_queue_number(db_session, queue_id=987654)
+
+
+def test_global_scope_uses_shared_counter(db_session, daily_queue):
+    _add_entry(db_session, daily_queue, 40)
+
+    first = queue_service.get_next_queue_number(db_session, scope="global", default_start=1)
+    second = allocate_global_number(db_session, start_number=1)
+
+    assert first >= 41
+    assert second == first + 1
+
+
+def test_global_and_queue_counters_do_not_repeat_each_other(db_session, daily_queue):
+    _add_entry(db_session, daily_queue, 3)
+    assert allocate_global_number(db_session, start_number=1) == 4
+
+    # Счётчик очереди ушёл вперёд - глобальный догоняет MAX(number)
+    for _ in range(3):
+        number = allocate_queue_number(db_session, daily_queue.id, start_number=1)
+        _add_entry(db_session, daily_queue, number)
+    assert allocate_global_number(db_session, start_number=1) == 7
+
+    # Глобальный номер в известной очереди резервируется и в её счётчике
+    number = queue_service.get_next_queue_number(
+        db_session, daily_queue=daily_queue, scope="global", default_start=1
+    )
+    assert number == 8
+    assert allocate_queue_number(db_session, daily_queue.id, start_number=1) == 9
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.models.online_queue import DailyQueue, OnlineQueueEntry
+from app.services.queue_position_notifications import QueuePositionNotificationService
+
+
+def _make_queue(db_session, doctor, size: int, *, start_number: int = 1) -> DailyQueue:
+    queue = DailyQueue(
+        day=date.today(),
+        specialist_id=doctor.id,
+        queue_tag=f"batch_{size}_{start_number}",
+        active=True,
+    )
+    db_session.add(queue)
+    db_session.flush()
+    base = datetime(2026, 1, 1, 8, 0)
+    for offset in range(size):
+        db_session.add(
+            OnlineQueueEntry(
+                queue_id=queue.id,
+                number=start_number + offset,
+                patient_name=f"Patient {offset}",
+                source="desk",
+                status="waiting",
+                queue_time=base + timedelta(minutes=offset),
+            )
+        )
+    db_session.flush()
+    return queue
+
+
+def _stub_sender(service: QueuePositionNotificationService) -> None:
+    async def _send(entry, **kwargs):
+        return {"success": True, "sent": True}
+
+    service._send_notification_to_patient = _send  # type: ignore[method-assign]
+
+
+def _count_statements(db_session):
+    statements: list[str] = []
+    bind = db_session.get_bind()
+
+    def _before(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(bind, "before_cursor_execute", _before)
+    return statements, lambda: event.remove(bind, "before_cursor_execute", _before)
+
+
+@pytest.mark.asyncio
+async def test_batch_query_count_is_constant_in_queue_length(db_session, test_doctor):
+    counts = []
+    for size in (5, 80):
+        queue = _make_queue(db_session, test_doctor, size)
+        service = QueuePositionNotificationService(db_session)
+        _stub_sender(service)
+
+        statements, stop = _count_statements(db_session)
+        try:
+            result = await service.notify_queue_changes_batch(queue.id, 0)
+        finally:
+            stop()
+        counts.append(len(statements))
+        assert result["total_notified"] == min(size, 6)
+
+    assert counts[0] == counts[1] == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_positions_match_per_entry_count(db_session, test_doctor):
+    queue = _make_queue(db_session, test_doctor, 8)
+    entries = (
+        db_session.query(OnlineQueueEntry)
+        .filter_by(queue_id=queue.id)
+        .order_by(OnlineQueueEntry.number)
+        .all()
+    )
+    entries[6].priority = 1  # восстановленный - "следующим"
+    entries[7].queue_time = None
+    entries[3].queue_time = entries[2].queue_time  # одинаковое время
+    db_session.flush()
+
+    service = QueuePositionNotificationService(db_session)
+    _stub_sender(service)
+    result = await service.notify_queue_changes_batch(queue.id, 0)
+
+    by_id = {detail["entry_id"]: detail["people_ahead"] for detail in result["details"]}
+    for entry in entries[:7]:
+        if entry.id in by_id:
+            assert by_id[entry.id] == service._count_people_ahead(entry)
+    assert by_id[entries[6].id] == 0
+    # Без queue_time впереди только записи с большим приоритетом
+    assert by_id[entries[7].id] == 1
+
+
+@pytest.mark.asyncio
+async def test_batch_notifies_only_after_changed_number(db_session, test_doctor):
+    queue = _make_queue(db_session, test_doctor, 6)
+    service = QueuePositionNotificationService(db_session)
+    _stub_sender(service)
+
+    result = await service.notify_queue_changes_batch(queue.id, 3)
+
+    assert [d["number"] for d in result["details"]] == [4, 5, 6]
+    assert [d["people_ahead"] for d in result["details"]] == [3, 4, 5]
+
+
+@pytest.mark.asyncio
+async def test_batch_sends_concurrently_with_bound(db_session, test_doctor, monkeypatch):
+    monkeypatch.setattr(QueuePositionNotificationService, "BATCH_NOTIFY_CONCURRENCY", 2)
+    queue = _make_queue(db_session, test_doctor, 6)
+    service = QueuePositionNotificationService(db_session)
+    in_flight = 0
+    peak = 0
+
+    async def _send(entry, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {"success": True, "sent": True}
+
+    service._send_notification_to_patient = _send  # type: ignore[method-assign]
+    result = await service.notify_queue_changes_batch(queue.id, 0)
+
+    assert result["total_notified"] == 6
+    assert peak == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_without_later_entries(db_session, test_doctor):
+    queue = _make_queue(db_session, test_doctor, 2)
+    service = QueuePositionNotificationService(db_session)
+
+    result = await service.notify_queue_changes_batch(queue.id, 10)
+
+    assert result == {
+        "success": True,
+        "total_notified": 0,
+        "message": "Нет записей для уведомления",
+    }
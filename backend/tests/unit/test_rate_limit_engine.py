@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.core.rate_limit_engine import (
+    MemoryRateLimitBackend,
+    RateLimiter,
+    RedisRateLimitBackend,
+    evaluate_window,
+)
+from app.middleware.websocket_rate_limit import WebSocketRateLimiter
+from app.services.ai.rate_limiter import AIRateLimiter
+
+
+class _Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_sliding_window_estimate_weights_previous_window():
+    # 10 запросов в прошлом окне, 2 в текущем, прошла четверть окна
+    result = evaluate_window(previous=10, current=2, elapsed=15, limit=10, window=60, cost=1)
+
+    assert result.allowed is False
+    assert result.count == pytest.approx(9.5)
+    # Место освободится, когда вклад прошлого окна упадёт до 7
+    assert result.retry_after == pytest.approx(60 * (1 - 7 / 10) - 15)
+
+
+def test_limiter_blocks_within_window_and_recovers_after_it():
+    clock = _Clock()
+    limiter = RateLimiter("test", clock=clock)
+
+    async def scenario():
+        results = [await limiter.hit("ip", 3, 60) for _ in range(4)]
+        assert [result.allowed for result in results] == [True, True, True, False]
+        assert [result.remaining for result in results[:3]] == [2, 1, 0]
+        assert results[3].retry_after > 0
+
+        clock.now += 120
+        assert (await limiter.hit("ip", 3, 60)).allowed
+        assert (await limiter.peek("other", 3, 60)).count == 0
+
+    asyncio.run(scenario())
+    assert "test:other" not in limiter.local
+
+
+def test_memory_backend_evicts_least_recent_keys_and_purges_expired():
+    backend = MemoryRateLimitBackend(max_keys=2)
+    backend.hit_sync("a", 5, 60, 600.0, 1)
+    backend.hit_sync("b", 5, 60, 600.0, 1)
+    backend.hit_sync("a", 5, 60, 601.0, 1)
+    backend.hit_sync("c", 5, 60, 602.0, 1)
+
+    assert "b" not in backend
+    assert len(backend) == 2
+    assert backend.purge(now=600.0 + 180) == 2
+    assert len(backend) == 0
+
+
+def test_limiter_falls_back_to_memory_when_backend_fails():
+    class BrokenBackend:
+        calls = 0
+
+        async def hit(self, key, limit, window, now, cost):
+            BrokenBackend.calls += 1
+            raise ConnectionError("redis down")
+
+        async def reset(self, key):
+            raise ConnectionError("redis down")
+
+    limiter = RateLimiter("test", BrokenBackend(), clock=_Clock())
+
+    async def scenario():
+        return [await limiter.hit("ip", 2, 60) for _ in range(3)]
+
+    results = asyncio.run(scenario())
+
+    assert [result.allowed for result in results] == [True, True, False]
+    # После ошибки Redis не дёргается до истечения паузы
+    assert BrokenBackend.calls == 1
+
+
+def test_redis_backend_runs_script_with_prefixed_key():
+    calls = []
+
+    class FakeScript:
+        async def __call__(self, keys, args):
+            calls.append((keys, args))
+            return [0, 4, 3]
+
+    class FakeRedis:
+        def register_script(self, script):
+            assert "HMGET" in script
+            return FakeScript()
+
+    backend = RedisRateLimitBackend(FakeRedis())
+    result = asyncio.run(backend.hit("security:login:1.2.3.4", 5, 300, 600.0 + 150, 1))
+
+    assert calls == [(["ratelimit:security:login:1.2.3.4"], [5, 300, 750.0, 1])]
+    assert result.allowed is False
+    assert result.count == pytest.approx(4 * 0.5 + 3)
+
+
+def test_websocket_limiter_counts_connection_attempts_per_minute():
+    limiter = WebSocketRateLimiter()
+
+    async def scenario():
+        for _ in range(limiter.max_connections_per_minute):
+            assert (await limiter.check_rate_limit("10.0.0.1"))[0]
+            await limiter.record_connection("10.0.0.1")
+            limiter.remove_connection("10.0.0.1")
+        return await limiter.check_rate_limit("10.0.0.1")
+
+    allowed, reason = asyncio.run(scenario())
+
+    assert allowed is False
+    assert "per minute" in reason
+
+
+def test_ai_limiter_reports_retry_after_and_usage():
+    limiter = AIRateLimiter(user_limit_per_hour=2, provider_limit_per_minute=1)
+
+    async def scenario():
+        assert await limiter.check_user_limit(7) == (True, None)
+        assert await limiter.check_user_limit(7) == (True, None)
+        allowed, retry_after = await limiter.check_user_limit(7)
+        assert allowed is False
+        # Вклад прошлого окна может держать лимит дольше одного окна
+        assert 1 <= retry_after <= 2 * 3600
+        assert (await limiter.check_provider_limit("openai"))[0]
+        assert not (await limiter.check_provider_limit("openai"))[0]
+        return await limiter.get_user_usage(7)
+
+    usage = asyncio.run(scenario())
+
+    assert usage["requests_used"] == 2
+    assert usage["remaining"] == 0
@@ -802,14 +802,11 @@ class TestTelegramWebhookSecurity:
             created_at=datetime.utcnow(),
         )
         db_session.commit()
+        async def fake_build_lab_report_pdf(db, instance):
+            return f"report-{instance.id}.pdf", b"%PDF-1.4 mini app", "Ready report"
+
         monkeypatch.setattr(
-            telegram_webhook,
-            "_build_lab_report_pdf",
-            lambda db, instance: (
-                f"report-{instance.id}.pdf",
-                b"%PDF-1.4 mini app",
-                "Ready report",
-            ),
+            telegram_webhook, "_build_lab_report_pdf", fake_build_lab_report_pdf
         )
 
         response = client.post(
@@ -2788,6 +2785,58 @@ class TestTelegramWebhookSecurity:
             ready_instances[1].id,
         ]
 
+    @pytest.mark.asyncio
+    async def test_lab_report_pdf_is_rendered_in_pdf_pool(
+        self, db_session, test_patient, monkeypatch
+    ):
+        from app.api.v1.endpoints.telegram_webhook import _staff_commands
+
+        template = LabReportTemplate(
+            code="TG_POOL_REPORT",
+            name="Pool Report",
+            family="test",
+        )
+        db_session.add(template)
+        db_session.flush()
+        version = LabReportTemplateVersion(
+            template_id=template.id,
+            version_no=1,
+            status="PUBLISHED",
+            layout_preset="default",
+            page_settings={},
+            branding_overrides={},
+            signer_defaults={},
+        )
+        db_session.add(version)
+        db_session.flush()
+        instance = _create_lab_report_instance(
+            db_session,
+            patient_id=test_patient.id,
+            template=template,
+            version=version,
+            status_value="FINALIZED",
+            created_at=datetime.utcnow(),
+        )
+        db_session.commit()
+        rendered = []
+
+        class FakePDFRenderPool:
+            async def render_lab_report(self, context):
+                rendered.append(context)
+                return b"%PDF-1.4 pool"
+
+        monkeypatch.setattr(
+            _staff_commands, "get_pdf_render_pool", lambda: FakePDFRenderPool()
+        )
+
+        filename, pdf_bytes, _caption = await telegram_webhook._build_lab_report_pdf(
+            db_session, instance
+        )
+
+        assert filename == f"kosmed-lab-report-{instance.id}.pdf"
+        assert pdf_bytes == b"%PDF-1.4 pool"
+        assert [context["template_name"] for context in rendered] == ["Pool Report"]
+
     @pytest.mark.asyncio
     async def test_lab_results_flow_sends_pdf_through_bot_service(
         self, db_session, test_patient, monkeypatch
@@ -2800,14 +2849,12 @@ class TestTelegramWebhookSecurity:
             "_latest_ready_lab_report_instances",
             lambda db, patient_id: [fake_instance],
         )
+
+        async def fake_build_lab_report_pdf(db, instance):
+            return "result.pdf", b"%PDF-1.4", "Ready result"
+
         monkeypatch.setattr(
-            telegram_webhook,
-            "_build_lab_report_pdf",
-            lambda db, instance: (
-                "result.pdf",
-                b"%PDF-1.4",
-                "Ready result",
-            ),
+            telegram_webhook, "_build_lab_report_pdf", fake_build_lab_report_pdf
         )
 
         await telegram_webhook._send_clinic_lab_results(db_session, fake_service, 7004)
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import UTC, date, datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+from app.models.visit import Visit
+from app.services.notifications import notification_sender_service
+from app.tasks import worker
+
+
+@pytest.fixture
+def job_ctx(db_session):
+    return {"session_factory": sessionmaker(bind=db_session.connection()), "job_try": 1}
+
+
+def _visit(db_session, patient, doctor, **overrides) -> Visit:
+    values = {
+        "patient_id": patient.id,
+        "doctor_id": doctor.id,
+        "visit_date": date.today() + timedelta(days=1),
+        "visit_time": "10:00",
+        "status": "pending_confirmation",
+        "discount_mode": "none",
+        "confirmation_token": f"token-{datetime.now(UTC).timestamp()}",
+    }
+    values.update(overrides)
+    visit = Visit(**values)
+    db_session.add(visit)
+    db_session.commit()
+    return visit
+
+
+def test_batch_reminders_walk_chunks_and_mark_delivered(
+    db_session, job_ctx, test_patient, test_doctor, monkeypatch
+):
+    due = [_visit(db_session, test_patient, test_doctor) for _ in range(5)]
+    reminded = _visit(db_session, test_patient, test_doctor, reminder_sent_at=datetime.now(UTC))
+    other_day = _visit(db_session, test_patient, test_doctor, visit_date=date.today())
+    confirmed = _visit(db_session, test_patient, test_doctor, status="confirmed")
+    failing_id = due[2].id
+    calls: list[int] = []
+
+    async def fake_send(db, visit, patient, hours_before=24, visit_services=None, doctor=None):
+        calls.append(visit.id)
+        # Услуги и врач приходят загруженными пачкой
+        assert visit_services is not None
+        assert doctor is not None and doctor.user is not None
+        if visit.id == failing_id:
+            return {"success": False, "error": "no channel"}
+        return {"success": True}
+
+    monkeypatch.setattr(notification_sender_service, "send_visit_reminder", fake_send)
+
+    chunk_queries: list[str] = []
+
+    def count_chunk_queries(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().startswith("SELECT visits.") and "JOIN patients" in statement:
+            chunk_queries.append(statement)
+
+    engine = db_session.get_bind().engine
+    event.listen(engine, "before_cursor_execute", count_chunk_queries)
+    try:
+        result = asyncio.run(worker.send_visit_reminders_batch(job_ctx, chunk_size=2))
+    finally:
+        event.remove(engine, "before_cursor_execute", count_chunk_queries)
+
+    assert result["sent"] == 4
+    assert result["failed"] == 1
+    assert calls == [visit.id for visit in due]
+    # 5 визитов по 2 за запрос: три запроса, не по одному на визит
+    assert len(chunk_queries) == 3
+
+    db_session.expire_all()
+    pending = {visit.id for visit in due if visit.reminder_sent_at is None}
+    assert pending == {failing_id}
+    assert other_day.reminder_sent_at is None
+    assert confirmed.reminder_sent_at is None
+    assert reminded.id not in calls
+
+    # Повторный запуск подбирает только недоставленное
+    calls.clear()
+    asyncio.run(worker.send_visit_reminders_batch(job_ctx, chunk_size=2))
+    assert calls == [failing_id]
+
+
+def test_single_reminder_is_idempotent(db_session, job_ctx, test_patient, test_doctor, monkeypatch):
+    visit = _visit(db_session, test_patient, test_doctor)
+    calls: list[int] = []
+
+    async def fake_send(db, visit, patient, hours_before=24, visit_services=None, doctor=None):
+        calls.append(visit.id)
+        return {"success": True, "channel": "telegram"}
+
+    monkeypatch.setattr(notification_sender_service, "send_visit_reminder", fake_send)
+
+    asyncio.run(worker.send_visit_reminder(job_ctx, visit_id=visit.id))
+    asyncio.run(worker.send_visit_reminder(job_ctx, visit_id=visit.id))
+
+    db_session.expire_all()
+    assert calls == [visit.id]
+    assert visit.reminder_sent_at is not None
+
+
+def test_jobs_record_outcome_and_retries(monkeypatch):
+    records = []
+    monkeypatch.setattr(
+        worker,
+        "record_worker_job_run",
+        lambda job, outcome, duration, attempt=1: records.append((job, outcome, attempt)),
+    )
+
+    @worker._instrumented
+    async def flaky_job(ctx):
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(flaky_job({"job_try": 2}))
+    asyncio.run(worker.generate_scheduled_report({"job_try": 1}, report_type="daily"))
+
+    assert records == [
+        ("flaky_job", "failure", 2),
+        ("generate_scheduled_report", "success", 1),
+    ]
+
+
+def test_worker_engine_lives_from_startup_to_shutdown():
+    ctx: dict = {}
+    asyncio.run(worker.startup(ctx))
+    engine = ctx["db_engine"]
+    with ctx["session_factory"]() as db:
+        assert db.get_bind() is engine
+
+    asyncio.run(worker.shutdown(ctx))
+    assert "db_engine" not in ctx and "session_factory" not in ctx
@@ -49,7 +49,12 @@ export function openQueueWS(department: string, dateStr: string, onMessage: (dat
  * Открыть WebSocket для табло очереди (новая система)
  * Подключается к /api/v1/display/ws/board/{board_id}
  */
-export function openDisplayBoardWS(boardId: string, onMessage: (data: unknown) => void, onConnect: () => void, onDisconnect: () => void): () => void {
+export function openDisplayBoardWS(
+  boardId: string,
+  onMessage: (data: unknown, send: (payload: unknown) => void) => void,
+  onConnect: () => void,
+  onDisconnect: () => void
+): () => void {
   if (!wsEnabled()) return () => {};
   let ws: WebSocket | null = null;
   let reconnectTimeout: ReturnType<typeof setTimeout> | null = null;
@@ -69,6 +74,13 @@ export function openDisplayBoardWS(boardId: string, onMessage: (data: unknown) =
   const maxReconnectAttempts = 5;
   const reconnectDelay = 3000;
 
+  // Ответ серверу из обработчика сообщений (например, queue_resync)
+  function send(payload: unknown) {
+    if (ws && ws.readyState === WebSocket.OPEN) {
+      ws.send(JSON.stringify(payload));
+    }
+  }
+
   function clearPingInterval() {
     if (pingIntervalRef !== null) {
       clearInterval(pingIntervalRef);
@@ -111,7 +123,7 @@ export function openDisplayBoardWS(boardId: string, onMessage: (data: unknown) =
         try {
           const obj = safeJsonParse(ev.data);
           logger.log('📨 Получено WebSocket сообщение:', obj);
-          onMessage && onMessage(obj);
+          onMessage && onMessage(obj, send);
         } catch (e) {
           logger.warn('Ошибка парсинга WebSocket сообщения:', e);
         }
@@ -49,6 +49,7 @@ interface BoardState {
 }
 
 interface QueueEntryDto {
+  id?: number;
   number: number | string;
   patient_name?: string;
   status: string;
@@ -100,6 +101,12 @@ interface WSMessageData {
   [key: string]: unknown;
 }
 
+interface QueueDiffChange {
+  op: 'upsert' | 'remove';
+  id?: number;
+  entry?: QueueEntryDto;
+}
+
 interface WSMessage {
   type: string;
   data: WSMessageData;
@@ -221,6 +228,8 @@ export default function DisplayBoardUnified({
   const loadWindowsRef = useRef<() => void>(() => {});
   const connectWebSocketRef = useRef<() => void>(() => {});
   const lastTicketRef = useRef(0);
+  // queue_id -> версия последнего применённого состояния очереди
+  const queueVersionsRef = useRef<Record<number, number>>({});
   const [online, setOnline] = useState(true);
 
   // Получаем board_id из URL или используем переданный
@@ -325,7 +334,7 @@ export default function DisplayBoardUnified({
   };
 
   // Обработка WebSocket сообщений (новое)
-  const handleWebSocketMessage = (messageRaw: unknown) => {
+  const handleWebSocketMessage = (messageRaw: unknown, send?: (payload: unknown) => void) => {
     const message = messageRaw as WSMessage;
     logger.log('Получено WebSocket сообщение:', message);
 
@@ -367,10 +376,38 @@ export default function DisplayBoardUnified({
         } else {
           // Обновляем всю очередь
           setQueueData(Array.isArray(data.queue_entries) ? data.queue_entries : []);
+          if (typeof data.queue_id === 'number' && typeof data.version === 'number') {
+            queueVersionsRef.current[data.queue_id] = data.version;
+          }
         }
         break;
       }
 
+      case 'queue_diff': {
+        const data = message.data || {};
+        const queueId = Number(data.queue_id);
+        const known = queueVersionsRef.current[queueId];
+        if (known === undefined || known !== data.base_version) {
+          // Пропущен дифф - запрашиваем полный снимок очереди
+          send?.({ type: 'queue_resync', queue_id: queueId });
+          break;
+        }
+        queueVersionsRef.current[queueId] = Number(data.version);
+        const changes = Array.isArray(data.changes) ? (data.changes as QueueDiffChange[]) : [];
+        setQueueData((prev) => {
+          const next = new Map(prev.map((e) => [e.id ?? `n${e.number}`, e]));
+          for (const change of changes) {
+            if (change.op === 'remove' && change.id !== undefined) {
+              next.delete(change.id);
+            } else if (change.op === 'upsert' && change.entry) {
+              next.set(change.entry.id ?? `n${change.entry.number}`, change.entry);
+            }
+          }
+          return [...next.values()].sort((a, b) => Number(a.number) - Number(b.number));
+        });
+        break;
+      }
+
       case 'announcement': {
         const newAnnouncement: Announcement = {
           created_at: typeof message.data?.created_at === 'string' ? message.data.created_at : undefined,
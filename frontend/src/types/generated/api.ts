@@ -14810,7 +14810,7 @@ export type paths = {
         put?: never;
         /**
          * Export Files
-         * @description Экспортировать файлы в архив
+         * @description Экспортировать файлы в архив (ZIP отдаётся потоком по мере сжатия)
          */
         post: operations["export_files_api_v1_files_export_post"];
         delete?: never;
@@ -26996,20 +26996,6 @@ export type components = {
              */
             include_versions: boolean;
         };
-        /** FileExportResponse */
-        FileExportResponse: {
-            /** Export Id */
-            export_id: string;
-            /** Download Url */
-            download_url: string;
-            /**
-             * Expires At
-             * Format: date-time
-             */
-            expires_at: string;
-            /** File Size */
-            file_size?: number | null;
-        };
         /** FileImportResponse */
         FileImportResponse: {
             /** Import Id */
@@ -63619,13 +63605,13 @@ export interface operations {
             };
         };
         responses: {
-            /** @description Successful Response */
+            /** @description ZIP-архив выбранных файлов */
             200: {
                 headers: {
                     [name: string]: unknown;
                 };
                 content: {
-                    "application/json": components["schemas"]["FileExportResponse"];
+                    "application/zip": string;
                 };
             };
             /** @description Validation Error */